@@ -0,0 +1,319 @@
+"""
+工地 × 月份 報告數活動立方體（增量維護）
+
+weekly_snapshot.check_monthly_activity_trend 與 analyze_decline.find_decline_candidates
+每次呼叫都從整份 PDF 清單重新解析、重新分箱出「每月總數」與「每資料夾每月數」；
+歷史越長、城市越多，每週的檢查就越慢。
+
+ActivityCube 把計數持久化在 state/activity_cube.json：
+- 每個工地（Drive 資料夾名稱）一列，每個月份一欄，兩個平面：
+  counts_any（檔名或 folder + 檔名 fallback 解析出的日期，decline 分析口徑）與
+  counts_filename（只認檔名本身的日期，月度趨勢口徑）；列是 array('l')
+- 每月總數 totals_any / totals_filename 隨列同步維護，月度總量查詢 O(1)
+- 每個工地的最新報告指標（日期最新、同日取先加入者）與 Drive modifiedTime 日期分布
+- members：每份 PDF 的貢獻紀錄，inventory 有檔案消失 / 改名 / 搬移時據此扣回
+
+update(pdfs) 只處理與上次相比新增、消失或簽章改變（檔名 / 資料夾 / modifiedTime /
+報告日期）的 PDF；未變動的 PDF 不再解析、不再分箱。月份以絕對月序
+（year × 12 + month − 1）表示，欄位範圍不夠時整體擴充。
+"""
+import json
+import os
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from geobingan_sync import REPO_ROOT
+from geobingan_sync.pdf_inventory import SOURCE_FILENAME, parse_report_date, site_flag
+
+ACTIVITY_CUBE_FILE = REPO_ROOT / 'state' / 'activity_cube.json'
+CUBE_VERSION = 1
+
+# members 紀錄欄位
+_M_SITE, _M_MONTH_FN, _M_MONTH_ANY, _M_DATE, _M_NAME, _M_MODIFIED, _M_SEQ, _M_SIG = range(8)
+
+
+def month_index(year: int, month: int) -> int:
+    return year * 12 + month - 1
+
+
+def month_of(index: int) -> Tuple[int, int]:
+    return index // 12, index % 12 + 1
+
+
+def _pdf_key(pdf: dict) -> str:
+    pid = pdf.get('id')
+    if pid:
+        return str(pid)
+    return f"{pdf.get('folder_name', '')}/{pdf.get('name', '')}@{pdf.get('modifiedTime', '')}"
+
+
+def _report_date(pdf: dict) -> Tuple[str, Optional[str]]:
+    """('YYYY-MM-DD' 或 '', date_source)；inventory 有預先計算欄位時直接取用"""
+    if 'date_source' in pdf:
+        return pdf.get('report_date') or '', pdf['date_source']
+    d, source = parse_report_date(pdf.get('name', ''), pdf.get('folder_name', ''))
+    return (d.date().isoformat() if d is not None else ''), source
+
+
+def _date_month(iso: str) -> int:
+    return month_index(int(iso[:4]), int(iso[5:7]))
+
+
+class ActivityCube:
+    """工地 × 月份計數（見模組說明）。"""
+
+    def __init__(self):
+        self.base = 0        # 第 0 欄的絕對月序
+        self.width = 0       # 欄數
+        self.sites: List[str] = []
+        self.site_index: Dict[str, int] = {}
+        self.folder_ids: List[str] = []
+        self.real_site: List[bool] = []
+        self.counts_any: List[array] = []
+        self.counts_filename: List[array] = []
+        self.totals_any = array('l')
+        self.totals_filename = array('l')
+        self.dated = array('l')                 # 每個工地有日期的 PDF 數
+        self.modified_days: List[Dict[str, int]] = []
+        self.latest: List[Optional[str]] = []   # 每個工地最新報告的 member key
+        self.members: Dict[str, list] = {}
+        self.next_seq = 0
+
+    # ── 建立 / 更新 ──
+
+    @classmethod
+    def from_pdfs(cls, pdfs: Iterable[dict]) -> 'ActivityCube':
+        cube = cls()
+        cube.update(pdfs)
+        return cube
+
+    def _site(self, folder: str) -> int:
+        idx = self.site_index.get(folder)
+        if idx is None:
+            idx = self.site_index[folder] = len(self.sites)
+            self.sites.append(folder)
+            self.folder_ids.append('')
+            self.real_site.append(False)
+            self.counts_any.append(array('l', [0]) * self.width)
+            self.counts_filename.append(array('l', [0]) * self.width)
+            self.dated.append(0)
+            self.modified_days.append({})
+            self.latest.append(None)
+        return idx
+
+    def _ensure_month(self, month: int):
+        """欄位範圍擴充到涵蓋 month（往前或往後補 0）"""
+        if not self.width:
+            self.base = month
+        elif self.base <= month < self.base + self.width:
+            return
+        lo = min(self.base, month)
+        hi = max(self.base + self.width, month + 1)
+        pad_front = array('l', [0]) * (self.base - lo)
+        pad_back = array('l', [0]) * (hi - self.base - self.width)
+        for plane in (self.counts_any, self.counts_filename):
+            for i, row in enumerate(plane):
+                plane[i] = pad_front + row + pad_back
+        self.totals_any = pad_front + self.totals_any + pad_back
+        self.totals_filename = pad_front + self.totals_filename + pad_back
+        self.base, self.width = lo, hi - lo
+
+    def _bump(self, rec: list, sign: int):
+        site = rec[_M_SITE]
+        col = rec[_M_MONTH_ANY]
+        if col >= 0:
+            self.counts_any[site][col - self.base] += sign
+            self.totals_any[col - self.base] += sign
+            self.dated[site] += sign
+        col = rec[_M_MONTH_FN]
+        if col >= 0:
+            self.counts_filename[site][col - self.base] += sign
+            self.totals_filename[col - self.base] += sign
+        day = rec[_M_MODIFIED][:10]
+        if day:
+            days = self.modified_days[site]
+            days[day] = days.get(day, 0) + sign
+            if days[day] <= 0:
+                del days[day]
+
+    def _newer(self, key: str, than: Optional[str]) -> bool:
+        if than is None:
+            return True
+        a, b = self.members[key], self.members[than]
+        return (a[_M_DATE], -a[_M_SEQ]) > (b[_M_DATE], -b[_M_SEQ])
+
+    def _add(self, key: str, pdf: dict, sig: list):
+        folder = pdf.get('folder_name', '') or ''
+        site = self._site(folder)
+        self.folder_ids[site] = pdf.get('folder_id', '') or self.folder_ids[site]
+        self.real_site[site] = bool(site_flag(pdf))
+        iso, source = sig[3], sig[4]
+        rec = [site,
+               _date_month(iso) if iso and source == SOURCE_FILENAME else -1,
+               _date_month(iso) if iso else -1,
+               iso, pdf.get('name', ''), pdf.get('modifiedTime', '') or '', self.next_seq, sig]
+        self.next_seq += 1
+        self.members[key] = rec
+        if rec[_M_MONTH_ANY] >= 0:
+            self._ensure_month(rec[_M_MONTH_ANY])
+        self._bump(rec, +1)
+        if iso and self._newer(key, self.latest[site]):
+            self.latest[site] = key
+
+    def _remove(self, key: str) -> int:
+        rec = self.members[key]
+        self._bump(rec, -1)
+        site = rec[_M_SITE]
+        if self.latest[site] == key:
+            self.latest[site] = None  # 稍後以 _repoint 重算
+        del self.members[key]
+        return site
+
+    def _repoint(self, sites):
+        for key, rec in self.members.items():
+            site = rec[_M_SITE]
+            if site in sites and rec[_M_DATE] and self._newer(key, self.latest[site]):
+                self.latest[site] = key
+
+    def update(self, pdfs: Iterable[dict]) -> Tuple[int, int]:
+        """套用 inventory 與上次的差異；回傳 (新增或變動數, 移除數)"""
+        seen = set()
+        changed: List[Tuple[str, dict, list]] = []
+        for pdf in pdfs:
+            key = _pdf_key(pdf)
+            if key in seen:
+                continue
+            seen.add(key)
+            iso, source = _report_date(pdf)
+            sig = [pdf.get('name', ''), pdf.get('folder_name', '') or '',
+                   pdf.get('modifiedTime', '') or '', iso, source]
+            rec = self.members.get(key)
+            if rec is None or rec[_M_SIG] != sig:
+                changed.append((key, pdf, sig))
+        stale = [k for k in self.members if k not in seen]
+        dirty = set()
+        for key in stale:
+            dirty.add(self._remove(key))
+        for key, _, _ in changed:
+            if key in self.members:
+                dirty.add(self._remove(key))
+        dirty = {s for s in dirty if self.latest[s] is None}
+        if dirty:
+            self._repoint(dirty)
+        for key, pdf, sig in changed:
+            self._add(key, pdf, sig)
+        return len(changed), len(stale)
+
+    # ── 查詢 ──
+
+    def month_total(self, year: int, month: int, *, filename_only: bool = False) -> int:
+        col = month_index(year, month) - self.base
+        if not 0 <= col < self.width:
+            return 0
+        return (self.totals_filename if filename_only else self.totals_any)[col]
+
+    def column(self, month: int, *, filename_only: bool = False) -> array:
+        """某月（絕對月序）所有工地的計數，順序同 sites"""
+        col = month - self.base
+        if not 0 <= col < self.width:
+            return array('l', [0]) * len(self.sites)
+        plane = self.counts_filename if filename_only else self.counts_any
+        return array('l', (row[col] for row in plane))
+
+    def site_months(self, site: int, months: Iterable[int]) -> List[int]:
+        row = self.counts_any[site]
+        return [row[m - self.base] if 0 <= m - self.base < self.width else 0 for m in months]
+
+    def latest_of(self, site: int) -> Optional[Tuple[str, str, str]]:
+        """(報告日期, 檔名, modifiedTime)；工地沒有可解析日期的報告時為 None"""
+        key = self.latest[site]
+        if key is None:
+            return None
+        rec = self.members[key]
+        return rec[_M_DATE], rec[_M_NAME], rec[_M_MODIFIED]
+
+    # ── 持久化 ──
+
+    def to_json(self) -> dict:
+        return {
+            'version': CUBE_VERSION,
+            'base': self.base,
+            'width': self.width,
+            'next_seq': self.next_seq,
+            'sites': [{
+                'name': self.sites[i],
+                'folder_id': self.folder_ids[i],
+                'is_real_site': self.real_site[i],
+                'counts_any': self.counts_any[i].tolist(),
+                'counts_filename': self.counts_filename[i].tolist(),
+                'modified_days': self.modified_days[i],
+                'latest': self.latest[i],
+            } for i in range(len(self.sites))],
+            'members': self.members,
+        }
+
+    @classmethod
+    def from_json(cls, data: dict) -> 'ActivityCube':
+        cube = cls()
+        cube.base, cube.width, cube.next_seq = data['base'], data['width'], data['next_seq']
+        cube.totals_any = array('l', [0]) * cube.width
+        cube.totals_filename = array('l', [0]) * cube.width
+        for site in data['sites']:
+            cube.site_index[site['name']] = len(cube.sites)
+            cube.sites.append(site['name'])
+            cube.folder_ids.append(site['folder_id'])
+            cube.real_site.append(site['is_real_site'])
+            row_any, row_fn = array('l', site['counts_any']), array('l', site['counts_filename'])
+            cube.counts_any.append(row_any)
+            cube.counts_filename.append(row_fn)
+            cube.dated.append(sum(row_any))
+            for col in range(cube.width):
+                cube.totals_any[col] += row_any[col]
+                cube.totals_filename[col] += row_fn[col]
+            cube.modified_days.append(dict(site['modified_days']))
+            cube.latest.append(site['latest'])
+        cube.members = data['members']
+        return cube
+
+    def save(self, path=None):
+        """atomic 寫入（tmp + os.replace）"""
+        path = str(path or ACTIVITY_CUBE_FILE)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f'{path}.tmp.{os.getpid()}'
+        try:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(self.to_json(), f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(tmp, path)
+        except Exception:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+
+
+def load_cube(path=None) -> ActivityCube:
+    """讀取持久化的立方體；不存在、損壞或版本不符時回傳空立方體（下次 update 會全量重建）"""
+    path = str(path or ACTIVITY_CUBE_FILE)
+    if os.path.exists(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == CUBE_VERSION:
+                return ActivityCube.from_json(data)
+        except (json.JSONDecodeError, IOError, KeyError, TypeError):
+            pass
+    return ActivityCube()
+
+
+def update_cube(pdfs: List[dict], path=None) -> ActivityCube:
+    """載入 → 套用 inventory 差異 → 存回；寫入失敗只警告（本次結果照用）"""
+    cube = load_cube(path)
+    added, removed = cube.update(pdfs)
+    if added or removed:
+        print(f"  🧊 活動立方體更新：{added} 筆新增/變動，{removed} 筆移除（共 {len(cube.members)} 筆）")
+        try:
+            cube.save(path)
+        except OSError as e:
+            print(f"  ⚠️ 活動立方體寫入失敗（不影響本次結果）: {e}")
+    return cube
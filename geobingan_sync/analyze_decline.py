@@ -5,26 +5,42 @@
 月度告警觸發時，自動附帶 top 候選 + Drive folder URL，
 不用人再手寫 query。
 
+兩種選法都讀 activity_cube 的工地 × 月份矩陣：
+- find_decline_candidates：固定門檻（前 N 月每月 ≥ k 份、目標月歸零）
+- score_stalled_sites：每個工地以前幾月 EWMA 為預期值，目標月實際數的 Poisson
+  下尾機率（−log10 p）為異常分數，全部工地一起計分後取 top-K
+
 也可獨立 CLI 跑：
     python3 -m geobingan_sync.analyze_decline                 # 對上一個完整月份分析
     python3 -m geobingan_sync.analyze_decline --month 2026-04 # 指定月份
     python3 -m geobingan_sync.analyze_decline --top 10        # 顯示前 10 名
+    python3 -m geobingan_sync.analyze_decline --score         # 依停報異常分數（EWMA + Poisson）排序
 """
 import argparse
+import heapq
 import json
-import re
+import math
 import sys
-from collections import defaultdict
-from datetime import datetime, timedelta
+from array import array
+from datetime import datetime
+from itertools import compress
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, Optional, Sequence, Tuple
 
 from geobingan_sync import REPO_ROOT
+from geobingan_sync.activity_cube import ActivityCube, month_index, month_of, update_cube
+from geobingan_sync.binary_inventory import open_if_fresh
+from geobingan_sync.pdf_inventory import is_real_site as _is_real_site
 DRIVE_CACHE_FILE = REPO_ROOT / 'state' / 'uploaded_to_geobingan_7days.json'  # legacy fallback
 PDF_INVENTORY_FILE = REPO_ROOT / 'state' / 'pdf_inventory.json'
 
-# 真工地名稱必含的關鍵字（過濾「2026年03月」、「115年1月」這類時間分類資料夾）
-SITE_NAME_KEYWORDS = re.compile(r'(建字|工程|新建|工地|大樓|社區|觀測|監測|案|場)')
+# 停報異常計分（score_stalled_sites）
+SCORE_HISTORY_MONTHS = 6     # EWMA 回看月數
+SCORE_EWMA_ALPHA = 0.5       # 越大越偏重最近月份
+SCORE_MIN_EXPECTED = 2.0     # 預期月報告數低於此值不計分（樣本太小）
+SCORE_MIN = 2.0              # −log10 p ≥ 2（p ≤ 1%）才列為候選
+SCORE_SHOWN_MONTHS = 3       # 訊息中顯示目標月前幾個月的分布
+LN10 = math.log(10)
 
 
 def _months_back(year: int, month: int, n: int) -> Tuple[int, int]:
@@ -35,23 +51,34 @@ def _months_back(year: int, month: int, n: int) -> Tuple[int, int]:
     return year, month
 
 
-def _is_real_site(folder_name: str) -> bool:
-    """過濾時間分類資料夾（如 `2026年03月`、`115年1月`、`11502`）。"""
-    if not folder_name:
-        return False
-    # 純數字或數字+年/月結尾，視為時間資料夾
-    if re.fullmatch(r'\d{4,6}|11\d{0,2}年?\d{0,2}月?|2026年?\d{1,2}月?|115\.\d{1,2}|115年?', folder_name):
-        return False
-    return bool(SITE_NAME_KEYWORDS.search(folder_name))
+def _candidate(cube: ActivityCube, site: int, shown_months: List[int], prior_months: int) -> dict:
+    """工地候選的輸出格式（format_candidates 的輸入）"""
+    latest = cube.latest_of(site)
+
+    # batch upload 偵測：所有 modifiedTime 集中在 1-2 天內 + 檔名日期 > 6 個月舊
+    batch_warn = ''
+    if len(cube.modified_days[site]) <= 2 and latest:
+        latest_age_days = (datetime.now() - datetime.fromisoformat(latest[0])).days
+        if latest_age_days > 180:
+            batch_warn = f'⚠️ 疑似批次回填（modifiedTime 集中、檔名日期 {latest_age_days}d 前）'
+
+    counts = cube.site_months(site, shown_months)
+    return {
+        'folder': cube.sites[site],
+        'folder_id': cube.folder_ids[site],
+        'prior_total': sum(counts[:prior_months]),
+        'monthly': {'%d-%02d' % month_of(m): n for m, n in zip(shown_months, counts)},
+        'latest_filename': latest[1] if latest else None,
+        'latest_filename_date': latest[0] if latest else None,
+        'latest_modified': latest[2][:10] if latest and latest[2] else None,
+        'batch_upload_warning': batch_warn,
+    }
 
 
-def _parse_filename_date(name: str, folder: str = ''):
-    """共用 parser：先檔名，再 folder + 檔名 fallback。"""
-    from geobingan_sync.filename_date_parser import parse_date_from_filename
-    d = parse_date_from_filename(name)
-    if d is None and folder:
-        d = parse_date_from_filename(folder + '/' + name)
-    return d
+def _site_mask(cube: ActivityCube) -> array:
+    """有資料夾、有可解析日期的報告、且是真工地（非時間分類資料夾）"""
+    return array('b', (bool(folder) and dated > 0 and real
+                       for folder, dated, real in zip(cube.sites, cube.dated, cube.real_site)))
 
 
 def find_decline_candidates(
@@ -63,77 +90,100 @@ def find_decline_candidates(
     min_prior_per_month: int = 2,
     max_target: int = 0,
     top: int = 5,
+    cube: ActivityCube = None,
 ) -> List[dict]:
     """找出前 prior_months 月每月 >= min_prior_per_month 但目標月 <= max_target 的工地。
 
+    cube 為已更新的 ActivityCube（weekly_snapshot 傳入持久化版本）；省略時由 pdfs 現建。
     回傳每個候選含：folder, folder_id, latest_filename, latest_filename_date,
     latest_drive_modified_time, batch_upload_warning, monthly_distribution。
     """
-    by_folder = defaultdict(lambda: defaultdict(int))
-    folder_id_lookup: Dict[str, str] = {}
-    folder_files: Dict[str, list] = defaultdict(list)
-    folder_modified_times: Dict[str, set] = defaultdict(set)
-
-    for p in pdfs:
-        folder = p.get('folder_name', '')
-        if not folder:
-            continue
-        folder_id_lookup[folder] = p.get('folder_id', '')
-        modified = p.get('modifiedTime', '')
-        if modified:
-            folder_modified_times[folder].add(modified[:10])
-
-        d = _parse_filename_date(p.get('name', ''), folder)
-        if d is None:
-            continue
-        by_folder[folder][(d.year, d.month)] += 1
-        folder_files[folder].append((d, p.get('name', ''), modified))
-
-    prior_keys = [_months_back(target_year, target_month, n) for n in range(1, prior_months + 1)]
+    if cube is None:
+        cube = ActivityCube.from_pdfs(pdfs)
+    target = month_index(target_year, target_month)
+
+    # 所有工地一次比對：前 N 月每欄都達標、目標月不超過 max_target
+    qualified = _site_mask(cube)
+    for n in range(1, prior_months + 1):
+        qualified = array('b', map(min, qualified, map(min_prior_per_month.__le__, cube.column(target - n))))
+    qualified = array('b', map(min, qualified, map(max_target.__ge__, cube.column(target))))
+
+    shown_months = [target - n for n in range(prior_months, -2, -1)]
+    candidates = [_candidate(cube, site, shown_months, prior_months)
+                  for site in compress(range(len(cube.sites)), qualified)]
+
+    # 同分時依資料夾名稱排（不受 Drive 列表順序影響）
+    candidates.sort(key=lambda c: (-c['prior_total'], c['folder']))
+    return candidates[:top]
+
 
+def _poisson_drop_score(observed: int, expected: float) -> float:
+    """−log10 P(X ≤ observed)，X ~ Poisson(expected)：越大表示「這麼少」越不可能是正常波動"""
+    log_lam = math.log(expected)
+    log_term = -expected               # i = 0 項：e^{-λ}
+    log_cdf = log_term
+    for i in range(1, observed + 1):
+        log_term += log_lam - math.log(i)
+        hi, lo = max(log_cdf, log_term), min(log_cdf, log_term)
+        log_cdf = hi + math.log1p(math.exp(lo - hi))
+    return -log_cdf / LN10
+
+
+def score_stalled_sites(
+    cube: ActivityCube,
+    target_year: int,
+    target_month: int,
+    *,
+    history_months: int = SCORE_HISTORY_MONTHS,
+    alpha: float = SCORE_EWMA_ALPHA,
+    min_expected: float = SCORE_MIN_EXPECTED,
+    min_score: float = SCORE_MIN,
+    top: int = 5,
+) -> List[dict]:
+    """所有工地一起計分，回傳停報嫌疑最高的 top 個（格式同 find_decline_candidates，另含 score / expected）。
+
+    預期值 = 前 history_months 月的 EWMA（越近的月份權重越高）；
+    分數 = Poisson 下尾機率的 −log10（目標月實際數 vs 預期值）。
+    預期值 < min_expected（樣本太小）或實際數不低於預期的工地不計分。
+    """
+    target = month_index(target_year, target_month)
+    # 由舊到新逐欄累積 EWMA：ewma = α·當月 + (1−α)·ewma（第一欄直接當初值）
+    ewma = None
+    for m in range(target - history_months, target):
+        col = cube.column(m)
+        if ewma is None:
+            ewma = array('d', col)
+        else:
+            ewma = array('d', map(lambda e, c: alpha * c + (1 - alpha) * e, ewma, col))
+    observed = cube.column(target)
+    eligible = array('b', map(lambda ok, e, o: ok and e >= min_expected and o < e,
+                              _site_mask(cube), ewma, observed))
+
+    scored = []
+    for site in compress(range(len(cube.sites)), eligible):
+        score = _poisson_drop_score(observed[site], ewma[site])
+        if score >= min_score:
+            scored.append((score, site))
+
+    shown_months = [target - n for n in range(SCORE_SHOWN_MONTHS, -2, -1)]
     candidates = []
-    for folder, months in by_folder.items():
-        if not _is_real_site(folder):
-            continue
-        prior_counts = [months.get(k, 0) for k in prior_keys]
-        if not all(c >= min_prior_per_month for c in prior_counts):
-            continue
-        if months.get((target_year, target_month), 0) > max_target:
-            continue
-
-        files = sorted(folder_files[folder], key=lambda x: x[0], reverse=True)
-        latest = files[0] if files else None
-
-        # batch upload 偵測：所有 modifiedTime 集中在 1-2 天內 + 檔名日期 > 6 個月舊
-        mt_dates = folder_modified_times[folder]
-        batch_warn = ''
-        if len(mt_dates) <= 2 and latest:
-            latest_age_days = (datetime.now() - latest[0]).days
-            if latest_age_days > 180:
-                batch_warn = f'⚠️ 疑似批次回填（modifiedTime 集中、檔名日期 {latest_age_days}d 前）'
-
-        prior_total = sum(prior_counts)
-        candidates.append({
-            'folder': folder,
-            'folder_id': folder_id_lookup.get(folder, ''),
-            'prior_total': prior_total,
-            'monthly': {f'{y}-{m:02d}': months.get((y, m), 0) for y, m in
-                        [_months_back(target_year, target_month, n) for n in range(prior_months, -2, -1)]},
-            'latest_filename': latest[1] if latest else None,
-            'latest_filename_date': latest[0].date().isoformat() if latest else None,
-            'latest_modified': latest[2][:10] if latest and latest[2] else None,
-            'batch_upload_warning': batch_warn,
-        })
-
-    candidates.sort(key=lambda c: -c['prior_total'])
-    return candidates[:top]
+    for score, site in heapq.nlargest(top, scored, key=lambda x: (x[0], -x[1])):
+        c = _candidate(cube, site, shown_months, SCORE_SHOWN_MONTHS)
+        c['score'] = round(score, 2)
+        c['expected'] = round(ewma[site], 1)
+        c['observed'] = observed[site]
+        candidates.append(c)
+    return candidates
 
 
 def format_candidates(candidates: List[dict], target_label: str) -> str:
     """格式化成 ClickUp comment / log 用的純文字。"""
     if not candidates:
         return '（無符合條件的候選 — 衰退可能分散在多工地、無單一明顯停報）'
-    lines = [f'🎯 {target_label} 候選工地（前月活躍、本月歸零）：']
+    if 'score' in candidates[0]:
+        lines = [f'🎯 {target_label} 候選工地（依停報異常分數排序）：']
+    else:
+        lines = [f'🎯 {target_label} 候選工地（前月活躍、本月歸零）：']
     for i, c in enumerate(candidates, 1):
         lines.append('')
         lines.append(f'{i}. {c["folder"]}')
@@ -141,6 +191,8 @@ def format_candidates(candidates: List[dict], target_label: str) -> str:
             lines.append(f'   https://drive.google.com/drive/folders/{c["folder_id"]}')
         dist = ' '.join(f'{m}={n}' for m, n in c['monthly'].items())
         lines.append(f'   月分布: {dist}')
+        if 'score' in c:
+            lines.append(f'   異常分數: {c["score"]:.1f}（預期 {c["expected"]:.1f} 份，實際 {c["observed"]} 份）')
         if c['latest_filename']:
             lines.append(f'   最新檔: {c["latest_filename"][:60]} (檔名日期 {c["latest_filename_date"]}, Drive {c["latest_modified"]})')
         if c['batch_upload_warning']:
@@ -148,8 +200,11 @@ def format_candidates(candidates: List[dict], target_label: str) -> str:
     return '\n'.join(lines)
 
 
-def load_pdfs() -> Optional[list]:
-    """優先讀新版 pdf_inventory.json，fallback legacy state cache。"""
+def load_pdfs() -> Optional[Sequence[dict]]:
+    """優先 mmap 二進位 inventory，其次 pdf_inventory.json，fallback legacy state cache。"""
+    binary = open_if_fresh(PDF_INVENTORY_FILE)
+    if binary is not None:
+        return binary
     if PDF_INVENTORY_FILE.exists():
         try:
             with open(PDF_INVENTORY_FILE, 'r', encoding='utf-8') as f:
@@ -171,6 +226,7 @@ def main():
     parser.add_argument('--top', type=int, default=5)
     parser.add_argument('--prior', type=int, default=3, help='往前看幾個月作為基準')
     parser.add_argument('--min-prior', type=int, default=2, help='前每月最少報告數')
+    parser.add_argument('--score', action='store_true', help='改用停報異常分數（EWMA + Poisson）排序')
     args = parser.parse_args()
 
     if args.month:
@@ -184,12 +240,16 @@ def main():
         print('❌ 找不到或無法讀取 cache')
         sys.exit(1)
 
-    candidates = find_decline_candidates(
-        pdfs, ty, tm,
-        prior_months=args.prior,
-        min_prior_per_month=args.min_prior,
-        top=args.top,
-    )
+    cube = update_cube(pdfs)
+    if args.score:
+        candidates = score_stalled_sites(cube, ty, tm, top=args.top)
+    else:
+        candidates = find_decline_candidates(
+            pdfs, ty, tm, cube=cube,
+            prior_months=args.prior,
+            min_prior_per_month=args.min_prior,
+            top=args.top,
+        )
     print(format_candidates(candidates, f'{ty}-{tm:02d}'))
 
 
@@ -0,0 +1,139 @@
+"""
+riskmap.today list endpoint 並行翻頁
+
+DRF 風格的 list API（construction-projects / construction-reports）回應含
+count / next / results。原本各呼叫端都循序跟著 next 一頁一頁抓（每頁 100 筆、
+timeout 15~30s），頁數一多就是頁數 × 延遲。
+
+fetch_all_pages 先抓第 1 頁讀 count，算出總頁數後以有上限的 thread pool 並行抓
+其餘頁，再依頁序組回；回應沒有 count 時退回循序跟 next。
+make_json_page_fetcher 產生的 fetcher 在多個 worker 間共用 token：
+任一 worker 遇到 401 只會觸發一次刷新，其他 worker 直接拿新 token 重試；
+傳入 invalidate（token_manager.invalidate）時，刷新交給共用的 TokenManager。
+"""
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+PAGE_SIZE = 100
+MAX_WORKERS = 4
+
+# fetch_page(page) → 該頁 JSON（dict，含 results / next / count）；失敗請 raise
+JsonPageFetcher = Callable[[int], dict]
+
+
+class SharedToken:
+    """多 worker 共用的 Bearer token；401 時以「舊 token」為條件只刷新一次。
+
+    invalidate(stale) → 新 token；沒給時以 get_token() 重新取得。
+    """
+
+    def __init__(self, get_token: Callable[[], str], invalidate: Callable[[str], str] = None):
+        self._get_token = get_token
+        self._invalidate = invalidate
+        self._lock = threading.Lock()
+        self._token: Optional[str] = None
+        self.refreshes = 0
+
+    def current(self) -> str:
+        with self._lock:
+            if self._token is None:
+                self._token = self._get_token()
+            return self._token
+
+    def refresh(self, stale: str) -> str:
+        with self._lock:
+            if self._token == stale:
+                self._token = self._invalidate(stale) if self._invalidate else self._get_token()
+                self.refreshes += 1
+            return self._token
+
+
+def make_json_page_fetcher(session, url: str, params: dict, get_token: Callable[[], str], *,
+                           headers: dict = None, timeout: float = 30, page_size: int = PAGE_SIZE,
+                           max_auth_retries: int = 2, invalidate: Callable[[str], str] = None):
+    """回傳 fetch_page(page, ordering=None) → JSON dict；401 共用刷新，非 200 raise。"""
+    token = SharedToken(get_token, invalidate)
+    extra_headers = dict(headers or {})
+
+    def fetch_page(page: int, ordering: str = None) -> dict:
+        query = dict(params, page=page, page_size=page_size)
+        if ordering:
+            query['ordering'] = ordering
+        auth_retries = 0
+        while True:
+            current = token.current()
+            hdrs = dict(extra_headers, Authorization=f'Bearer {current}')
+            r = session.get(url, params=query, headers=hdrs, timeout=timeout)
+            if r.status_code == 401:
+                auth_retries += 1
+                if auth_retries > max_auth_retries:
+                    raise IOError('401 重試超過上限')
+                token.refresh(current)
+                continue
+            if r.status_code != 200:
+                raise IOError(f'API 錯誤: {r.status_code}（page {page}）')
+            return r.json()
+
+    fetch_page.token = token
+    return fetch_page
+
+
+def fetch_all_pages(fetch_page: JsonPageFetcher, *, max_workers: int = MAX_WORKERS,
+                    verbose: bool = True, partial: bool = False) -> List[dict]:
+    """抓完所有頁並依頁序回傳 results。
+
+    預設任一頁失敗即 raise（不回傳靜默缺頁的結果）。partial=True 時第 2 頁之後的失敗頁
+    略過並印出警告，回傳其餘頁的結果（原本循序翻頁「抓到哪算哪」的語意）；
+    第 1 頁失敗一律 raise——呼叫端不該把「什麼都沒抓到」當成空清單。
+    """
+    first = fetch_page(1)
+    results = list(first.get('results') or [])
+    count = first.get('count')
+    if not first.get('next') or not results:
+        return results
+
+    if not isinstance(count, int):
+        # 沒有 count → 無法預先知道頁數，循序跟 next
+        page = 1
+        data = first
+        while data.get('next'):
+            page += 1
+            try:
+                data = fetch_page(page)
+            except Exception as e:
+                if not partial:
+                    raise
+                print(f"    ⚠️ 第 {page} 頁抓取失敗，停止翻頁並回傳已取得的 {len(results)} 筆: {e}")
+                break
+            chunk = data.get('results') or []
+            if not chunk:
+                break
+            results.extend(chunk)
+        return results
+
+    total_pages = math.ceil(count / len(results))
+    if verbose:
+        print(f"    共 {count} 筆 / {total_pages} 頁，並行 {min(max_workers, total_pages - 1)} 個 worker")
+
+    failed = []
+
+    def fetch(page: int) -> Optional[dict]:
+        if not partial:
+            return fetch_page(page)
+        try:
+            return fetch_page(page)
+        except Exception as e:
+            failed.append(page)
+            print(f"    ⚠️ 第 {page} 頁抓取失敗，略過: {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        pages = list(pool.map(fetch, range(2, total_pages + 1)))
+    for data in pages:
+        if data is not None:
+            results.extend(data.get('results') or [])
+    if failed:
+        print(f"    ⚠️ {len(failed)} 頁失敗（{sorted(failed)}），回傳部分結果 {len(results)} / {count} 筆")
+    return results
@@ -0,0 +1,330 @@
+"""
+pdf_inventory 的欄位式二進位格式（pdf_inventory.bin）
+
+pdf_inventory.json 每份 Drive PDF 一個 dict，資料夾名稱 / id / ISO 時間字串一再重複；
+讀者（weekly_snapshot、analyze_decline）每次都 json.load 整份成 list of dict，
+檔案數到 10 萬級時載入時間與記憶體都跟著線性膨脹。
+
+二進位檔以 mmap 惰性讀取，整份只有一個 header 需要解析：
+- 資料夾（folder_name, folder_id）intern 成表，每列只存 uint32 索引
+- id / name：UTF-8 blob + uint32 offsets（第 i 列 = blob[off[i]:off[i+1]]）
+- size、modifiedTime（epoch ms）、report_date（date ordinal）、date_source 為定寬陣列
+- flags 記錄各欄位是否存在，讀回的 dict 與寫入時的 key 集合一致
+- 格式外的欄位或非標準格式的值（例如不是 Drive 標準 RFC 3339 的時間字串）
+  原樣存進 header 的 extras，保證逐列 round-trip
+
+BinaryInventory 是唯讀 Sequence：len() 與欄位查詢不建 dict，逐列迭代時才組出 dict。
+JSON 版照寫（相容舊讀者與人工檢查）；讀者以 open_if_fresh 取用「不比 JSON 舊」的二進位檔。
+"""
+import json
+import mmap
+import os
+import sys
+from array import array
+from collections.abc import Sequence
+from datetime import date, datetime, timezone
+from typing import Dict, List, Optional
+
+MAGIC = b'GBPDFINV'
+FORMAT_VERSION = 1
+
+_F_ID = 1
+_F_SIZE = 2
+_F_SIZE_STR = 4
+_F_MODIFIED = 8
+_F_FOLDER_ID = 16
+_F_FOLDER_NAME = 32
+_F_ANNOTATED = 64
+_F_REAL_SITE = 128
+
+_SOURCES = (None, 'filename', 'folder')
+_KNOWN = {'id', 'name', 'size', 'modifiedTime', 'folder_id', 'folder_name',
+          'report_date', 'date_source', 'is_real_site'}
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# (名稱, array typecode)；依此順序排在 header 之後，各段 8 bytes 對齊
+_SECTIONS = (('id_off', 'I'), ('id_blob', 'B'), ('name_off', 'I'), ('name_blob', 'B'),
+             ('folder', 'I'), ('size', 'q'), ('modified', 'q'), ('report_day', 'i'),
+             ('date_source', 'B'), ('flags', 'B'))
+
+
+def bin_path_for(json_path) -> str:
+    """pdf_inventory.json → pdf_inventory.bin（同目錄）"""
+    base, _ = os.path.splitext(str(json_path))
+    return base + '.bin'
+
+
+def _format_modified(ms: int) -> str:
+    dt = datetime.fromtimestamp(ms // 1000, tz=timezone.utc)
+    return dt.strftime('%Y-%m-%dT%H:%M:%S') + '.%03dZ' % (ms % 1000)
+
+
+def _parse_modified(value) -> Optional[int]:
+    """Drive 標準格式（2026-03-15T08:01:02.345Z）→ epoch ms；其他格式回傳 None"""
+    if not isinstance(value, str) or len(value) != 24 or not value.endswith('Z'):
+        return None
+    try:
+        dt = datetime.strptime(value[:19], '%Y-%m-%dT%H:%M:%S').replace(tzinfo=timezone.utc)
+        ms = int((dt - _EPOCH).total_seconds()) * 1000 + int(value[20:23])
+    except ValueError:
+        return None
+    return ms if _format_modified(ms) == value else None
+
+
+def _encode_size(value):
+    """(int 值, 是否原為字串)；無法無損表示時回傳 None"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int) and value >= 0:
+        return value, False
+    if isinstance(value, str) and value.isdigit() and str(int(value)) == value:
+        return int(value), True
+    return None
+
+
+def _encode_day(value) -> Optional[int]:
+    if not isinstance(value, str):
+        return None
+    try:
+        day = date.fromisoformat(value)
+    except ValueError:
+        return None
+    return day.toordinal() if day.isoformat() == value else None
+
+
+def encode(pdfs, meta: dict = None) -> bytes:
+    """把 PDF dict 清單編成二進位 inventory"""
+    cols = {name: array(code) for name, code in _SECTIONS}
+    id_blob, name_blob = bytearray(), bytearray()
+    cols['id_off'].append(0)
+    cols['name_off'].append(0)
+    folders: Dict[tuple, int] = {}
+    extras: Dict[str, dict] = {}
+
+    for row, pdf in enumerate(pdfs):
+        extra = {k: v for k, v in pdf.items() if k not in _KNOWN}
+        flags = 0
+
+        pid = pdf.get('id')
+        if 'id' in pdf:
+            if isinstance(pid, str):
+                flags |= _F_ID
+                id_blob += pid.encode('utf-8')
+            else:
+                extra['id'] = pid
+        cols['id_off'].append(len(id_blob))
+
+        name = pdf.get('name', '')
+        if isinstance(name, str) and 'name' in pdf:
+            name_blob += name.encode('utf-8')
+        elif 'name' in pdf:
+            extra['name'] = name
+        else:
+            extra['__no_name__'] = True
+        cols['name_off'].append(len(name_blob))
+
+        folder_key = (pdf.get('folder_name', ''), pdf.get('folder_id', ''))
+        if not all(isinstance(v, str) for v in folder_key):
+            extra.update({k: pdf[k] for k in ('folder_name', 'folder_id') if k in pdf})
+            folder_key = ('', '')
+        else:
+            flags |= (_F_FOLDER_NAME if 'folder_name' in pdf else 0) | (_F_FOLDER_ID if 'folder_id' in pdf else 0)
+        cols['folder'].append(folders.setdefault(folder_key, len(folders)))
+
+        size = -1
+        if 'size' in pdf:
+            enc = _encode_size(pdf['size'])
+            if enc is None:
+                extra['size'] = pdf['size']
+            else:
+                size = enc[0]
+                flags |= _F_SIZE | (_F_SIZE_STR if enc[1] else 0)
+        cols['size'].append(size)
+
+        modified = -1
+        if 'modifiedTime' in pdf:
+            ms = _parse_modified(pdf['modifiedTime'])
+            if ms is None:
+                extra['modifiedTime'] = pdf['modifiedTime']
+            else:
+                modified = ms
+                flags |= _F_MODIFIED
+        cols['modified'].append(modified)
+
+        day, source = 0, 0
+        if 'date_source' in pdf or 'report_date' in pdf or 'is_real_site' in pdf:
+            rd, ds, site = pdf.get('report_date'), pdf.get('date_source'), pdf.get('is_real_site')
+            encoded_day = 0 if rd is None else _encode_day(rd)
+            complete = all(k in pdf for k in ('report_date', 'date_source', 'is_real_site'))
+            if complete and encoded_day is not None and ds in _SOURCES and isinstance(site, bool):
+                day, source = encoded_day, _SOURCES.index(ds)
+                flags |= _F_ANNOTATED | (_F_REAL_SITE if site else 0)
+            else:
+                extra.update({k: pdf[k] for k in ('report_date', 'date_source', 'is_real_site') if k in pdf})
+        cols['report_day'].append(day)
+        cols['date_source'].append(source)
+        cols['flags'].append(flags)
+        if extra:
+            extras[str(row)] = extra
+
+    cols['id_blob'] = array('B', bytes(id_blob))
+    cols['name_blob'] = array('B', bytes(name_blob))
+    count = len(cols['flags'])
+
+    header = {
+        'version': FORMAT_VERSION,
+        'byteorder': sys.byteorder,
+        'count': count,
+        'meta': meta or {},
+        'folders': [list(k) for k in folders],
+        'extras': extras,
+        'sections': [],
+    }
+    body = bytearray()
+    for name, code in _SECTIONS:
+        data = cols[name].tobytes()
+        header['sections'].append([name, code, len(body), len(data)])
+        body += data
+        body += b'\0' * (-len(body) % 8)
+    head = json.dumps(header, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    head += b' ' * (-(len(MAGIC) + 8 + len(head)) % 8)
+    return MAGIC + len(head).to_bytes(8, 'little') + head + bytes(body)
+
+
+def write(path, pdfs, meta: dict = None):
+    """atomic 寫入（tmp + os.replace）"""
+    path = str(path)
+    data = encode(pdfs, meta)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp = f'{path}.tmp.{os.getpid()}'
+    try:
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except Exception:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+class BinaryInventory(Sequence):
+    """mmap 的唯讀 PDF 清單；第 i 個元素是與寫入時相同內容的 dict"""
+
+    def __init__(self, path):
+        self.path = str(path)
+        with open(self.path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:len(MAGIC)] != MAGIC:
+            raise ValueError(f'不是 PDF inventory 二進位檔: {self.path}')
+        head_len = int.from_bytes(self._mm[len(MAGIC):len(MAGIC) + 8], 'little')
+        body_start = len(MAGIC) + 8 + head_len
+        header = json.loads(self._mm[len(MAGIC) + 8:body_start].decode('utf-8'))
+        if header.get('version') != FORMAT_VERSION or header.get('byteorder') != sys.byteorder:
+            raise ValueError(f'不支援的 inventory 格式: {self.path}')
+        self.count: int = header['count']
+        self.meta: dict = header['meta']
+        self.folders: List[list] = header['folders']
+        self._extras: Dict[str, dict] = header['extras']
+        self._day_prefix: Dict[int, str] = {}
+        self._iso_days: Dict[int, str] = {}
+        view = memoryview(self._mm)
+        self._cols = {}
+        for name, code, offset, length in header['sections']:
+            start = body_start + offset
+            self._cols[name] = view[start:start + length].cast(code)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _text(self, blob: str, off: str, i: int) -> str:
+        offsets = self._cols[off]
+        return bytes(self._cols[blob][offsets[i]:offsets[i + 1]]).decode('utf-8')
+
+    def name(self, i: int) -> str:
+        return self._text('name_blob', 'name_off', i)
+
+    def folder_name(self, i: int) -> str:
+        return self.folders[self._cols['folder'][i]][0]
+
+    def _modified(self, ms: int) -> str:
+        # 日期部分依「日」快取（同一天的檔案很多），時分秒直接算
+        day, rest = divmod(ms, 86_400_000)
+        prefix = self._day_prefix.get(day)
+        if prefix is None:
+            prefix = self._day_prefix[day] = _format_modified(day * 86_400_000)[:11]
+        secs, millis = divmod(rest, 1000)
+        hours, secs = divmod(secs, 3600)
+        return '%s%02d:%02d:%02d.%03dZ' % (prefix, hours, secs // 60, secs % 60, millis)
+
+    def _iso_day(self, ordinal: int) -> str:
+        text = self._iso_days.get(ordinal)
+        if text is None:
+            text = self._iso_days[ordinal] = date.fromordinal(ordinal).isoformat()
+        return text
+
+    def row(self, i: int) -> dict:
+        c = self._cols
+        flags = c['flags'][i]
+        extra = self._extras.get(str(i)) if self._extras else None
+        pdf = {}
+        if flags & _F_ID:
+            off = c['id_off']
+            pdf['id'] = bytes(c['id_blob'][off[i]:off[i + 1]]).decode('utf-8')
+        if not (extra and '__no_name__' in extra):
+            off = c['name_off']
+            pdf['name'] = bytes(c['name_blob'][off[i]:off[i + 1]]).decode('utf-8')
+        if flags & _F_SIZE:
+            size = c['size'][i]
+            pdf['size'] = str(size) if flags & _F_SIZE_STR else size
+        if flags & _F_MODIFIED:
+            pdf['modifiedTime'] = self._modified(c['modified'][i])
+        folder_name, folder_id = self.folders[c['folder'][i]]
+        if flags & _F_FOLDER_ID:
+            pdf['folder_id'] = folder_id
+        if flags & _F_FOLDER_NAME:
+            pdf['folder_name'] = folder_name
+        if flags & _F_ANNOTATED:
+            day = c['report_day'][i]
+            pdf['report_date'] = self._iso_day(day) if day else None
+            pdf['date_source'] = _SOURCES[c['date_source'][i]]
+            pdf['is_real_site'] = bool(flags & _F_REAL_SITE)
+        if extra:
+            pdf.update((k, v) for k, v in extra.items() if k != '__no_name__')
+        return pdf
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.row(j) for j in range(*i.indices(self.count))]
+        if i < 0:
+            i += self.count
+        if not 0 <= i < self.count:
+            raise IndexError(i)
+        return self.row(i)
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield self.row(i)
+
+    def to_json_dict(self) -> dict:
+        """匯出成 pdf_inventory.json 的格式（相容舊讀者）"""
+        return dict(self.meta, pdfs=list(self))
+
+
+def open_if_fresh(json_path) -> Optional[BinaryInventory]:
+    """JSON 旁的二進位檔存在、可讀且不比 JSON 舊時回傳 BinaryInventory，否則 None"""
+    path = bin_path_for(json_path)
+    try:
+        bin_mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    try:
+        if bin_mtime < os.stat(str(json_path)).st_mtime_ns:
+            return None
+    except OSError:
+        pass
+    try:
+        return BinaryInventory(path)
+    except (OSError, ValueError, KeyError):
+        return None
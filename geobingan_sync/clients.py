@@ -0,0 +1,61 @@
+"""
+同一 process 內共用的外部 client
+
+各步驟原本各自讀 service account 金鑰、各自 build Drive service、各自開 requests.Session；
+shell 逐步驟開新 interpreter 時無所謂，改由 geobingan_sync.run 在同一 process 跑完
+整條流程後，這些初始化就變成重複成本。
+
+- credentials(file, scopes)：金鑰檔 × scopes 只讀一次（google-auth credentials 是 thread-safe）
+- drive_service(file, scopes)：每個 thread 一個 service（httplib2 不是 thread-safe，
+  見 https://googleapis.github.io/google-api-python-client/docs/thread_safety.html）
+- http_session()：共用的 requests.Session（連線池跨步驟沿用）
+"""
+import threading
+from typing import Dict, Sequence, Tuple
+
+_lock = threading.Lock()
+_credentials: Dict[Tuple[str, Tuple[str, ...]], object] = {}
+_thread_local = threading.local()
+_session = None
+
+
+def credentials(credentials_file: str, scopes: Sequence[str]):
+    key = (str(credentials_file), tuple(scopes))
+    with _lock:
+        creds = _credentials.get(key)
+        if creds is None:
+            from google.oauth2 import service_account
+            creds = _credentials[key] = service_account.Credentials.from_service_account_file(
+                key[0], scopes=list(scopes))
+        return creds
+
+
+def drive_service(credentials_file: str, scopes: Sequence[str]):
+    """當前 thread 的 Drive v3 service（同 thread 同金鑰 / scopes 重複呼叫回傳同一個）"""
+    services = getattr(_thread_local, 'services', None)
+    if services is None:
+        services = _thread_local.services = {}
+    key = (str(credentials_file), tuple(scopes))
+    service = services.get(key)
+    if service is None:
+        from googleapiclient.discovery import build
+        service = services[key] = build('drive', 'v3', credentials=credentials(credentials_file, scopes))
+    return service
+
+
+def http_session():
+    global _session
+    with _lock:
+        if _session is None:
+            import requests
+            _session = requests.Session()
+        return _session
+
+
+def reset():
+    """清掉共用 client（測試用）"""
+    global _session
+    with _lock:
+        _credentials.clear()
+        _session = None
+    _thread_local.__dict__.clear()
@@ -11,48 +11,78 @@
 
 import os
 from pathlib import Path
-from dotenv import load_dotenv
 
-# 載入 .env 檔案
 from geobingan_sync import REPO_ROOT
 env_path = REPO_ROOT / '.env'
-load_dotenv(env_path)
+_env_loaded = False
 
-# JWT Token（會自動刷新）
-JWT_TOKEN = os.environ.get('JWT_TOKEN', '')
 
-# Refresh Token（用於自動刷新 access token，有效期 7 天）
-REFRESH_TOKEN = os.environ.get('REFRESH_TOKEN', '')
+def load_env():
+    """載入 .env（只做一次）。
 
-# 用戶資訊
-USER_EMAIL = os.environ.get('USER_EMAIL', '')
-USER_ID = os.environ.get('USER_ID', '')
+    import config 本身不讀 .env、也不 import python-dotenv：第一次取用下列任一設定值時
+    才自動載入，只用到 escape_drive_query 或 update_jwt_token 的輕量指令不必付這個成本。
+    直接讀 os.environ 的呼叫端請先呼叫本函式。
+    """
+    global _env_loaded
+    if not _env_loaded:
+        from dotenv import load_dotenv
+        load_dotenv(env_path)
+        _env_loaded = True
+
+
+def _flag(value: str) -> bool:
+    return value.lower() == 'true'
+
+
+# 設定名稱 → (預設值, 型別轉換)；`from geobingan_sync.config import X` 時才由 __getattr__ 讀出
+_SETTINGS = {
+    # JWT Token（會自動刷新）
+    'JWT_TOKEN': ('', str),
+    # Refresh Token（用於自動刷新 access token，有效期 7 天）
+    'REFRESH_TOKEN': ('', str),
+
+    # 用戶資訊
+    'USER_EMAIL': ('', str),
+    'USER_ID': ('', str),
+
+    # 群組資訊
+    'GROUP_ID': ('', str),
+    'GROUP_NAME': ('', str),
+
+    # API 設定
+    'GEOBINGAN_BASE_URL': ('https://riskmap.today', str),
+    'GEOBINGAN_API_URL': ('https://riskmap.today/api/reports/construction-reports/upload/', str),
+    'GEOBINGAN_REFRESH_URL': ('https://riskmap.today/api/auth/auth/refresh_token/', str),
 
-# 群組資訊
-GROUP_ID = os.environ.get('GROUP_ID', '')
-GROUP_NAME = os.environ.get('GROUP_NAME', '')
+    # Google Drive 設定
+    'GOOGLE_CREDENTIALS': ('./credentials.json', str),
+    'SHARED_DRIVE_ID': ('', str),
 
-# API 設定
-GEOBINGAN_BASE_URL = os.environ.get('GEOBINGAN_BASE_URL', 'https://riskmap.today')
-GEOBINGAN_API_URL = os.environ.get('GEOBINGAN_API_URL', 'https://riskmap.today/api/reports/construction-reports/upload/')
-GEOBINGAN_REFRESH_URL = os.environ.get('GEOBINGAN_REFRESH_URL', 'https://riskmap.today/api/auth/auth/refresh_token/')
+    # ClickUp
+    'CLICKUP_TOKEN': ('', str),
+    'HEALTHCHECK_CLICKUP_TASK_ID': ('', str),
 
-# Google Drive 設定
-GOOGLE_CREDENTIALS = os.environ.get('GOOGLE_CREDENTIALS', './credentials.json')
-SHARED_DRIVE_ID = os.environ.get('SHARED_DRIVE_ID', '')
+    # 通知設定
+    'LINE_NOTIFY_TOKEN': ('', str),
+    'ENABLE_MACOS_NOTIFY': ('true', _flag),
 
-# ClickUp
-CLICKUP_TOKEN = os.environ.get('CLICKUP_TOKEN', '')
-HEALTHCHECK_CLICKUP_TASK_ID = os.environ.get('HEALTHCHECK_CLICKUP_TASK_ID', '')
+    # 同步設定
+    'DAYS_AGO': ('7', int),
+    'MAX_UPLOADS': ('0', int),
+    'DELAY_BETWEEN_UPLOADS': ('2', float),
+}
 
-# 通知設定
-LINE_NOTIFY_TOKEN = os.environ.get('LINE_NOTIFY_TOKEN', '')
-ENABLE_MACOS_NOTIFY = os.environ.get('ENABLE_MACOS_NOTIFY', 'true').lower() == 'true'
 
-# 同步設定
-DAYS_AGO = int(os.environ.get('DAYS_AGO', '7'))
-MAX_UPLOADS = int(os.environ.get('MAX_UPLOADS', '0'))
-DELAY_BETWEEN_UPLOADS = float(os.environ.get('DELAY_BETWEEN_UPLOADS', '2'))
+def __getattr__(name: str):
+    spec = _SETTINGS.get(name)
+    if spec is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    load_env()
+    default, convert = spec
+    value = convert(os.environ.get(name, default))
+    globals()[name] = value
+    return value
 
 
 def update_jwt_token(new_token: str, new_refresh_token: str = None):
@@ -91,7 +121,19 @@ def update_jwt_token(new_token: str, new_refresh_token: str = None):
         )
         REFRESH_TOKEN = new_refresh_token
 
-    env_path.write_text(content, encoding='utf-8')
+    # atomic：背景刷新 thread 在 process 結束時被中斷也不會留下寫一半的 .env
+    tmp = f'{env_path}.tmp.{os.getpid()}'
+    try:
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.chmod(tmp, env_path.stat().st_mode & 0o777)
+        os.replace(tmp, env_path)
+    except Exception:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
     print("✅ Token 已更新到 .env 檔案")
 
 
@@ -6,10 +6,6 @@
 """
 import time
 
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
-
 # files().list 單次呼叫上限 1000；未翻頁的呼叫曾造成靜默截斷資料漏失
 # （#65：758 個資料夾內 PDF 從未上傳；#67：同步端來源資料夾 >1000 檔截斷）。
 # 新的 files().list 呼叫一律走 paginate_files_list，不要手寫翻頁迴圈。
@@ -24,6 +20,8 @@ def paginate_files_list(service, *, retries: int = 3, retry_base_delay: float =
     - 每頁對 429/5xx 指數退避重試（retries 次）；其他錯誤或重試耗盡直接 raise，
       由呼叫端決定 fail-closed 行為——寧可炸也不回傳靜默截斷的部分結果。
     """
+    from googleapiclient.errors import HttpError
+
     fields = list_kwargs.get('fields', '')
     if fields and 'nextPageToken' not in fields:
         list_kwargs['fields'] = f'nextPageToken, {fields}'
@@ -56,6 +54,9 @@ def paginate_files_list(service, *, retries: int = 3, retry_base_delay: float =
 
 def create_drive_service(credentials_file: str, scopes: list = None):
     """建立 Google Drive API service instance"""
+    from google.oauth2 import service_account
+    from googleapiclient.discovery import build
+
     scopes = scopes or ['https://www.googleapis.com/auth/drive']
     credentials = service_account.Credentials.from_service_account_file(
         credentials_file, scopes=scopes)
@@ -0,0 +1,116 @@
+"""
+資料來源並行抓取（小型依賴圖）
+
+build_registry 與追蹤報告都要先抓好幾個彼此獨立的來源（政府 PDF、Drive 掃描、
+riskmap API…），原本一個接一個跑，步驟耗時是所有來源的總和。
+各步驟改以 FetchTask 宣告來源與依賴，由 run_fetch_graph 在 thread pool 上執行：
+依賴完成的來源立即開跑，步驟耗時約等於最慢的那條依賴鏈。
+
+- 每個來源獨立計時，結束時印出耗時表。
+- 失敗隔離：一般來源失敗時記錄錯誤並改用 default，下游照常執行；
+  required=True 的來源失敗則在所有已啟動的來源結束後 re-raise（含 SystemExit）。
+- 改用 default 的來源列在回傳值的 .degraded（label 清單）：呼叫端須把它寫進輸出，
+  不可把部分資料當成完整結果發布。
+- 來源函式以關鍵字參數接收其依賴的結果（參數名 = 依賴的 task name）。
+
+注意：googleapiclient 的 service（httplib2）不是 thread-safe，
+需要 Drive 的來源請在函式內自行 build 一個 service，不要共用。
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, Iterable, List
+
+
+class FetchTask:
+    """一個資料來源。default 為失敗時的替代值；callable 會在失敗時才呼叫
+    （避免多次失敗共用同一個 mutable 預設值）。"""
+
+    def __init__(self, name: str, fn: Callable[..., Any], *, deps: Iterable[str] = (),
+                 default: Any = None, required: bool = False, label: str = ''):
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+        self.default = default
+        self.required = required
+        self.label = label or name
+
+
+class FetchResults(dict):
+    """{task name: 結果}；degraded 為失敗後改用 default 的來源 label（依宣告順序）"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.degraded: List[str] = []
+
+
+def _default_of(task: FetchTask):
+    return task.default() if callable(task.default) else task.default
+
+
+def _timed_call(task: FetchTask, kwargs: dict):
+    start = time.time()
+    try:
+        return task.fn(**kwargs), time.time() - start, None
+    except BaseException as e:  # SystemExit 也要攔下來，由主執行緒決定是否 re-raise
+        return None, time.time() - start, e
+
+
+def run_fetch_graph(tasks, *, max_workers: int = 6, verbose: bool = True) -> FetchResults:
+    """執行來源依賴圖，回傳 {task name: 結果}（失敗的非必要來源為 default，列於 .degraded）。"""
+    by_name = {t.name: t for t in tasks}
+    if len(by_name) != len(tasks):
+        raise ValueError('FetchTask name 重複')
+    for t in tasks:
+        missing = [d for d in t.deps if d not in by_name]
+        if missing:
+            raise ValueError(f'{t.name} 依賴不存在的來源: {missing}')
+
+    results = FetchResults()
+    timings: Dict[str, float] = {}
+    errors: Dict[str, BaseException] = {}
+    pending = dict(by_name)
+    running = {}
+    fatal = None
+    wall_start = time.time()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while pending or running:
+            if fatal is None:
+                for name in [n for n, t in pending.items() if all(d in results for d in t.deps)]:
+                    task = pending.pop(name)
+                    kwargs = {d: results[d] for d in task.deps}
+                    running[pool.submit(_timed_call, task, kwargs)] = task
+            if not running:
+                if pending and fatal is None:
+                    raise ValueError(f'來源依賴有循環: {sorted(pending)}')
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in done:
+                task = running.pop(fut)
+                value, seconds, error = fut.result()
+                timings[task.name] = seconds
+                if error is None:
+                    results[task.name] = value
+                    continue
+                errors[task.name] = error
+                if task.required:
+                    fatal = fatal or error
+                    print(f"  ❌ 來源 {task.label} 失敗（必要來源）: {error!r}")
+                else:
+                    print(f"  ⚠️ 來源 {task.label} 失敗，改用預設值: {error!r}")
+                    results[task.name] = _default_of(task)
+
+    if verbose:
+        total = time.time() - wall_start
+        print(f"\n⏱️  來源抓取耗時（並行總計 {total:.1f}s，循序需 {sum(timings.values()):.1f}s）")
+        for name, seconds in sorted(timings.items(), key=lambda kv: -kv[1]):
+            task = by_name[name]
+            mark = ' ❌' if name in errors else ''
+            print(f"    {task.label}: {seconds:.1f}s{mark}")
+
+    if fatal is not None:
+        raise fatal
+    results.degraded = [t.label for t in tasks if t.name in errors]
+    if results.degraded:
+        print(f"  ⚠️ 資料不完整：{'、'.join(results.degraded)} 失敗，已改用預設值")
+    return results
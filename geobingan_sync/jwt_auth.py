@@ -2,15 +2,18 @@
 JWT Token 管理模組
 
 提供 JWT Token 的解碼、過期檢查、刷新功能。
-供 upload_pdfs.py 和 generate_permit_tracking_report.py 共用。
+各步驟透過 token_manager（共用 TokenManager）使用，不直接呼叫 get_valid_token。
 """
 import base64
 import json
 import time
 import threading
-import requests
 from typing import Optional
 
+from geobingan_sync.lazy_import import lazy_module
+
+requests = lazy_module('requests')
+
 
 # 執行緒安全鎖，保護 token 刷新操作
 _token_lock = threading.Lock()
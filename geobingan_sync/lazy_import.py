@@ -0,0 +1,33 @@
+"""
+延遲 import 的 module 代理（啟動時間）
+
+requests / pypdf / urllib3 這類重量級套件原本在每個步驟模組頂層 import，
+光是 import 步驟模組就要 150~250ms——即使這次根本不會發 HTTP、不會讀 PDF
+（--help、token 檢查、record_sync_result、測試只用到其中一個純函式）。
+
+lazy_module('requests') 回傳一個代理物件：第一次取屬性（requests.get、
+pypdf.PdfReader…）時才真的 import，之後每次取屬性只是 sys.modules 查表。
+代理是模組的一般全域變數，測試照舊可以 monkeypatch.setattr(module, 'requests', fake)
+或 patch('module.requests.post')。
+
+只用在「整個 module 當命名空間」的 import；`from x import Name` 形式
+（HttpError、MediaIoBaseDownload…）請改在用到的函式內 import。
+"""
+import importlib
+
+
+class LazyModule:
+    """第一次取屬性時才 import 的 module 代理"""
+
+    def __init__(self, name: str):
+        self.__dict__['_lazy_name'] = name
+
+    def __getattr__(self, attr: str):
+        return getattr(importlib.import_module(self._lazy_name), attr)
+
+    def __repr__(self) -> str:
+        return f'<lazy module {self._lazy_name!r}>'
+
+
+def lazy_module(name: str) -> LazyModule:
+    return LazyModule(name)
@@ -0,0 +1,232 @@
+"""
+pdf_inventory.json 的預先計算欄位
+
+inventory 原本只存 Drive 原始 metadata，每個讀者各自逐筆重算同樣的事實：
+select_pdfs_to_upload、weekly_snapshot 月度趨勢、analyze_decline 都重新解析檔名日期，
+analyze_decline 還對每個資料夾重跑「是否為真工地」的 regex。
+
+upload_pdfs 寫 inventory 前以 annotate_pdfs 補上三個欄位：
+- report_date：解析出的報告日期 'YYYY-MM-DD'（解析不到為 None）
+- date_source：'filename'（只看檔名）/ 'folder'（folder + 檔名 fallback）/ None
+- is_real_site：資料夾是否為真工地（排除「2026年03月」這類時間分類資料夾）
+
+讀者以 report_date_of / site_flag 取值：欄位存在就直接用，沒有（legacy state cache、
+舊版 inventory）才現場計算，因此兩種來源結果一致。inventory 每次掃描都整份重寫，
+parser 改版後下一次掃描就會更新欄位。
+
+掃描結果在記憶體中以 PdfRecord（__slots__）表示，取代原本就地改寫的 Drive API dict：
+資料夾字串 intern（同資料夾的上百份 PDF 共用同一個字串物件）、modifiedTime 建立時
+解析一次、unique_id（folder/檔名）與報告日期建立後快取。PdfRecord 提供唯讀 dict 介面
+（pdf['name']、get、in、items），既有以 dict 存取的讀者不需改動。
+"""
+import re
+import sys
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Dict, Iterable, Optional, Tuple
+
+from geobingan_sync.filename_date_parser import parse_date_from_filename
+
+SOURCE_FILENAME = 'filename'
+SOURCE_FOLDER = 'folder'
+
+# 真工地名稱必含的關鍵字（過濾「2026年03月」、「115年1月」這類時間分類資料夾）
+SITE_NAME_KEYWORDS = re.compile(r'(建字|工程|新建|工地|大樓|社區|觀測|監測|案|場)')
+# 純數字或數字+年/月結尾，視為時間資料夾
+_TIME_FOLDER = re.compile(r'\d{4,6}|11\d{0,2}年?\d{0,2}月?|2026年?\d{1,2}月?|115\.\d{1,2}|115年?')
+
+
+@lru_cache(maxsize=None)
+def is_real_site(folder_name: str) -> bool:
+    """過濾時間分類資料夾（如 `2026年03月`、`115年1月`、`11502`）。"""
+    if not folder_name:
+        return False
+    if _TIME_FOLDER.fullmatch(folder_name):
+        return False
+    return bool(SITE_NAME_KEYWORDS.search(folder_name))
+
+
+# dict key → PdfRecord slot（dict 介面與 inventory JSON 的欄位順序）
+_FIELDS = {
+    'id': 'id',
+    'name': 'name',
+    'size': 'size',
+    'modifiedTime': 'modified_time',
+    'folder_id': 'folder_id',
+    'folder_name': 'folder_name',
+    'report_date': 'report_date',
+    'date_source': 'date_source',
+    'is_real_site': 'is_real_site',
+}
+_MISSING = object()
+# 沒有 modifiedTime（或格式不符）的排序值：排在所有有時間的檔案之後
+MODIFIED_MIN = datetime.min.replace(tzinfo=timezone.utc)
+
+
+def _parse_modified(value) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except (ValueError, AttributeError):
+        return None
+
+
+class PdfRecord:
+    """一份 Drive PDF 的掃描結果。未設定的欄位不出現在 dict 介面（與原本的 dict 一致）。"""
+
+    __slots__ = tuple(_FIELDS.values()) + ('modified', 'unique_id', 'extra', '_report_dt')
+
+    def __init__(self, fields: Dict = None, **kwargs):
+        for slot in _FIELDS.values():
+            setattr(self, slot, _MISSING)
+        self.extra = None
+        self._report_dt = _MISSING
+        self.modified = None
+        self.unique_id = '/'
+        for key, value in dict(fields or {}, **kwargs).items():
+            self[key] = value
+
+    @classmethod
+    def from_drive(cls, item: Dict, folder_id: str, folder_name: str) -> 'PdfRecord':
+        """Drive files.list 的一筆結果 + 所屬資料夾（parents 等其餘欄位不保留）"""
+        rec = cls({k: item[k] for k in ('id', 'name', 'size', 'modifiedTime') if k in item})
+        rec['folder_id'] = folder_id
+        rec['folder_name'] = folder_name
+        return rec
+
+    # ── dict 介面 ──
+
+    def __getitem__(self, key):
+        slot = _FIELDS.get(key)
+        if slot is not None:
+            value = getattr(self, slot)
+            if value is not _MISSING:
+                return value
+        elif self.extra is not None and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        slot = _FIELDS.get(key)
+        if slot is None:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+            return
+        if slot in ('folder_id', 'folder_name') and isinstance(value, str):
+            value = sys.intern(value)
+        setattr(self, slot, value)
+        if slot in ('report_date', 'date_source'):
+            self._report_dt = _MISSING
+        elif slot in ('name', 'folder_name'):
+            self.unique_id = f"{self.get('folder_name', '')}/{self.get('name', '')}"
+        elif slot == 'modified_time':
+            self.modified = _parse_modified(value)
+
+    def __contains__(self, key) -> bool:
+        slot = _FIELDS.get(key)
+        if slot is not None:
+            return getattr(self, slot) is not _MISSING
+        return self.extra is not None and key in self.extra
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        return [k for k in self]
+
+    def __iter__(self):
+        for key, slot in _FIELDS.items():
+            if getattr(self, slot) is not _MISSING:
+                yield key
+        if self.extra:
+            yield from self.extra
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def items(self):
+        return [(k, self[k]) for k in self]
+
+    def to_dict(self) -> dict:
+        return dict(self.items())
+
+    def __repr__(self) -> str:
+        return f'PdfRecord({self.to_dict()!r})'
+
+    def report_datetime(self) -> Optional[datetime]:
+        """報告日期（folder fallback 口徑；未標註時現場標註，之後直接用快取）"""
+        if self._report_dt is _MISSING:
+            if self.date_source is _MISSING:
+                annotate_pdfs((self,))
+            rd = self.report_date
+            self._report_dt = datetime.fromisoformat(rd) if rd else None
+        return self._report_dt
+
+
+def as_record(pdf) -> PdfRecord:
+    return pdf if isinstance(pdf, PdfRecord) else PdfRecord(pdf)
+
+
+def unique_id_of(pdf) -> str:
+    """history / state 用的 'folder/檔名' key"""
+    if isinstance(pdf, PdfRecord):
+        return pdf.unique_id
+    return f"{pdf['folder_name']}/{pdf['name']}"
+
+
+def json_default(obj):
+    """json.dump 的 default：PdfRecord 以 dict 寫出"""
+    if isinstance(obj, PdfRecord):
+        return obj.to_dict()
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+def parse_report_date(name: str, folder: str = '') -> Tuple[Optional[datetime], Optional[str]]:
+    """先檔名，再 folder + 檔名 fallback；回傳 (日期, date_source)"""
+    d = parse_date_from_filename(name)
+    if d is not None:
+        return d, SOURCE_FILENAME
+    if folder:
+        d = parse_date_from_filename(folder + '/' + name)
+        if d is not None:
+            return d, SOURCE_FOLDER
+    return None, None
+
+
+def annotate_pdfs(pdfs: Iterable[dict]):
+    """就地補上 report_date / date_source / is_real_site 欄位"""
+    for pdf in pdfs:
+        d, source = parse_report_date(pdf.get('name', ''), pdf.get('folder_name', ''))
+        pdf['report_date'] = d.date().isoformat() if d is not None else None
+        pdf['date_source'] = source
+        pdf['is_real_site'] = is_real_site(pdf.get('folder_name', '') or '')
+
+
+def report_date_of(pdf: dict, *, folder_fallback: bool = True) -> Optional[datetime]:
+    """PDF 的報告日期：有預先計算欄位就直接用，否則現場解析。
+
+    folder_fallback=False 時只接受由檔名本身解析出的日期（月度趨勢的既有口徑）。
+    """
+    if folder_fallback and isinstance(pdf, PdfRecord):
+        return pdf.report_datetime()
+    if 'date_source' in pdf:
+        source = pdf['date_source']
+        if source is None or (source == SOURCE_FOLDER and not folder_fallback):
+            return None
+        return datetime.fromisoformat(pdf['report_date'])
+    if folder_fallback:
+        return parse_report_date(pdf.get('name', ''), pdf.get('folder_name', ''))[0]
+    return parse_date_from_filename(pdf.get('name', ''))
+
+
+def site_flag(pdf: dict) -> bool:
+    """PDF 所在資料夾是否為真工地（預先計算欄位優先）"""
+    flag = pdf.get('is_real_site')
+    if flag is None:
+        return is_real_site(pdf.get('folder_name', '') or '')
+    return flag
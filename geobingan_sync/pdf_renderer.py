@@ -0,0 +1,229 @@
+"""
+週報 HTML → PDF 渲染（可替換 backend + 內容雜湊快取）
+
+generate_weekly_report.html_to_pdf 原本每份報告都冷啟動一次 macOS 的 Chrome
+（路徑寫死），找不到才冷啟動 WeasyPrint；字型以 file:///Library/Fonts/... 寫死在 HTML，
+Linux container 裡找不到中文字型，HTML 完全相同時也照樣重新渲染。
+
+本模組：
+- Renderer 介面 + 兩個 backend：
+  ChromeRenderer（macOS / Linux 上找得到的 Chrome / Chromium；固定 profile 目錄，
+  字型與設定快取跨次沿用）與 WeasyPrintRenderer（in-process；FontConfiguration 與
+  字型 stylesheet 只在第一次渲染時載入，同一 process 後續渲染直接沿用）
+- 中文字型由 find_cjk_font() 依平台尋找（macOS Arial Unicode、Linux Noto CJK / 文泉驛…），
+  可用 GEOBINGAN_CJK_FONT 指定；由 renderer 注入，HTML 本身不再寫死路徑
+- render_pdf() 以「HTML + 字型 + backend」的 SHA-256 快取輸出 PDF（state/pdf_render_cache），
+  內容相同時直接複製快取檔，不啟動任何 backend
+
+backend 選擇：GEOBINGAN_PDF_BACKEND=chrome / weasyprint 可強制指定；
+預設先 Chrome（與原本的版面一致）再 WeasyPrint。WeasyPrint 為選用依賴。
+"""
+import hashlib
+import importlib.util
+import os
+import shutil
+import subprocess
+import tempfile
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from pathlib import Path
+from typing import List, Optional
+
+from geobingan_sync import REPO_ROOT
+
+RENDER_CACHE_DIR = REPO_ROOT / 'state' / 'pdf_render_cache'
+# 快取保留的 PDF 份數（依最後使用時間淘汰）
+MAX_CACHE_ENTRIES = 20
+RENDER_VERSION = 1
+CHROME_TIMEOUT = 60
+
+FONT_FAMILY = 'LocalChinese'
+CJK_FONT_CANDIDATES = [
+    '/Library/Fonts/Arial Unicode.ttf',
+    '/System/Library/Fonts/Supplemental/Arial Unicode.ttf',
+    '/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc',
+    '/usr/share/fonts/noto-cjk/NotoSansCJK-Regular.ttc',
+    '/usr/share/fonts/google-noto-cjk/NotoSansCJK-Regular.ttc',
+    '/usr/share/fonts/truetype/wqy/wqy-microhei.ttc',
+    '/usr/share/fonts/wenquanyi/wqy-microhei/wqy-microhei.ttc',
+    '/usr/share/fonts/truetype/droid/DroidSansFallbackFull.ttf',
+]
+CHROME_CANDIDATES = [
+    '/Applications/Google Chrome.app/Contents/MacOS/Google Chrome',
+    '/Applications/Chromium.app/Contents/MacOS/Chromium',
+    'google-chrome',
+    'google-chrome-stable',
+    'chromium',
+    'chromium-browser',
+]
+
+
+@lru_cache(maxsize=None)
+def find_cjk_font() -> Optional[str]:
+    """第一個存在的中文字型檔；都找不到時回傳 None（交給系統 fontconfig 的 sans-serif）"""
+    override = os.environ.get('GEOBINGAN_CJK_FONT')
+    for path in ([override] if override else []) + CJK_FONT_CANDIDATES:
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def font_face_css() -> str:
+    font = find_cjk_font()
+    if not font:
+        return ''
+    return f"@font-face {{ font-family: '{FONT_FAMILY}'; src: url('{Path(font).as_uri()}'); }}"
+
+
+def find_chrome() -> Optional[str]:
+    override = os.environ.get('CHROME_PATH')
+    for candidate in ([override] if override else []) + CHROME_CANDIDATES:
+        path = candidate if os.path.isabs(candidate) else shutil.which(candidate)
+        if path and os.path.exists(path):
+            return path
+    return None
+
+
+class Renderer(ABC):
+    """HTML 字串 → PDF 檔"""
+    name = ''
+
+    @abstractmethod
+    def render(self, html: str, output_path: str):
+        """渲染 html 到 output_path；失敗時 raise"""
+
+
+class ChromeRenderer(Renderer):
+    """headless Chrome --print-to-pdf；profile 目錄固定，跨次沿用字型 / 設定快取"""
+    name = 'chrome'
+
+    def __init__(self, binary: str, profile_dir=None):
+        self.binary = binary
+        self.profile_dir = str(profile_dir or Path(RENDER_CACHE_DIR) / 'chrome-profile')
+
+    def render(self, html: str, output_path: str):
+        css = font_face_css()
+        if css:
+            html = html.replace('</head>', f'<style>{css}</style>\n</head>', 1)
+        os.makedirs(self.profile_dir, exist_ok=True)
+        if os.path.exists(output_path):
+            os.unlink(output_path)  # 以「有沒有產生檔案」判斷成敗，先清掉舊檔
+        fd, html_path = tempfile.mkstemp(suffix='.html')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(html)
+            subprocess.run([
+                self.binary, '--headless', '--disable-gpu', '--no-sandbox',
+                f'--user-data-dir={self.profile_dir}',
+                f'--print-to-pdf={output_path}',
+                '--no-pdf-header-footer',
+                Path(html_path).as_uri(),
+            ], capture_output=True, timeout=CHROME_TIMEOUT)
+        finally:
+            os.unlink(html_path)
+        if not os.path.exists(output_path):
+            raise RuntimeError('Chrome 未產生 PDF')
+
+
+class WeasyPrintRenderer(Renderer):
+    """in-process WeasyPrint；字型設定與 stylesheet 第一次渲染時載入後沿用"""
+    name = 'weasyprint'
+
+    def __init__(self):
+        self._stylesheets = None
+        self._font_config = None
+
+    def _preload(self):
+        from weasyprint import CSS
+        from weasyprint.text.fonts import FontConfiguration
+        self._font_config = FontConfiguration()
+        css = font_face_css()
+        self._stylesheets = [CSS(string=css, font_config=self._font_config)] if css else []
+
+    def render(self, html: str, output_path: str):
+        from weasyprint import HTML
+        if self._stylesheets is None:
+            self._preload()
+        HTML(string=html, base_url=os.getcwd()).write_pdf(
+            output_path, stylesheets=self._stylesheets, font_config=self._font_config)
+
+
+def available_renderers() -> List[Renderer]:
+    """依偏好順序列出這台機器可用的 backend"""
+    forced = os.environ.get('GEOBINGAN_PDF_BACKEND', '').lower()
+    renderers: List[Renderer] = []
+    chrome = find_chrome()
+    if chrome and forced in ('', 'chrome'):
+        renderers.append(ChromeRenderer(chrome))
+    if importlib.util.find_spec('weasyprint') is not None and forced in ('', 'weasyprint'):
+        renderers.append(_weasyprint())
+    return renderers
+
+
+@lru_cache(maxsize=None)
+def _weasyprint() -> WeasyPrintRenderer:
+    """process 內共用一個 WeasyPrint backend（預載的字型才會被沿用）"""
+    return WeasyPrintRenderer()
+
+
+def cache_key(html: str, renderer: Renderer) -> str:
+    h = hashlib.sha256()
+    for part in (str(RENDER_VERSION), renderer.name, find_cjk_font() or '', html):
+        h.update(part.encode('utf-8'))
+        h.update(b'\0')
+    return h.hexdigest()
+
+
+def _copy_atomic(src: str, dst: str):
+    tmp = f'{dst}.tmp.{os.getpid()}'
+    try:
+        shutil.copyfile(src, tmp)
+        os.replace(tmp, dst)
+    except Exception:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def _prune(cache_dir: str, keep: int):
+    entries = sorted(Path(cache_dir).glob('*.pdf'), key=lambda p: p.stat().st_mtime, reverse=True)
+    for path in entries[keep:]:
+        try:
+            path.unlink()
+        except OSError:
+            pass
+
+
+def render_pdf(html: str, output_path: str, *, renderers: List[Renderer] = None,
+               cache_dir=None, max_entries: int = MAX_CACHE_ENTRIES) -> str:
+    """HTML → PDF；回傳實際使用的來源（'cache' 或 backend 名稱）。
+
+    依序嘗試 backend，失敗的換下一個；全部失敗時 raise 最後一個錯誤。
+    """
+    renderers = available_renderers() if renderers is None else renderers
+    if not renderers:
+        raise RuntimeError('找不到可用的 PDF 渲染器（請安裝 Chrome / Chromium 或 weasyprint）')
+    cache_dir = str(cache_dir or RENDER_CACHE_DIR)
+    last_error = None
+    for renderer in renderers:
+        cached = os.path.join(cache_dir, f'{cache_key(html, renderer)}.pdf')
+        if os.path.exists(cached):
+            _copy_atomic(cached, output_path)
+            os.utime(cached)
+            return 'cache'
+        try:
+            renderer.render(html, output_path)
+        except Exception as e:
+            print(f"  ⚠️ PDF 渲染器 {renderer.name} 失敗，改用下一個: {e}")
+            last_error = e
+            continue
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            _copy_atomic(output_path, cached)
+            _prune(cache_dir, max_entries)
+        except OSError as e:
+            print(f"  ⚠️ PDF 快取寫入失敗（不影響本次輸出）: {e}")
+        return renderer.name
+    raise last_error
@@ -0,0 +1,498 @@
+"""
+政府建案列表 PDF：條件式下載 + 解析結果快取
+
+同一份列表 PDF 每次 run 會被 sync_permits（步驟 1）、match_permits（步驟 2.5）、
+generate_permit_tracking_report（步驟 3）各下載、各 pypdf 解析一次，
+且全部寫到同一個固定的 /tmp/permit_list.pdf。台北市列表自 2025-01 後就沒更新過，
+幾乎每次都是白工。
+
+本模組以 URL 為 key 把 PDF 落在 state/permit_list_cache/，
+下載時帶 If-None-Match / If-Modified-Since 做條件式 GET（304 直接用本地檔），
+並把各呼叫端的「結構化解析結果」以內容 sha256 為 key 存進 meta——
+內容沒變就連 text extraction 都跳過，跨步驟、跨 run 共用。
+
+解析方面，列表只走一次：parse_permit_list() 以「建照號碼 | URL」的單一 alternation
+regex 掃過全文，產出結構化紀錄（建照、依雲端服務分類的 URL、Drive folder id）；
+sync_permits 要的 Drive 對應（drive_mapping）與追蹤報告要的非 Google 清單
+（non_google_permits）都是同一份紀錄的 view，不會再出現兩套規則各說各話。
+"""
+import hashlib
+import json
+import os
+import re
+import time
+import warnings
+from typing import Callable, Dict, List, Optional
+
+from geobingan_sync import REPO_ROOT
+
+PERMIT_LIST_CACHE_DIR = REPO_ROOT / 'state' / 'permit_list_cache'
+
+
+def _cache_paths(url: str):
+    """回傳 (pdf_path, meta_path)；檔名用 URL hash，多城市互不覆蓋。"""
+    key = hashlib.sha1(url.encode('utf-8')).hexdigest()[:16]
+    base = os.path.join(str(PERMIT_LIST_CACHE_DIR), key)
+    return f'{base}.pdf', f'{base}.json'
+
+
+def _load_meta(meta_path: str) -> dict:
+    if os.path.exists(meta_path):
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (json.JSONDecodeError, IOError):
+            pass
+    return {}
+
+
+def _atomic_write(path: str, data: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f'{path}.tmp.{os.getpid()}'
+    try:
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except Exception:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def _save_meta(meta_path: str, meta: dict):
+    _atomic_write(meta_path, json.dumps(meta, ensure_ascii=False, indent=2).encode('utf-8'))
+
+
+def _file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def fetch_permit_list_pdf(url: str, *, max_attempts: int = 3, http=None,
+                          sleep: Callable[[float], None] = None,
+                          timeout: float = 30) -> Optional[str]:
+    """條件式下載列表 PDF，回傳本地快取路徑。
+
+    - 已有快取時帶 ETag / Last-Modified 做 conditional GET，304 直接沿用本地檔。
+    - transient 失敗以 5s, 10s… backoff 重試（#59）。
+    - 重試耗盡：有快取就退回使用快取（列表本來就極少變動），沒有才回傳 None，
+      由呼叫端決定要不要中止。
+    http / sleep 可注入以利測試（預設 requests / time.sleep）。
+    """
+    if http is None:
+        import requests as http
+    if sleep is None:
+        sleep = time.sleep
+    import urllib3
+
+    pdf_path, meta_path = _cache_paths(url)
+    meta = _load_meta(meta_path)
+    has_cache = os.path.exists(pdf_path)
+
+    headers = {}
+    if has_cache and meta.get('url') == url:
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+
+    last_err = None
+    for attempt in range(1, max_attempts + 1):
+        try:
+            with warnings.catch_warnings():
+                warnings.filterwarnings('ignore', category=urllib3.exceptions.InsecureRequestWarning)
+                response = http.get(url, verify=False, timeout=timeout, headers=headers)
+            status = getattr(response, 'status_code', 200)
+            if status == 304 and has_cache:
+                print(f"✅ 列表未變更（304），沿用本地快取")
+                meta['checked_at'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+                _save_meta(meta_path, meta)
+                return pdf_path
+            if status >= 400:
+                raise IOError(f'HTTP {status}')
+
+            content = response.content
+            sha = hashlib.sha256(content).hexdigest()
+            if sha != meta.get('sha256') or not has_cache:
+                _atomic_write(pdf_path, content)
+                # 內容變了 → 舊的解析結果全部作廢
+                meta['parsed'] = {}
+            resp_headers = getattr(response, 'headers', None) or {}
+            meta.update({
+                'url': url,
+                'sha256': sha,
+                'size': len(content),
+                'etag': resp_headers.get('ETag', ''),
+                'last_modified': resp_headers.get('Last-Modified', ''),
+                'checked_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            })
+            _save_meta(meta_path, meta)
+            print(f"✅ 列表已下載: {len(content)} bytes")
+            return pdf_path
+        except Exception as e:
+            last_err = e
+            if attempt < max_attempts:
+                wait = 5 * attempt
+                print(f"⚠️  下載失敗（第 {attempt}/{max_attempts} 次）: {e}；{wait}s 後重試")
+                sleep(wait)
+
+    if has_cache:
+        print(f"⚠️  下載失敗（已重試 {max_attempts} 次）: {last_err}；改用本地快取")
+        return pdf_path
+    print(f"❌ 下載失敗（已重試 {max_attempts} 次）: {last_err}")
+    return None
+
+
+def cached_parse(url: str, pdf_path: str, key: str, parse_fn: Callable[[str], object]):
+    """以「PDF 內容 sha256 + key」快取 parse_fn(pdf_path) 的結果。
+
+    key 應包含解析器版本（例如 'drive_mapping/v1'），改解析邏輯時換 key 即可作廢舊結果。
+    結果必須可 JSON 序列化。
+    """
+    _, meta_path = _cache_paths(url)
+    meta = _load_meta(meta_path)
+    sha = meta.get('sha256') if meta.get('url') == url else None
+    if not sha:
+        sha = _file_sha256(pdf_path)
+
+    entry = meta.get('parsed', {}).get(key)
+    if entry and entry.get('sha256') == sha:
+        print(f"  ♻️ 沿用快取的解析結果（{key}）")
+        return entry['result']
+
+    result = parse_fn(pdf_path)
+    meta.setdefault('parsed', {})[key] = {'sha256': sha, 'result': result}
+    if meta.get('url') == url:
+        try:
+            _save_meta(meta_path, meta)
+        except OSError as e:
+            print(f"  ⚠️ 解析結果快取寫入失敗（不影響本次結果）: {e}")
+    return result
+
+
+# ==================== 結構化解析 ====================
+
+# 所有呼叫端共用的解析結果 key（改解析邏輯時遞增版本）
+RECORDS_KEY = 'records/v4'
+
+# 單次掃描：建照號碼或 URL。URL 只收 ASCII 安全字元（全文已去空白，後面緊接中文欄位），
+# 並以 negative lookahead 在下一個 https?:// 或下一個建照號碼處斷開，避免兩個相鄰連結
+# 黏成一個、或 URL 吃掉後面建照號碼開頭的數字（去空白後兩者常緊接在一起）。
+# 沒寫 scheme 的 drive.google.com/… 、docs.google.com/… 也算連結（舊版追蹤報告即如此
+# 判定「有 Google 連結」）；這種 URL 不會進 Drive 對應（_RE_DRIVE_URL 要求 https）。
+_RE_LIST_TOKEN = re.compile(
+    r'(?P<permit>\d{2,3}建字第\d{3,5}號)'
+    r"|(?P<url>(?:https?://|(?<![A-Za-z0-9./-])(?:drive|docs)\.google\.com(?=/))"
+    r"(?:(?!https?://|\d{2,3}建字第)[A-Za-z0-9/._~:?#@!$&'*+,;=%-])+)"
+)
+# Drive 對應沿用舊 parser 的保守字元集（避免把 :、# 等後綴帶進 folder URL）
+_RE_DRIVE_URL = re.compile(r'https://drive\.google\.com[a-zA-Z0-9/._?=%&-]+')
+_RE_FOLDER_ID = re.compile(r'/folders/([a-zA-Z0-9_-]+)')
+_RE_OPEN_ID = re.compile(r'id=([a-zA-Z0-9_-]+)')
+_RE_URL_HOST = re.compile(r'(?:https?://)?([^/?#]+)', re.IGNORECASE)
+
+GOOGLE_DRIVE = 'Google Drive'
+
+# (服務名稱, host 關鍵字)；順序即非 Google 清單的判定優先序
+CLOUD_PROVIDERS = (
+    (GOOGLE_DRIVE, ('drive.google.com', 'docs.google.com')),
+    ('SharePoint', ('sharepoint.com',)),
+    ('Dropbox', ('dropbox.com',)),
+    ('OneDrive', ('onedrive.live.com', '1drv.ms')),
+    ('MEGA', ('mega.nz',)),
+    ('pCloud', ('pcloud.com',)),
+    ('GoFile', ('gofile.io',)),
+    ('ownCloud', ('owncloud',)),
+    ('短網址', ('reurl.cc', 'bit.ly', 'tinyurl.com')),
+)
+_PROVIDER_ORDER = [name for name, _ in CLOUD_PROVIDERS]
+
+# 列表內出現但不是建案資料夾的網域（市府自己的頁面、風險地圖）
+_IGNORED_HOSTS = ('gov.taipei', 'riskmap')
+
+
+def url_host(url: str) -> str:
+    m = _RE_URL_HOST.match(url)
+    return m.group(1).lower() if m else ''
+
+
+def classify_url(url: str) -> str:
+    """回傳 URL 所屬雲端服務；不在已知清單時回傳 '其他: <host>'。"""
+    host = url_host(url)
+    for name, needles in CLOUD_PROVIDERS:
+        if any(n in host for n in needles):
+            return name
+    return f'其他: {host}'
+
+
+def extract_drive_folder_id(url: str) -> Optional[str]:
+    """支援 /folders/ID 和 /open?id=ID 兩種格式"""
+    m = _RE_FOLDER_ID.search(url) or _RE_OPEN_ID.search(url)
+    return m.group(1) if m else None
+
+
+def _drive_folder_url(urls: Dict[str, List[str]]) -> Optional[str]:
+    for u in urls.get(GOOGLE_DRIVE, []):
+        m = _RE_DRIVE_URL.match(u)
+        if m:
+            return m.group(0)
+    return None
+
+
+def _text_tokens(text: str):
+    """全文 → ('permit', raw) / ('url', url) token 串流"""
+    clean = re.sub(r'\s+', '', text)
+    for m in _RE_LIST_TOKEN.finditer(clean):
+        yield m.lastgroup, m.group(m.lastgroup)
+
+
+def _last_drive_folder_url(rec: dict) -> Optional[str]:
+    """最後一次出現且帶 Drive 資料夾連結的那一列，取該列第一個（舊 parser 的後者覆蓋前者）"""
+    for urls in reversed(rec['occurrences']):
+        url = _drive_folder_url(urls)
+        if url:
+            return url
+    return None
+
+
+def _build_records(tokens) -> List[dict]:
+    """token 串流 → 每個建照一筆紀錄（依首次出現順序）。
+
+    URL 歸屬於它前面最近的建照（「領地」＝兩個建照號碼之間）。
+    同一建照出現多次時 urls 合併，occurrences 則逐次保留各自的 URL
+    （{服務: [url, ...]}）——兩個 view 都以最後一次出現為準。
+    """
+    from geobingan_sync.permit_utils import normalize_permit
+
+    records: Dict[str, dict] = {}
+    current = None
+    for kind, value in tokens:
+        if kind == 'permit':
+            permit = normalize_permit(value) or value
+            rec = records.setdefault(permit, {'permit': permit, 'urls': {}, 'occurrences': [], 'folder_id': None})
+            current = {}
+            rec['occurrences'].append(current)
+        elif current is not None:
+            provider = classify_url(value)
+            rec['urls'].setdefault(provider, []).append(value)
+            current.setdefault(provider, []).append(value)
+
+    for rec in records.values():
+        drive_url = _last_drive_folder_url(rec)
+        if drive_url:
+            rec['folder_id'] = extract_drive_folder_id(drive_url)
+    return list(records.values())
+
+
+def parse_permit_list_text(text: str) -> List[dict]:
+    """單次掃描列表全文，回傳每個建照一筆紀錄。
+
+    紀錄格式：{'permit': 標準化建照, 'urls': {服務: [url, ...]},
+    'occurrences': [{服務: [url, ...]}, ...], 'folder_id': str | None}
+    """
+    return _build_records(_text_tokens(text))
+
+
+def extract_permit_list_text(pdf_path: str) -> str:
+    import pypdf
+    with open(pdf_path, 'rb') as f:
+        reader = pypdf.PdfReader(f)
+        return ''.join(p.extract_text() or '' for p in reader.pages)
+
+
+# ==================== 連結註解（/Annots）模式 ====================
+#
+# 文字模式的長 URL 會被斷行切碎（所以得先去空白再拼回）；PDF 裡的超連結本來就以
+# /Link 註解的 /URI action 存在，直接讀是精確的完整 URL。這個模式為的是 URL 正確性，
+# 不是省 CPU：建照號碼（中文字型需 pypdf 解碼）仍只能從文字取得，每頁照樣跑一次
+# extract_text()，只是改以 visitor 收集文字片段的 y，再把每個連結配給 y 最接近的建照
+# （同一列）；每頁只抽一次文字。沒有連結註解的頁面退回純文字模式；有註解的頁面上，
+# 沒配到任何註解的列（URL 只是純文字）沿用同一份文字的文字模式結果。
+# 大檔案的加速來自下方的 process pool 分段平行解析。
+
+# 頁數達此門檻才開 process pool（小檔案開 pool 的成本比解析還高）
+PARALLEL_PAGE_THRESHOLD = 40
+PAGES_PER_TASK = 20
+
+_RE_PERMIT = re.compile(r'\d{2,3}建字第\d{3,5}號')
+
+
+def _page_links(page) -> List[tuple]:
+    """回傳頁面上 http(s) 連結註解 [(url, y_center)]，依頁面由上而下排序。"""
+    links = []
+    for annot in page.get('/Annots') or []:
+        try:
+            obj = annot.get_object()
+            if obj.get('/Subtype') != '/Link':
+                continue
+            action = obj.get('/A')
+            action = action.get_object() if action is not None else None
+            if not action or action.get('/S') != '/URI':
+                continue
+            uri = str(action.get('/URI') or '').strip()
+            rect = [float(v) for v in obj.get('/Rect')]
+        except Exception:
+            continue
+        if not uri.lower().startswith(('http://', 'https://')):
+            continue
+        links.append((uri, (rect[1] + rect[3]) / 2))
+    links.sort(key=lambda item: -item[1])
+    return links
+
+
+def _page_permits(page) -> tuple:
+    """以 visitor 收集文字片段座標，回傳 (頁面上的建照 [(raw, y)]（出現順序）, 去空白的整頁文字)。
+
+    片段先去空白後串接、記下每個字元所屬片段的 y，再對整頁字串跑 regex——
+    建照號碼被切成兩個片段（或斷行）也抓得到，y 取號碼第一個字元的片段。
+    """
+    chars: List[str] = []
+    ys: List[float] = []
+
+    def visitor(text, cm, tm, font_dict, font_size):
+        frag = re.sub(r'\s+', '', text or '')
+        if not frag:
+            return
+        y = tm[4] * cm[1] + tm[5] * cm[3] + cm[5]
+        chars.append(frag)
+        ys.extend([y] * len(frag))
+
+    page.extract_text(visitor_text=visitor)
+    joined = ''.join(chars)
+    return [(m.group(0), ys[m.start()]) for m in _RE_PERMIT.finditer(joined)], joined
+
+
+def _text_url_slots(text: str) -> List[List[str]]:
+    """文字模式的 URL 依「格」分組：[第一個建照之前, 第 1 個建照之後, ...]"""
+    slots: List[List[str]] = [[]]
+    for kind, value in _text_tokens(text):
+        if kind == 'permit':
+            slots.append([])
+        else:
+            slots[-1].append(value)
+    return slots
+
+
+def assign_links_to_permits(permits: List[tuple], links: List[tuple],
+                            text_slots: Optional[List[List[str]]] = None) -> List[tuple]:
+    """把同一頁的連結配給 y 最接近的建照，回傳 token 串流（依建照出現順序）。
+
+    permits: [(raw_permit, y)]，links: [(url, y)]。距離相同時配給較上方（先出現）的建照。
+    頁面上沒有建照時，連結原樣輸出——由 _build_records 歸給前一頁最後一個建照
+    （跨頁的表格列）。
+    text_slots：同一頁文字模式的 URL（_text_url_slots）；某一格沒配到任何連結註解時
+    改用該格的文字 URL（列上的 URL 沒做成超連結）。
+    """
+    slots: List[List[str]] = [[] for _ in range(len(permits) + 1)]
+    for url, y in links:
+        if not permits:
+            slots[0].append(url)
+            continue
+        best = min(range(len(permits)), key=lambda i: (abs(permits[i][1] - y), i))
+        slots[best + 1].append(url)
+    if text_slots is not None and len(text_slots) == len(slots):
+        slots = [urls or text_urls for urls, text_urls in zip(slots, text_slots)]
+    tokens = [('url', u) for u in slots[0]]
+    for (raw, _), urls in zip(permits, slots[1:]):
+        tokens.append(('permit', raw))
+        tokens.extend(('url', u) for u in urls)
+    return tokens
+
+
+def _extract_page_range(pdf_path: str, start: int, stop: int) -> List[list]:
+    """解析 [start, stop) 頁，回傳每頁的 token list（process pool worker，須為 module 層級）"""
+    import pypdf
+    out = []
+    with open(pdf_path, 'rb') as f:
+        reader = pypdf.PdfReader(f)
+        for i in range(start, min(stop, len(reader.pages))):
+            page = reader.pages[i]
+            links = _page_links(page)
+            if links:
+                permits, text = _page_permits(page)
+                out.append(assign_links_to_permits(permits, links, _text_url_slots(text)))
+            else:
+                out.append(list(_text_tokens(page.extract_text() or '')))
+    return out
+
+
+def parse_permit_list(pdf_path: str, *, max_workers: Optional[int] = None) -> List[dict]:
+    """解析列表 PDF 為結構化紀錄（連結註解優先，無註解頁面退回文字模式）。
+
+    頁數 ≥ PARALLEL_PAGE_THRESHOLD 時以 process pool 分段平行解析，結果依頁序重組。
+    """
+    import pypdf
+    with open(pdf_path, 'rb') as f:
+        n_pages = len(pypdf.PdfReader(f).pages)
+
+    ranges = [(i, i + PAGES_PER_TASK) for i in range(0, n_pages, PAGES_PER_TASK)]
+    pages: List[list] = []
+    if n_pages >= PARALLEL_PAGE_THRESHOLD and len(ranges) > 1:
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        workers = min(max_workers or os.cpu_count() or 1, len(ranges))
+        try:
+            # spawn 而非 Linux 預設的 fork：run.py 在 worker thread 內執行本步驟，旁邊還有
+            # token 背景刷新 thread 與 log tee 的鎖，fork 多執行緒 process 可能讓子行程卡死
+            with ProcessPoolExecutor(max_workers=workers,
+                                     mp_context=multiprocessing.get_context('spawn')) as pool:
+                futures = [pool.submit(_extract_page_range, pdf_path, a, b) for a, b in ranges]
+                for fut in futures:
+                    pages.extend(fut.result())
+        except (OSError, RuntimeError) as e:
+            # 沙箱/受限環境開不了子行程 → 退回單行程
+            print(f"  ⚠️ 平行解析失敗，改為單行程: {e}")
+            pages = []
+    if not pages:
+        pages = _extract_page_range(pdf_path, 0, n_pages)
+
+    return _build_records(tok for page_tokens in pages for tok in page_tokens)
+
+
+def drive_mapping(records: List[dict]) -> Dict[str, str]:
+    """建照 → Google Drive 資料夾 URL（sync_permits / match_permits 用）
+
+    同一建照出現多次時，以最後一次帶 Drive 連結的那一列為準。
+    """
+    mapping = {}
+    for rec in records:
+        url = _last_drive_folder_url(rec)
+        if url:
+            mapping[rec['permit']] = url
+    return mapping
+
+
+def _non_google_link(urls: Dict[str, List[str]]) -> Optional[tuple]:
+    """單一列的 (服務, url)；該列有 Google 連結、或只有市府自己的頁面時回傳 None"""
+    if urls.get(GOOGLE_DRIVE):
+        return None
+    cloud = next((name for name in _PROVIDER_ORDER if urls.get(name)), None)
+    if cloud:
+        return cloud, urls[cloud][0]
+    for name, found in urls.items():
+        if not name.startswith('其他: '):
+            continue
+        host = url_host(found[0])
+        if any(h in host for h in _IGNORED_HOSTS):
+            continue
+        return name, found[0]
+    return None
+
+
+def non_google_permits(records: List[dict]) -> List[dict]:
+    """沒有 Google 連結、但有其他雲端（或外部網站）連結的建照（追蹤報告用）
+
+    逐列判定（與舊版追蹤報告相同）；同一建照出現多次時以最後一個符合的列為準。
+    """
+    result = []
+    for rec in records:
+        link = next(filter(None, map(_non_google_link, reversed(rec['occurrences']))), None)
+        if link:
+            cloud, url = link
+            result.append({'permit': rec['permit'], 'cloud': cloud, 'url': url})
+    return result
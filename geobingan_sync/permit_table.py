@@ -0,0 +1,255 @@
+"""
+欄位式建案表（permit_system_mapping.json + permit_registry.json）
+
+追蹤報告 main、report_template、generate_weekly_report.gather_stats、
+weekly_snapshot.save_snapshot 原本各自讀這兩個檔，再各自用 dict 迴圈算
+狀態分布、雲端 / AI 總數、「有 AI 辨識才算」的警戒值 join——
+同一個數字有四份實作，條件稍有出入（`!= 0` vs `> 0`）數字就對不起來。
+
+PermitTable 把兩個檔案 join 成一張表，每個欄位是一條 stdlib array（或 list）：
+- 列順序：mapping 的建照（依插入順序，tracked=1），再接只出現在 registry 的建照（tracked=0）
+- status 以小整數代碼存放，代碼 → 名稱見 status_names（依第一次出現的順序 intern）
+- 日期欄位另存 date ordinal（latest_day；0 = 無日期），比較不必再切字串
+- 統計以遮罩（array('b')）+ itertools.compress 在 C 層完成：group_count / column_sum
+
+load_table() 以兩個檔案的 (mtime, size) 快取：同一 process 內 gather_stats 與
+save_snapshot 共用同一張表。表在 process 內共用，呼叫端請勿修改欄位內容。
+"""
+import json
+import os
+import threading
+from array import array
+from collections import Counter
+from datetime import date
+from itertools import compress
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from geobingan_sync import REPO_ROOT
+
+MAPPING_FILE = REPO_ROOT / 'state' / 'permit_system_mapping.json'
+REGISTRY_FILE = REPO_ROOT / 'state' / 'permit_registry.json'
+
+# 超過幾天沒更新算「報告過期」（追蹤報告「需要關注」區塊）
+STALE_DAYS = 30
+
+_cache: Dict[Tuple[str, str], Tuple[tuple, 'PermitTable']] = {}
+_cache_lock = threading.Lock()
+
+
+def _day(value: str) -> int:
+    """'YYYY-MM-DD...' → date ordinal；空字串或格式不符回傳 0"""
+    if not value:
+        return 0
+    try:
+        return date.fromisoformat(value[:10]).toordinal()
+    except ValueError:
+        return 0
+
+
+def positive(column: Sequence[int]) -> array:
+    """column > 0 的遮罩"""
+    return array('b', map((0).__lt__, column))
+
+
+def mask_and(*masks: Sequence[int]) -> array:
+    return array('b', map(all, zip(*masks)))
+
+
+def column_sum(column: Sequence[int], mask: Sequence[int] = None) -> int:
+    return sum(compress(column, mask)) if mask is not None else sum(column)
+
+
+def group_count(codes: Sequence[int], labels: List[str], mask: Sequence[int] = None) -> Dict[str, int]:
+    """各代碼的列數 → {名稱: 數量}（依第一次出現的順序）"""
+    counts = Counter(compress(codes, mask) if mask is not None else codes)
+    return {labels[code]: n for code, n in counts.items()}
+
+
+def group_sum(codes: Sequence[int], column: Sequence[int], labels: List[str],
+              mask: Sequence[int] = None) -> Dict[str, int]:
+    """各代碼的 column 加總 → {名稱: 總和}（依第一次出現的順序）"""
+    pairs = zip(codes, column)
+    if mask is not None:
+        pairs = compress(pairs, mask)
+    sums: Dict[int, int] = {}
+    for code, value in pairs:
+        sums[code] = sums.get(code, 0) + value
+    return {labels[code]: n for code, n in sums.items()}
+
+
+class PermitTable:
+    """mapping × registry 的欄位式 join（每個屬性是一個欄位，第 i 個元素屬於 permits[i]）"""
+
+    def __init__(self, mapping: Dict[str, dict], registry: Dict[str, dict] = None):
+        registry = registry or {}
+        self.permits: List[str] = list(mapping) + [p for p in registry if p not in mapping]
+        self.row_of: Dict[str, int] = {p: i for i, p in enumerate(self.permits)}
+        self.tracked = array('b', [1] * len(mapping) + [0] * (len(self.permits) - len(mapping)))
+
+        self.status_names: List[str] = []
+        self._status_code: Dict[str, int] = {}
+        self.status = array('H')
+        self.drive_count = array('q')
+        self.system_count = array('q')
+        self.latest_report: List[str] = []
+        self.latest_day = array('l')
+        self.days_since = array('l')  # -1 = 無資料
+
+        self.names: List[str] = []
+        self.api_matched = array('b')
+        self.alert_total = array('q')
+        self.alert_warning = array('q')
+        self.alert_danger = array('q')
+        self.alert_date: List[str] = []
+        self.alert_details: List[list] = []
+        self.gov_url_status: List[str] = []
+
+        empty = {}
+        for permit in self.permits:
+            data = mapping.get(permit, empty)
+            self.status.append(self.intern_status(data.get('status', '')))
+            self.drive_count.append(data.get('drive_count', 0) or 0)
+            self.system_count.append(data.get('system_count', 0) or 0)
+            latest = data.get('latest_report', '') or ''
+            self.latest_report.append(latest)
+            self.latest_day.append(_day(latest))
+            ds = data.get('days_since_update', '')
+            self.days_since.append(int(ds) if ds != '' and ds is not None else -1)
+
+            info = registry.get(permit, empty)
+            self.names.append(info.get('name', '') or '')
+            self.api_matched.append(1 if info.get('api_match') else 0)
+            la = info.get('live_alerts') or empty
+            self.alert_total.append(la.get('total', 0) or 0)
+            self.alert_warning.append(la.get('warning', 0) or 0)
+            self.alert_danger.append(la.get('danger', 0) or 0)
+            self.alert_date.append(la.get('latest_date', '') or '')
+            self.alert_details.append(la.get('details', []) or [])
+            self.gov_url_status.append(info.get('gov_pdf_url_status', '') or '')
+
+    @classmethod
+    def from_alert_data(cls, mapping: Dict[str, dict], alert_data: Dict[str, dict] = None,
+                        permit_names: Dict[str, str] = None) -> 'PermitTable':
+        """由報告層的 alert_data（warning_count / danger_count…）與名稱表建表"""
+        registry: Dict[str, dict] = {}
+        for permit, name in (permit_names or {}).items():
+            registry[permit] = {'name': name}
+        for permit, pa in (alert_data or {}).items():
+            registry.setdefault(permit, {})['live_alerts'] = {
+                'total': pa.get('total', 0),
+                'warning': pa.get('warning_count', 0),
+                'danger': pa.get('danger_count', 0),
+                'latest_date': pa.get('latest_alert_date', ''),
+                'details': pa.get('details', []),
+            }
+        return cls(mapping, registry)
+
+    def __len__(self) -> int:
+        return len(self.permits)
+
+    def intern_status(self, status: str) -> int:
+        code = self._status_code.get(status)
+        if code is None:
+            code = self._status_code[status] = len(self.status_names)
+            self.status_names.append(status)
+        return code
+
+    def set_status(self, permit: str, status: str):
+        self.status[self.row_of[permit]] = self.intern_status(status)
+
+    def status_of(self, row: int) -> str:
+        return self.status_names[self.status[row]]
+
+    def rows(self, mask: Sequence[int]) -> List[int]:
+        return list(compress(range(len(self.permits)), mask))
+
+    # ── 統計（只算 mapping 內的建照，除非另外註明） ──
+
+    @property
+    def total(self) -> int:
+        return column_sum(self.tracked)
+
+    def total_pdfs(self) -> int:
+        return column_sum(self.drive_count, self.tracked)
+
+    def total_ai(self) -> int:
+        return column_sum(self.system_count, self.tracked)
+
+    def status_counts(self) -> Dict[str, int]:
+        return group_count(self.status, self.status_names, self.tracked)
+
+    def named_count(self) -> int:
+        """registry 中有名稱的建照數（含不在 mapping 的建照）"""
+        return sum(map(bool, self.names))
+
+    def api_matched_count(self) -> int:
+        return column_sum(self.api_matched)
+
+    def alert_mask(self) -> array:
+        """有即時警戒值且有 AI 辨識紀錄的建照（AI=0 表示名稱匹配不可靠，警戒值可能是誤配）"""
+        return mask_and(self.tracked, positive(self.system_count), positive(self.alert_total))
+
+    def updated_mask(self, since: date) -> array:
+        """最近報告日期 ≥ since 的建照"""
+        cutoff = since.toordinal()
+        return mask_and(self.tracked, array('b', map(cutoff.__le__, self.latest_day)))
+
+    def stale_mask(self, days: int = STALE_DAYS) -> array:
+        """超過 days 天沒更新、且不是「無資料」的建照"""
+        no_reports = self._status_code.get('no_reports', -1)
+        return mask_and(self.tracked,
+                        array('b', map(days.__lt__, self.days_since)),
+                        array('b', map(no_reports.__ne__, self.status)))
+
+    # ── 報告層的 dict 視圖（registry 全部建照） ──
+
+    def name_map(self) -> Dict[str, str]:
+        return {p: n for p, n in zip(self.permits, self.names) if n}
+
+    def alert_data(self) -> Dict[str, dict]:
+        return {
+            self.permits[i]: {
+                'warning_count': self.alert_warning[i],
+                'danger_count': self.alert_danger[i],
+                'total': self.alert_total[i],
+                'latest_alert_date': self.alert_date[i],
+                'details': self.alert_details[i],
+            }
+            for i in self.rows(positive(self.alert_total))
+        }
+
+    def gov_url_statuses(self) -> Dict[str, str]:
+        return {p: s for p, s in zip(self.permits, self.gov_url_status) if s}
+
+
+def _file_key(path: str) -> Optional[tuple]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def load_table(mapping_path=None, registry_path=None) -> PermitTable:
+    """讀取（或沿用快取的）建案表。
+
+    檔案不存在或 JSON 損壞時 raise（與原本各呼叫端直接 json.load 的行為一致）。
+    """
+    paths = (str(mapping_path or MAPPING_FILE), str(registry_path or REGISTRY_FILE))
+    key = (_file_key(paths[0]), _file_key(paths[1]))
+    with _cache_lock:
+        cached = _cache.get(paths)
+        if cached is not None and cached[0] == key and None not in key:
+            return cached[1]
+        with open(paths[0], 'r', encoding='utf-8') as f:
+            mapping = json.load(f)
+        with open(paths[1], 'r', encoding='utf-8') as f:
+            registry = json.load(f)
+        table = PermitTable(mapping, registry)
+        _cache[paths] = (key, table)
+        return table
+
+
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
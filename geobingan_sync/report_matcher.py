@@ -0,0 +1,277 @@
+"""
+API 報告 → 建照號碼比對引擎（generate_permit_tracking_report 步驟 3）
+
+fetch_api_reports 原本對每一份報告：
+- 逐一走過所有 api_match 名稱，每個名稱重跑三次後綴 re.sub 才比對（方法 2.5）
+- 每份報告都把 fragment_to_permit 依長度重新排序一次（方法 3b）
+- 反向匹配對每個候選視窗掃過全部名稱（方法 3c）
+- 每次加入前都從 list 重建一次「已存在檔名」set
+
+ReportPermitMatcher 每次 run 只建一次：API 核心名稱預先算好、名稱與片段各建一台
+Aho-Corasick 自動機（一次掃過檔名找出所有命中，再依「最長、同長取先加入者」挑選，
+等同原本的迴圈 / 穩定排序語意），反向匹配改查 SubstringIndex。
+group_reports 以每個建照一個檔名 set 去重。比對結果與原本逐一掃描完全一致。
+
+報告檔名建立後就不會再變，名稱比對（方法 2.5 / 3）的結果只取決於 registry 的
+name / api_match。MatchMemo 把「檔名 → (建照, 方法)」存在 state/report_match_memo.json，
+以 registry_fingerprint 當版本：registry 名稱沒變時只有新報告需要比對。
+方法 1 / 2（建照號 regex、上傳記錄對應）是 O(1) 查表且上傳記錄每天都在長，
+不進 memo，每次都重新判斷。
+"""
+import hashlib
+import json
+import os
+import re
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from geobingan_sync import REPO_ROOT
+from geobingan_sync.text_index import AhoCorasick, SubstringIndex
+
+REPORT_MATCH_MEMO_FILE = REPO_ROOT / 'state' / 'report_match_memo.json'
+# 比對邏輯改變時遞增，讓舊 memo 全部失效
+MATCH_LOGIC_VERSION = 1
+
+_RE_PERMIT = re.compile(r'(\d{2,3}建字第\d{3,5}號)')
+# 通用名稱和太短的名稱不可用於模糊匹配（會造成大量誤配）
+_RE_GENERIC_NAME = re.compile(r'^(監測報告?|監測報表?|監測$|安全觀測|安全監測|觀測報告|觀測數據|工地監測|工地$|報告$|報表$|告示牌|基地觀測系統|建號\d)')
+_RE_NAME_NOISE = re.compile(r'(安全觀測|監測報表?|觀測報告|觀測數據|新建工程|工程|報告|報表|數據)')
+_RE_CJK_RUN = re.compile(r'[\u4e00-\u9fff]+')
+_RE_API_SUFFIX = re.compile(r'[-\s]*(新建工程|監測案|新建統包工程|集合住宅|住宅大樓|商辦大樓|店鋪|工程|監測)$')
+_RE_FN_CLEAN_API = re.compile(r'\d{7,8}|\d{4}[-/.]\d{2}[-/.]\d{2}|\.pdf$|[^\u4e00-\u9fff\w\s-]')
+_RE_FN_CLEAN_FRAGMENT = re.compile(r'\d{7,8}|\d{4}[-/.]\d{2}[-/.]\d{2}|\.pdf$|監測報告|觀測報告|報告|報表|[^\u4e00-\u9fff]')
+_RE_FN_CLEAN_REVERSE = re.compile(r'\d{7,8}|\d{4}[-/.]\d{2}[-/.]\d{2}|\.pdf$|監測報告|觀測報告|觀測數據|報告|報表|新建工程|集合住宅|住宅大樓|安全觀測|安全監測|[^\u4e00-\u9fff]')
+
+# match() 回傳的比對方法（對應 fetch_api_reports 原本的方法編號）
+METHOD_PERMIT_NO = 'permit_no'   # 方法 1：檔名含建照號
+METHOD_HISTORY = 'history'       # 方法 2：上傳記錄檔名對應
+METHOD_API_NAME = 'api_name'     # 方法 2.5：高信度 api_match 名稱
+METHOD_NAME = 'name'             # 方法 3a：完整名稱在檔名中
+METHOD_FRAGMENT = 'fragment'     # 方法 3b：唯一名稱片段
+METHOD_REVERSE = 'reverse'       # 方法 3c：反向視窗唯一匹配
+FUZZY_METHODS = (METHOD_API_NAME, METHOD_NAME, METHOD_FRAGMENT, METHOD_REVERSE)
+
+
+def api_core_name(api_name: str) -> str:
+    """從 API 名稱逐步去除通用後綴，提取核心名稱"""
+    core = api_name
+    for _ in range(3):
+        core = _RE_API_SUFFIX.sub('', core).strip()
+    return core
+
+
+def _longest_first(automaton: AhoCorasick, text: str) -> Optional[int]:
+    """text 中出現的 pattern 取最長者，同長取編號最小（= 最早加入）者"""
+    hits = automaton.find(text)
+    if not hits:
+        return None
+    patterns = automaton.patterns
+    return min(hits, key=lambda i: (-len(patterns[i]), i))
+
+
+def registry_fingerprint(registry: Dict[str, dict]) -> str:
+    """名稱比對的輸入版本：所有建照的 name / api_match（加上比對邏輯版本）"""
+    payload = {
+        'v': MATCH_LOGIC_VERSION,
+        'names': sorted([permit, info.get('name', ''), info.get('api_match', '')]
+                        for permit, info in registry.items()),
+    }
+    blob = json.dumps(payload, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(blob.encode('utf-8')).hexdigest()[:16]
+
+
+class MatchMemo:
+    """跨 run 的名稱比對結果：檔名 → [建照 list, 方法]（比對不到也記，為 [[], '']）"""
+
+    def __init__(self, version: str, path=None):
+        self.version = version
+        self.path = str(path or REPORT_MATCH_MEMO_FILE)
+        self.entries: Dict[str, list] = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidated = False
+        self._used: Set[str] = set()
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get('version') == version:
+                    self.entries = data.get('matches', {})
+                else:
+                    self.invalidated = True
+            except (json.JSONDecodeError, IOError, AttributeError):
+                self.invalidated = True
+
+    def get(self, filename: str) -> Optional[Tuple[List[str], str]]:
+        hit = self.entries.get(filename)
+        if hit is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._used.add(filename)
+        return list(hit[0]), hit[1]
+
+    def put(self, filename: str, permits: List[str], method: str):
+        self.entries[filename] = [list(permits), method]
+        self._used.add(filename)
+
+    def save(self):
+        """寫回 memo；只保留本次用到的檔名（已刪除的報告自然淘汰）"""
+        matches = {fn: self.entries[fn] for fn in self._used} if self._used else self.entries
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = f'{self.path}.tmp.{os.getpid()}'
+        try:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump({'version': self.version, 'matches': matches}, f, ensure_ascii=False)
+            os.replace(tmp, self.path)
+        except Exception:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+
+
+class ReportPermitMatcher:
+    """以 permit_registry 與上傳記錄檔名對應建立的報告檔名比對器。
+
+    給 memo 時，名稱比對（方法 2.5 / 3）先查 memo，沒有才算並寫回。
+    自動機在第一次真的需要名稱比對時才建（memo 全中的 run 不必建）。
+    """
+
+    def __init__(self, registry: Dict[str, dict], filename_to_permit: Dict[str, str],
+                 memo: MatchMemo = None):
+        self.filename_to_permit = filename_to_permit
+        self.memo = memo
+        self._registry = registry
+
+        # 方法 2.5：api_match 名稱 → [permits]（支援多對一）
+        api_name_to_permits: Dict[str, List[str]] = {}
+        for permit, info in registry.items():
+            api_match = info.get('api_match', '')
+            if api_match and len(api_match) >= 4:
+                api_name_to_permits.setdefault(api_match, []).append(permit)
+        self.api_name_to_permits = api_name_to_permits
+        self._built = False
+
+    def _build(self):
+        """建立名稱比對用的核心名稱 / 片段表與自動機"""
+        registry = self._registry
+        cores, core_permits = [], []
+        for api_name, permits in self.api_name_to_permits.items():
+            core = api_core_name(api_name)
+            if len(core) >= 3:
+                cores.append(core)
+                core_permits.append(permits)
+        self._api_cores = AhoCorasick(cores)
+        self._api_core_permits = core_permits
+
+        # 方法 3：完整名稱 → permit；名稱片段（4~6 字）只保留唯一對應者
+        name_to_permit: Dict[str, str] = {}
+        fragment_permits: Dict[str, Set[str]] = {}
+        for permit, info in registry.items():
+            name = info.get('name', '')
+            if name and len(name) >= 4 and not _RE_GENERIC_NAME.match(name):
+                name_to_permit[name] = permit
+                clean = _RE_NAME_NOISE.sub('', name)
+                for part in _RE_CJK_RUN.findall(clean):
+                    for flen in range(4, min(7, len(part) + 1)):
+                        for start in range(len(part) - flen + 1):
+                            fragment_permits.setdefault(part[start:start + flen], set()).add(permit)
+            api_name = info.get('api_match', '')
+            if api_name:
+                name_to_permit[api_name] = permit
+        self.name_to_permit = name_to_permit
+        self.fragment_to_permit = {frag: next(iter(permits))
+                                   for frag, permits in fragment_permits.items() if len(permits) == 1}
+        self._names = AhoCorasick(name_to_permit)
+        self._name_values = list(name_to_permit.values())
+        self._fragments = AhoCorasick(self.fragment_to_permit)
+        self._fragment_values = list(self.fragment_to_permit.values())
+        self._name_index = SubstringIndex(name_to_permit)
+        self._built = True
+
+    def _reverse_match(self, filename: str) -> Optional[str]:
+        """從檔名提取 6→4 字子片段，在 registry 名稱中搜尋（唯一建照才採用）"""
+        cjk_text = ''.join(_RE_CJK_RUN.findall(_RE_FN_CLEAN_REVERSE.sub('', filename)))
+        for flen in range(min(6, len(cjk_text)), 3, -1):
+            for start in range(len(cjk_text) - flen + 1):
+                names = self._name_index.containing(cjk_text[start:start + flen])
+                permits = {self.name_to_permit[n] for n in names}
+                if len(permits) == 1:
+                    return next(iter(permits))
+        return None
+
+    def match(self, filename: str) -> Tuple[List[str], str]:
+        """回傳 (建照號碼 list, 比對方法)；比對不到回傳 ([], '')"""
+        m = _RE_PERMIT.search(filename)
+        if m:
+            return [m.group(1)], METHOD_PERMIT_NO
+        permit = self.filename_to_permit.get(filename)
+        if permit:
+            return [permit], METHOD_HISTORY
+        if self.memo is None:
+            return self.match_names(filename)
+        hit = self.memo.get(filename)
+        if hit is not None:
+            return hit
+        permits, method = self.match_names(filename)
+        self.memo.put(filename, permits, method)
+        return permits, method
+
+    def match_names(self, filename: str) -> Tuple[List[str], str]:
+        """名稱比對（方法 2.5 / 3）；只取決於 registry"""
+        if not self._built:
+            self._build()
+        if self.api_name_to_permits:
+            idx = _longest_first(self._api_cores, _RE_FN_CLEAN_API.sub('', filename))
+            if idx is not None:
+                return list(self._api_core_permits[idx]), METHOD_API_NAME
+
+        if self.name_to_permit:
+            idx = _longest_first(self._names, filename)
+            if idx is not None:
+                return [self._name_values[idx]], METHOD_NAME
+            if self.fragment_to_permit:
+                idx = _longest_first(self._fragments, _RE_FN_CLEAN_FRAGMENT.sub('', filename))
+                if idx is not None:
+                    return [self._fragment_values[idx]], METHOD_FRAGMENT
+            permit = self._reverse_match(filename)
+            if permit:
+                return [permit], METHOD_REVERSE
+        return [], ''
+
+
+def group_reports(reports: Iterable[dict], matcher: ReportPermitMatcher,
+                  upload_history: Dict[str, Iterable[str]]) -> Tuple[Dict[str, List[dict]], dict]:
+    """按建照號碼分組（上傳記錄為基礎，再補上 API 報告；同建照同檔名只算一次）。
+
+    回傳 (permit_reports, stats)，stats 含 matched / fuzzy / unmatched / by_method。
+    """
+    permit_reports: Dict[str, List[dict]] = {}
+    seen: Dict[str, Set[str]] = {}
+    for permit, files in upload_history.items():
+        permit_reports[permit] = [{'filename': f, 'created_at': '', 'status': 'uploaded'} for f in files]
+        seen[permit] = set(files)
+
+    stats = {'matched': 0, 'fuzzy': 0, 'unmatched': 0, 'by_method': {}}
+    for report in reports:
+        filename = report.get('file_name', '')
+        permits, method = matcher.match(filename)
+        if not permits:
+            stats['unmatched'] += 1
+            continue
+        stats['matched'] += 1
+        if method in FUZZY_METHODS:
+            stats['fuzzy'] += 1
+        stats['by_method'][method] = stats['by_method'].get(method, 0) + 1
+        for p in permits:
+            files = seen.setdefault(p, set())
+            if filename in files:
+                continue
+            files.add(filename)
+            permit_reports.setdefault(p, []).append({
+                'filename': filename,
+                'created_at': report.get('created_at', ''),
+                'status': report.get('parse_status', '')
+            })
+    return permit_reports, stats
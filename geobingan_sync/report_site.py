@@ -0,0 +1,470 @@
+"""
+線上版追蹤報告（docs/）：靜態 shell + 資料 JSON
+
+docs/index.html 原本是整份預先渲染的報告（~500 KB、每個建案一段 <tr>），
+手機載入慢，而且每天 cp + git push 都等於整檔重寫（列序號、排序隨日期變動）。
+
+線上版拆成兩個檔：
+- index.html：不含資料的靜態 shell（樣式 / 圖例沿用 report_template），
+  內容不隨每日資料變動，只有模板改版時才會出現在 diff。
+- permit_data.json：依建照號碼排序、一列一筆的決定性資料檔；不放會隨日期
+  自然變動的衍生欄位（距今天數、過期旗標、序號），每日 commit 只 diff 有變的建案。
+
+shell 載入資料後在瀏覽器端完成統計、需要關注清單、預設排序，表格以固定列高
+虛擬捲動（只渲染可視範圍附近的列），搜尋 / 狀態篩選走載入時預建的索引，
+5k~10k 列仍維持流暢。完整單檔 HTML（state/permit_tracking_report.html）照常產生，
+供離線檢視。
+"""
+import json
+import os
+from datetime import datetime
+from typing import Dict, List
+
+from geobingan_sync.report_template import REPORT_CSS, REPORT_LEGEND_HTML
+
+DATA_FILENAME = 'permit_data.json'
+SHELL_FILENAME = 'index.html'
+DATA_VERSION = 1
+
+COLUMNS = [
+    'permit', 'name', 'cloud', 'drive_count', 'system_count',
+    'alert_total', 'warning_count', 'danger_count', 'latest_alert_date', 'alert_details',
+    'latest', 'status', 'folder_id', 'url_status',
+]
+
+
+def build_rows(permit_data: Dict[str, dict], non_google: List[dict], alert_data: Dict[str, dict] = None,
+               permit_names: Dict[str, str] = None, gov_url_statuses: Dict[str, str] = None) -> List[list]:
+    """每個建案一列（欄位順序見 COLUMNS），依建照號碼排序"""
+    alert_data = alert_data or {}
+    permit_names = permit_names or {}
+    gov_url_statuses = gov_url_statuses or {}
+    non_google_set = {item['permit']: item['cloud'] for item in non_google}
+    rows = []
+    for permit in sorted(permit_data):
+        data = permit_data[permit]
+        system_count = data.get('system_count', 0) or 0
+        # 只在有 AI 辨識紀錄的建案才顯示警戒值（與完整報告相同）
+        alert = alert_data.get(permit, {}) if system_count > 0 else {}
+        alert_total = alert.get('total', 0) or 0
+        latest = data.get('latest_report') or ''
+        rows.append([
+            permit,
+            permit_names.get(permit, '') or '',
+            non_google_set.get(permit, 'Google Drive'),
+            data.get('drive_count', 0) or 0,
+            system_count,
+            alert_total,
+            alert.get('warning_count', 0) if alert_total else 0,
+            alert.get('danger_count', 0) if alert_total else 0,
+            (alert.get('latest_alert_date') or '')[:10] if alert_total else '',
+            list(alert.get('details') or []) if alert_total else [],
+            latest[:10],
+            data.get('status', 'unknown'),
+            data.get('folder_id', '') or '',
+            gov_url_statuses.get(permit, ''),
+        ])
+    return rows
+
+
+def render_data_json(rows: List[list], non_google: List[dict], now: datetime = None,
+                     degraded: List[str] = None) -> str:
+    """決定性輸出：鍵固定順序、每列一行（git diff 以建案為單位）。
+
+    degraded（抓取失敗、以空資料代替的來源）非空時才輸出 "degraded" 鍵。
+    """
+    dump = lambda v: json.dumps(v, ensure_ascii=False, separators=(',', ':'))
+    ng = sorted([item['permit'], item['cloud']] for item in non_google)
+    lines = [
+        '{"version":' + dump(DATA_VERSION) + ',',
+        '"generated_at":' + dump((now or datetime.now()).strftime('%Y-%m-%d %H:%M')) + ',',
+        '"degraded":' + dump(list(degraded)) + ',' if degraded else '',
+        '"columns":' + dump(COLUMNS) + ',',
+        '"non_google":[',
+        ',\n'.join(dump(item) for item in ng),
+        '],',
+        '"rows":[',
+        ',\n'.join(dump(row) for row in rows),
+        ']}',
+    ]
+    return '\n'.join(line for line in lines if line) + '\n'
+
+
+def _write_text_atomic(path: str, text: str):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp = f'{path}.tmp.{os.getpid()}'
+    try:
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp, path)
+    except Exception:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def write_report_site(out_dir: str, permit_data: Dict[str, dict], non_google: List[dict],
+                      alert_data: Dict[str, dict] = None, permit_names: Dict[str, str] = None,
+                      gov_url_statuses: Dict[str, str] = None, now: datetime = None,
+                      degraded: List[str] = None) -> int:
+    """寫出 out_dir/index.html（shell）與 out_dir/permit_data.json；回傳列數"""
+    print("🌐 生成線上版報告（shell + 資料 JSON）...")
+    rows = build_rows(permit_data, non_google, alert_data, permit_names, gov_url_statuses)
+    _write_text_atomic(os.path.join(out_dir, DATA_FILENAME), render_data_json(rows, non_google, now, degraded))
+    _write_text_atomic(os.path.join(out_dir, SHELL_FILENAME), SHELL_HTML)
+    print(f"  已生成: {out_dir}/{SHELL_FILENAME}、{DATA_FILENAME}（{len(rows)} 筆）")
+    return len(rows)
+
+
+# ==================== 靜態 shell ====================
+
+_SHELL_CSS = '''
+.vspace td{padding:0;border:0}
+.load-msg{padding:40px;text-align:center;color:#6b7280}
+'''
+
+_SHELL_BODY = '''<body>
+<div class="container">
+<div class="header">
+<div><h1>建照監測追蹤報告</h1></div>
+<div class="meta"><span id="generatedAt">載入中…</span> | 自動生成</div>
+</div>
+<div class="stats">
+<div class="stat" title="政府列管的監測建案總數（＝ 已完成上傳 + 部分對應 + 待 AI 對應 + 尚無監測資料 + 已結案，全部都在監控）"><div class="label">監測建案總數</div><div class="value" data-stat="total">-</div></div>
+<div class="stat" title="所有報告都已上傳到究平安系統完成分析"><div class="label">已完成上傳</div><div class="value" style="color:#22c55e" data-stat="completed">-</div></div>
+<div class="stat" title="部分報告已對應到 AI 分析結果"><div class="label">部分對應</div><div class="value" style="color:#3b82f6" data-stat="in_progress">-</div></div>
+<div class="stat" title="Google Drive 已有此建案 PDF，但系統未對應到 AI 分析。常見原因：（1）檔名格式無法自動解析、（2）檔名日期超過 30 天，系統不主動上傳舊報告"><div class="label">待 AI 對應</div><div class="value" style="color:#f59e0b" data-stat="not_uploaded">-</div></div>
+<div class="stat" title="雲端資料夾中沒有任何 PDF 報告"><div class="label">尚無監測資料</div><div class="value" style="color:#6b7280" data-stat="no_reports">-</div></div>
+<div class="stat" title="最後更新超過一年，建案可能已完工"><div class="label">已結案</div><div class="value" style="color:#9ca3af" data-stat="completed_project">-</div></div>
+<div class="stat" title="使用 SharePoint、Dropbox 等其他雲端服務"><div class="label">非 Google Drive</div><div class="value" style="color:#c2410c" data-stat="other_cloud">-</div></div>
+<div class="stat" title="同步或上傳過程中發生錯誤"><div class="label">異常</div><div class="value" style="color:#dc2626" data-stat="error">-</div></div>
+</div>
+
+''' + REPORT_LEGEND_HTML + '''<div class="attention-section" id="attentionSection">
+<button class="attention-toggle" onclick="toggleAttention()">
+<i class="toggle-arrow">▶</i> ⚠️ 需要處理 — <span id="attentionTitle">-</span>
+</button>
+<div class="attention-body">
+<div class="attention-group">
+<h4>目前有監測警戒的建案 (<span id="alertCount">0</span> 個)</h4>
+<div class="attention-cards" id="alertCards"></div>
+</div>
+<div class="attention-group">
+<h4>報告過期的建案 (超過 30 天未更新, <span id="staleCount">0</span> 個)</h4>
+<div style="max-height:300px;overflow-y:auto">
+<table class="stale-table">
+<thead><tr><th>建照字號</th><th>建案名稱</th><th>距今</th></tr></thead>
+<tbody id="staleRows"></tbody>
+</table>
+</div>
+</div>
+</div>
+</div>
+
+<div class="non-google">
+<h3>⚠️ 需手動處理的建照（未使用 Google Drive，系統無法自動抓取，共 <span data-stat="other_cloud">0</span> 個）</h3>
+<div class="cloud-grid" id="cloudCards"></div>
+</div>
+
+<div class="content">
+<div class="controls">
+<input type="text" class="search" id="search" placeholder="搜尋建照號碼或建案名稱...">
+<div class="filter-group">
+<button class="btn active" onclick="filterStatus(this,'')">全部</button>
+<button class="btn" onclick="filterStatus(this,'completed')">已完成</button>
+<button class="btn" onclick="filterStatus(this,'in_progress')">部分對應</button>
+<button class="btn" onclick="filterStatus(this,'not_uploaded')">待 AI 對應</button>
+<button class="btn" onclick="filterStatus(this,'other_cloud')">需手動處理</button>
+<button class="btn" onclick="filterStatus(this,'needs_attention')">需要處理</button>
+</div>
+</div>
+<div class="table-wrap" id="tableWrap">
+<table id="dataTable">
+<thead>
+<tr>
+<th onclick="sortTable(0)">#</th>
+<th onclick="sortTable(1)">建照號碼</th>
+<th onclick="sortTable(2)">工地名稱</th>
+<th onclick="sortTable(3)" class="col-cloud">資料來源</th>
+<th onclick="sortTable(4)" class="col-num">雲端報告數</th>
+<th onclick="sortTable(5)" class="col-num" title="已對應到此建案的 AI 分析報告數量。- 表示尚未對應">AI 辨識數</th>
+<th onclick="sortTable(6)" class="col-coverage" title="AI 辨識數 ÷ 雲端報告數">系統處理進度</th>
+<th onclick="sortTable(7)" title="即時監測警戒狀態（來自系統 API），日期為最近一次警戒觸發時間">監測警戒 ℹ️</th>
+<th onclick="sortTable(8)">最近更新</th>
+<th onclick="sortTable(9)" class="col-num">更新間隔</th>
+<th onclick="sortTable(10)">同步狀態</th>
+</tr>
+</thead>
+<tbody id="tableBody"><tr><td colspan="11" class="load-msg">資料載入中…</td></tr></tbody>
+</table>
+</div>
+</div>
+</div>
+'''
+
+_SHELL_SCRIPT = r'''<script>
+var DATA_FILE = 'permit_data.json';
+var STATUS_BADGES = {
+  completed: ['✔ 已完成', 'badge-success'], in_progress: ['⏳ 部分對應', 'badge-info'],
+  not_uploaded: ['⬆ 待 AI 對應', 'badge-warning'], no_reports: ['── 無資料', 'badge-gray'],
+  completed_project: ['🏁 已結案', 'badge-gray'], error: ['✖ 異常', 'badge-danger']
+};
+var CLOUD_ICONS = {SharePoint: '📊', Dropbox: '📦', OneDrive: '☁️', MEGA: '🔷', pCloud: '🌩️', GoFile: '📁', ownCloud: '🔵', '短網址': '🔗'};
+var EMPTY = '<span class="empty-val">-</span>';
+var OVERSCAN = 20;
+
+var rows = [];        // 全部建案（物件，含衍生欄位）
+var view = [];        // 篩選 + 排序後的 rows index
+var searchIndex = []; // rows[i] 的搜尋字串（建照 / 名稱 / 狀態）
+var statusIndex = {}; // 狀態 → rows index
+var currentFilter = '';
+var sortCol = -1, sortDir = 1;
+var rowHeight = 0;
+var today = new Date(); today.setHours(0, 0, 0, 0);
+
+function esc(s) {
+  return s ? String(s).replace(/[&<>"']/g, function(c) {
+    return {'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#x27;'}[c];
+  }) : '';
+}
+function daysSince(raw) {
+  var parts = (raw || '').split('-');
+  if (parts.length !== 3) return null;
+  var d = new Date(parseInt(parts[0]), parseInt(parts[1]) - 1, parseInt(parts[2]));
+  return Math.floor((today - d) / 86400000);
+}
+function permitNo(permit) {
+  var y = /(\d{2,3})建字/.exec(permit), n = /第(\d+)號/.exec(permit);
+  return [y ? parseInt(y[1]) : 0, n ? parseInt(n[1]) : 0];
+}
+// htmlpreview.github.io 會把頁面放在自己的網域，資料改從 raw.githubusercontent.com 讀
+function dataUrl() {
+  var m = /^https:\/\/github\.com\/([^\/]+)\/([^\/]+)\/blob\/(.+)\/[^\/]*$/.exec(location.search.slice(1));
+  if (location.hostname === 'htmlpreview.github.io' && m) {
+    return 'https://raw.githubusercontent.com/' + m[1] + '/' + m[2] + '/' + m[3] + '/' + DATA_FILE;
+  }
+  return DATA_FILE;
+}
+
+function load(data) {
+  var cols = data.columns;
+  rows = data.rows.map(function(r) {
+    var o = {};
+    for (var i = 0; i < cols.length; i++) o[cols[i]] = r[i];
+    var no = permitNo(o.permit);
+    o.year = no[0]; o.num = no[1];
+    o.days = o.latest ? daysSince(o.latest) : null;
+    o.stale = o.days !== null && o.days > 30 && o.status !== 'no_reports';
+    o.coverage = o.drive_count > 0 && o.system_count > 0 ? Math.min(100, Math.floor(o.system_count / o.drive_count * 100)) : null;
+    return o;
+  });
+  // 預設排序：最近更新日期降序，同日依建照年份 / 號碼降序
+  rows.sort(function(a, b) {
+    if (a.latest !== b.latest) return a.latest < b.latest ? 1 : -1;
+    return (b.year - a.year) || (b.num - a.num) || (a.permit < b.permit ? -1 : 1);
+  });
+  rows.forEach(function(o, i) {
+    o.rank = i + 1;
+    searchIndex.push((o.permit + '\u0001' + o.name + '\u0001' + (STATUS_BADGES[o.status] || ['未知'])[0]).toLowerCase());
+    (statusIndex[o.status] = statusIndex[o.status] || []).push(i);
+  });
+  document.getElementById('generatedAt').textContent = data.generated_at +
+    (data.degraded ? '（⚠️ 資料不完整：' + data.degraded.join('、') + ' 抓取失敗）' : '');
+  renderSummary(data.non_google);
+  filterTable();
+}
+
+function renderSummary(nonGoogle) {
+  var counts = {total: rows.length, other_cloud: nonGoogle.length};
+  Object.keys(statusIndex).forEach(function(s) { counts[s] = statusIndex[s].length; });
+  document.querySelectorAll('[data-stat]').forEach(function(el) {
+    el.textContent = counts[el.getAttribute('data-stat')] || 0;
+  });
+
+  var alerts = rows.filter(function(o) { return o.alert_total > 0; });
+  var stale = rows.filter(function(o) { return o.stale; });
+  document.getElementById('attentionTitle').textContent =
+    alerts.length + ' 個工地有監測警戒，' + stale.length + ' 個工地報告超過 30 天未更新';
+  document.getElementById('alertCount').textContent = alerts.length;
+  document.getElementById('staleCount').textContent = stale.length;
+  document.getElementById('alertCards').innerHTML = alerts.length ? alerts.map(function(o) {
+    var parts = [];
+    if (o.warning_count > 0) parts.push('⚠️警戒值' + o.warning_count + '項');
+    if (o.danger_count > 0) parts.push('🔴行動值' + o.danger_count + '項');
+    var summary = parts.join(' ');
+    var detail = o.alert_details.length ? o.alert_details.join(' / ') : summary;
+    return '<div class="attention-card attention-card-alert"><div class="ac-permit">' + esc(o.permit) +
+      '</div><div class="ac-name">' + esc(o.name || '-') + '</div><div class="ac-summary">' + esc(summary) +
+      '</div><div class="ac-detail">' + esc(detail) + '</div><div class="ac-date">最近觸發: ' +
+      esc(o.latest_alert_date || '-') + '</div></div>';
+  }).join('') : '<span style="font-size:11px;color:#999">無</span>';
+  document.getElementById('staleRows').innerHTML = stale.length ? stale.map(function(o) {
+    return '<tr><td><strong>' + esc(o.permit) + '</strong></td><td>' + esc(o.name || '-') +
+      '</td><td><span class="days days-old">' + o.days + ' 天</span></td></tr>';
+  }).join('') : '<tr><td colspan="3" style="color:#999;font-size:11px;padding:6px">無</td></tr>';
+
+  var groups = {}, order = [];
+  nonGoogle.forEach(function(item) {
+    if (!groups[item[1]]) { groups[item[1]] = []; order.push(item[1]); }
+    groups[item[1]].push(item[0]);
+  });
+  order.sort(function(a, b) { return groups[b].length - groups[a].length; });
+  document.getElementById('cloudCards').innerHTML = order.map(function(cloud) {
+    var permits = groups[cloud];
+    var items = permits.slice(0, 20).map(function(p) { return '<li>' + esc(p) + '</li>'; }).join('');
+    if (permits.length > 20) items += '<li>...還有 ' + (permits.length - 20) + ' 個</li>';
+    return '<div class="cloud-card"><h4><span class="icon">' + (CLOUD_ICONS[cloud] || '🌐') + '</span> ' +
+      esc(cloud) + ' (' + permits.length + ')</h4><ul>' + items + '</ul></div>';
+  }).join('');
+}
+
+function rowHtml(o) {
+  var badge = STATUS_BADGES[o.status] || ['未知', 'badge-gray'];
+  var coverage = EMPTY;
+  if (o.coverage !== null) {
+    var color = o.coverage >= 80 ? '#22c55e' : o.coverage >= 50 ? '#f59e0b' : '#dc2626';
+    coverage = '<div class="progress-wrapper"><div class="progress-text">' + o.coverage + '%</div><div class="bar"><div class="bar-fill" style="width:' + o.coverage + '%;background:' + color + '"></div></div></div>';
+  }
+  var name = !o.name ? EMPTY : o.name.length > 25
+    ? '<span title="' + esc(o.name) + '">' + esc(o.name.slice(0, 25)) + '...</span>' : esc(o.name);
+  var alert = EMPTY;
+  if (o.alert_total > 0) {
+    var parts = [];
+    if (o.danger_count > 0) parts.push('🔴 行動值' + o.danger_count + '項');
+    if (o.warning_count > 0) parts.push('⚠️ 警戒值' + o.warning_count + '項');
+    var d = o.latest_alert_date.split('-');
+    var short = o.latest_alert_date ? (d.length === 3 && !isNaN(parseInt(d[1])) ? parseInt(d[1]) + '/' + parseInt(d[2]) : o.latest_alert_date) : '';
+    alert = '<span class="alert-merged" title="' + esc(o.alert_details.join(' / ')) + '">' + parts.join(' ') +
+      (short ? '<span class="alert-date">' + esc(short) + '</span>' : '') + '</span>';
+  }
+  var system = o.system_count > 0 ? o.system_count : o.drive_count === 0 ? EMPTY
+    : '<span class="empty-val" title="PDF 已在雲端，尚未對應到 AI 分析結果">-</span>';
+  var drive = o.folder_id ? '<a href="https://drive.google.com/drive/folders/' + esc(o.folder_id) +
+    '" target="_blank" title="開啟 Google Drive 資料夾">' + o.drive_count + ' ↗</a>' : o.drive_count;
+  var days = o.days === null ? EMPTY : '<span class="days' + (o.days > 30 ? ' days-old' : o.days <= 7 ? ' days-recent' : '') + '">' + o.days + ' 天</span>';
+  var cls = (o.alert_total > 0 ? 'row-alert' : '') + (o.stale ? ' row-stale' : '');
+  return '<tr class="' + cls + '"><td>' + o.rank + '</td><td><strong>' + esc(o.permit) + '</strong>' +
+    (o.url_status === '404' ? ' <span class="badge badge-danger" title="政府 PDF folder URL 已失效，需聯繫建管處更新 PDF">URL 失效</span>' : '') +
+    '</td><td class="name-cell">' + name + '</td><td>' +
+    (o.cloud === 'Google Drive' ? '' : '<span class="badge badge-orange">' + esc(o.cloud) + '</span>') +
+    '</td><td class="col-num">' + drive + '</td><td class="col-num">' + system + '</td><td>' + coverage +
+    '</td><td>' + alert + '</td><td>' + (o.latest || EMPTY) + '</td><td class="col-num">' + days +
+    '</td><td><span class="badge ' + badge[1] + '">' + esc(badge[0]) + '</span></td></tr>';
+}
+
+// 虛擬捲動：只渲染可視範圍（前後各多 OVERSCAN 列），其餘以上下兩列空白撐出高度
+function renderWindow() {
+  var wrap = document.getElementById('tableWrap');
+  var body = document.getElementById('tableBody');
+  if (!view.length) {
+    body.innerHTML = '<tr><td colspan="11" style="text-align:center;padding:40px;color:#9ca3af"><div style="font-size:24px;margin-bottom:8px">🔍</div>找不到符合條件的建案紀錄</td></tr>';
+    return;
+  }
+  var h = rowHeight || 49;
+  var visible = Math.ceil(wrap.clientHeight / h) || 20;
+  var start = Math.max(0, Math.floor(wrap.scrollTop / h) - OVERSCAN);
+  var end = Math.min(view.length, start + visible + OVERSCAN * 2);
+  var html = '<tr class="vspace"><td colspan="11" style="height:' + (start * h) + 'px"></td></tr>';
+  for (var i = start; i < end; i++) html += rowHtml(rows[view[i]]);
+  html += '<tr class="vspace"><td colspan="11" style="height:' + ((view.length - end) * h) + 'px"></td></tr>';
+  body.innerHTML = html;
+  if (!rowHeight && body.rows.length > 2) {
+    rowHeight = body.rows[1].getBoundingClientRect().height || 49;
+    renderWindow();
+  }
+}
+
+function filterTable() {
+  var search = document.getElementById('search').value.toLowerCase();
+  var candidates;
+  if (currentFilter && currentFilter !== 'other_cloud' && currentFilter !== 'needs_attention') {
+    candidates = statusIndex[currentFilter] || [];
+  } else {
+    candidates = rows.map(function(_, i) { return i; });
+  }
+  view = candidates.filter(function(i) {
+    var o = rows[i];
+    if (currentFilter === 'other_cloud' && o.cloud === 'Google Drive') return false;
+    if (currentFilter === 'needs_attention' && !(o.alert_total > 0 || o.stale)) return false;
+    return !search || searchIndex[i].indexOf(search) !== -1;
+  });
+  applySort();
+  document.getElementById('tableWrap').scrollTop = 0;
+  renderWindow();
+}
+function filterStatus(btn, status) {
+  currentFilter = status;
+  document.querySelectorAll('.filter-group .btn').forEach(function(b) { b.classList.remove('active'); b.setAttribute('aria-pressed', 'false'); });
+  btn.classList.add('active');
+  btn.setAttribute('aria-pressed', 'true');
+  filterTable();
+}
+
+var SORT_KEYS = [
+  function(o) { return o.rank; }, function(o) { return o.permit; }, function(o) { return o.name || null; },
+  function(o) { return o.cloud === 'Google Drive' ? null : o.cloud; }, function(o) { return o.drive_count; },
+  function(o) { return o.system_count || null; }, function(o) { return o.coverage; },
+  function(o) { return o.alert_total > 0 ? o.danger_count * 1000 + o.warning_count : null; },
+  function(o) { return o.latest || null; }, function(o) { return o.days; }, function(o) { return o.status; }
+];
+function applySort() {
+  if (sortCol < 0) { view.sort(function(a, b) { return a - b; }); return; }
+  var key = SORT_KEYS[sortCol];
+  view.sort(function(a, b) {
+    var x = key(rows[a]), y = key(rows[b]);
+    if (x === y) return a - b;
+    if (x === null) return 1;   // 空值永遠排最後
+    if (y === null) return -1;
+    if (typeof x === 'number' && typeof y === 'number') return (x - y) * sortDir;
+    return String(x).localeCompare(String(y), 'zh-TW') * sortDir;
+  });
+}
+function sortTable(n) {
+  var ths = document.querySelectorAll('#dataTable thead th');
+  sortDir = sortCol === n && sortDir === 1 ? -1 : 1;
+  sortCol = n;
+  ths.forEach(function(th) { th.classList.remove('sort-asc', 'sort-desc'); });
+  ths[n].classList.add(sortDir === 1 ? 'sort-asc' : 'sort-desc');
+  applySort();
+  renderWindow();
+}
+function toggleAttention() { document.getElementById('attentionSection').classList.toggle('open'); }
+function toggleLegend() { document.getElementById('legendSection').classList.toggle('open'); }
+
+(function() {
+  var ticking = false;
+  document.getElementById('tableWrap').addEventListener('scroll', function() {
+    if (ticking) return;
+    ticking = true;
+    requestAnimationFrame(function() { ticking = false; renderWindow(); });
+  });
+  var searchTimeout;
+  document.getElementById('search').addEventListener('input', function() {
+    clearTimeout(searchTimeout);
+    searchTimeout = setTimeout(filterTable, 150);
+  });
+  fetch(dataUrl(), {cache: 'no-cache'}).then(function(r) {
+    if (!r.ok) throw new Error('HTTP ' + r.status);
+    return r.json();
+  }).then(load).catch(function(e) {
+    document.getElementById('tableBody').innerHTML =
+      '<tr><td colspan="11" class="load-msg">無法載入 ' + DATA_FILE + '（' + esc(e.message) + '）。本機檢視請以 http 伺服器開啟，或改看 state/permit_tracking_report.html</td></tr>';
+  });
+})();
+</script>'''
+
+SHELL_HTML = '''<!DOCTYPE html>
+<html lang="zh-TW">
+<head>
+<meta charset="utf-8"/>
+<meta content="width=device-width, initial-scale=1.0" name="viewport"/>
+<title>建照監測追蹤報告</title>
+<style>
+''' + REPORT_CSS + _SHELL_CSS + '''</style>
+</head>
+''' + _SHELL_BODY + '\n' + _SHELL_SCRIPT + '''
+</body>
+</html>
+'''
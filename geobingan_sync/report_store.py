@@ -0,0 +1,222 @@
+"""
+construction-reports 本地快取（增量同步）
+
+match_permits（來源 5）與 generate_permit_tracking_report（fetch_api_reports）每次 run
+都把群組內全部報告重新翻頁下載一遍，每頁 100 筆循序抓——歷史越多越慢，
+而且兩個步驟各抓一次。
+
+本模組把報告存成 state/report_store/<group_id>.jsonl，只留實際用到的欄位
+（id, file_name, created_at, parse_status），另以 .meta.json 記錄同步游標：
+
+- 增量同步：以 ordering=-created_at 由新到舊翻頁，翻到比「上次游標 − 重疊視窗」
+  還舊的報告就停（重疊視窗吸收時鐘誤差與延遲寫入）。
+- 每 FULL_RESYNC_DAYS 天做一次完整重抓，收斂被刪除 / 被改名的報告。
+- API 若沒照 created_at 排序（回應順序不是由新到舊），自動改做完整同步。
+- 短時間內重複呼叫（同一 run 的兩個步驟）直接讀本地檔，不打 API。
+"""
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from geobingan_sync import REPO_ROOT
+
+REPORT_STORE_DIR = REPO_ROOT / 'state' / 'report_store'
+STORE_VERSION = 1
+# 每幾天做一次完整重抓（收斂刪除 / 改名）
+FULL_RESYNC_DAYS = 7
+# 增量同步往回重疊的時間（秒）
+OVERLAP_SECONDS = 2 * 24 * 3600
+# 上次同步在這個秒數內 → 直接沿用本地資料
+FRESH_SECONDS = 15 * 60
+
+# fetch_page(page, ordering) → 該頁 JSON（results / next / count）；失敗請 raise
+# 一般用 api_pagination.make_json_page_fetcher 產生
+PageFetcher = Callable[[int, str], dict]
+
+
+def _paths(group_id: str) -> Tuple[str, str]:
+    base = os.path.join(str(REPORT_STORE_DIR), str(group_id))
+    return f'{base}.jsonl', f'{base}.meta.json'
+
+
+def _parse_ts(value: str) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+
+
+def compact_report(report: dict) -> dict:
+    """只保留下游用到的欄位（檔名與狀態沿用原本兩個步驟的 fallback 規則）"""
+    return {
+        'id': report.get('id'),
+        'file_name': report.get('file_name', '') or report.get('original_filename', '') or '',
+        'created_at': report.get('created_at', '') or '',
+        'parse_status': report.get('parse_status', report.get('status', '')),
+    }
+
+
+def _key(rec: dict):
+    rid = rec.get('id')
+    return rid if rid is not None else (rec.get('file_name'), rec.get('created_at'))
+
+
+def _sort_key(rec: dict):
+    return rec.get('created_at') or '', str(rec.get('id'))
+
+
+def load_reports(group_id: str) -> List[dict]:
+    """讀取本地快取的報告（由新到舊）；沒有快取時回傳空 list"""
+    store_path, _ = _paths(group_id)
+    if not os.path.exists(store_path):
+        return []
+    reports = []
+    with open(store_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                try:
+                    reports.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue  # 半行（寫入中斷）→ 略過，下次完整同步會補回
+    return reports
+
+
+def _load_meta(meta_path: str) -> dict:
+    if os.path.exists(meta_path):
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta.get('version') == STORE_VERSION:
+                return meta
+        except (json.JSONDecodeError, IOError):
+            pass
+    return {}
+
+
+def _atomic_write_text(path: str, text: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f'{path}.tmp.{os.getpid()}'
+    try:
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp, path)
+    except Exception:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def _save(group_id: str, reports: Dict, meta: dict):
+    store_path, meta_path = _paths(group_id)
+    ordered = sorted(reports.values(), key=_sort_key, reverse=True)
+    _atomic_write_text(store_path, ''.join(json.dumps(r, ensure_ascii=False) + '\n' for r in ordered))
+    meta['count'] = len(ordered)
+    _atomic_write_text(meta_path, json.dumps(meta, ensure_ascii=False, indent=2))
+    return ordered
+
+
+def _is_descending(results: List[dict], prev_oldest: Optional[str]) -> bool:
+    stamps = [r.get('created_at') or '' for r in results]
+    if prev_oldest is not None and stamps and stamps[0] > prev_oldest:
+        return False
+    return all(a >= b for a, b in zip(stamps, stamps[1:]))
+
+
+def _fetch_all(fetch_page: PageFetcher) -> Dict:
+    """完整抓取（有 count 時並行翻頁）"""
+    from geobingan_sync.api_pagination import fetch_all_pages
+    reports = {}
+    for r in fetch_all_pages(lambda page: fetch_page(page, '-created_at')):
+        rec = compact_report(r)
+        reports[_key(rec)] = rec
+    return reports
+
+
+def _fetch_incremental(fetch_page: PageFetcher, existing: Dict, cutoff: str) -> Optional[Dict]:
+    """由新到舊翻頁直到越過 cutoff；API 未依 created_at 排序時回傳 None（改做完整同步）"""
+    reports = dict(existing)
+    page = 1
+    prev_oldest = None
+    while True:
+        data = fetch_page(page, '-created_at')
+        results = data.get('results') or []
+        has_next = bool(data.get('next'))
+        if not _is_descending(results, prev_oldest):
+            return None
+        for r in results:
+            rec = compact_report(r)
+            reports[_key(rec)] = rec
+        if not results or not has_next:
+            return reports
+        prev_oldest = results[-1].get('created_at') or ''
+        if prev_oldest and prev_oldest < cutoff:
+            return reports
+        page += 1
+
+
+def sync_reports(group_id: str, fetch_page: PageFetcher, *, full: bool = False,
+                 fresh_seconds: float = FRESH_SECONDS, now: datetime = None) -> List[dict]:
+    """同步並回傳群組內所有報告（compact 欄位，由新到舊）。
+
+    API 失敗時沿用本地快取（並保留游標，下次再補）；沒有快取才會回傳空 list。
+    """
+    now = now or datetime.now()
+    store_path, meta_path = _paths(group_id)
+    meta = _load_meta(meta_path)
+    existing = {_key(r): r for r in load_reports(group_id)} if meta else {}
+
+    last_sync = _parse_ts(meta.get('last_sync', ''))
+    if not full and existing and last_sync and (now - last_sync).total_seconds() < fresh_seconds:
+        print(f"  ♻️ 報告快取 {int((now - last_sync).total_seconds())}s 前剛同步，直接沿用（{len(existing)} 筆）")
+        return sorted(existing.values(), key=_sort_key, reverse=True)
+
+    last_full = _parse_ts(meta.get('last_full_sync', ''))
+    need_full = full or not existing or not last_full or now - last_full >= timedelta(days=FULL_RESYNC_DAYS)
+
+    start = time.time()
+    reports = None
+    mode = 'full'
+    try:
+        if not need_full:
+            cursor = _parse_ts(meta.get('cursor', ''))
+            cutoff = ''
+            if cursor:
+                cutoff = (cursor - timedelta(seconds=OVERLAP_SECONDS)).isoformat()
+            reports = _fetch_incremental(fetch_page, existing, cutoff)
+            mode = 'incremental'
+            if reports is None:
+                print("  ⚠️ API 回應未依 created_at 排序，改做完整同步")
+        if reports is None:
+            reports = _fetch_all(fetch_page)
+            mode = 'full'
+    except Exception as e:
+        if existing:
+            print(f"  ⚠️ 報告同步失敗，沿用本地快取（{len(existing)} 筆）: {e}")
+            return sorted(existing.values(), key=_sort_key, reverse=True)
+        print(f"  ❌ 報告同步失敗且無本地快取: {e}")
+        return []
+
+    added = len(set(reports) - set(existing))
+    newest = max((r.get('created_at') or '' for r in reports.values()), default='')
+    meta = {
+        'version': STORE_VERSION,
+        'group_id': str(group_id),
+        'cursor': newest or meta.get('cursor', ''),
+        'last_sync': now.isoformat(),
+        'last_full_sync': now.isoformat() if mode == 'full' else meta.get('last_full_sync', ''),
+    }
+    try:
+        ordered = _save(group_id, reports, meta)
+    except OSError as e:
+        print(f"  ⚠️ 報告快取寫入失敗（不影響本次結果）: {e}")
+        ordered = sorted(reports.values(), key=_sort_key, reverse=True)
+    label = '完整同步' if mode == 'full' else '增量同步'
+    print(f"  📦 報告快取{label}: {len(ordered)} 筆（新增 {added}，{time.time() - start:.1f}s）")
+    return ordered
@@ -0,0 +1,460 @@
+#!/usr/bin/env python3
+"""
+同步流程 orchestrator（單一 process）
+
+run_weekly_sync.sh 原本每個步驟、每段 inline `python3 -c` 都開一個新的 interpreter：
+每次重新 import googleapiclient / pypdf / requests、重讀金鑰、重建 Drive service、
+重讀同一批 state JSON。本模組在同一個 process 內依宣告的步驟 DAG 執行：
+
+- Drive credentials / service 與 HTTP session 經 geobingan_sync.clients 共用，
+  PermitTable、報告快取等 in-memory 快取也跨步驟沿用
+- 步驟以 Step 宣告：requires（依賴失敗或被跳過 → 本步驟跳過）與 after（只排順序）；
+  彼此獨立的步驟並行（例如快照 ‖ 追蹤報告）
+- 失敗語意與 shell 版相同：步驟 1 失敗跳過依賴同步資料的步驟、步驟 2 失敗跳過追蹤報告、
+  名稱比對 / 快照 / 週報失敗不影響同步結果
+- 同步 / 上傳數量沿用 shell 版的 log 樣式計數，結束時寫 sync_status 並發通知
+
+用法：
+  python3 -m geobingan_sync.run weekly              # 每日 / 週一同步（取代 run_weekly_sync.sh 的步驟鏈）
+  python3 -m geobingan_sync.run friday              # 週五總結週報
+  python3 -m geobingan_sync.run weekly --dry-run    # 只列出步驟與依賴
+  python3 -m geobingan_sync.run weekly --force      # 忽略步驟記憶（輸入未變也重跑，見 step_memo）
+  python3 -m geobingan_sync.run weekly --force match_permits tracking_report
+"""
+import argparse
+import io
+import os
+import re
+import shutil
+import subprocess
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from geobingan_sync import REPO_ROOT
+
+PAUSE_UPLOAD_FLAG = REPO_ROOT / '.pause_upload'
+REPORT_SITE_DIR = REPO_ROOT / 'state' / 'report_site'
+DOCS_DIR = REPO_ROOT / 'docs'
+PUBLISHED_FILES = ['docs/index.html', 'docs/permit_data.json', 'state/permit_tracking.csv',
+                   'state/upload_history_all.json', 'state/permit_registry.json']
+REPORT_URL = ('https://htmlpreview.github.io/?https://github.com/GeoThings/'
+              'geoBingAn-pdf-sync-tool/blob/main/docs/index.html')
+# Refresh Token 剩餘天數低於此值 → 警告（仍繼續執行）
+TOKEN_WARNING_DAYS = 2
+
+OK, FAILED, SKIPPED = 'ok', 'failed', 'skipped'
+
+
+class Step:
+    """流程中的一個步驟。
+
+    fn(ctx) 回傳值不使用；raise 或 SystemExit(非 0) 視為失敗，SystemExit(0 / None) 視為成功
+    （upload_pdfs 以 sys.exit(0) 表示「沒有要上傳的檔案」）。
+    error=(標籤, 訊息) 的步驟失敗時整次執行記為失敗；沒有 error 的步驟失敗只印 on_failure。
+    """
+
+    def __init__(self, name: str, fn: Callable[[dict], object], *, label: str = '',
+                 requires: Iterable[str] = (), after: Iterable[str] = (),
+                 error: Tuple[str, str] = None, on_failure: str = ''):
+        self.name = name
+        self.fn = fn
+        self.label = label or name
+        self.requires = tuple(requires)
+        self.after = tuple(after)
+        self.error = error
+        self.on_failure = on_failure
+
+
+class RunResult:
+    def __init__(self):
+        self.status: Dict[str, str] = {}
+        self.timings: Dict[str, float] = {}
+        self.error_message = ''
+
+    @property
+    def has_error(self) -> bool:
+        return bool(self.error_message)
+
+    def fail(self, tag: str, message: str):
+        """同 shell 版 handle_error：記錄最後一個錯誤"""
+        self.error_message = f'{tag}: {message}'
+        print(f"❌ 錯誤: {self.error_message}")
+
+
+def _call(step: Step, ctx: dict):
+    start = time.time()
+    try:
+        step.fn(ctx)
+        return OK, time.time() - start
+    except SystemExit as e:
+        return (OK if e.code in (0, None) else FAILED), time.time() - start
+    except KeyboardInterrupt:
+        raise
+    except BaseException:
+        traceback.print_exc(file=sys.stdout)
+        return FAILED, time.time() - start
+
+
+def run_steps(steps: List[Step], ctx: dict, result: RunResult = None, *,
+              max_workers: int = 2) -> RunResult:
+    """依 requires / after 執行步驟 DAG；依賴都結束（任何狀態）的步驟立即開跑。"""
+    result = result or RunResult()
+    by_name = {s.name: s for s in steps}
+    if len(by_name) != len(steps):
+        raise ValueError('Step name 重複')
+    for s in steps:
+        missing = [d for d in s.requires + s.after if d not in by_name]
+        if missing:
+            raise ValueError(f'{s.name} 依賴不存在的步驟: {missing}')
+
+    pending = dict(by_name)
+    running = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while pending or running:
+            progressed = True
+            while progressed:
+                progressed = False
+                for name in list(pending):
+                    step = pending[name]
+                    if not all(d in result.status for d in step.requires + step.after):
+                        continue
+                    del pending[name]
+                    progressed = True
+                    blocked = [d for d in step.requires if result.status[d] != OK]
+                    if blocked:
+                        result.status[name] = SKIPPED
+                        print(f"\n⚠️  {step.label}：跳過（依賴的 {', '.join(by_name[d].label for d in blocked)} 未成功）")
+                        continue
+                    print(f"\n{step.label}")
+                    print("-" * 40)
+                    running[pool.submit(_call, step, ctx)] = step
+            if not running:
+                if pending:
+                    raise ValueError(f'步驟依賴有循環: {sorted(pending)}')
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in done:
+                step = running.pop(fut)
+                status, seconds = fut.result()
+                result.status[step.name] = status
+                result.timings[step.name] = seconds
+                if status == FAILED:
+                    if step.error:
+                        result.fail(*step.error)
+                    elif step.on_failure:
+                        print(step.on_failure)
+    return result
+
+
+class _Tee(io.TextIOBase):
+    """stdout 同時寫到原本的輸出與記憶體（結束時以 shell 版的 log 樣式計數）"""
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._parts: List[str] = []
+        self._lock = threading.Lock()
+
+    def write(self, text):
+        with self._lock:
+            self._parts.append(text)
+        return self._stream.write(text)
+
+    def flush(self):
+        self._stream.flush()
+
+    def getvalue(self) -> str:
+        with self._lock:
+            return ''.join(self._parts)
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+def count_results(log_text: str) -> Tuple[int, int, int]:
+    """(同步數, 上傳成功數, 上傳失敗數)：與 run_weekly_sync.sh 的 grep 規則相同"""
+    synced = re.findall(r'新增 ([0-9]*) 個 PDF', log_text)
+    lines = log_text.splitlines()
+    uploaded = sum('報告上傳成功' in line for line in lines)
+    failed = sum('上傳失敗' in line for line in lines)
+    return (int(synced[-1] or 0) if synced else 0), uploaded, failed
+
+
+def check_refresh_token(token: str = None, now: float = None) -> Tuple[str, float]:
+    """Refresh Token 有效期：('EXPIRED' | 'WARNING' | 'OK', 天數)"""
+    from geobingan_sync.jwt_auth import decode_jwt_payload
+    if token is None:
+        from geobingan_sync.config import REFRESH_TOKEN as token
+    exp = decode_jwt_payload(token).get('exp', 0)
+    days_left = (exp - (now if now is not None else time.time())) / 86400
+    if days_left < 0:
+        return 'EXPIRED', -days_left
+    if days_left < TOKEN_WARNING_DAYS:
+        return 'WARNING', days_left
+    return 'OK', days_left
+
+
+# ── 步驟 ──
+
+def _city_argv(ctx: dict) -> List[str]:
+    return ['--city', ctx['city']] if ctx.get('city') else []
+
+
+def step_sync_permits(ctx):
+    from geobingan_sync.steps import sync_permits
+    sync_permits.cli(_city_argv(ctx))
+
+
+def step_upload(ctx):
+    # .pause_upload 旗標檔暫停上傳（例如後端 AI 停用期間）；其餘步驟照常執行
+    if os.path.exists(PAUSE_UPLOAD_FLAG):
+        print("⏸️  上傳已暫停（偵測到 .pause_upload 旗標，恢復：rm .pause_upload）")
+        try:
+            with open(PAUSE_UPLOAD_FLAG, 'r', encoding='utf-8') as f:
+                for line in f:
+                    print(f"   {line.rstrip()}")
+        except OSError:
+            pass
+        return
+    from geobingan_sync.steps import upload_pdfs
+    upload_pdfs.cli(_city_argv(ctx))
+
+
+def step_match_permits(ctx):
+    from geobingan_sync.steps import match_permits
+    match_permits.cli(_city_argv(ctx))
+
+
+def step_snapshot_table(ctx):
+    """快照要記錄的是追蹤報告改寫 mapping 之前的狀態（與 shell 版的先後順序一致）：
+    先載入建案表，追蹤報告才開跑。"""
+    from geobingan_sync.permit_table import load_table
+    from geobingan_sync.steps import weekly_snapshot
+    state_dir = weekly_snapshot.STATE_DIR
+    ctx['snapshot_table'] = load_table(f'{state_dir}/permit_system_mapping.json',
+                                       f'{state_dir}/permit_registry.json')
+
+
+def step_snapshot(ctx):
+    from geobingan_sync.steps import weekly_snapshot
+    weekly_snapshot.main(['--notify'], table=ctx.get('snapshot_table'))
+
+
+def step_tracking_report(ctx):
+    from geobingan_sync.steps import generate_permit_tracking_report
+    generate_permit_tracking_report.cli(_city_argv(ctx))
+
+
+def _git(*args) -> subprocess.CompletedProcess:
+    proc = subprocess.run(['git', *args], cwd=REPO_ROOT, capture_output=True, text=True)
+    for text in (proc.stdout, proc.stderr):
+        if text:
+            print(text, end='' if text.endswith('\n') else '\n')
+    return proc
+
+
+def step_publish(ctx):
+    """複製線上版報告到 docs/，有變更時 commit + push"""
+    result: RunResult = ctx['result']
+    index, data = REPORT_SITE_DIR / 'index.html', REPORT_SITE_DIR / 'permit_data.json'
+    if index.exists() and data.exists():
+        try:
+            shutil.copy(index, DOCS_DIR / 'index.html')
+            shutil.copy(data, DOCS_DIR / 'permit_data.json')
+            print("✅ 已複製報告到 docs/index.html + docs/permit_data.json")
+        except OSError:
+            result.fail('步驟4', '複製報告失敗')
+    else:
+        print("⚠️ 找不到報告檔案，跳過複製")
+
+    _git('add', *PUBLISHED_FILES)
+    if _git('diff', '--cached', '--quiet').returncode == 0:
+        print("ℹ️  無任何變更，跳過推送")
+        return
+    label = 'Weekly sync' if ctx['weekday'] == 1 else 'Daily sync'
+    if _git('commit', '-m', f"{label} report update ({datetime.now():%Y-%m-%d})").returncode != 0:
+        result.fail('步驟4', 'Git commit 失敗')
+    elif _git('push', 'origin', 'main').returncode != 0:
+        result.fail('步驟4', '推送到 GitHub 失敗')
+    else:
+        print("✅ 已推送到 GitHub")
+        print(f"🔗 線上報告: {REPORT_URL}")
+
+
+def step_weekly_report(ctx):
+    # 週二-週日跳過，避免 ClickUp 每天都有重複附件（週五另有 summary 週報）
+    if ctx['weekday'] != 1:
+        print("ℹ️  跳過 sync 週報 PDF（非週一、避免每日重複附件）")
+        return
+    from geobingan_sync.steps import generate_weekly_report
+    generate_weekly_report.main(['--type', 'sync', '--upload'])
+    print("✅ 週報已上傳到 ClickUp")
+
+
+def weekly_steps() -> List[Step]:
+    return [
+        Step('sync_permits', step_sync_permits, label='📥 步驟 1/5: 同步 PDF 從台北市政府網站...',
+             error=('步驟1', '同步 PDF 失敗')),
+        Step('upload', step_upload, label='📤 步驟 2/5: 上傳最近 7 天的 PDF 到 Backend...',
+             requires=['sync_permits'], error=('步驟2', '上傳 PDF 失敗')),
+        Step('match_permits', step_match_permits, label='🔍 步驟 2.5: 建案名稱交叉比對...',
+             requires=['sync_permits'], after=['upload'],
+             on_failure='⚠️  名稱比對失敗，使用現有 registry 繼續'),
+        Step('snapshot_table', step_snapshot_table, label='📋 載入快照用建案表...',
+             requires=['sync_permits'], after=['match_permits']),
+        Step('snapshot', step_snapshot, label='📸 儲存快照 + 偵測新建案...',
+             requires=['snapshot_table']),
+        Step('tracking_report', step_tracking_report, label='📊 步驟 3/5: 生成建照監測追蹤報告...',
+             requires=['sync_permits', 'upload'], after=['match_permits', 'snapshot_table'],
+             error=('步驟3', '生成報告失敗')),
+        Step('publish', step_publish, label='🌐 步驟 4/5: 更新線上報告到 GitHub...',
+             after=['snapshot', 'tracking_report']),
+        Step('weekly_report', step_weekly_report, label='📄 步驟 5/5: sync 週報 PDF（週一例行）...',
+             after=['publish'], on_failure='⚠️  週報產生或上傳失敗（不影響同步結果）'),
+    ]
+
+
+def run_weekly(city: str = None, max_workers: int = 2) -> int:
+    start = time.time()
+    tee = _Tee(sys.stdout)
+    sys.stdout = tee
+    result = RunResult()
+    try:
+        print("=" * 40)
+        print(f"🚀 開始執行週期同步 - {datetime.now():%Y-%m-%d %H:%M:%S}")
+        print("=" * 40)
+        try:
+            from geobingan_sync.sync_status import SyncStatus
+            SyncStatus().start_run()
+        except Exception as e:
+            print(f"⚠️  無法記錄開始時間: {e}")
+
+        print("\n🔑 檢查 Token 有效期...")
+        if _check_token(result):
+            print()
+            try:
+                from geobingan_sync.steps import network_ready
+                network_ready.main()
+            except Exception as e:
+                print(f"⚠️  網路就緒檢查失敗: {e}")
+
+            # 各步驟共用同一個 TokenManager：先啟動背景刷新，token 快過期前就換好
+            from geobingan_sync import token_manager
+            token_manager.get_manager()
+
+            ctx = {'city': city, 'weekday': datetime.now().isoweekday(), 'result': result}
+            run_steps(weekly_steps(), ctx, result, max_workers=max_workers)
+    except Exception as e:
+        traceback.print_exc(file=sys.stdout)
+        if not result.has_error:
+            result.fail('未預期的錯誤', str(e))
+    finally:
+        sys.stdout = tee._stream
+
+    synced, uploaded, failed = count_results(tee.getvalue())
+    duration = int(time.time() - start)
+    status = 'failure' if result.has_error else 'success'
+    print("\n📝 記錄執行結果...")
+    try:
+        from geobingan_sync.steps.record_sync_result import record_result
+        record_result(status, synced, uploaded, failed, duration, result.error_message)
+    except Exception as e:
+        print(f"⚠️  記錄執行結果失敗: {e}")
+
+    print("\n" + "=" * 40)
+    if result.has_error:
+        print(f"⚠️ 週期同步執行完成（有錯誤） - {datetime.now():%Y-%m-%d %H:%M:%S}")
+        print(f"錯誤訊息: {result.error_message}")
+    else:
+        print(f"✅ 週期同步執行完成 - {datetime.now():%Y-%m-%d %H:%M:%S}")
+    print(f"執行時間: {duration / 60:.1f} 分鐘")
+    for name, seconds in sorted(result.timings.items(), key=lambda kv: -kv[1]):
+        print(f"    {name}: {seconds:.1f}s（{result.status[name]}）")
+    print("=" * 40)
+    return 1 if result.has_error else 0
+
+
+def _check_token(result: RunResult) -> bool:
+    """Refresh Token 檢查；已過期時通知並回傳 False（中止本次執行）"""
+    try:
+        state, days = check_refresh_token()
+    except Exception as e:
+        print(f"⚠️  無法檢查 Refresh Token 有效期: {e}")
+        return True
+    if state == 'EXPIRED':
+        print(f"❌ Refresh Token 已過期 {days:.1f} 天，請登入 riskmap.today 更新")
+        _notify('❌ geoBingAn Token 已過期', 'Refresh Token 已過期，請登入 riskmap.today 取得新 Token 並更新 .env')
+        result.fail('Token 檢查', 'Refresh Token 已過期')
+        return False
+    if state == 'WARNING':
+        print(f"⚠️  Refresh Token 將在 {days:.1f} 天後過期，請儘快更新")
+        _notify('⚠️ geoBingAn Token 即將過期',
+                f'Refresh Token 將在 {days:.1f} 天後過期，請登入 riskmap.today 更新 .env 中的 Token')
+        print("   繼續執行同步流程...")
+    else:
+        print(f"✅ Refresh Token 有效期剩餘 {days:.1f} 天")
+    return True
+
+
+def _notify(title: str, message: str):
+    try:
+        from geobingan_sync.notify import send_notification
+        send_notification(title, message)
+    except Exception as e:
+        print(f"  通知發送失敗: {e}")
+
+
+def run_friday() -> int:
+    print("=" * 40)
+    print(f"📊 週五總結週報 - {datetime.now():%Y-%m-%d %H:%M:%S}")
+    print("=" * 40)
+    result = run_steps([Step('summary_report', lambda ctx: _summary_report(), label='📄 產生總結週報...')], {})
+    if result.status['summary_report'] == OK:
+        print("\n✅ 總結週報已產生並上傳到 ClickUp")
+        return 0
+    print("\n❌ 週報產生失敗")
+    return 1
+
+
+def _summary_report():
+    from geobingan_sync.steps import generate_weekly_report
+    generate_weekly_report.main(['--type', 'summary', '--upload'])
+
+
+def print_plan(steps: List[Step]):
+    for step in steps:
+        deps = []
+        if step.requires:
+            deps.append(f"requires {', '.join(step.requires)}")
+        if step.after:
+            deps.append(f"after {', '.join(step.after)}")
+        print(f"  {step.name}" + (f"（{'；'.join(deps)}）" if deps else ''))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='geoBingAn 同步流程（單一 process）')
+    parser.add_argument('pipeline', choices=['weekly', 'friday'])
+    parser.add_argument('--city', default=None, help='City ID or "all"')
+    parser.add_argument('--max-workers', type=int, default=2, help='並行步驟數上限')
+    parser.add_argument('--dry-run', action='store_true', help='只列出步驟與依賴')
+    parser.add_argument('--force', nargs='*', metavar='STEP', default=None,
+                        help='忽略步驟記憶重跑（不指定 STEP = 全部）')
+    args = parser.parse_args(argv)
+    if args.force is not None:
+        from geobingan_sync import step_memo
+        step_memo.set_force(args.force or None)
+
+    if args.dry_run:
+        print_plan(weekly_steps() if args.pipeline == 'weekly' else [Step('summary_report', None)])
+        return 0
+    if args.pipeline == 'friday':
+        return run_friday()
+    return run_weekly(city=args.city, max_workers=args.max_workers)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,286 @@
+"""
+週報快照時間序列（append-only，建照清單以 delta 儲存）
+
+weekly_snapshot.save_snapshot 原本每天寫一份完整 JSON（含整份排序過的 permits 清單），
+get_previous_snapshot 每次 glob + 排序整個目錄再逐檔讀；要看多週趨勢就得讀完所有檔案，
+目錄也每天多一份幾乎相同的檔案。
+
+SnapshotSeries 把快照存成 weekly_snapshots/series.jsonl 的一列一筆：
+- 純量指標（metrics）與狀態分布（statuses）每筆都存（指標列）
+- 建照清單只存與前一筆的差異（added / removed）；每 KEYFRAME_EVERY 筆另存一份完整
+  清單（keyframe），重建任一筆最多只需讀 keyframe 之後的幾筆
+- series.idx.json 記錄每筆的 (日期, byte offset, 長度, 是否 keyframe)：
+  查詢以 bisect 找到需要的列後直接 seek 讀取，不碰範圍外的紀錄
+
+同一天重複儲存時追加一筆新紀錄，查詢以當天最後一筆為準。
+寫入順序為「資料列 append → 索引 atomic 重寫」：索引落後（中途中斷）時開檔會補掃尾端，
+寫到一半的殘列會被截掉。舊版的每日 {date}.json 會在第一次開檔時匯入並刪除。
+"""
+import json
+import os
+import re
+from bisect import bisect_left, bisect_right
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from geobingan_sync import REPO_ROOT
+
+SERIES_DIR = REPO_ROOT / 'state' / 'weekly_snapshots'
+SERIES_FILE = 'series.jsonl'
+INDEX_FILE = 'series.idx.json'
+SERIES_VERSION = 1
+# 每幾筆存一份完整建照清單
+KEYFRAME_EVERY = 28
+
+_LEGACY_NAME = re.compile(r'\d{4}-\d{2}-\d{2}')
+# 索引欄位
+_E_DATE, _E_OFFSET, _E_LENGTH, _E_KEYFRAME = range(4)
+
+
+def _atomic_write_json(path: str, data):
+    tmp = f'{path}.tmp.{os.getpid()}'
+    try:
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp, path)
+    except Exception:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def split_snapshot(snapshot: dict) -> Tuple[str, Dict[str, int], Dict[str, int], List[str]]:
+    """快照 dict → (日期, 純量指標, 狀態分布, 建照清單)"""
+    metrics = {k: v for k, v in snapshot.items() if k not in ('date', 'statuses', 'permits')}
+    return snapshot['date'], metrics, dict(snapshot.get('statuses') or {}), list(snapshot.get('permits') or [])
+
+
+def apply_changes(added: Set[str], removed: Set[str], record: dict):
+    """把一筆紀錄的 delta 疊到累計的 (added, removed) 上（就地修改）"""
+    for p in record.get('added', ()):
+        if p in removed:
+            removed.discard(p)
+        else:
+            added.add(p)
+    for p in record.get('removed', ()):
+        if p in added:
+            added.discard(p)
+        else:
+            removed.add(p)
+
+
+class SnapshotSeries:
+    """一個快照目錄的時間序列（資料檔 + 索引）"""
+
+    def __init__(self, directory=None):
+        self.directory = str(directory or SERIES_DIR)
+        self.data_path = os.path.join(self.directory, SERIES_FILE)
+        self.index_path = os.path.join(self.directory, INDEX_FILE)
+        self.entries: List[list] = []
+        self.dates: List[str] = []
+        self._latest_permits: Optional[List[str]] = None
+        self._load_index()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    # ── 索引 ──
+
+    def _load_index(self):
+        size = os.path.getsize(self.data_path) if os.path.exists(self.data_path) else 0
+        indexed = 0
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get('version') == SERIES_VERSION and data.get('size', 0) <= size:
+                    self.entries = data['entries']
+                    indexed = data['size']
+            except (json.JSONDecodeError, IOError, KeyError, TypeError):
+                self.entries = []
+        if indexed < size:
+            self._scan_tail(indexed)
+        self.dates = [e[_E_DATE] for e in self.entries]
+
+    def _scan_tail(self, offset: int):
+        """索引之後的資料列補進索引；結尾不完整的殘列截掉"""
+        good = offset
+        with open(self.data_path, 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                self.entries.append([record['date'], good, len(line), 'permits' in record])
+                good += len(line)
+        if good < os.path.getsize(self.data_path):
+            print(f"  ⚠️ 快照序列結尾有不完整的紀錄，已截除（{self.data_path}）")
+            with open(self.data_path, 'r+b') as f:
+                f.truncate(good)
+        self._save_index()
+
+    def _save_index(self):
+        os.makedirs(self.directory, exist_ok=True)
+        size = self.entries[-1][_E_OFFSET] + self.entries[-1][_E_LENGTH] if self.entries else 0
+        _atomic_write_json(self.index_path, {'version': SERIES_VERSION, 'size': size, 'entries': self.entries})
+
+    # ── 讀取 ──
+
+    def read(self, i: int) -> dict:
+        """第 i 筆紀錄（只 seek 讀這一列）"""
+        entry = self.entries[i]
+        with open(self.data_path, 'rb') as f:
+            f.seek(entry[_E_OFFSET])
+            return json.loads(f.read(entry[_E_LENGTH]))
+
+    def position(self, day: str) -> Optional[int]:
+        """日期 ≤ day 的最後一筆（同一天多筆取最後一筆）；沒有則 None"""
+        i = bisect_right(self.dates, day) - 1
+        return i if i >= 0 else None
+
+    def permits_at(self, i: int) -> List[str]:
+        """第 i 筆的完整建照清單：最近的 keyframe + 之後的 delta"""
+        k = i
+        while not self.entries[k][_E_KEYFRAME]:
+            k -= 1
+        permits = set(self.read(k)['permits'])
+        for j in range(k + 1, i + 1):
+            record = self.read(j)
+            permits.difference_update(record.get('removed', ()))
+            permits.update(record.get('added', ()))
+        return sorted(permits)
+
+    def snapshot_at(self, i: int) -> dict:
+        """第 i 筆還原成 save_snapshot 的快照格式"""
+        record = self.read(i)
+        snapshot = {'date': record['date']}
+        snapshot.update(record['metrics'])
+        snapshot['statuses'] = record['statuses']
+        snapshot['permits'] = self.permits_at(i)
+        return snapshot
+
+    def snapshot_before(self, day: str) -> Optional[dict]:
+        """日期早於 day 的最近一份快照（完整格式）"""
+        i = bisect_left(self.dates, day) - 1
+        return self.snapshot_at(i) if i >= 0 else None
+
+    def changes_between(self, start: str, end: str):
+        """start 與 end 兩個日期（各取當天或之前最後一筆）之間的差異。
+
+        回傳 (起點指標, 終點指標, 新增建照, 移除建照)；只讀兩端點之間的 delta 列，
+        不重建完整清單。任一端點之前沒有紀錄時回傳 None。
+        """
+        i, j = self.position(start), self.position(end)
+        if i is None or j is None:
+            return None
+        lo, hi = min(i, j), max(i, j)
+        added: Set[str] = set()
+        removed: Set[str] = set()
+        for k in range(lo + 1, hi + 1):
+            apply_changes(added, removed, self.read(k))
+        if i > j:
+            added, removed = removed, added
+        before, after = self.read(i), self.read(j)
+        return (dict(before['metrics'], date=before['date']), dict(after['metrics'], date=after['date']),
+                sorted(added), sorted(removed))
+
+    def metric_series(self, name: str, weeks: int, end: str = None) -> List[Tuple[str, int]]:
+        """最近 weeks 週每週最後一筆的指標值（由舊到新，沒有紀錄的週略過）。
+
+        name 為純量指標（如 total_pdfs）或 'status:<狀態>'。每週只讀一列。
+        """
+        end_day = date.fromisoformat(end) if end else date.today()
+        series = []
+        for w in range(weeks - 1, -1, -1):
+            upper = (end_day - timedelta(days=7 * w)).isoformat()
+            lower = (end_day - timedelta(days=7 * (w + 1))).isoformat()
+            i = self.position(upper)
+            if i is None or self.dates[i] <= lower:
+                continue
+            record = self.read(i)
+            if name.startswith('status:'):
+                value = record['statuses'].get(name[len('status:'):], 0)
+            else:
+                value = record['metrics'].get(name)
+            if value is not None:  # 舊快照沒有這個指標 → 略過
+                series.append((record['date'], value))
+        return series
+
+    # ── 寫入 ──
+
+    def _current_permits(self) -> List[str]:
+        if self._latest_permits is None:
+            self._latest_permits = self.permits_at(len(self.entries) - 1) if self.entries else []
+        return self._latest_permits
+
+    def append(self, snapshot: dict):
+        """追加一份快照（與前一筆比對出 delta；每 KEYFRAME_EVERY 筆存完整清單）"""
+        day, metrics, statuses, permits = split_snapshot(snapshot)
+        if self.dates and day < self.dates[-1]:
+            raise ValueError(f'快照日期 {day} 早於序列最後一筆 {self.dates[-1]}')
+        previous = set(self._current_permits())
+        current = set(permits)
+        record = {
+            'date': day,
+            'metrics': metrics,
+            'statuses': statuses,
+            'added': sorted(current - previous),
+            'removed': sorted(previous - current),
+        }
+        since_keyframe = 0
+        for entry in reversed(self.entries):
+            if entry[_E_KEYFRAME]:
+                break
+            since_keyframe += 1
+        if not self.entries or since_keyframe + 1 >= KEYFRAME_EVERY:
+            record['permits'] = sorted(current)
+
+        line = (json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.data_path, 'ab') as f:
+            offset = f.tell()
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        self.entries.append([day, offset, len(line), 'permits' in record])
+        self.dates.append(day)
+        self._latest_permits = sorted(current)
+        self._save_index()
+
+    def import_legacy(self) -> int:
+        """匯入舊版每日 {date}.json（只收比序列最後一筆新的），驗證可還原後刪除原檔"""
+        files = sorted(p for p in Path(self.directory).glob('*.json') if _LEGACY_NAME.fullmatch(p.stem))
+        last = self.dates[-1] if self.dates else ''
+        imported = 0
+        for path in files:
+            if path.stem <= last:
+                continue
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    snapshot = json.load(f)
+            except (json.JSONDecodeError, IOError):
+                continue
+            snapshot.setdefault('date', path.stem)
+            self.append(snapshot)
+            expected = dict(snapshot, statuses=snapshot.get('statuses') or {},
+                            permits=sorted(snapshot.get('permits') or []))
+            if self.snapshot_at(len(self.entries) - 1) == expected:
+                path.unlink()
+            imported += 1
+        if imported:
+            print(f"  📚 已將 {imported} 份舊版每日快照匯入時間序列: {self.data_path}")
+        return imported
+
+
+def open_series(directory=None) -> SnapshotSeries:
+    """開啟快照序列；目錄內有舊版每日快照時先匯入"""
+    series = SnapshotSeries(directory)
+    if os.path.isdir(series.directory):
+        series.import_legacy()
+    return series
@@ -0,0 +1,209 @@
+"""
+步驟輸入指紋與記憶（內容定址的增量執行）
+
+多數日子裡步驟的輸入根本沒變：match_permits 抓回來的六個來源與上次相同，
+卻照樣重跑整套交叉比對、重寫 registry；追蹤報告以同一份資料重新渲染 HTML / CSV / 線上版；
+同一天重跑週報會再上傳一份一模一樣的 PDF 到 ClickUp。
+
+每個可記憶的（子）步驟宣告自己的輸入，組成 Fingerprint：
+- file(path)：檔案內容的 sha256（同一 process 內以 (mtime, size) 快取，不重讀）
+- data(obj)：API 快照等記憶體資料（JSON 正規化後雜湊）
+- code(module)：產生輸出的程式碼版本（模組原始碼雜湊；改了程式就會重跑）
+
+state/step_memo.json 記錄每個名稱上次「成功」時的指紋與輸出檔雜湊。
+is_fresh(name, fingerprint) 在指紋相同、且輸出檔仍與當時寫出的內容一致
+（沒被刪除或被別的程式改寫）時成立，呼叫端即可跳過該段工作——類似 Make，
+但以內容而非時間戳判斷。
+
+--force（或環境變數 GEOBINGAN_FORCE=1 / 逗號分隔的名稱前綴）無條件重跑。
+記憶檔損壞或不存在 → 一律視為需要重跑（最差情況就是原本的行為）。
+"""
+import hashlib
+import importlib.util
+import json
+import os
+import sys
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+from geobingan_sync import REPO_ROOT
+
+MEMO_FILE = REPO_ROOT / 'state' / 'step_memo.json'
+MEMO_VERSION = 1
+
+_lock = threading.Lock()
+# path → ((mtime_ns, size), sha256)
+_file_digests: Dict[str, Tuple[tuple, str]] = {}
+_force: Optional[set] = None  # None = 未強制；空 set = 全部強制
+
+
+def file_digest(path) -> Optional[str]:
+    """檔案內容 sha256；檔案不存在回傳 None"""
+    path = str(path)
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    key = (st.st_mtime_ns, st.st_size)
+    with _lock:
+        cached = _file_digests.get(path)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    digest = h.hexdigest()
+    with _lock:
+        _file_digests[path] = (key, digest)
+    return digest
+
+
+class Fingerprint:
+    """依序累加輸入的雜湊；同樣的輸入（含順序）得到同樣的 hexdigest。"""
+
+    def __init__(self, name: str = ''):
+        self._h = hashlib.sha256(name.encode('utf-8'))
+
+    def _part(self, tag: str, value: str) -> 'Fingerprint':
+        self._h.update(f'\x00{tag}\x00{value}'.encode('utf-8'))
+        return self
+
+    def file(self, path) -> 'Fingerprint':
+        return self._part('file', f'{path}={file_digest(path)}')
+
+    def files(self, paths: Iterable) -> 'Fingerprint':
+        for path in paths:
+            self.file(path)
+        return self
+
+    def data(self, obj) -> 'Fingerprint':
+        text = json.dumps(obj, sort_keys=True, ensure_ascii=False, default=_json_default)
+        return self._part('data', hashlib.sha256(text.encode('utf-8')).hexdigest())
+
+    def code(self, *modules: str) -> 'Fingerprint':
+        """模組原始碼。請傳完整模組名稱而不是 __name__：`python -m` 執行時 __name__ 是
+        '__main__'，與 run.py 內呼叫時的指紋會不同；尚未 import 的模組以 find_spec 定位檔案。"""
+        for name in modules:
+            path = getattr(sys.modules.get(name), '__file__', None)
+            if path is None:
+                try:
+                    spec = importlib.util.find_spec(name)
+                except (ImportError, ValueError):
+                    spec = None
+                path = spec.origin if spec is not None and spec.has_location else None
+            self._part('code', f'{name}={file_digest(path) if path else None}')
+        return self
+
+    def hexdigest(self) -> str:
+        return self._h.hexdigest()
+
+
+def _json_default(obj):
+    if isinstance(obj, (set, frozenset)):
+        return sorted(obj, key=str)
+    if isinstance(obj, tuple):
+        return list(obj)
+    to_dict = getattr(obj, 'to_dict', None)
+    if callable(to_dict):
+        return to_dict()
+    return str(obj)
+
+
+# ── 強制重跑 ──
+
+def set_force(names: Iterable[str] = None):
+    """names=None → 全部強制重跑；否則只強制名稱（或名稱前綴）在 names 內的項目"""
+    global _force
+    _force = set() if names is None else set(names)
+
+
+def forced(name: str) -> bool:
+    env = os.environ.get('GEOBINGAN_FORCE', '').strip()
+    if env:
+        if env.lower() in ('1', 'true', 'all'):
+            return True
+        if _matches(name, env.split(',')):
+            return True
+    if _force is None:
+        return False
+    return not _force or _matches(name, _force)
+
+
+def _matches(name: str, prefixes: Iterable[str]) -> bool:
+    return any(name == p or name.startswith(f'{p}.') for p in map(str.strip, prefixes) if p)
+
+
+# ── 記憶檔 ──
+
+def _load() -> dict:
+    try:
+        with open(MEMO_FILE, 'r', encoding='utf-8') as f:
+            memo = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+    if not isinstance(memo, dict) or memo.get('version') != MEMO_VERSION:
+        return {}
+    return memo
+
+
+def _save(memo: dict):
+    path = str(MEMO_FILE)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f'{path}.tmp.{os.getpid()}'
+    try:
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(memo, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
+    except Exception:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def is_fresh(name: str, fingerprint: str, *, verbose: bool = True) -> bool:
+    """上次成功的指紋相同且輸出檔未被更動 → True（呼叫端可跳過）"""
+    if forced(name):
+        return False
+    with _lock:
+        entry = _load().get('steps', {}).get(name)
+    if not entry or entry.get('fingerprint') != fingerprint:
+        return False
+    for path, digest in (entry.get('outputs') or {}).items():
+        if file_digest(path) != digest:
+            return False
+    if verbose:
+        print(f"  ♻️ {name}: 輸入未變更（{fingerprint[:10]}，{entry.get('completed_at', '')[:16]}），跳過")
+    return True
+
+
+def record(name: str, fingerprint: str, outputs: Iterable = ()):
+    """記錄成功執行的指紋與輸出檔雜湊（寫入失敗只警告：下次重跑而已）"""
+    out = {str(p): file_digest(p) for p in outputs}
+    try:
+        with _lock:
+            memo = _load() or {'version': MEMO_VERSION, 'steps': {}}
+            memo.setdefault('steps', {})[name] = {
+                'fingerprint': fingerprint,
+                'outputs': out,
+                'completed_at': datetime.now().isoformat(timespec='seconds'),
+            }
+            _save(memo)
+    except OSError as e:
+        print(f"  ⚠️ 步驟記憶寫入失敗（下次會重跑）: {e}")
+
+
+def forget(name: str = None):
+    """清除某個名稱（或全部）的記憶"""
+    with _lock:
+        memo = _load()
+        if not memo:
+            return
+        if name is None:
+            memo['steps'] = {}
+        else:
+            memo.get('steps', {}).pop(name, None)
+        _save(memo)
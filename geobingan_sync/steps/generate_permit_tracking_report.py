@@ -15,37 +15,29 @@ import os
 import re
 import sys
 import time
-import requests
 
-_session = requests.Session()
-import urllib3
+from geobingan_sync import clients
+
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
-import pypdf
-from geobingan_sync.jwt_auth import get_valid_token as _jwt_get_valid_token
+from geobingan_sync import token_manager
 from geobingan_sync.permit_utils import extract_name_from_filename
-from geobingan_sync.report_template import generate_html_report, generate_csv_report
+from geobingan_sync.permit_table import PermitTable
+from geobingan_sync.report_template import write_reports
+from geobingan_sync.report_site import write_report_site
 
-import warnings
 
 # 匯入配置
 try:
     from geobingan_sync.config import (
-        JWT_TOKEN,
         USER_EMAIL,
         GROUP_ID,
-        REFRESH_TOKEN,
-        GEOBINGAN_REFRESH_URL
     )
     try:
         from geobingan_sync.config import SHARED_DRIVE_ID
     except ImportError:
         SHARED_DRIVE_ID = os.environ.get('SHARED_DRIVE_ID', '0AIvp1h-6BZ1oUk9PVA')
-    print(f"✅ 已載入認證配置（用戶: {USER_EMAIL}）")
 except ImportError as e:
     print("❌ 找不到 config.py 或缺少必要設定")
     sys.exit(1)
@@ -66,40 +58,22 @@ GEOBINGAN_API_BASE = 'https://riskmap.today/api/reports/construction-reports/'
 STATE_DIR = './state'
 OUTPUT_HTML = f'{STATE_DIR}/permit_tracking_report.html'
 OUTPUT_CSV = f'{STATE_DIR}/permit_tracking.csv'
+# 線上版（docs/）：靜態 shell + 資料 JSON，由 run_weekly_sync.sh 複製到 docs/
+OUTPUT_SITE_DIR = f'{STATE_DIR}/report_site'
 NON_GOOGLE_JSON = f'{STATE_DIR}/non_google_permits.json'
 MAPPING_JSON = f'{STATE_DIR}/permit_system_mapping.json'
 ALERT_DATA_CSV = f'{STATE_DIR}/alert_data.csv'
 # ============================================
 
-# 全域變數
-current_access_token = JWT_TOKEN
-
-
-def get_valid_token() -> str:
-    """取得有效的 Token（使用 jwt_auth 模組），刷新時同步寫回 .env"""
-    global current_access_token
-    valid_token, was_refreshed, new_refresh = _jwt_get_valid_token(
-        current_access_token, REFRESH_TOKEN, GEOBINGAN_REFRESH_URL
-    )
-    if was_refreshed:
-        current_access_token = valid_token
-        try:
-            from geobingan_sync.config import update_jwt_token
-            update_jwt_token(valid_token, new_refresh)
-        except Exception as e:
-            print(f"⚠️  無法更新 .env Token: {e}")
-    return current_access_token
-
 
 def init_drive_service():
     """初始化 Google Drive API"""
-    credentials = service_account.Credentials.from_service_account_file(
-        SERVICE_ACCOUNT_FILE, scopes=SCOPES)
-    return build('drive', 'v3', credentials=credentials)
+    return clients.drive_service(SERVICE_ACCOUNT_FILE, SCOPES)
 
 
 def scan_google_drive(service) -> Dict[str, dict]:
     """掃描 Google Drive 取得所有建照資料夾"""
+    from googleapiclient.errors import HttpError
     print("\n📂 掃描 Google Drive 建照資料夾...")
 
     from geobingan_sync.drive_utils import list_top_level_folders, list_all_subfolders, build_folder_resolver
@@ -236,80 +210,54 @@ def scan_google_drive(service) -> Dict[str, dict]:
 
 def load_filename_to_permit_mapping() -> Dict[str, str]:
     """從上傳記錄建立檔名到建照的對應"""
-    mapping = {}
-    permit_pattern = r'(\d{2,3}建字第\d{3,5}號)'
-
-    # 優先使用永久歷史記錄
-    history_file = './state/upload_history_all.json'
+    from geobingan_sync import upload_history
     state_file = './state/uploaded_to_geobingan_7days.json'
 
-    all_files = []
-
-    # 載入永久歷史記錄
-    if os.path.exists(history_file):
-        try:
-            with open(history_file, 'r', encoding='utf-8') as f:
-                history = json.load(f)
-            all_files.extend(history.get('uploaded_files', []))
-        except Exception as e:
-            print(f"  載入永久歷史記錄時發生錯誤: {e}")
+    # 優先使用永久歷史記錄（共用索引，只解析一次）
+    try:
+        index = upload_history.load_index()
+    except Exception as e:
+        print(f"  載入永久歷史記錄時發生錯誤: {e}")
+        index = upload_history.UploadHistoryIndex({})
+    mapping = dict(index.filename_to_permit)
+    total = len(index)
 
-    # 也載入 7 天記錄（補充）
+    # 也載入 7 天記錄（補充；永久記錄已有的不重複處理）
     if os.path.exists(state_file):
         try:
             with open(state_file, 'r', encoding='utf-8') as f:
                 state = json.load(f)
-            for f in state.get('uploaded_files', []):
-                if f not in all_files:
-                    all_files.append(f)
+            seen = set(index.files)
+            # dict 不可 hash：以正規化 JSON 當 key，避免逐筆線性比對整份歷史
+            seen_dicts = {json.dumps(e, sort_keys=True) for e in index.entries if isinstance(e, dict)}
+            for item in state.get('uploaded_files', []):
+                if isinstance(item, dict):
+                    key = json.dumps(item, sort_keys=True)
+                    if key in seen_dicts:
+                        continue
+                    seen_dicts.add(key)
+                elif item in seen:
+                    continue
+                else:
+                    seen.add(item)
+                total += 1
+                upload_history.add_filename_mapping(mapping, item)
         except Exception as e:
             print(f"  ⚠️ 載入上傳歷史失敗: {e}")
 
-    print(f"  載入 {len(all_files)} 個上傳記錄")
-
-    for item in all_files:
-        # 處理不同格式：可能是字串或 dict
-        if isinstance(item, dict):
-            filepath = item.get('permit', '') + '/' + item.get('pdf', {}).get('name', '')
-        else:
-            filepath = str(item)
-
-        match = re.search(permit_pattern, filepath)
-        if match:
-            permit = match.group(1)
-            # 取得檔名（可能在子資料夾中）
-            filename = filepath.split('/')[-1] if '/' in filepath else filepath
-            mapping[filename] = permit
-
-            # 也處理加了 .pdf 的情況
-            if not filename.lower().endswith('.pdf'):
-                mapping[filename + '.pdf'] = permit
-
+    print(f"  載入 {total} 個上傳記錄")
     return mapping
 
 
 def load_upload_history_by_permit() -> Dict[str, set]:
     """從上傳記錄取得每個建案已上傳的檔案"""
-    permit_files = {}
-    history_file = './state/upload_history_all.json'
-
-    if os.path.exists(history_file):
-        try:
-            with open(history_file, 'r', encoding='utf-8') as f:
-                history = json.load(f)
-
-            for item in history.get('uploaded_files', []):
-                if isinstance(item, str) and '/' in item:
-                    parts = item.split('/', 1)
-                    permit = parts[0]
-                    filename = parts[1]
-                    if permit not in permit_files:
-                        permit_files[permit] = set()
-                    permit_files[permit].add(filename)
-        except Exception as e:
-            print(f"  載入上傳記錄時發生錯誤: {e}")
-
-    return permit_files
+    from geobingan_sync import upload_history
+    try:
+        index = upload_history.load_index()
+    except Exception as e:
+        print(f"  載入上傳記錄時發生錯誤: {e}")
+        return {}
+    return {permit: set(files) for permit, files in index.by_permit.items()}
 
 
 
@@ -326,213 +274,41 @@ def fetch_api_reports() -> Dict[str, List[dict]]:
     filename_to_permit = load_filename_to_permit_mapping()
     print(f"  已載入 {len(filename_to_permit)} 個檔名對應")
 
-    token = get_valid_token()
-    headers = {'Authorization': f'Bearer {token}'}
-
-    all_reports = []
-    page = 1
-    auth_retries = 0
-
-    while True:
-        try:
-            response = _session.get(
-                f"{GEOBINGAN_API_BASE}?group_id={GROUP_ID}&page={page}&page_size=100",
-                headers=headers,
-                timeout=30
-            )
-
-            if response.status_code == 401:
-                auth_retries += 1
-                if auth_retries > 2:
-                    print("  ❌ 401 重試超過上限，停止")
-                    break
-                token = get_valid_token()
-                if token:
-                    headers = {'Authorization': f'Bearer {token}'}
-                    continue
-                break
-            auth_retries = 0
-
-            if response.status_code != 200:
-                print(f"  API 錯誤: {response.status_code}")
-                break
-
-            data = response.json()
-            results = data.get('results', [])
-
-            if not results:
-                break
-
-            all_reports.extend(results)
-            print(f"    第 {page} 頁: {len(results)} 筆")
-
-            if not data.get('next'):
-                break
-            page += 1
-
-        except Exception as e:
-            print(f"  API 請求錯誤: {e}")
-            break
+    # 讀本地報告快取（與 match_permits 共用；增量同步，只抓上次之後的新報告）
+    from geobingan_sync import report_store
+    from geobingan_sync.api_pagination import make_json_page_fetcher
+    fetch_page = make_json_page_fetcher(
+        clients.http_session(), GEOBINGAN_API_BASE, {'group_id': GROUP_ID}, token_manager.get_token, timeout=30,
+        invalidate=token_manager.invalidate)
+    all_reports = report_store.sync_reports(GROUP_ID, fetch_page)
 
     print(f"  共取得 {len(all_reports)} 筆報告")
 
-    # 高信度匹配：api_match 名稱 → permit（已通過 construction-projects API 驗證）
+    # 比對器每次 run 只建一次（api_match 核心名稱、名稱 / 片段自動機皆預先算好）
+    # 名稱比對結果跨 run 保存：registry 的 name / api_match 沒變時只比對新報告
+    from geobingan_sync.report_matcher import (
+        ReportPermitMatcher, MatchMemo, group_reports, registry_fingerprint,
+    )
     registry_file = './state/permit_registry.json'
-    api_name_to_permits = {}  # api_match name → [permits]（支援多對一）
-    if os.path.exists(registry_file):
-        with open(registry_file, 'r', encoding='utf-8') as f:
-            _reg_tmp = json.load(f)
-        for permit, info in _reg_tmp.items():
-            api_match = info.get('api_match', '')
-            if api_match and len(api_match) >= 4:
-                if api_match not in api_name_to_permits:
-                    api_name_to_permits[api_match] = []
-                api_name_to_permits[api_match].append(permit)
-        print(f"  高信度 API 名稱: {len(api_name_to_permits)} 個")
-
-    # 從 permit_registry.json + construction-projects API 建立名稱對應
-    name_to_permit_fuzzy = {}  # 完整名稱 → permit
-    fragment_to_permit = {}    # 名稱片段（≥4字） → permit（唯一對應才使用）
+    registry = {}
     if os.path.exists(registry_file):
         with open(registry_file, 'r', encoding='utf-8') as f:
             registry = json.load(f)
-        # 收集所有名稱片段（用於去重）
-        fragment_permits = {}  # fragment → set of permits
-        # 通用名稱和太短的名稱不可用於模糊匹配（會造成大量誤配）
-        generic_patterns = re.compile(r'^(監測報告?|監測報表?|監測$|安全觀測|安全監測|觀測報告|觀測數據|工地監測|工地$|報告$|報表$|告示牌|基地觀測系統|建號\d)')
-        for permit, info in registry.items():
-            name = info.get('name', '')
-            if name and len(name) >= 4 and not generic_patterns.match(name):
-                name_to_permit_fuzzy[name] = permit
-                # 提取 3~6 字的滑動視窗片段（≥3字避免公司名/地名誤匹配）
-                clean = re.sub(r'(安全觀測|監測報表?|觀測報告|觀測數據|新建工程|工程|報告|報表|數據)', '', name)
-                # 只保留中文字元片段
-                cjk_parts = re.findall(r'[\u4e00-\u9fff]+', clean)
-                for part in cjk_parts:
-                    for flen in range(4, min(7, len(part) + 1)):
-                        for start in range(len(part) - flen + 1):
-                            frag = part[start:start + flen]
-                            if frag not in fragment_permits:
-                                fragment_permits[frag] = set()
-                            fragment_permits[frag].add(permit)
-            # 也用 api_match 的名稱
-            api_name = info.get('api_match', '')
-            if api_name:
-                name_to_permit_fuzzy[api_name] = permit
-        # 只保留唯一對應的片段（避免歧義）
-        for frag, permits in fragment_permits.items():
-            if len(permits) == 1:
-                fragment_to_permit[frag] = next(iter(permits))
-
-    # 按建照號碼分組（結合 API 報告和上傳記錄）
-    permit_reports = {}
-    matched = 0
-    unmatched = 0
-    fuzzy_matched = 0
-
-    # 先從上傳記錄建立基礎計數
-    for permit, files in upload_history.items():
-        permit_reports[permit] = [{'filename': f, 'created_at': '', 'status': 'uploaded'} for f in files]
-
-    # 再處理 API 報告（避免重複計算）
-    for report in all_reports:
-        filename = report.get('file_name', '') or report.get('original_filename', '')
-
-        # 方法 1: 直接從檔名找建照號
-        permit_match = re.search(r'(\d{2,3}建字第\d{3,5}號)', filename)
-        permit = None
-
-        if permit_match:
-            permit = permit_match.group(1)
-        else:
-            # 方法 2: 從上傳記錄對應
-            permit = filename_to_permit.get(filename)
-
-        # 方法 2.5: 高信度 API 名稱匹配（api_match 已驗證的名稱）
-        if not permit and api_name_to_permits:
-            fn_clean_api = re.sub(r'\d{7,8}|\d{4}[-/.]\d{2}[-/.]\d{2}|\.pdf$|[^\u4e00-\u9fff\w\s-]', '', filename)
-            best_permits = None
-            best_api_len = 0
-            for api_name, permits_list in api_name_to_permits.items():
-                # 從 API 名稱逐步去除通用後綴，提取核心名稱
-                api_core = api_name
-                for _ in range(3):
-                    api_core = re.sub(r'[-\s]*(新建工程|監測案|新建統包工程|集合住宅|住宅大樓|商辦大樓|店鋪|工程|監測)$', '', api_core).strip()
-                if len(api_core) >= 3 and api_core in fn_clean_api and len(api_core) > best_api_len:
-                    best_permits = permits_list
-                    best_api_len = len(api_core)
-            if best_permits:
-                # 將報告分配給所有對應的 permit
-                for p in best_permits:
-                    if p not in permit_reports:
-                        permit_reports[p] = []
-                    existing = {r['filename'] for r in permit_reports[p]}
-                    if filename not in existing:
-                        permit_reports[p].append({
-                            'filename': filename,
-                            'created_at': report.get('created_at', ''),
-                            'status': report.get('parse_status', report.get('status', ''))
-                        })
-                matched += 1
-                fuzzy_matched += 1
-                continue  # 跳過後續匹配
-
-        # 方法 3: 用 permit_registry 名稱模糊匹配
-        if not permit and name_to_permit_fuzzy:
-            best_match = None
-            best_len = 0
-            # 3a: 完整名稱在檔名中
-            for name, p in name_to_permit_fuzzy.items():
-                if name in filename and len(name) > best_len:
-                    best_match = p
-                    best_len = len(name)
-            # 3b: 名稱片段匹配（最長唯一片段優先）
-            if not best_match and fragment_to_permit:
-                # 從檔名中去除日期、常見字詞和標點後嘗試匹配
-                fn_clean = re.sub(r'\d{7,8}|\d{4}[-/.]\d{2}[-/.]\d{2}|\.pdf$|監測報告|觀測報告|報告|報表|[^\u4e00-\u9fff]', '', filename)
-                for frag, p in sorted(fragment_to_permit.items(), key=lambda x: -len(x[0])):
-                    if frag in fn_clean:
-                        best_match = p
-                        best_len = len(frag)
-                        break
-            # 3c: 反向匹配 — 從檔名提取 4~6 字子片段，在 registry 名稱中搜尋（唯一匹配才採用）
-            if not best_match and name_to_permit_fuzzy:
-                fn_clean = re.sub(r'\d{7,8}|\d{4}[-/.]\d{2}[-/.]\d{2}|\.pdf$|監測報告|觀測報告|觀測數據|報告|報表|新建工程|集合住宅|住宅大樓|安全觀測|安全監測|[^\u4e00-\u9fff]', '', filename)
-                cjk_text = ''.join(re.findall(r'[\u4e00-\u9fff]+', fn_clean))
-                # 從長到短嘗試，最短 4 字（避免短片段誤配）
-                for flen in range(min(6, len(cjk_text)), 3, -1):
-                    found = False
-                    for start in range(len(cjk_text) - flen + 1):
-                        sub = cjk_text[start:start + flen]
-                        matches = [p for name, p in name_to_permit_fuzzy.items() if sub in name]
-                        unique_permits = set(matches)
-                        if len(unique_permits) == 1:
-                            best_match = next(iter(unique_permits))
-                            fuzzy_matched += 1
-                            found = True
-                            break
-                    if found:
-                        break
-            if best_match:
-                permit = best_match
-                fuzzy_matched += 1
-
-        if permit:
-            matched += 1
-            # 只有當檔案不在上傳記錄中時才加入（避免重複）
-            if permit not in permit_reports:
-                permit_reports[permit] = []
-
-            # 檢查是否已存在
-            existing_files = {r['filename'] for r in permit_reports[permit]}
-            if filename not in existing_files:
-                permit_reports[permit].append({
-                    'filename': filename,
-                    'created_at': report.get('created_at', ''),
-                    'status': report.get('parse_status', report.get('status', ''))
-                })
-        else:
-            unmatched += 1
+    memo = MatchMemo(registry_fingerprint(registry))
+    if memo.invalidated:
+        print("  ♻️ registry 名稱已變更，名稱比對快取失效，全部重新比對")
+    matcher = ReportPermitMatcher(registry, filename_to_permit, memo=memo)
+    if registry:
+        print(f"  高信度 API 名稱: {len(matcher.api_name_to_permits)} 個")
+
+    # 按建照號碼分組（結合 API 報告和上傳記錄，同建照同檔名只算一次）
+    permit_reports, stats = group_reports(all_reports, matcher, upload_history)
+    matched, fuzzy_matched, unmatched = stats['matched'], stats['fuzzy'], stats['unmatched']
+    print(f"  名稱比對快取: 命中 {memo.hits}，新比對 {memo.misses}")
+    try:
+        memo.save()
+    except OSError as e:
+        print(f"  ⚠️ 名稱比對快取寫入失敗（不影響本次結果）: {e}")
 
     print(f"  對應成功: {matched}（含名稱匹配 {fuzzy_matched}）, 未對應: {unmatched}")
     return permit_reports
@@ -540,140 +316,51 @@ def fetch_api_reports() -> Dict[str, List[dict]]:
 
 def download_and_parse_gov_pdf() -> List[dict]:
     """下載並解析台北市政府 PDF，識別非 Google Drive 雲端服務"""
+    from geobingan_sync.permit_list import (
+        fetch_permit_list_pdf, cached_parse, parse_permit_list, non_google_permits, RECORDS_KEY,
+    )
     print("\n📥 下載台北市政府建案列表...")
 
-    try:
-        with warnings.catch_warnings():
-            warnings.filterwarnings('ignore', category=urllib3.exceptions.InsecureRequestWarning)
-            response = requests.get(PDF_LIST_URL, verify=False, timeout=30)
-        pdf_path = '/tmp/permit_list.pdf'
-        with open(pdf_path, 'wb') as f:
-            f.write(response.content)
-        print(f"  已下載: {len(response.content)} bytes")
-    except Exception as e:
-        print(f"  下載失敗: {e}")
+    # 與 sync_permits / match_permits 共用快取（conditional GET + 同一份結構化紀錄），
+    # 失敗不中止報告
+    pdf_path = fetch_permit_list_pdf(PDF_LIST_URL, max_attempts=1)
+    if not pdf_path:
         return []
 
     print("  解析 PDF 內容...")
-    non_google_permits = []
-
     try:
-        with open(pdf_path, 'rb') as f:
-            pdf_reader = pypdf.PdfReader(f)
-            all_text = '\n'.join(p.extract_text() or '' for p in pdf_reader.pages)
-
-        # 找出所有建照號碼位置
-        permit_pattern = r'(\d{2,3}建字第\d{3,5}號)'
-        permit_matches = list(re.finditer(permit_pattern, all_text))
-
-        # 定義非 Google Drive 的雲端服務
-        cloud_patterns = {
-            'SharePoint': r'(sharepoint\.com[^\s]*)',
-            'Dropbox': r'(dropbox\.com[^\s]*)',
-            'OneDrive': r'(onedrive\.live\.com[^\s]*|1drv\.ms[^\s]*)',
-            'MEGA': r'(mega\.nz[^\s]*)',
-            'pCloud': r'(pcloud\.com[^\s]*)',
-            'GoFile': r'(gofile\.io[^\s]*)',
-            'ownCloud': r'(owncloud[^\s]*)',
-            '短網址': r'(reurl\.cc[^\s]*|bit\.ly[^\s]*|tinyurl\.com[^\s]*)',
-        }
-
-        for i, match in enumerate(permit_matches):
-            permit = match.group(1)
-            start = match.end()
-            end = permit_matches[i + 1].start() if i + 1 < len(permit_matches) else len(all_text)
-            chunk = all_text[start:end]
-
-            # 檢查是否有 Google Drive 連結
-            has_google = bool(re.search(r'drive\.google\.com|docs\.google\.com', chunk))
-
-            if not has_google:
-                # 找出使用的雲端服務
-                cloud_service = None
-                cloud_url = None
-
-                for service, pattern in cloud_patterns.items():
-                    url_match = re.search(pattern, chunk, re.IGNORECASE)
-                    if url_match:
-                        cloud_service = service
-                        cloud_url = url_match.group(1)
-                        break
-
-                # 檢查其他 http/https 連結
-                if not cloud_service:
-                    other_url = re.search(r'(https?://[^\s\)]+)', chunk)
-                    if other_url:
-                        url = other_url.group(1)
-                        if 'gov.taipei' not in url and 'riskmap' not in url:
-                            domain = re.search(r'https?://([^/]+)', url)
-                            if domain:
-                                cloud_service = f"其他: {domain.group(1)}"
-                                cloud_url = url
-
-                if cloud_service:
-                    non_google_permits.append({
-                        'permit': permit,
-                        'cloud': cloud_service,
-                        'url': cloud_url or ''
-                    })
-
-        print(f"  找到 {len(non_google_permits)} 個使用非 Google Drive 的建照")
-
+        records = cached_parse(PDF_LIST_URL, pdf_path, RECORDS_KEY, parse_permit_list)
     except Exception as e:
         print(f"  解析錯誤: {e}")
-
-    return non_google_permits
+        return []
+    result = non_google_permits(records)
+    print(f"  找到 {len(result)} 個使用非 Google Drive 的建照")
+    return result
 
 
 def load_alert_data() -> Tuple[Dict[str, dict], Dict[str, str]]:
     """載入警戒/行動值資料，並對應到建照號碼。同時返回建案名稱對應表"""
     print("\n📊 載入警戒值資料...")
 
-    # 建立建案名稱到建照號碼的對應（雙向）
+    # 建立建案名稱到建照號碼的對應（雙向；共用上傳歷史索引）
+    from geobingan_sync import upload_history
     name_to_permit = {}
-    permit_to_name = {}  # 建照號碼 -> 建案名稱
-    permit_name_counts = {}  # 建照號碼 -> {名稱: 出現次數}
-    history_file = './state/upload_history_all.json'
-
-    if os.path.exists(history_file):
-        try:
-            with open(history_file, 'r', encoding='utf-8') as f:
-                history = json.load(f)
-
-            for item in history.get('uploaded_files', []):
-                if isinstance(item, str) and '/' in item:
-                    parts = item.split('/', 1)
-                    permit = parts[0]
-                    filename = parts[1]
-
-                    # 只接受合法的建照號碼格式
-                    if not re.match(r'\d{2,3}建字第\d{3,5}號', permit):
-                        continue
-
-                    name = extract_name_from_filename(filename)
-                    if name and permit:
-                        name_to_permit[name] = permit
-                        # 統計每個名稱出現次數
-                        if permit not in permit_name_counts:
-                            permit_name_counts[permit] = {}
-                        permit_name_counts[permit][name] = permit_name_counts[permit].get(name, 0) + 1
-
-            # 選擇最常出現的名稱
-            for permit, name_counts in permit_name_counts.items():
-                if name_counts:
-                    # 找出現次數最多的名稱
-                    most_common = max(name_counts.items(), key=lambda x: x[1])
-                    permit_to_name[permit] = most_common[0]
-
-        except Exception as e:
-            print(f"  載入上傳記錄時發生錯誤: {e}")
+    permit_to_name = {}  # 建照號碼 -> 建案名稱（最常出現的名稱）
+    try:
+        index = upload_history.load_index()
+        name_to_permit = index.name_to_permit
+        permit_to_name = index.most_common_names()
+    except Exception as e:
+        print(f"  載入上傳記錄時發生錯誤: {e}")
 
     if not os.path.exists(ALERT_DATA_CSV):
         print(f"  找不到警戒資料檔案: {ALERT_DATA_CSV}")
         return {}, permit_to_name
 
     # 讀取警戒資料 CSV
+    from geobingan_sync.text_index import SubstringIndex
     alert_data = {}
+    name_index = None  # 部分匹配用，第一次需要時才建
     try:
         with open(ALERT_DATA_CSV, 'r', encoding='utf-8-sig') as f:
             reader = csv.DictReader(f)
@@ -697,12 +384,13 @@ def load_alert_data() -> Tuple[Dict[str, dict], Dict[str, str]]:
                 if not permit:
                     permit = name_to_permit.get(building_name)
 
-                # 方法3: 嘗試部分匹配
+                # 方法3: 嘗試部分匹配（依名稱加入順序取第一個互相包含者）
                 if not permit:
-                    for name, p in name_to_permit.items():
-                        if building_name in name or name in building_name:
-                            permit = p
-                            break
+                    if name_index is None:
+                        name_index = SubstringIndex(name_to_permit)
+                    name = name_index.first_overlapping(building_name)
+                    if name is not None:
+                        permit = name_to_permit[name]
 
                 if permit:
                     # 取得最近日期
@@ -749,20 +437,27 @@ def main(city: dict = None):
     print("=" * 50)
     print(f"建照監測追蹤報告生成工具{f' ({city_name})' if city_name else ''}")
     print("=" * 50)
+    print(f"✅ 已載入認證配置（用戶: {USER_EMAIL}）")
 
     start_time = time.time()
 
-    # 初始化
-    drive_service = init_drive_service()
-
-    # 1. 掃描 Google Drive
-    drive_data = scan_google_drive(drive_service)
-
-    # 2. 從 API 取得報告
-    api_reports = fetch_api_reports()
-
-    # 3. 解析政府 PDF 取得非 Google 建照
-    non_google = download_and_parse_gov_pdf()
+    # 1~3 互相獨立（Drive 掃描 / API 報告 / 政府 PDF）→ 並行抓取
+    # Drive service 在 task 內 build（httplib2 不是 thread-safe）
+    from geobingan_sync.fetch_graph import FetchTask, run_fetch_graph
+    sources = run_fetch_graph([
+        # 1. 掃描 Google Drive
+        FetchTask('drive_data', lambda: scan_google_drive(init_drive_service()),
+                  required=True, label='Drive 掃描'),
+        # 2. 從 API 取得報告
+        FetchTask('api_reports', fetch_api_reports, default=dict, label='API 報告'),
+        # 3. 解析政府 PDF 取得非 Google 建照
+        FetchTask('non_google', download_and_parse_gov_pdf, default=list, label='政府 PDF'),
+    ])
+    drive_data = sources['drive_data']
+    api_reports = sources['api_reports']
+    non_google = sources['non_google']
+    # 失敗後以空資料代替的來源：寫進報告標頭與線上版，不把部分報告當完整報告發布
+    degraded = sources.degraded
 
     # 4. 合併資料
     print("\n🔄 合併資料...")
@@ -825,44 +520,15 @@ def main(city: dict = None):
                 'cloud_service': item['cloud']
             }
 
-    # 5. 從 permit_registry.json 載入建案名稱和即時警戒值（由 match_permits.py 產生）
+    # 5. 載入 permit_registry.json（建案名稱和即時警戒值，由 match_permits.py 產生）
     registry_file = './state/permit_registry.json'
-    permit_names = {}
-    alert_data = {}
-    gov_url_statuses = {}
     if os.path.exists(registry_file):
         with open(registry_file, 'r', encoding='utf-8') as f:
             registry = json.load(f)
-        for permit, info in registry.items():
-            reg_name = info.get('name', '')
-            if reg_name:
-                permit_names[permit] = reg_name
-            # 從 live_alerts 載入即時警戒值
-            la = info.get('live_alerts', {})
-            if la and la.get('total', 0) > 0:
-                alert_data[permit] = {
-                    'warning_count': la.get('warning', 0),
-                    'danger_count': la.get('danger', 0),
-                    'total': la.get('total', 0),
-                    'latest_alert_date': la.get('latest_date', ''),
-                    'details': la.get('details', []),
-                }
-            # 政府 PDF folder URL 活/死狀態
-            url_status = info.get('gov_pdf_url_status', '')
-            if url_status:
-                gov_url_statuses[permit] = url_status
-        n_404 = sum(1 for s in gov_url_statuses.values() if s == '404')
-        print(f"  從 permit_registry 載入 {len(permit_names)} 個建案名稱，{len(alert_data)} 個有即時警戒值，{n_404} 個 URL 失效")
     else:
         print("  ⚠️ permit_registry.json 不存在，請先執行 python3 -m geobingan_sync.steps.match_permits")
         registry = {}
 
-    # 5b. 補充：從 upload_history 提取名稱（permit_registry 沒涵蓋的）
-    _, history_names = load_alert_data()
-    for permit, name in history_names.items():
-        if name and permit not in permit_names:
-            permit_names[permit] = name
-
     # 5c. 移除 _drive_names（掃描時產生的暫存資料）
     drive_data.pop('_drive_names', None)
 
@@ -880,6 +546,21 @@ def main(city: dict = None):
     if completed_count > 0:
         print(f"  標記 {completed_count} 個建案為已結案（建照年份 ≤ 110 年且無系統報告）")
 
+    # 5f. 建立欄位式建案表（狀態統計、警戒 join 與報告共用）
+    table = PermitTable(permit_data, registry)
+    permit_names = table.name_map()
+    alert_data = table.alert_data()
+    gov_url_statuses = table.gov_url_statuses()
+    if registry:
+        n_404 = sum(1 for s in gov_url_statuses.values() if s == '404')
+        print(f"  從 permit_registry 載入 {len(permit_names)} 個建案名稱，{len(alert_data)} 個有即時警戒值，{n_404} 個 URL 失效")
+
+    # 5g. 補充：從 upload_history 提取名稱（permit_registry 沒涵蓋的）
+    _, history_names = load_alert_data()
+    for permit, name in history_names.items():
+        if name and permit not in permit_names:
+            permit_names[permit] = name
+
     # 6. 儲存資料
     with open(MAPPING_JSON, 'w', encoding='utf-8') as f:
         json.dump(permit_data, f, indent=2, ensure_ascii=False)
@@ -887,24 +568,53 @@ def main(city: dict = None):
     with open(NON_GOOGLE_JSON, 'w', encoding='utf-8') as f:
         json.dump(non_google, f, indent=2, ensure_ascii=False)
 
-    # 7. 生成報告
-    generate_html_report(permit_data, non_google, alert_data, permit_names, output_path=OUTPUT_HTML, gov_url_statuses=gov_url_statuses)
-    generate_csv_report(permit_data, non_google, alert_data, permit_names, output_path=OUTPUT_CSV, gov_url_statuses=gov_url_statuses)
+    # 7. 生成報告（合併後的資料與模板都沒變 → 沿用上次的輸出，不重新渲染）
+    from geobingan_sync import step_memo
+    outputs = [OUTPUT_HTML, OUTPUT_CSV,
+               f'{OUTPUT_SITE_DIR}/index.html', f'{OUTPUT_SITE_DIR}/permit_data.json']
+    memo_name = f"tracking_report.render.{(city or {}).get('id', 'default')}"
+    # days_since_update 由 latest_report 與今天推導，不直接 hash（否則指紋每天都變）；
+    # 報告的天數欄位與產生時間仍依日期而定 → 明確把執行日期放進指紋：同一天重跑才沿用
+    dated_fields = ('days_since_update',)
+    permit_inputs = {p: {k: v for k, v in d.items() if k not in dated_fields} for p, d in permit_data.items()}
+    fingerprint = step_memo.Fingerprint(memo_name).data(
+        [permit_inputs, non_google, alert_data, permit_names, gov_url_statuses, degraded,
+         now.date().isoformat()]
+    ).code('geobingan_sync.report_template', 'geobingan_sync.report_site').hexdigest()
+    if not step_memo.is_fresh(memo_name, fingerprint):
+        write_reports(permit_data, non_google, alert_data, permit_names,
+                      html_path=OUTPUT_HTML, csv_path=OUTPUT_CSV, gov_url_statuses=gov_url_statuses, table=table,
+                      degraded=degraded)
+        write_report_site(OUTPUT_SITE_DIR, permit_data, non_google, alert_data, permit_names,
+                          gov_url_statuses=gov_url_statuses, degraded=degraded)
+        step_memo.record(memo_name, fingerprint, outputs)
 
     elapsed = time.time() - start_time
+    if degraded:
+        print(f"\n⚠️  報告資料不完整（{'、'.join(degraded)} 抓取失敗），已在報告標頭註明")
     print(f"\n✅ 報告生成完成！耗時 {elapsed:.1f} 秒")
     print(f"   - HTML: {OUTPUT_HTML}")
     print(f"   - CSV: {OUTPUT_CSV}")
+    print(f"   - 線上版: {OUTPUT_SITE_DIR}/")
 
 
-if __name__ == '__main__':
+def cli(argv=None):
+    """命令列進入點（argv 省略時讀 sys.argv；geobingan_sync.run 在同一 process 內呼叫）"""
     import argparse
     from geobingan_sync.city_config import get_cities_for_cli
 
     parser = argparse.ArgumentParser()
     parser.add_argument('--city', default=None, help='City ID or "all"')
-    args = parser.parse_args()
+    parser.add_argument('--force', action='store_true', help='忽略步驟記憶，無條件重新渲染報告')
+    args = parser.parse_args(argv)
+    if args.force:
+        from geobingan_sync import step_memo
+        step_memo.set_force(['tracking_report'])
 
     cities = get_cities_for_cli(args.city)
     for city in cities:
         main(city=city)
+
+
+if __name__ == '__main__':
+    cli()
@@ -13,85 +13,67 @@ import os
 import re
 import sys
 import argparse
-import requests
 from datetime import datetime, timedelta
 from pathlib import Path
 
 # ClickUp
 from geobingan_sync.config import CLICKUP_TOKEN
+from geobingan_sync.lazy_import import lazy_module
+from geobingan_sync.permit_table import load_table
+
+requests = lazy_module('requests')
 WEEKLY_REPORT_TASK_ID = '86ex8u782'
 
 STATE_DIR = './state'
 
 
 def load_data():
-    """載入所有需要的資料"""
-    with open(f'{STATE_DIR}/permit_system_mapping.json', 'r', encoding='utf-8') as f:
-        mapping = json.load(f)
-    with open(f'{STATE_DIR}/permit_registry.json', 'r', encoding='utf-8') as f:
-        registry = json.load(f)
-    return mapping, registry
+    """載入欄位式建案表（mapping + registry，同一 process 內與快照共用）"""
+    return load_table(f'{STATE_DIR}/permit_system_mapping.json', f'{STATE_DIR}/permit_registry.json')
 
 
-def gather_stats(mapping, registry, days=7):
+def gather_stats(table, days=7):
     """彙整統計資料"""
     now = datetime.now()
     cutoff = now - timedelta(days=days)
-    cutoff_str = cutoff.strftime('%Y-%m-%d')
-
-    total = len(mapping)
-    total_pdfs = sum(d.get('drive_count', 0) for d in mapping.values())
-    total_ai = sum(d.get('system_count', 0) for d in mapping.values())
-
-    # 狀態分布
-    statuses = {}
-    for d in mapping.values():
-        s = d.get('status', '')
-        statuses[s] = statuses.get(s, 0) + 1
 
     # 本週更新
     updated = []
-    for p, d in mapping.items():
-        latest = d.get('latest_report', '')
-        if latest and latest[:10] >= cutoff_str:
-            info = registry.get(p, {})
-            updated.append({
-                'permit': p,
-                'name': info.get('name', '') or '-',
-                'drive': d.get('drive_count', 0),
-                'ai': d.get('system_count', 0),
-                'latest': latest[:10],
-            })
+    for i in table.rows(table.updated_mask(cutoff.date())):
+        updated.append({
+            'permit': table.permits[i],
+            'name': table.names[i] or '-',
+            'drive': table.drive_count[i],
+            'ai': table.system_count[i],
+            'latest': table.latest_report[i][:10],
+        })
     updated.sort(key=lambda x: x['latest'], reverse=True)
 
     # 警戒值（只顯示有 AI 辨識的）
     danger_alerts = []
     warning_alerts = []
-    for p, info in registry.items():
-        la = info.get('live_alerts', {})
-        sys_count = mapping.get(p, {}).get('system_count', 0)
-        if la and la.get('total', 0) > 0 and sys_count > 0:
-            entry = {
-                'permit': p,
-                'name': info.get('name', '')[:25] or '-',
-                'danger': la.get('danger', 0),
-                'warning': la.get('warning', 0),
-                'date': la.get('latest_date', ''),
-                'details': la.get('details', []),
-            }
-            if la.get('danger', 0) > 0:
-                danger_alerts.append(entry)
-            else:
-                warning_alerts.append(entry)
+    for i in table.rows(table.alert_mask()):
+        entry = {
+            'permit': table.permits[i],
+            'name': table.names[i][:25] or '-',
+            'danger': table.alert_danger[i],
+            'warning': table.alert_warning[i],
+            'date': table.alert_date[i],
+            'details': table.alert_details[i],
+        }
+        if entry['danger'] > 0:
+            danger_alerts.append(entry)
+        else:
+            warning_alerts.append(entry)
 
     danger_alerts.sort(key=lambda x: x['date'], reverse=True)
     warning_alerts.sort(key=lambda x: x['date'], reverse=True)
 
     return {
-        'total': total,
-        'total_pdfs': total_pdfs,
-        'total_ai': total_ai,
-        'statuses': statuses,
+        'total': table.total,
+        'total_pdfs': table.total_pdfs(),
+        'total_ai': table.total_ai(),
+        'statuses': table.status_counts(),
         'updated': updated,
         'danger_alerts': danger_alerts,
         'warning_alerts': warning_alerts,
@@ -127,7 +109,6 @@ def generate_html(stats, report_type='summary'):
 <style>
 @page {{ size: A4; margin: 18mm 15mm; }}
 * {{ box-sizing: border-box; margin: 0; padding: 0; }}
-@font-face {{ font-family: 'LocalChinese'; src: url('file:///Library/Fonts/Arial Unicode.ttf'); }}
 body {{ font-family: 'LocalChinese', sans-serif; color: #1a1a1a; line-height: 1.55; font-size: 11px; -webkit-print-color-adjust: exact; print-color-adjust: exact; }}
 
 .header {{ background: linear-gradient(135deg, #1a1a1a 0%, #2d2d2d 100%); color: white; padding: 28px 36px; }}
@@ -294,39 +275,19 @@ geoBingAn 究平安 ・ 建案監測週報 ・ {s["report_date"]} 自動產生
 
 
 def html_to_pdf(html_content, output_path):
-    """HTML 轉 PDF（使用 Chrome headless）"""
-    import subprocess
-    import tempfile
-
-    html_path = tempfile.mktemp(suffix='.html')
-    with open(html_path, 'w', encoding='utf-8') as f:
-        f.write(html_content)
-
-    chrome = '/Applications/Google Chrome.app/Contents/MacOS/Google Chrome'
-    if os.path.exists(chrome):
-        subprocess.run([
-            chrome, '--headless', '--disable-gpu', '--no-sandbox',
-            f'--print-to-pdf={output_path}',
-            '--no-pdf-header-footer',
-            html_path
-        ], capture_output=True, timeout=30)
-        os.unlink(html_path)
-        if os.path.exists(output_path):
-            size_kb = os.path.getsize(output_path) / 1024
-            print(f"  PDF 產生完成: {output_path} ({size_kb:.0f} KB)")
-            return
-
-    # Fallback to weasyprint
-    from weasyprint import HTML
-    HTML(filename=html_path).write_pdf(output_path)
-    if os.path.exists(html_path):
-        os.unlink(html_path)
+    """HTML 轉 PDF（Chrome / WeasyPrint，內容相同時沿用快取；見 geobingan_sync.pdf_renderer）
+
+    中文字型（LocalChinese）由渲染器依平台注入，HTML 不寫死字型路徑。
+    """
+    from geobingan_sync.pdf_renderer import render_pdf
+    source = render_pdf(html_content, output_path)
     size_kb = os.path.getsize(output_path) / 1024
-    print(f"  PDF 產生完成（weasyprint fallback）: {output_path} ({size_kb:.0f} KB)")
+    label = {'cache': '（內容未變，沿用快取）', 'weasyprint': '（weasyprint）'}.get(source, '')
+    print(f"  PDF 產生完成{label}: {output_path} ({size_kb:.0f} KB)")
 
 
 def upload_to_clickup(pdf_path, summary_text):
-    """上傳 PDF 到 ClickUp task，並在 comment 中嵌入附件下載連結"""
+    """上傳 PDF 到 ClickUp task，並在 comment 中嵌入附件下載連結；附件與 comment 都成功才回傳 True"""
     headers = {'Authorization': CLICKUP_TOKEN}
 
     # 上傳附件並取得 URL
@@ -358,28 +319,33 @@ def upload_to_clickup(pdf_path, summary_text):
         print(f"  Comment 已發送")
     else:
         print(f"  Comment 發送失敗: {r2.status_code}")
+    return bool(attachment_url) and r2.status_code == 200
 
 
-def main():
+def main(argv=None):
     parser = argparse.ArgumentParser(description='建案監測週報產生器')
     parser.add_argument('--type', choices=['sync', 'summary'], default='summary',
                         help='sync=週一同步報告, summary=週五總結週報')
     parser.add_argument('--upload', action='store_true', help='產生後上傳到 ClickUp')
     parser.add_argument('--days', type=int, default=7, help='回溯天數（預設 7）')
-    args = parser.parse_args()
+    parser.add_argument('--force', action='store_true', help='內容與上次上傳相同時仍重新上傳')
+    args = parser.parse_args(argv)
+    if args.force:
+        from geobingan_sync import step_memo
+        step_memo.set_force(['weekly_report'])
 
     print("=" * 50)
     print(f"📊 建案監測{'同步報告' if args.type == 'sync' else '週報'}產生器")
     print("=" * 50)
 
     # 載入資料
-    mapping, registry = load_data()
-    stats = gather_stats(mapping, registry, days=args.days)
+    table = load_data()
+    stats = gather_stats(table, days=args.days)
 
     # 儲存快照並取得趨勢
     try:
         from geobingan_sync.steps.weekly_snapshot import save_snapshot, get_previous_snapshot, compute_diff
-        current_snap = save_snapshot()
+        current_snap = save_snapshot(table)
         previous_snap = get_previous_snapshot()
         trend = compute_diff(current_snap, previous_snap)
         stats['trend'] = trend
@@ -415,7 +381,13 @@ def main():
             f'• ⚠️ 警戒值超標：{len(stats["warning_alerts"])} 個\n\n'
             f'詳見附件 PDF。'
         )
-        upload_to_clickup(pdf_path, summary)
+        # 同一份週報（HTML 與摘要完全相同）已成功上傳過 → 不再重複附加到 ClickUp
+        from geobingan_sync import step_memo
+        memo_name = f'weekly_report.upload.{args.type}'
+        fingerprint = step_memo.Fingerprint(memo_name).data([html, summary, WEEKLY_REPORT_TASK_ID]).hexdigest()
+        if not step_memo.is_fresh(memo_name, fingerprint):
+            if upload_to_clickup(pdf_path, summary):
+                step_memo.record(memo_name, fingerprint)
 
     print(f"\n✅ 完成！")
 
@@ -17,44 +17,29 @@ import os
 import re
 import sys
 import csv
-import requests
+import functools
 
-_session = requests.Session()
+from geobingan_sync import clients
 from datetime import datetime
 from typing import Dict, Optional
 from collections import Counter
 
 # 載入設定
 try:
-    from geobingan_sync.config import (JWT_TOKEN, REFRESH_TOKEN, GEOBINGAN_REFRESH_URL,
-                        GROUP_ID, SHARED_DRIVE_ID)
+    from geobingan_sync.config import GROUP_ID, SHARED_DRIVE_ID
 except ImportError:
     print("❌ 需要 config.py")
     sys.exit(1)
 
-from geobingan_sync.jwt_auth import get_valid_token
+from geobingan_sync import token_manager
 from geobingan_sync.filename_date_parser import parse_date_from_filename
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
 
 REGISTRY_FILE = './state/permit_registry.json'
+REGISTRY_CHANGES_FILE = './state/registry_changes.json'
 ALERT_CSV = './state/alert_data.csv'
 SERVICE_ACCOUNT_FILE = os.environ.get('GOOGLE_CREDENTIALS', './credentials.json')
 
 
-def get_api_token():
-    global JWT_TOKEN
-    token, was_refreshed, new_refresh = get_valid_token(JWT_TOKEN, REFRESH_TOKEN, GEOBINGAN_REFRESH_URL)
-    if was_refreshed:
-        JWT_TOKEN = token
-        try:
-            from geobingan_sync.config import update_jwt_token
-            update_jwt_token(token, new_refresh)
-        except Exception as e:
-            print(f"⚠️  無法更新 .env Token: {e}")
-    return token
-
-
 def load_existing_registry() -> dict:
     if os.path.exists(REGISTRY_FILE):
         with open(REGISTRY_FILE, 'r', encoding='utf-8') as f:
@@ -63,6 +48,7 @@ def load_existing_registry() -> dict:
 
 
 from geobingan_sync.permit_utils import normalize_permit
+from geobingan_sync.text_index import SubstringIndex, substrings
 
 
 def extract_name_from_text(text: str) -> str:
@@ -87,22 +73,16 @@ def fetch_gov_pdf_data(city: dict = None) -> Dict[str, dict]:
     print("📄 來源 1: 政府 PDF...")
     from geobingan_sync.steps.sync_permits import PermitSync
     ps = PermitSync(city=city)
-    pdf_path = ps.download_pdf_list()
-    mapping = ps.parse_pdf_list(pdf_path)
-
-    # 從 PDF 原文解析承造人
-    import pypdf
-    with open(pdf_path, 'rb') as f:
-        reader = pypdf.PdfReader(f)
-        all_text = ''.join(p.extract_text() or '' for p in reader.pages)
+    records = ps.load_permit_records()
+    mapping = ps.records_to_mapping(records)
 
     results = {}
-    for permit in mapping:
-        norm = normalize_permit(permit)
-        if norm:
-            results[norm] = {
+    for rec in records:
+        permit = rec['permit']
+        if permit in mapping:
+            results[permit] = {
                 'source_url': mapping[permit],
-                'source_folder_id': ps.extract_folder_id_from_url(mapping[permit]),
+                'source_folder_id': rec['folder_id'],
             }
 
     print(f"  {len(results)} 個建照")
@@ -225,23 +205,15 @@ def fetch_drive_pdf_names(drive_service) -> Dict[str, dict]:
 def fetch_api_projects() -> list:
     """從 API 取得所有 construction-projects"""
     print("🌐 來源 4: API construction-projects...")
-    token = get_api_token()
-    headers = {'Authorization': f'Bearer {token}', 'X-Current-Group': GROUP_ID}
-
-    all_projects = []
-    page = 1
-    while True:
-        r = _session.get(
-            f'https://riskmap.today/api/groups/{GROUP_ID}/construction-projects/?page={page}&page_size=100',
-            headers=headers, timeout=15
-        )
-        if r.status_code != 200:
-            break
-        data = r.json()
-        all_projects.extend(data.get('results', []))
-        if not data.get('next'):
-            break
-        page += 1
+    # 讀 count 後並行翻頁；401 由 fetcher 統一刷新一次。
+    # 個別頁失敗時略過該頁、回傳其餘頁（原本循序翻頁也是回傳已抓到的頁）；第 1 頁就失敗則 raise，
+    # 由 build_registry 視為必要來源失敗——空清單會讓所有建照看起來都沒有 API 匹配
+    from geobingan_sync.api_pagination import make_json_page_fetcher, fetch_all_pages
+    fetch_page = make_json_page_fetcher(
+        clients.http_session(), f'https://riskmap.today/api/groups/{GROUP_ID}/construction-projects/',
+        {}, token_manager.get_token, headers={'X-Current-Group': GROUP_ID}, timeout=15,
+        invalidate=token_manager.invalidate)
+    all_projects = fetch_all_pages(fetch_page, partial=True)
 
     print(f"  {len(all_projects)} 筆")
     return all_projects
@@ -251,39 +223,13 @@ def fetch_api_projects() -> list:
 def fetch_api_report_categories() -> Dict[str, str]:
     """從 API reports 的 file_name 建立 category → permit 的橋樑"""
     print("📡 來源 5: API construction-reports（建立橋樑）...")
-    token = get_api_token()
-    headers = {'Authorization': f'Bearer {token}'}
-
-    # 分頁取得所有 reports
-    all_reports = []
-    page = 1
-    auth_retries = 0
-    while True:
-        r = _session.get(
-            f'https://riskmap.today/api/reports/construction-reports/?group_id={GROUP_ID}&page={page}&page_size=100',
-            headers=headers, timeout=30
-        )
-        if r.status_code == 401:
-            auth_retries += 1
-            if auth_retries > 2:
-                print("  ❌ 401 重試超過上限，停止")
-                break
-            token = get_api_token()
-            headers = {'Authorization': f'Bearer {token}'}
-            continue
-        auth_retries = 0
-        if r.status_code != 200:
-            break
-        data = r.json()
-        results = data.get('results', [])
-        if not results:
-            break
-        all_reports.extend(results)
-        if not data.get('next'):
-            break
-        page += 1
-        if page % 50 == 0:
-            print(f"    第 {page} 頁...")
+    # 讀本地報告快取（增量同步，只抓上次之後的新報告）
+    from geobingan_sync import report_store
+    from geobingan_sync.api_pagination import make_json_page_fetcher
+    fetch_page = make_json_page_fetcher(
+        clients.http_session(), 'https://riskmap.today/api/reports/construction-reports/',
+        {'group_id': GROUP_ID}, token_manager.get_token, timeout=30, invalidate=token_manager.invalidate)
+    all_reports = report_store.sync_reports(GROUP_ID, fetch_page)
 
     print(f"  {len(all_reports)} 筆報告")
 
@@ -301,47 +247,216 @@ def fetch_api_report_categories() -> Dict[str, str]:
 
 # ==================== 來源 6: API construction-alerts（即時） ====================
 def fetch_live_alerts() -> Dict[str, list]:
-    """從 API 取得即時警示資料（取代靜態 alert_data.csv）"""
+    """從 API 取得即時警示資料（取代靜態 alert_data.csv）
+
+    失敗時 raise（不回傳空 dict）：由 build_registry 的 fetch graph 標記為資料不完整，
+    並保留各建照既有的 live_alerts——空 dict 會被當成「全部建案都沒有警示」。
+    """
     print("🚨 來源 6: API construction-alerts（即時）...")
-    token = get_api_token()
+    token = token_manager.get_token()
     headers = {'Authorization': f'Bearer {token}', 'X-Current-Group': GROUP_ID}
 
-    try:
-        r = _session.get(
-            f'https://riskmap.today/api/groups/{GROUP_ID}/construction-alerts/',
-            headers=headers, timeout=15
-        )
-        if r.status_code != 200:
-            print(f"  API 錯誤: {r.status_code}")
-            return {}
-
-        data = r.json()
-        summary = data.get('summary', {})
-        alerts = data.get('alerts', [])
-
-        print(f"  危險: {summary.get('danger', 0)}, 警戒: {summary.get('warning', 0)}")
-        print(f"  共 {len(alerts)} 筆警示")
-
-        # 按 project 分組
-        by_project = {}  # project_name → [alerts]
-        for alert in alerts:
-            project = alert.get('project', '')
-            if project:
-                if project not in by_project:
-                    by_project[project] = []
-                by_project[project].append({
-                    'level': alert.get('level', ''),
-                    'tone': alert.get('tone', ''),
-                    'detail': alert.get('detail', ''),
-                    'date': alert.get('updatedAt', ''),
-                    'sensor': alert.get('sensor', ''),
-                })
-
-        return by_project
-
-    except Exception as e:
-        print(f"  錯誤: {e}")
-        return {}
+    r = clients.http_session().get(
+        f'https://riskmap.today/api/groups/{GROUP_ID}/construction-alerts/',
+        headers=headers, timeout=15
+    )
+    if r.status_code != 200:
+        raise RuntimeError(f"API 錯誤: {r.status_code}")
+
+    data = r.json()
+    summary = data.get('summary', {})
+    alerts = data.get('alerts', [])
+
+    print(f"  危險: {summary.get('danger', 0)}, 警戒: {summary.get('warning', 0)}")
+    print(f"  共 {len(alerts)} 筆警示")
+
+    # 按 project 分組
+    by_project = {}  # project_name → [alerts]
+    for alert in alerts:
+        project = alert.get('project', '')
+        if project:
+            if project not in by_project:
+                by_project[project] = []
+            by_project[project].append({
+                'level': alert.get('level', ''),
+                'tone': alert.get('tone', ''),
+                'detail': alert.get('detail', ''),
+                'date': alert.get('updatedAt', ''),
+                'sensor': alert.get('sensor', ''),
+            })
+
+    return by_project
+
+
+# ==================== 名稱比對（子字串索引） ====================
+# 原本每個建照都全表掃 API project / 警示名稱（去重是 all-pairs、滑動視窗每個子字串
+# 再全表掃一次）。改為每次 run 建一次 SubstringIndex，比對結果與全表掃描逐筆一致
+# （tests/test_name_matching.py 以 permit_registry.json 做 golden 驗證）。
+_API_WINDOW_NOISE = re.compile(r'(安全觀測|監測報表?|觀測報告|觀測數據|報告|報表|數據)')
+_ALERT_WINDOW_NOISE = re.compile(r'(安全觀測|監測|觀測|報告|報表|數據|新建工程|工程)')
+_NON_CJK = re.compile(r'[^\u4e00-\u9fff]')
+
+
+def dedup_api_projects(api_projects: list) -> Dict[str, dict]:
+    """API project 名稱 → 專案資訊；互為子字串的名稱只保留較完整（較長）的。
+
+    保留的名稱彼此互不包含，所以「新名稱被既有名稱包含」與「新名稱包含既有名稱」
+    不會同時成立：前者跳過新名稱，後者移除被包含的舊名稱。
+    """
+    index = SubstringIndex()
+    api_project_index = {}
+    for p in api_projects:
+        name = p.get('project_name', '')
+        if not name:
+            continue
+        if index.any_containing(name):
+            continue  # 已有更完整的名稱
+        for existing_name in set(substrings(name)):
+            if existing_name in api_project_index:
+                del api_project_index[existing_name]  # 新名稱更完整，移除舊的
+                index.remove(existing_name)
+        index.add(name)
+        alert = p.get('alert_status', {})
+        api_project_index[name] = {
+            'address': p.get('location_address', ''),
+            'stage': p.get('stage', ''),
+            'sensors': p.get('sensor_count', 0),
+            'coordinates': p.get('construction_coordinates'),
+            'alert_label': alert.get('label', '') if isinstance(alert, dict) else '',
+            'alert_tone': alert.get('tone', '') if isinstance(alert, dict) else '',
+            'alert_message': alert.get('message', '') if isinstance(alert, dict) else '',
+            'alert_date': alert.get('report_date', '') if isinstance(alert, dict) else '',
+        }
+    return api_project_index
+
+
+class ApiProjectMatcher:
+    """Drive 檔名建案名稱 → API project（依 api_project_index 順序取第一個命中）"""
+
+    def __init__(self, api_project_index: Dict[str, dict]):
+        self.projects = api_project_index
+        self.index = SubstringIndex(api_project_index)
+        # 清理後名稱（4+ 字）→ API 名稱，預先算好不再每個建照重算
+        self._by_clean: Dict[str, list] = {}
+        for api_name in api_project_index:
+            api_clean = extract_name_from_text(api_name)
+            if len(api_clean) >= 4:
+                self._by_clean.setdefault(api_clean, []).append(api_name)
+
+    def match(self, drive_name: str) -> Optional[tuple]:
+        # 方法 1: 完整子字串匹配（4+ 字）——drive 名稱在 API 名稱內，或 API 清理名稱在 drive 名稱內
+        hits = []
+        if len(drive_name) >= 4:
+            hits.extend(self.index.containing(drive_name)[:1])
+        for sub in set(substrings(drive_name, 4)):
+            if sub in self._by_clean:
+                hits.append(self._by_clean[sub][0])
+        if hits:
+            api_name = min(hits, key=self.index.order)
+            return api_name, self.projects[api_name]
+
+        # 方法 2: 滑動視窗匹配（3+ 字，唯一匹配）
+        drive_cjk = _NON_CJK.sub('', _API_WINDOW_NOISE.sub('', drive_name))
+        for flen in range(min(6, len(drive_cjk)), 2, -1):
+            for start in range(len(drive_cjk) - flen + 1):
+                api_name = self.index.unique_containing(drive_cjk[start:start + flen])
+                if api_name is not None:
+                    return api_name, self.projects[api_name]
+        return None
+
+
+class LiveAlertMatcher:
+    """建案名稱 → 即時警示 project（依 live_alerts 順序取第一個命中）"""
+
+    def __init__(self, live_alerts: Dict[str, list]):
+        self.index = SubstringIndex(live_alerts)
+        self._long_names = {ap for ap in live_alerts if len(ap) >= 3}
+        self._unique_cache: Dict[str, Optional[str]] = {}
+
+    def _unique(self, sub: str) -> Optional[str]:
+        if sub not in self._unique_cache:
+            self._unique_cache[sub] = self.index.unique_containing(sub)
+        return self._unique_cache[sub]
+
+    def match(self, names_to_try: list) -> Optional[str]:
+        hits = set()
+        for try_name in names_to_try:
+            if not try_name:
+                continue
+            # 完整子字串匹配
+            if len(try_name) >= 3:
+                hits.update(self.index.containing(try_name))
+            hits.update(sub for sub in substrings(try_name, 3) if sub in self._long_names)
+            # 滑動視窗匹配（3+ 字，唯一匹配）
+            cjk = _NON_CJK.sub('', _ALERT_WINDOW_NOISE.sub('', try_name))
+            for flen in range(min(5, len(cjk)), 2, -1):
+                for start in range(len(cjk) - flen + 1):
+                    alert_project = self._unique(cjk[start:start + flen])
+                    if alert_project is not None:
+                        hits.add(alert_project)
+        if not hits:
+            return None
+        return min(hits, key=self.index.order)
+
+
+# ==================== 增量重建：per-permit 輸入指紋 ====================
+# 比對邏輯（或指紋涵蓋範圍）有改時遞增，讓所有 entry 重新比對一次
+MATCH_LOGIC_VERSION = 3
+# 不屬於比對結果的欄位：不參與「內容是否變了」的判斷
+_BOOKKEEPING_KEYS = ('updated_at', 'input_fingerprint')
+_GENERIC_ALERT_NAME = re.compile(r'^(監測報告?|監測報表?|監測$|安全觀測報告書?|安全監測系統|觀測報告|觀測數據|工地監測數據)')
+
+
+def _alert_names_to_try(entry: dict) -> list:
+    """警示比對用的名稱（通用名稱不可用於警示匹配，會造成誤配）"""
+    return [n for n in [entry.get('api_match', ''), entry.get('name', '')]
+            if n and not _GENERIC_ALERT_NAME.match(n)]
+
+
+def input_fingerprint(permit: str, entry: dict, *, gov_data: dict, gov_url_statuses: dict,
+                      drive_names: dict, source_names: dict,
+                      api_match: Optional[tuple] = None, alert_match: Optional[tuple] = None) -> str:
+    """此建照比對時看得到的輸入的 hash：政府 PDF 紀錄、URL 狀態、Drive 檔名投票結果、
+    來源資料夾名稱、此建照命中的 API project（api_match）與即時警示 project 及其警示
+    （alert_match），加上 entry 目前的內容。
+
+    API projects / 即時警示只取此建照命中的那一筆——其他建案新增警示不會讓所有建照重比。
+    entry 的指紋在比對（含名稱優化 / 清理）完成後才寫入，所以下次 run 輸入沒變、
+    entry 也沒被手動改過 → 指紋相同，整筆沿用（不重比、不改 updated_at）。
+    """
+    import hashlib
+    payload = {
+        'v': MATCH_LOGIC_VERSION,
+        'gov': gov_data.get(permit),
+        'gov_url_status': gov_url_statuses.get(permit, ''),
+        'drive': drive_names.get(permit),
+        'source_folder': source_names.get(permit, ''),
+        'api': api_match,
+        'alerts': alert_match,
+        'entry': {k: v for k, v in entry.items() if k not in _BOOKKEEPING_KEYS},
+    }
+    blob = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(blob.encode('utf-8')).hexdigest()[:16]
+
+
+def _content_snapshot(entry: dict) -> str:
+    return json.dumps({k: v for k, v in entry.items() if k not in _BOOKKEEPING_KEYS},
+                      sort_keys=True, ensure_ascii=False, default=str)
+
+
+def _write_registry_changes(changed: list, total: int, skipped: int, degraded: list = ()):
+    """輸出本次內容有變的建照清單，下游步驟可只處理這些建照（degraded：本次失敗、以空資料代替的來源）"""
+    os.makedirs(os.path.dirname(REGISTRY_CHANGES_FILE), exist_ok=True)
+    tmp = REGISTRY_CHANGES_FILE + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump({
+            'generated_at': datetime.now().isoformat(),
+            'total': total,
+            'unchanged_inputs': skipped,
+            'degraded_sources': list(degraded),
+            'changed': changed,
+        }, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, REGISTRY_CHANGES_FILE)
 
 
 # ==================== 主程式：交叉比對 ====================
@@ -355,53 +470,59 @@ def build_registry(city: dict = None):
     print(f"🔍 建案交叉比對工具{f' ({city_name})' if city_name else ''}")
     print("=" * 60)
 
-    # 初始化 Drive
-    creds = service_account.Credentials.from_service_account_file(
-        SERVICE_ACCOUNT_FILE, scopes=['https://www.googleapis.com/auth/drive.readonly'])
-    drive_service = build('drive', 'v3', credentials=creds)
+    # 初始化 Drive（credentials thread-safe；service 每個來源各自 build，httplib2 不是）
+    drive_scopes = ['https://www.googleapis.com/auth/drive.readonly']
+
+    def drive_service():
+        return clients.drive_service(SERVICE_ACCOUNT_FILE, drive_scopes)
 
     # 載入現有 registry
     registry = load_existing_registry()
     print(f"現有 registry: {len(registry)} 筆\n")
 
-    # 取得所有來源
-    gov_data = fetch_gov_pdf_data(city=city)
-    source_names, gov_url_statuses = fetch_source_folder_names(gov_data, drive_service)
-    drive_names = fetch_drive_pdf_names(drive_service)
-    api_projects = fetch_api_projects()
-    report_permits = fetch_api_report_categories()
-    live_alerts = fetch_live_alerts()
+    # 取得所有來源（依賴圖並行：只有來源 2 要等政府 PDF 的 folder ID）
+    from geobingan_sync.fetch_graph import FetchTask, run_fetch_graph
+    alerts_task = FetchTask('live_alerts', fetch_live_alerts, default=dict, label='6 即時警示')
+    sources = run_fetch_graph([
+        FetchTask('gov_data', lambda: fetch_gov_pdf_data(city=city),
+                  required=True, label='1 政府 PDF'),
+        FetchTask('source_folders', lambda gov_data: fetch_source_folder_names(gov_data, drive_service()),
+                  deps=('gov_data',), default=lambda: ({}, {}), label='2 來源資料夾'),
+        FetchTask('drive_names', lambda: fetch_drive_pdf_names(drive_service()),
+                  default=dict, label='3 Drive PDF 檔名'),
+        FetchTask('api_projects', fetch_api_projects, required=True, label='4 API projects'),
+        FetchTask('report_permits', fetch_api_report_categories, default=dict, label='5 API reports'),
+        alerts_task,
+    ])
+    gov_data = sources['gov_data']
+    source_names, gov_url_statuses = sources['source_folders']
+    drive_names = sources['drive_names']
+    api_projects = sources['api_projects']
+    report_permits = sources['report_permits']
+    live_alerts = sources['live_alerts']
+    degraded = sources.degraded
+    # 即時警示抓取失敗 → 保留各建照既有的 live_alerts，不當成「沒有警示」清掉
+    alerts_degraded = alerts_task.label in degraded
+
+    # 六個來源與比對程式都和上次成功時相同、registry 也沒被動過 → 結果必然相同，跳過比對與寫檔
+    from geobingan_sync import step_memo
+    memo_name = f"match_permits.{(city or {}).get('id', 'default')}"
+    step_fingerprint = step_memo.Fingerprint(memo_name).data(
+        [gov_data, source_names, gov_url_statuses, drive_names, api_projects, report_permits, live_alerts]
+    ).code('geobingan_sync.steps.match_permits', 'geobingan_sync.text_index',
+           'geobingan_sync.permit_utils').hexdigest()
+    if registry and step_memo.is_fresh(memo_name, step_fingerprint):
+        _write_registry_changes([], len(registry), len(registry), degraded)
+        _write_url_404_csv(registry)
+        return
 
     # 建立 API project 關鍵字索引（用於模糊匹配，去重相似名稱）
-    api_project_index = {}  # keyword → project info
-    for p in api_projects:
-        name = p.get('project_name', '')
-        if not name:
-            continue
-        # 去重：如果已有名稱是此名稱的子字串（或反過來），跳過較短的
-        skip = False
-        to_remove = []
-        for existing_name in api_project_index:
-            if name in existing_name:
-                skip = True  # 已有更完整的名稱
-                break
-            if existing_name in name:
-                to_remove.append(existing_name)  # 新名稱更完整，移除舊的
-        for rm in to_remove:
-            del api_project_index[rm]
-        if skip:
-            continue
-        alert = p.get('alert_status', {})
-        api_project_index[name] = {
-            'address': p.get('location_address', ''),
-            'stage': p.get('stage', ''),
-            'sensors': p.get('sensor_count', 0),
-            'coordinates': p.get('construction_coordinates'),
-            'alert_label': alert.get('label', '') if isinstance(alert, dict) else '',
-            'alert_tone': alert.get('tone', '') if isinstance(alert, dict) else '',
-            'alert_message': alert.get('message', '') if isinstance(alert, dict) else '',
-            'alert_date': alert.get('report_date', '') if isinstance(alert, dict) else '',
-        }
+    api_project_index = dedup_api_projects(api_projects)
+    api_matcher = ApiProjectMatcher(api_project_index)
+    alert_matcher = LiveAlertMatcher(live_alerts)
+    # 指紋與比對共用同一份結果（同一名稱每次 run 只比一次）
+    match_api = functools.lru_cache(maxsize=None)(api_matcher.match)
+    match_alert = functools.lru_cache(maxsize=None)(lambda names: alert_matcher.match(list(names)))
     print(f"  去重後 {len(api_project_index)} 個唯一 project")
 
     # 所有已知的建照號碼
@@ -414,14 +535,29 @@ def build_registry(city: dict = None):
     print(f"{'=' * 60}\n")
 
     generic_name_pat = re.compile(r'^(監測報告?|監測報表?|監測$|安全觀測|安全監測|觀測報告|觀測數據|工地監測|工地$|報告$|報表$|告示牌|基地觀測系統|建號\d)')
-    updated = 0
+    # 比對前的內容快照：結束時只對內容真的變了的 entry 更新 updated_at
+    snapshots = {permit: _content_snapshot(entry) for permit, entry in registry.items()}
+
+    def fingerprint_of(permit: str, entry: dict) -> str:
+        # 只有還沒有地址的建照會跑 API 比對；警示依 entry 目前的名稱解析
+        api = None
+        if not entry.get('address') and permit in drive_names:
+            api = match_api(drive_names[permit]['name'])
+        alert_project = match_alert(tuple(_alert_names_to_try(entry)))
+        alerts = (alert_project, live_alerts[alert_project]) if alert_project is not None else None
+        return input_fingerprint(
+            permit, entry, gov_data=gov_data, gov_url_statuses=gov_url_statuses,
+            drive_names=drive_names, source_names=source_names, api_match=api, alert_match=alerts)
+
+    skipped = 0
     for permit in sorted(all_permits):
         entry = registry.get(permit, {})
-        changed = False
-        # 每次重新比對時清除舊的 live_alerts（避免殘留錯誤匹配）
-        if 'live_alerts' in entry:
-            del entry['live_alerts']
-            changed = True
+        if entry and entry.get('input_fingerprint') == fingerprint_of(permit, entry):
+            skipped += 1  # 輸入與 entry 都沒變 → 比對結果不會變，整筆沿用（不跑比對器）
+            continue
+        # 每次重新比對時清除舊的 live_alerts（避免殘留錯誤匹配）；本次沒抓到警示則保留
+        if not alerts_degraded:
+            entry.pop('live_alerts', None)
 
         # 優先順序合併名稱（短名稱/通用名稱也可被更好的名稱覆蓋）
         current_name = entry.get('name', '')
@@ -441,13 +577,11 @@ def build_registry(city: dict = None):
                 if is_poor_name or (current_source == 'source_folder' and len(drive_name) > len(current_name)):
                     entry['name'] = drive_name
                     entry['name_source'] = 'drive_pdf'
-                    changed = True
 
             # 來源 2: 來源資料夾（補充用）
             if not entry.get('name') and permit in source_names:
                 entry['name'] = source_names[permit]
                 entry['name_source'] = 'source_folder'
-                changed = True
 
         # 合併 Drive 資料
         if permit in drive_names:
@@ -456,32 +590,8 @@ def build_registry(city: dict = None):
         # 合併 API 資料（用檔名關鍵字匹配）
         if not entry.get('address') and permit in drive_names:
             drive_name = drive_names[permit]['name']
-            matched_api = None
-
-            for api_name, api_info in api_project_index.items():
-                # 方法 1: 完整子字串匹配（4+ 字）
-                if len(drive_name) >= 4 and drive_name in api_name:
-                    matched_api = (api_name, api_info)
-                    break
-                api_clean = extract_name_from_text(api_name)
-                if len(api_clean) >= 4 and api_clean in drive_name:
-                    matched_api = (api_name, api_info)
-                    break
-
-            # 方法 2: 滑動視窗匹配（3+ 字，唯一匹配）
-            if not matched_api:
-                drive_cjk = re.sub(r'[^\u4e00-\u9fff]', '', re.sub(r'(安全觀測|監測報表?|觀測報告|觀測數據|報告|報表|數據)', '', drive_name))
-                for flen in range(min(6, len(drive_cjk)), 2, -1):
-                    found = False
-                    for start in range(len(drive_cjk) - flen + 1):
-                        sub = drive_cjk[start:start + flen]
-                        matches = [(n, i) for n, i in api_project_index.items() if sub in n]
-                        if len(matches) == 1:
-                            matched_api = matches[0]
-                            found = True
-                            break
-                    if found:
-                        break
+            # 方法 1: 完整子字串匹配（4+ 字）；方法 2: 滑動視窗匹配（3+ 字，唯一匹配）
+            matched_api = match_api(drive_name)
 
             if matched_api:
                 api_name, api_info = matched_api
@@ -505,50 +615,24 @@ def build_registry(city: dict = None):
                     if api_clean:
                         entry['name'] = api_clean
                         entry['name_source'] = 'api_match'
-                changed = True
 
         # 合併即時警示資料（用名稱匹配，含 api_match）
         # 通用名稱不可用於警示匹配（會造成誤配）
-        generic_alert = re.compile(r'^(監測報告?|監測報表?|監測$|安全觀測報告書?|安全監測系統|觀測報告|觀測數據|工地監測數據)')
         if entry.get('name') or entry.get('api_match'):
-            names_to_try = [n for n in [entry.get('api_match', ''), entry.get('name', '')] if n and not generic_alert.match(n)]
-            for alert_project, alert_list in live_alerts.items():
-                matched_alert = False
-                for try_name in names_to_try:
-                    if not try_name:
-                        continue
-                    # 完整子字串匹配
-                    if (len(try_name) >= 3 and try_name in alert_project) or \
-                       (len(alert_project) >= 3 and alert_project in try_name):
-                        matched_alert = True
-                        break
-                    # 滑動視窗匹配（3+ 字，唯一匹配）
-                    cjk = re.sub(r'[^\u4e00-\u9fff]', '', re.sub(r'(安全觀測|監測|觀測|報告|報表|數據|新建工程|工程)', '', try_name))
-                    for flen in range(min(5, len(cjk)), 2, -1):
-                        for start in range(len(cjk) - flen + 1):
-                            sub = cjk[start:start + flen]
-                            alert_matches = [ap for ap in live_alerts.keys() if sub in ap]
-                            if len(alert_matches) == 1 and sub in alert_project:
-                                matched_alert = True
-                                break
-                        if matched_alert:
-                            break
-                    if matched_alert:
-                        break
-                if matched_alert:
-                    danger = sum(1 for a in alert_list if a['tone'] == 'danger')
-                    warning = sum(1 for a in alert_list if a['tone'] == 'warning')
-                    latest_date = max((a['date'] for a in alert_list if a['date']), default='')
-                    entry['live_alerts'] = {
-                        'danger': danger,
-                        'warning': warning,
-                        'total': len(alert_list),
-                        'latest_date': latest_date,
-                        'details': [a['detail'] for a in alert_list[:3]],
-                    }
-                    if not changed:
-                        changed = True
-                    break
+            names_to_try = _alert_names_to_try(entry)
+            alert_project = match_alert(tuple(names_to_try))
+            if alert_project is not None:
+                alert_list = live_alerts[alert_project]
+                danger = sum(1 for a in alert_list if a['tone'] == 'danger')
+                warning = sum(1 for a in alert_list if a['tone'] == 'warning')
+                latest_date = max((a['date'] for a in alert_list if a['date']), default='')
+                entry['live_alerts'] = {
+                    'danger': danger,
+                    'warning': warning,
+                    'total': len(alert_list),
+                    'latest_date': latest_date,
+                    'details': [a['detail'] for a in alert_list[:3]],
+                }
 
         # 合併來源 URL + URL 活/死狀態（政府 PDF 凍結後 URL 持續腐爛，做列管）
         if permit in gov_data:
@@ -556,10 +640,6 @@ def build_registry(city: dict = None):
         if permit in gov_url_statuses:
             entry['gov_pdf_url_status'] = gov_url_statuses[permit]
 
-        if changed:
-            updated += 1
-
-        entry['updated_at'] = datetime.now().isoformat()
         registry[permit] = entry
 
     # 名稱優化：有 api_match 的建案，用 API 名稱取代通用/較差的名稱
@@ -612,6 +692,20 @@ def build_registry(city: dict = None):
     if name_upgraded:
         print(f"  名稱優化: {name_upgraded} 個建案改用 API 名稱")
 
+    # 比對、名稱優化與清理都完成後才記錄指紋：下次 run 輸入沒變就直接沿用這個結果
+    for permit in all_permits:
+        entry = registry[permit]
+        entry['input_fingerprint'] = fingerprint_of(permit, entry)
+
+    # 只有內容真的變了的 entry 才更新 updated_at（registry 不再每天整檔改寫）
+    now = datetime.now().isoformat()
+    changed_permits = []
+    for permit, entry in registry.items():
+        if snapshots.get(permit) != _content_snapshot(entry):
+            entry['updated_at'] = now
+            changed_permits.append(permit)
+    changed_permits.sort()
+
     # 統計
     has_name = sum(1 for e in registry.values() if e.get('name'))
     has_address = sum(1 for e in registry.values() if e.get('address'))
@@ -626,7 +720,9 @@ def build_registry(city: dict = None):
     print(f"  有地址: {has_address}")
     print(f"  有施工階段: {has_stage}")
     print(f"  有 API 匹配: {has_api}")
-    print(f"  本次更新: {updated}")
+    print(f"  本次更新: {len(changed_permits)}（輸入未變沿用: {skipped}）")
+    if degraded:
+        print(f"  ⚠️ 資料不完整：{'、'.join(degraded)} 抓取失敗，相關欄位本次未更新（保留既有 registry 的值）")
 
     # 名稱來源分布
     source_counts = Counter(e.get('name_source', 'none') for e in registry.values())
@@ -639,6 +735,8 @@ def build_registry(city: dict = None):
     with open(REGISTRY_FILE, 'w', encoding='utf-8') as f:
         json.dump(registry, f, indent=2, ensure_ascii=False)
     print(f"\n✅ 已儲存到 {REGISTRY_FILE}")
+    _write_registry_changes(changed_permits, len(registry), skipped, degraded)
+    step_memo.record(memo_name, step_fingerprint, outputs=[REGISTRY_FILE])
 
     # 列管 PDF URL 失效清單 — 給建管處請求更新政府 PDF 用
     _write_url_404_csv(registry)
@@ -671,14 +769,23 @@ def _write_url_404_csv(registry: dict):
     print(f"📋 失效 URL 列管表已輸出 {out_path}（{len(rows)} 筆）")
 
 
-if __name__ == '__main__':
+def cli(argv=None):
+    """命令列進入點（argv 省略時讀 sys.argv；geobingan_sync.run 在同一 process 內呼叫）"""
     import argparse
     from geobingan_sync.city_config import get_cities_for_cli
 
     parser = argparse.ArgumentParser()
     parser.add_argument('--city', default=None, help='City ID or "all"')
-    args = parser.parse_args()
+    parser.add_argument('--force', action='store_true', help='忽略步驟記憶，無條件重新比對')
+    args = parser.parse_args(argv)
+    if args.force:
+        from geobingan_sync import step_memo
+        step_memo.set_force(['match_permits'])
 
     cities = get_cities_for_cli(args.city)
     for city in cities:
         build_registry(city=city)
+
+
+if __name__ == '__main__':
+    cli()
@@ -25,13 +25,19 @@ from geobingan_sync.notify import send_success, send_failure
 
 def main():
     # 從環境變數讀取（安全，不會有注入問題）
-    status = os.environ.get('SYNC_STATUS', 'success')
-    synced_count = int(os.environ.get('SYNC_SYNCED_COUNT', '0'))
-    uploaded_count = int(os.environ.get('SYNC_UPLOADED_COUNT', '0'))
-    failed_count = int(os.environ.get('SYNC_FAILED_COUNT', '0'))
-    duration_seconds = int(os.environ.get('SYNC_DURATION_SECONDS', '0'))
-    error_message = os.environ.get('SYNC_ERROR_MESSAGE', '')
+    return record_result(
+        status=os.environ.get('SYNC_STATUS', 'success'),
+        synced_count=int(os.environ.get('SYNC_SYNCED_COUNT', '0')),
+        uploaded_count=int(os.environ.get('SYNC_UPLOADED_COUNT', '0')),
+        failed_count=int(os.environ.get('SYNC_FAILED_COUNT', '0')),
+        duration_seconds=int(os.environ.get('SYNC_DURATION_SECONDS', '0')),
+        error_message=os.environ.get('SYNC_ERROR_MESSAGE', ''),
+    )
+
 
+def record_result(status: str, synced_count: int, uploaded_count: int, failed_count: int,
+                  duration_seconds: int, error_message: str = ''):
+    """記錄執行結果並發送通知（geobingan_sync.run 直接呼叫；shell 版經由 main 讀環境變數）"""
     # 記錄執行結果
     sync_status = SyncStatus()
     result = sync_status.end_run(
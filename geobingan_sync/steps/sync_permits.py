@@ -14,8 +14,6 @@ from geobingan_sync import REPO_ROOT
 import os
 import csv
 import re
-import requests
-import urllib3
 import time
 import io
 import sys
@@ -23,14 +21,11 @@ import random
 import threading
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
-from googleapiclient.http import MediaIoBaseDownload, MediaIoBaseUpload
-import pypdf
 from typing import Dict, List, Tuple
 
-import warnings
+from geobingan_sync.lazy_import import lazy_module
+
+requests = lazy_module('requests')
 
 # ================== 設定區域 ==================
 # 請確認金鑰路徑是否正確
@@ -61,8 +56,8 @@ _thread_local = threading.local()
 def _get_credentials():
     global _credentials
     if _credentials is None:
-        _credentials = service_account.Credentials.from_service_account_file(
-            SERVICE_ACCOUNT_FILE, scopes=SCOPES)
+        from geobingan_sync import clients
+        _credentials = clients.credentials(SERVICE_ACCOUNT_FILE, SCOPES)
     return _credentials
 
 
@@ -70,14 +65,16 @@ def get_drive_service():
     """取得主執行緒的 Drive service（lazy init）"""
     global _drive_service
     if _drive_service is None:
-        _drive_service = build('drive', 'v3', credentials=_get_credentials())
+        from geobingan_sync import clients
+        _drive_service = clients.drive_service(SERVICE_ACCOUNT_FILE, SCOPES)
     return _drive_service
 
 
 def get_thread_drive_service():
     """取得當前 thread 的獨立 Drive service instance"""
     if not hasattr(_thread_local, 'service'):
-        _thread_local.service = build('drive', 'v3', credentials=_get_credentials())
+        from geobingan_sync import clients
+        _thread_local.service = clients.drive_service(SERVICE_ACCOUNT_FILE, SCOPES)
     return _thread_local.service
 
 # 並行處理設定
@@ -148,91 +145,51 @@ class PermitSync:
 
     def download_pdf_list(self, max_attempts: int = 3) -> str:
         # retry-with-backoff 防 transient 網路/DNS 失敗（#59）— 配合 network_ready.py
-        # 的 post-wake gate，雙層防禦：probe 等 DNS ready，此處再吸收 mid-run blip
+        # 的 post-wake gate，雙層防禦：probe 等 DNS ready，此處再吸收 mid-run blip。
+        # 下載走 permit_list 快取（conditional GET，304 直接用本地檔；跨步驟共用）
+        from geobingan_sync.permit_list import fetch_permit_list_pdf
         print("📥 下載建案列表 PDF...")
-        last_err = None
-        for attempt in range(1, max_attempts + 1):
-            try:
-                with warnings.catch_warnings():
-                    warnings.filterwarnings('ignore', category=urllib3.exceptions.InsecureRequestWarning)
-                    response = requests.get(self.pdf_list_url, verify=False, timeout=30)
-                pdf_path = '/tmp/permit_list.pdf'
-                with open(pdf_path, 'wb') as f:
-                    f.write(response.content)
-                print(f"✅ 列表已下載: {len(response.content)} bytes")
-                return pdf_path
-            except Exception as e:
-                last_err = e
-                if attempt < max_attempts:
-                    wait = 5 * attempt
-                    print(f"⚠️  下載失敗（第 {attempt}/{max_attempts} 次）: {e}；{wait}s 後重試")
-                    time.sleep(wait)
-        print(f"❌ 下載失敗（已重試 {max_attempts} 次）: {last_err}")
-        sys.exit(1)
-    
+        pdf_path = fetch_permit_list_pdf(
+            self.pdf_list_url, max_attempts=max_attempts,
+            http=requests, sleep=time.sleep,
+        )
+        if not pdf_path:
+            sys.exit(1)
+        return pdf_path
+
+    def load_permit_records(self) -> List[dict]:
+        """下載（條件式）+ 解析列表 PDF 為結構化紀錄；內容沒變時直接沿用快取。"""
+        from geobingan_sync.permit_list import cached_parse, parse_permit_list, RECORDS_KEY
+        pdf_path = self.download_pdf_list()
+        print("\n📖 解析 PDF 列表 (單次掃描)...")
+        return cached_parse(self.pdf_list_url, pdf_path, RECORDS_KEY, parse_permit_list)
+
+    def load_pdf_mapping(self) -> Dict[str, str]:
+        return self.records_to_mapping(self.load_permit_records())
+
     def parse_pdf_list(self, pdf_path: str) -> Dict[str, str]:
-        print("\n📖 解析 PDF 列表 (智慧分塊演算法)...")
-        with open(pdf_path, 'rb') as f:
-            pdf_reader = pypdf.PdfReader(f)
-            all_text = ''.join(p.extract_text() or '' for p in pdf_reader.pages)
-        
-        # 移除空白，接合斷行
-        clean_text = re.sub(r'\s+', '', all_text)
-        permit_mapping = {}
+        from geobingan_sync.permit_list import parse_permit_list
+        print("\n📖 解析 PDF 列表 (單次掃描)...")
+        return self.records_to_mapping(parse_permit_list(pdf_path))
 
-        # 步驟 1: 找出所有「建照號碼」的位置 (插旗)
-        # 使用 iterator 記錄每一個 match 的 start/end 位置
-        permit_matches = list(re.finditer(r'(\d{2,3}建字第\d{3,5}號)', clean_text))
-        
-        if not permit_matches:
+    def records_to_mapping(self, records: List[dict]) -> Dict[str, str]:
+        from geobingan_sync.permit_list import drive_mapping
+        if not records:
             print("❌ 錯誤: 未找到任何建照號碼，請檢查 PDF 內容")
             return {}
-
-        count_found = 0
+        permit_mapping = drive_mapping(records)
         count_missed = 0
-
-        # 步驟 2: 遍歷每個建案，搜尋它「領地」內的網址
-        for i in range(len(permit_matches)):
-            current_match = permit_matches[i]
-            permit_no = current_match.group(1)
-            
-            # 定義搜尋範圍 (Chunking)
-            # 起點：當前建号的结束位置
-            start_pos = current_match.end()
-            
-            # 終點：下一個建号的開始位置 (如果是最後一個，則搜到字串結尾)
-            if i < len(permit_matches) - 1:
-                end_pos = permit_matches[i+1].start()
-            else:
-                end_pos = len(clean_text)
-            
-            # 提取這段區域的文字
-            chunk_text = clean_text[start_pos:end_pos]
-            
-            # 步驟 3: 在區域內搜尋 Google Drive 連結
-            # 這裡使用寬鬆的 Regex，只要是 https://drive.google.com 開頭都抓
-            # 並抓取直到遇到非 URL 安全字符 (防止抓到下一個欄位的中文)
-            url_match = re.search(r'(https://drive\.google\.com[a-zA-Z0-9/._?=%&-]+)', chunk_text)
-            
-            if url_match:
-                url = url_match.group(1)
-                normalized = _normalize_permit(permit_no) or permit_no
-                permit_mapping[normalized] = url
-                count_found += 1
+        for rec in records:
+            if rec['permit'] in permit_mapping:
+                continue
+            if rec['urls'].get('OneDrive'):
+                # 暫時只支援識別，不支援下載 OneDrive (需 Azure 驗證)
+                print(f"  ⚠️ 跳過 OneDrive 連結: {rec['permit']}")
             else:
-                # 只有當找不到 Google 連結時，才嘗試找 OneDrive (選配)
-                onedrive_match = re.search(r'(https://(?:1drv\.ms|onedrive\.live\.com)[\w/._?=%&-]+)', chunk_text)
-                if onedrive_match:
-                     # 暫時只支援識別，不支援下載 OneDrive (需 Azure 驗證)
-                     print(f"  ⚠️ 跳過 OneDrive 連結: {permit_no}")
-                else:
-                     # print(f"  ⚠️ 無連結: {permit_no}") # 除錯用
-                     count_missed += 1
-
+                count_missed += 1
         print(f"✅ 解析完成: 成功配對 {len(permit_mapping)} 個 (無連結/無效: {count_missed} 個)")
-        
         return permit_mapping
-    
+
     def scan_shared_drive(self) -> Dict[str, str]:
         print(f"\n📂 掃描共享雲端...")
         from geobingan_sync.drive_utils import list_top_level_folders
@@ -240,16 +197,11 @@ class PermitSync:
         return {item['name']: item['id'] for item in raw_folders}
     
     def extract_folder_id_from_url(self, url: str) -> str:
-        # 支援 /folders/ID 和 /open?id=ID 兩種格式
-        match = re.search(r'/folders/([a-zA-Z0-9_-]+)', url)
-        if match: return match.group(1)
-        
-        match_id = re.search(r'id=([a-zA-Z0-9_-]+)', url)
-        if match_id: return match_id.group(1)
-        
-        return None
+        from geobingan_sync.permit_list import extract_drive_folder_id
+        return extract_drive_folder_id(url)
     
     def list_files_recursive(self, folder_id: str, path: str = "") -> List[Tuple[str, str, str, str]]:
+        from googleapiclient.errors import HttpError
         files = []
         try:
             # 完整翻頁（#67）：來源資料夾 >1000 檔時，未翻頁的單次查詢會
@@ -290,6 +242,7 @@ class PermitSync:
         """遞迴收集資料夾內所有檔案的 path/name。
         回傳 True 表示完整掃描成功，False 表示任一層失敗。
         """
+        from googleapiclient.errors import HttpError
         try:
             page_token = None
             while True:
@@ -317,6 +270,7 @@ class PermitSync:
 
     def check_file_exists(self, folder_id: str, filename: str, path: str = "", permit_no: str = "") -> bool:
         """用預載入的 set 比對檔案是否存在（O(1) lookup，無 API 呼叫）"""
+        from googleapiclient.errors import HttpError
         if permit_no and permit_no in self._target_file_cache:
             key = f"{path}/{filename}" if path else filename
             # 同時檢查 .url 捷徑
@@ -339,6 +293,7 @@ class PermitSync:
             return False
 
     def create_target_folder(self, folder_name: str) -> str:
+        from googleapiclient.errors import HttpError
         try:
             file_metadata = {'name': folder_name, 'mimeType': 'application/vnd.google-apps.folder', 'parents': [self.shared_drive_id]}
             folder = get_drive_service().files().create(body=file_metadata, fields='id', supportsAllDrives=True).execute()
@@ -349,6 +304,7 @@ class PermitSync:
             return None
 
     def get_or_create_subfolder(self, parent_id: str, path: str) -> str:
+        from googleapiclient.errors import HttpError
         current_folder_id = parent_id
         for folder_name in path.split('/'):
             if not folder_name: continue
@@ -376,6 +332,7 @@ class PermitSync:
         return current_folder_id
 
     def create_shortcut_file(self, parent_id: str, filename: str, web_link: str):
+        from googleapiclient.http import MediaIoBaseUpload
         try:
             link_filename = f"{filename}.url"
             file_content = f"[InternetShortcut]\nURL={web_link}"
@@ -388,6 +345,8 @@ class PermitSync:
             return False
 
     def copy_file(self, source_file_id: str, target_folder_id: str, filename: str, path: str = ""):
+        from googleapiclient.errors import HttpError
+        from googleapiclient.http import MediaIoBaseDownload, MediaIoBaseUpload
         final_folder_id = target_folder_id
         if path:
             final_folder_id = self.get_or_create_subfolder(target_folder_id, path)
@@ -483,8 +442,7 @@ class PermitSync:
         if self.source_type == 'csv':
             self.permit_mapping = self.load_csv_list()
         else:
-            pdf_path = self.download_pdf_list()
-            self.permit_mapping = self.parse_pdf_list(pdf_path)
+            self.permit_mapping = self.load_pdf_mapping()
         self.target_folders = self.scan_shared_drive()
 
         permit_list = list(self.permit_mapping.items())
@@ -529,13 +487,14 @@ class PermitSync:
                     permit_no = futures[future]
                     self._print(f"  ❌ {permit_no} 未預期錯誤: {e}")
 
-if __name__ == '__main__':
+def cli(argv=None):
+    """命令列進入點（argv 省略時讀 sys.argv；geobingan_sync.run 在同一 process 內呼叫）"""
     import argparse
     from geobingan_sync.city_config import get_cities_for_cli
 
     parser = argparse.ArgumentParser()
     parser.add_argument('--city', default=None, help='City ID or "all"')
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     cities = get_cities_for_cli(args.city)
     for city in cities:
@@ -549,4 +508,8 @@ if __name__ == '__main__':
             print("\n🛑 使用者手動停止")
             break
         except Exception as e:
-            print(f"\n❌ {city['name']} 發生錯誤: {e}")
\ No newline at end of file
+            print(f"\n❌ {city['name']} 發生錯誤: {e}")
+
+
+if __name__ == '__main__':
+    cli()
@@ -17,27 +17,22 @@ import sys
 import io
 import time
 import fcntl
-import requests
 from pathlib import Path
 from datetime import datetime, timedelta
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
-from googleapiclient.http import MediaIoBaseDownload
 from typing import Dict, List, Optional
 import threading
 import re
-from geobingan_sync.jwt_auth import decode_jwt_payload, is_token_expired, refresh_access_token, get_valid_token
+from geobingan_sync import token_manager
+from geobingan_sync import binary_inventory
+from geobingan_sync.lazy_import import lazy_module
+from geobingan_sync.pdf_inventory import PdfRecord, annotate_pdfs, as_record, json_default, unique_id_of
 
 # 匯入配置檔案
 try:
     from geobingan_sync.config import (
-        JWT_TOKEN,
         USER_EMAIL,
         GROUP_ID,
         GEOBINGAN_API_URL,
-        REFRESH_TOKEN,
-        GEOBINGAN_REFRESH_URL,
         DELAY_BETWEEN_UPLOADS,
         DAYS_AGO,
         MAX_UPLOADS
@@ -46,15 +41,13 @@ try:
         from geobingan_sync.config import SHARED_DRIVE_ID
     except ImportError:
         SHARED_DRIVE_ID = os.environ.get('SHARED_DRIVE_ID', '0AIvp1h-6BZ1oUk9PVA')
-    print(f"✅ 已載入認證配置（用戶: {USER_EMAIL}）", flush=True)
 except ImportError as e:
     print("❌ 找不到 config.py 或缺少必要設定")
     print(f"   錯誤: {e}")
     print("   請參考 geobingan_sync/config.py.example 建立 geobingan_sync/config.py")
     sys.exit(1)
 
-# 全域變數：當前使用的 Token
-current_access_token = JWT_TOKEN
+requests = lazy_module('requests')
 
 # ================== 設定區域 ==================
 # Google Drive 認證
@@ -99,39 +92,6 @@ BATCH_SAVE_INTERVAL = 10
 _pending_error_saves = 0  # 追蹤錯誤記錄自上次寫入以來的變更數量
 
 
-# ================== JWT Token 管理 ==================
-# JWT 功能已抽取到 jwt_auth.py 模組，以下為本模組的包裝函數
-
-
-def update_config_token(new_token: str, new_refresh_token: str = None):
-    """
-    更新 .env 中的 JWT_TOKEN 和 REFRESH_TOKEN（透過 config 模組）
-    """
-    try:
-        from geobingan_sync.config import update_jwt_token
-        update_jwt_token(new_token, new_refresh_token)
-        print(f"📝 已更新 .env 中的 Token", flush=True)
-    except Exception as e:
-        print(f"⚠️  無法更新 Token: {e}", flush=True)
-
-
-def _get_valid_token() -> str:
-    """
-    取得有效的 access token（使用 jwt_auth 模組）
-    如果 API 同時回傳新的 refresh_token，也會一併更新 .env
-    """
-    global current_access_token
-
-    valid_token, was_refreshed, new_refresh = get_valid_token(
-        current_access_token, REFRESH_TOKEN, GEOBINGAN_REFRESH_URL
-    )
-    if was_refreshed:
-        current_access_token = valid_token
-        update_config_token(valid_token, new_refresh)
-
-    return current_access_token
-
-
 # ================== 狀態管理 ==================
 
 def load_history() -> dict:
@@ -189,9 +149,9 @@ def load_state() -> dict:
             'errors': [],
         }
 
-    # 合併 git 追蹤的上傳歷史（確保 fresh clone 不重複上傳）
-    history = load_history()
-    history_files = set(history.get('uploaded_files', []))
+    # 合併 git 追蹤的上傳歷史（確保 fresh clone 不重複上傳；共用上傳歷史索引）
+    from geobingan_sync import upload_history
+    history_files = upload_history.load_index(HISTORY_FILE).files
     state_files = set(state.get('uploaded_files', []))
     merged = state_files | history_files
     if len(merged) > len(state_files):
@@ -211,6 +171,7 @@ def save_pdf_inventory(all_pdfs: list) -> bool:
     以此為正式資料來源；每 run 掃描完成後寫一次。
     寫入失敗不中斷上傳流程，但會回報 False——load_state 只在 inventory
     檔存在時才移除 legacy cache，故失敗時 fallback 資料源不會被毀。
+    JSON 成功後另寫欄位式二進位檔（binary_inventory），讀者優先 mmap 讀取。
     """
     os.makedirs(os.path.dirname(PDF_INVENTORY_FILE), exist_ok=True)
     tmp = f"{PDF_INVENTORY_FILE}.tmp.{os.getpid()}"
@@ -220,10 +181,9 @@ def save_pdf_inventory(all_pdfs: list) -> bool:
     }
     try:
         with open(tmp, 'w', encoding='utf-8') as f:
-            json.dump(payload, f, ensure_ascii=False)
+            json.dump(payload, f, ensure_ascii=False, default=json_default)
         os.replace(tmp, PDF_INVENTORY_FILE)
         print(f"📦 已更新 PDF inventory（{len(all_pdfs)} 筆）: {PDF_INVENTORY_FILE}")
-        return True
     except Exception as e:
         try:
             os.unlink(tmp)
@@ -231,6 +191,13 @@ def save_pdf_inventory(all_pdfs: list) -> bool:
             pass
         print(f"⚠️  PDF inventory 寫入失敗（不影響上傳流程；legacy fallback 將保留）: {e}")
         return False
+    # 欄位式二進位版（讀者優先 mmap 這份；失敗時讀者因其比 JSON 舊而自動改讀 JSON）
+    try:
+        binary_inventory.write(binary_inventory.bin_path_for(PDF_INVENTORY_FILE), all_pdfs,
+                               {'last_scan': payload['last_scan']})
+    except Exception as e:
+        print(f"⚠️  PDF inventory 二進位檔寫入失敗（讀者將改讀 JSON）: {e}")
+    return True
 
 
 def save_state(state: dict):
@@ -295,10 +262,9 @@ def get_drive_service():
         print(f"❌ 找不到 Service Account 金鑰: {SERVICE_ACCOUNT_FILE}")
         sys.exit(1)
 
-    credentials = service_account.Credentials.from_service_account_file(
-        SERVICE_ACCOUNT_FILE, scopes=SCOPES)
-
-    service = build('drive', 'v3', credentials=credentials)
+    from geobingan_sync import clients
+    credentials = clients.credentials(SERVICE_ACCOUNT_FILE, SCOPES)
+    service = clients.drive_service(SERVICE_ACCOUNT_FILE, SCOPES)
     print(f"✅ 已初始化 ({credentials.service_account_email})", flush=True)
     return service
 
@@ -335,8 +301,9 @@ def list_all_pdfs_with_folder_info(service, folders: List[Dict]) -> List[Dict]:
     live 路徑寫入、快取永遠不命中，卻讓每次 save_state 白白序列化 ~3MB。）
 
     Returns:
-        List of dict with keys: id, name, size, modifiedTime, folder_id, folder_name
+        List of PdfRecord（dict 介面 keys: id, name, size, modifiedTime, folder_id, folder_name）
     """
+    from googleapiclient.errors import HttpError
     # 建立 folder_id → folder_name 的查找表
     folder_lookup = {f['id']: f['name'] for f in folders}
 
@@ -374,10 +341,7 @@ def list_all_pdfs_with_folder_info(service, folders: List[Dict]) -> List[Dict]:
                 folder_name = folder_lookup.get(folder_id, '')
 
                 if folder_name:
-                    pdf['folder_id'] = folder_id
-                    pdf['folder_name'] = folder_name
-                    pdf.pop('parents', None)
-                    all_pdfs.append(pdf)
+                    all_pdfs.append(PdfRecord.from_drive(pdf, folder_id, folder_name))
                 elif folder_id == SHARED_DRIVE_ID:
                     # Shared Drive 根目錄的 PDF：非建案資料、一向不上傳。
                     # 與 unmatched 分開計數，避免每次執行都觸發告警造成狼來了。
@@ -422,9 +386,7 @@ def list_all_pdfs_with_folder_info(service, folders: List[Dict]) -> List[Dict]:
                         supportsAllDrives=True,
                         fields='files(id, name, size, modifiedTime)'
                     ):
-                        pdf['folder_id'] = folder['id']
-                        pdf['folder_name'] = folder['name']
-                        all_pdfs.append(pdf)
+                        all_pdfs.append(PdfRecord.from_drive(pdf, folder['id'], folder['name']))
                 except HttpError as folder_err:
                     # 先記錄、掃完其餘資料夾再 raise：一次呈現完整失敗清單，
                     # 但絕不把部分結果當完整掃描回傳/寫快取（fail-closed）
@@ -449,6 +411,8 @@ def list_all_pdfs_with_folder_info(service, folders: List[Dict]) -> List[Dict]:
 
 def download_pdf(service, file_id: str, file_name: str, max_retries: int = 3) -> Optional[bytes]:
     """從 Google Drive 下載 PDF（支援網路錯誤重試）"""
+    from googleapiclient.errors import HttpError
+    from googleapiclient.http import MediaIoBaseDownload
     for attempt in range(max_retries):
         try:
             request = service.files().get_media(fileId=file_id)
@@ -519,8 +483,8 @@ def upload_to_geobingan(pdf_content: bytes, file_name: str, project_code: str,
                 'file': (file_name, pdf_content, 'application/pdf')
             }
 
-            # 設定 JWT 認證標頭（使用自動刷新的 Token）
-            valid_token = _get_valid_token()
+            # 設定 JWT 認證標頭（共用 TokenManager：背景主動刷新，這裡不阻塞）
+            valid_token = token_manager.get_token()
             headers = {
                 'Authorization': f'Bearer {valid_token}'
             }
@@ -566,13 +530,10 @@ def upload_to_geobingan(pdf_content: bytes, file_name: str, project_code: str,
                     print(f"  ❌ 伺服器不可用 (503)，已重試 {max_retries} 次")
                     return None
             elif response.status_code == 401:
-                # Token 過期，嘗試刷新並重試
+                # Token 被拒：以舊 token 為條件刷新（其他 worker 已換過就直接拿新 token）
                 print(f"  ⚠️  Token 已過期，嘗試刷新...")
-                new_token, new_refresh = refresh_access_token(REFRESH_TOKEN, GEOBINGAN_REFRESH_URL)
-                if new_token:
-                    global current_access_token
-                    current_access_token = new_token
-                    update_config_token(new_token, new_refresh)
+                new_token = token_manager.invalidate(valid_token)
+                if new_token and new_token != valid_token:
                     # 使用新 Token 重試一次
                     headers['Authorization'] = f'Bearer {new_token}'
                     retry_response = requests.post(
@@ -645,7 +606,7 @@ def process_single_pdf(service, pdf: Dict, state: dict, idx: int, total: int) ->
     result = upload_to_geobingan(pdf_content, pdf['name'], pdf['folder_name'])
 
     if result:
-        unique_id = f"{pdf['folder_name']}/{pdf['name']}"
+        unique_id = unique_id_of(pdf)
         with state_lock:
             state['uploaded_files'].append(unique_id)
             # 成功上傳立即寫入，確保 crash 後不會重複上傳
@@ -684,6 +645,7 @@ def select_pdfs_to_upload(all_pdfs: List[Dict], uploaded_files, *, cutoff: datet
     規則（依序）：排除清單 → history 去重（folder/檔名）→ run 內同名去重
     → 檔名日期解析（解析不到跳過）→ cutoff 日期窗 → max_uploads 上限
     （0 = 不限）。輸入先按 Drive modifiedTime 降序排序，讓上限吃到最新的。
+    輸入可為 PdfRecord 或 dict（dict 會轉成 PdfRecord，回傳的也是 PdfRecord）。
 
     cutoff 以「日」為粒度：傳入值會正規化到當日 00:00，確保 cutoff 當日的
     報告（parser 回傳皆為當日 00:00）不會因呼叫端帶時分秒（如
@@ -694,13 +656,8 @@ def select_pdfs_to_upload(all_pdfs: List[Dict], uploaded_files, *, cutoff: datet
         dup_skipped（run 內去重跳過的 unique_id 清單，供 operator 分辨
         良性同名重複 vs 真同名撞檔）。
     """
-    from geobingan_sync.filename_date_parser import parse_date_from_filename
-
-    def _filename_date(pdf):
-        d = parse_date_from_filename(pdf.get('name', ''))
-        if d is None and pdf.get('folder_name'):
-            d = parse_date_from_filename(pdf['folder_name'] + '/' + pdf['name'])
-        return d
+    # 檔名日期：main 已在寫 inventory 時預先算好 report_date（見 pdf_inventory.annotate_pdfs）
+    from geobingan_sync.pdf_inventory import MODIFIED_MIN, report_date_of as _filename_date
 
     cutoff = cutoff.replace(hour=0, minute=0, second=0, microsecond=0)
     uploaded = set(uploaded_files)
@@ -719,12 +676,14 @@ def select_pdfs_to_upload(all_pdfs: List[Dict], uploaded_files, *, cutoff: datet
     # history 尚未寫入，故需獨立的 in-run 集合，否則會建出重複報告（2026-07-17 踩過）。
     seen_this_run = set()
 
-    for pdf in sorted(all_pdfs, key=lambda x: x.get('modifiedTime', ''), reverse=True):
+    records = [as_record(pdf) for pdf in all_pdfs]
+    records.sort(key=lambda x: x.modified or MODIFIED_MIN, reverse=True)
+    for pdf in records:
         if pdf['name'] in exclude:
             counts['excluded'] += 1
             continue
 
-        unique_id = f"{pdf['folder_name']}/{pdf['name']}"
+        unique_id = pdf.unique_id
         if unique_id in uploaded:
             counts['already_uploaded'] += 1
             continue
@@ -764,6 +723,7 @@ def main(city: dict = None, catchup_days: int = None):
     print("\n" + "=" * 60)
     print(f"🚀 上傳最新 PDF 到 geoBingAn{f' ({city_name})' if city_name else ''}")
     print("=" * 60)
+    print(f"✅ 已載入認證配置（用戶: {USER_EMAIL}）", flush=True)
 
     # 初始化
     service = get_drive_service()
@@ -794,7 +754,8 @@ def main(city: dict = None, catchup_days: int = None):
         print("❌ 未找到任何 PDF 檔案")
         sys.exit(1)
 
-    # 掃描結果寫入獨立 inventory（月度趨勢/decline 分析的資料來源）
+    # 掃描結果補上報告日期 / 真工地欄位後寫入獨立 inventory（月度趨勢/decline 分析的資料來源）
+    annotate_pdfs(all_pdfs)
     save_pdf_inventory(all_pdfs)
 
     # 寫回 state：讓 load_state 的 legacy cache 移除（一次性瘦身）落盤
@@ -893,7 +854,8 @@ def main(city: dict = None, catchup_days: int = None):
     print("=" * 60)
 
 
-if __name__ == '__main__':
+def cli(argv=None):
+    """命令列進入點（argv 省略時讀 sys.argv；geobingan_sync.run 在同一 process 內呼叫）"""
     import argparse
     from geobingan_sync.city_config import get_cities_for_cli
 
@@ -902,7 +864,7 @@ if __name__ == '__main__':
     parser.add_argument('--catchup-days', type=int, default=None,
                         help='暫停後補掃：用 N 天檔名日期窗取代預設 30 天'
                              '（history 去重、不會重傳；恢復 .pause_upload 後用一次）')
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     cities = get_cities_for_cli(args.city)
     try:
@@ -916,3 +878,7 @@ if __name__ == '__main__':
         import traceback
         traceback.print_exc()
         sys.exit(1)
+
+
+if __name__ == '__main__':
+    cli()
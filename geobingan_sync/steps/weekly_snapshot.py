@@ -9,6 +9,11 @@
   python3 -m geobingan_sync.steps.weekly_snapshot              # 儲存快照 + 偵測新建案
   python3 -m geobingan_sync.steps.weekly_snapshot --notify      # 有新建案時發送通知
   python3 -m geobingan_sync.steps.weekly_snapshot --diff        # 顯示與上次快照的差異
+  python3 -m geobingan_sync.steps.weekly_snapshot --since 2026-09-01   # 與指定日期的快照比較
+  python3 -m geobingan_sync.steps.weekly_snapshot --weeks 8      # 最近 8 週的指標走勢
+
+快照存成 append-only 時間序列（見 geobingan_sync.snapshot_series）：
+每天一列純量指標 + 建照清單 delta，不再每天寫一份完整 JSON。
 """
 
 import json
@@ -16,7 +21,6 @@ import os
 import sys
 import argparse
 from datetime import datetime
-from pathlib import Path
 
 SNAPSHOT_DIR = './state/weekly_snapshots'
 STATE_DIR = './state'
@@ -24,8 +28,13 @@ DRIVE_CACHE_FILE = './state/uploaded_to_geobingan_7days.json'  # legacy fallback
 PDF_INVENTORY_FILE = './state/pdf_inventory.json'
 
 
-def _load_pdf_inventory() -> list:
-    """讀取全 Drive PDF 清單：優先新版 inventory，fallback legacy state cache。"""
+def _load_pdf_inventory():
+    """讀取全 Drive PDF 清單：優先二進位 inventory（mmap，逐列惰性解碼），
+    其次 JSON inventory，fallback legacy state cache。"""
+    from geobingan_sync.binary_inventory import open_if_fresh
+    binary = open_if_fresh(PDF_INVENTORY_FILE)
+    if binary is not None:
+        return binary
     if os.path.exists(PDF_INVENTORY_FILE):
         try:
             with open(PDF_INVENTORY_FILE, 'r', encoding='utf-8') as f:
@@ -47,58 +56,38 @@ MONTHLY_DROP_THRESHOLD = 0.3
 MONTHLY_MIN_BASELINE = 10
 
 
-def save_snapshot():
-    """儲存本週快照"""
-    with open(f'{STATE_DIR}/permit_system_mapping.json', 'r', encoding='utf-8') as f:
-        mapping = json.load(f)
-    with open(f'{STATE_DIR}/permit_registry.json', 'r', encoding='utf-8') as f:
-        registry = json.load(f)
-
-    # 彙整統計
-    statuses = {}
-    for d in mapping.values():
-        s = d.get('status', '')
-        statuses[s] = statuses.get(s, 0) + 1
-
-    alerts_confirmed = 0
-    for p, info in registry.items():
-        la = info.get('live_alerts', {})
-        if la and la.get('total', 0) > 0 and mapping.get(p, {}).get('system_count', 0) > 0:
-            alerts_confirmed += 1
+def save_snapshot(table=None):
+    """儲存本週快照（table：呼叫端已載入的 PermitTable，省略時自行載入）"""
+    if table is None:
+        from geobingan_sync.permit_table import load_table
+        table = load_table(f'{STATE_DIR}/permit_system_mapping.json', f'{STATE_DIR}/permit_registry.json')
 
     snapshot = {
         'date': datetime.now().strftime('%Y-%m-%d'),
-        'total_permits': len(mapping),
-        'total_pdfs': sum(d.get('drive_count', 0) for d in mapping.values()),
-        'total_ai': sum(d.get('system_count', 0) for d in mapping.values()),
-        'named_permits': sum(1 for e in registry.values() if e.get('name')),
-        'api_matched': sum(1 for e in registry.values() if e.get('api_match')),
-        'alerts_confirmed': alerts_confirmed,
-        'statuses': statuses,
-        'permits': sorted(mapping.keys()),
+        'total_permits': table.total,
+        'total_pdfs': table.total_pdfs(),
+        'total_ai': table.total_ai(),
+        'named_permits': table.named_count(),
+        'api_matched': table.api_matched_count(),
+        'alerts_confirmed': len(table.rows(table.alert_mask())),
+        'statuses': table.status_counts(),
+        'permits': sorted(table.permits[i] for i in table.rows(table.tracked)),
     }
 
-    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
-    filename = f'{SNAPSHOT_DIR}/{snapshot["date"]}.json'
-    with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(snapshot, f, indent=2, ensure_ascii=False)
+    from geobingan_sync.snapshot_series import open_series
+    series = open_series(SNAPSHOT_DIR)
+    series.append(snapshot)
 
-    print(f"📸 快照已儲存: {filename}")
+    print(f"📸 快照已儲存: {series.data_path}（第 {len(series)} 筆）")
     return snapshot
 
 
 def get_previous_snapshot():
-    """取得最近一次的快照"""
+    """取得最近一次的快照（跳過今天的）"""
     if not os.path.exists(SNAPSHOT_DIR):
         return None
-    files = sorted(Path(SNAPSHOT_DIR).glob('*.json'), reverse=True)
-    # 跳過今天的
-    today = datetime.now().strftime('%Y-%m-%d')
-    for f in files:
-        if f.stem != today:
-            with open(f, 'r', encoding='utf-8') as fp:
-                return json.load(fp)
-    return None
+    from geobingan_sync.snapshot_series import open_series
+    return open_series(SNAPSHOT_DIR).snapshot_before(datetime.now().strftime('%Y-%m-%d'))
 
 
 def compute_diff(current, previous):
@@ -108,11 +97,26 @@ def compute_diff(current, previous):
 
     curr_permits = set(current.get('permits', []))
     prev_permits = set(previous.get('permits', []))
+    return _diff_of(current, previous, sorted(curr_permits - prev_permits), sorted(prev_permits - curr_permits))
+
+
+def diff_between(start: str, end: str):
+    """任兩個日期（各取當天或之前最後一份快照）之間的差異；只讀兩者之間的 delta 紀錄"""
+    if not os.path.exists(SNAPSHOT_DIR):
+        return None
+    from geobingan_sync.snapshot_series import open_series
+    changes = open_series(SNAPSHOT_DIR).changes_between(start, end)
+    if changes is None:
+        return None
+    before, after, added, removed = changes
+    return _diff_of(after, before, added, removed)
+
 
+def _diff_of(current, previous, new_permits, removed_permits):
     diff = {
         'period': f"{previous['date']} → {current['date']}",
-        'new_permits': sorted(curr_permits - prev_permits),
-        'removed_permits': sorted(prev_permits - curr_permits),
+        'new_permits': new_permits,
+        'removed_permits': removed_permits,
         'total_change': current['total_permits'] - previous['total_permits'],
         'pdfs_change': current['total_pdfs'] - previous['total_pdfs'],
         'ai_change': current['total_ai'] - previous['total_ai'],
@@ -151,6 +155,28 @@ def format_diff(diff):
     return '\n'.join(lines)
 
 
+SERIES_METRICS = [
+    ('total_permits', '建案數'),
+    ('total_pdfs', '雲端報告'),
+    ('total_ai', 'AI 分析'),
+    ('alerts_confirmed', '監測警戒'),
+]
+
+
+def format_metric_series(weeks: int, end: str = None):
+    """最近 weeks 週的指標走勢（每週最後一份快照）"""
+    from geobingan_sync.snapshot_series import open_series
+    series = open_series(SNAPSHOT_DIR)
+    lines = [f"📈 最近 {weeks} 週指標走勢"]
+    for name, label in SERIES_METRICS:
+        points = series.metric_series(name, weeks, end)
+        if points:
+            lines.append(f"  {label}：" + ' → '.join(f'{v:,}' for _, v in points))
+    if len(lines) == 1:
+        lines.append("  （無快照資料）")
+    return '\n'.join(lines)
+
+
 def notify_new_permits(diff):
     """新建案通知"""
     if not diff or not diff['new_permits']:
@@ -185,12 +211,12 @@ def notify_new_permits(diff):
 
 
 def _bin_pdfs_by_report_month(pdfs):
-    """從檔名解析報告日期，依年月計數。"""
+    """依報告日期（只認檔名本身解析出的日期）的年月計數；inventory 已有 report_date 時不再解析檔名。"""
     from collections import Counter
-    from geobingan_sync.filename_date_parser import parse_date_from_filename
+    from geobingan_sync.pdf_inventory import report_date_of
     by_month = Counter()
     for p in pdfs:
-        dt = parse_date_from_filename(p.get('name', ''))
+        dt = report_date_of(p, folder_fallback=False)
         if dt:
             by_month[(dt.year, dt.month)] += 1
     return by_month
@@ -215,14 +241,17 @@ def check_monthly_activity_trend(notify: bool = False):
     if not pdfs:
         return
 
-    by_month = _bin_pdfs_by_report_month(pdfs)
+    # 每月計數來自增量維護的活動立方體（只套用 inventory 差異，不再整份重新分箱）
+    from geobingan_sync.activity_cube import update_cube
+    cube = update_cube(pdfs)
+    month_count = lambda y, m: cube.month_total(y, m, filename_only=True)
     today = datetime.now()
     last_y, last_m = _months_back(today.year, today.month, 1)
     last_label = f'{last_y}-{last_m:02d}'
-    last_count = by_month.get((last_y, last_m), 0)
+    last_count = month_count(last_y, last_m)
 
     prior_keys = [_months_back(last_y, last_m, n) for n in range(1, 4)]
-    prior_counts = [by_month.get(k, 0) for k in prior_keys]
+    prior_counts = [month_count(*k) for k in prior_keys]
     prior_avg = sum(prior_counts) / len(prior_counts)
 
     print(f"\n📊 月度監測報告：{last_label} = {last_count}，前 3 月平均 = {prior_avg:.1f}")
@@ -245,7 +274,7 @@ def check_monthly_activity_trend(notify: bool = False):
 
     drop_pct = (1 - last_count / prior_avg) * 100
     prior_detail = ', '.join(
-        f'{y}-{m:02d}={by_month.get((y, m), 0)}'
+        f'{y}-{m:02d}={month_count(y, m)}'
         for y, m in reversed(prior_keys)
     )
     msg = (
@@ -256,11 +285,11 @@ def check_monthly_activity_trend(notify: bool = False):
 
     # 自動帶上候選工地（前月活躍、本月歸零），讓告警一觸發就有可調查的對象
     try:
-        from geobingan_sync.analyze_decline import find_decline_candidates, format_candidates, load_pdfs
-        analyzer_pdfs = load_pdfs()
-        if analyzer_pdfs:
-            candidates = find_decline_candidates(analyzer_pdfs, last_y, last_m, top=5)
-            msg += '\n\n' + format_candidates(candidates, last_label)
+        from geobingan_sync.analyze_decline import find_decline_candidates, format_candidates, score_stalled_sites
+        # 先依停報異常分數排序；沒有工地達到分數門檻時退回固定門檻規則
+        candidates = (score_stalled_sites(cube, last_y, last_m, top=5)
+                      or find_decline_candidates(pdfs, last_y, last_m, top=5, cube=cube))
+        msg += '\n\n' + format_candidates(candidates, last_label)
     except Exception as e:
         msg += f'\n\n（候選工地分析失敗: {e}）'
 
@@ -285,24 +314,32 @@ def check_monthly_activity_trend(notify: bool = False):
         print(f"  ⚠️ 無法寫入告警狀態: {e}")
 
 
-def main():
+def main(argv=None, table=None):
+    """argv 省略時讀 sys.argv；table 為呼叫端已載入的 PermitTable（geobingan_sync.run 傳入）"""
     parser = argparse.ArgumentParser(description='週報快照管理')
     parser.add_argument('--notify', action='store_true', help='新建案時發送通知')
     parser.add_argument('--diff', action='store_true', help='顯示與上次快照的差異')
-    args = parser.parse_args()
+    parser.add_argument('--since', metavar='YYYY-MM-DD', help='改與指定日期（或之前最近一份）的快照比較')
+    parser.add_argument('--weeks', type=int, default=0, help='印出最近 N 週的指標走勢')
+    args = parser.parse_args(argv)
 
     # 儲存快照
-    current = save_snapshot()
+    current = save_snapshot(table)
 
     # 取得前次快照並比較
-    previous = get_previous_snapshot()
-    diff = compute_diff(current, previous)
+    if args.since:
+        diff = diff_between(args.since, current['date'])
+    else:
+        diff = compute_diff(current, get_previous_snapshot())
 
     if diff:
         print(format_diff(diff))
     else:
         print("（首次快照，無前次資料可比較）")
 
+    if args.weeks > 0:
+        print(format_metric_series(args.weeks))
+
     # 通知新建案
     if args.notify and diff and diff['new_permits']:
         notify_new_permits(diff)
@@ -0,0 +1,162 @@
+"""
+名稱子字串查詢索引（建案名稱比對用）
+
+match_permits 的比對邏輯本質上都是「哪些名稱包含這個子字串」：
+API project 去重、方法 1/2 的檔名 → API project 比對、即時警示的滑動視窗唯一匹配。
+原本每次都全表 `sub in name` 掃描，建照數 × project 數 × 視窗數的二次方以上成本。
+
+SubstringIndex 以字元 bigram 建倒排索引：查詢時取查詢字串各 bigram 的 posting
+交集當候選，再以 `in` 驗證——結果與全表掃描完全一致，只是不再碰不可能命中的名稱。
+查詢結果一律依 key 的插入順序回傳（呼叫端的「第一個命中」語意依賴這個順序）。
+
+AhoCorasick 則是反方向：給一段文字（報告檔名），一次找出它包含了哪些已知名稱 / 片段，
+取代「對每個名稱做一次 `name in filename`」。
+"""
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+
+
+def _bigrams(text: str) -> Set[str]:
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+def substrings(text: str, min_len: int = 1) -> Iterator[str]:
+    """列舉 text 所有長度 ≥ min_len 的子字串（名稱都很短，O(L²) 可接受）"""
+    n = len(text)
+    for start in range(n):
+        for end in range(start + min_len, n + 1):
+            yield text[start:end]
+
+
+class SubstringIndex:
+    """可增刪的 bigram 倒排索引；key 以遞增序號記錄插入順序。"""
+
+    def __init__(self, keys: Iterable[str] = ()):
+        self._order: Dict[str, int] = {}
+        self._postings: Dict[str, Set[str]] = {}
+        self._seq = 0
+        for key in keys:
+            self.add(key)
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._order
+
+    def add(self, key: str):
+        if key in self._order:
+            return
+        self._order[key] = self._seq
+        self._seq += 1
+        for bg in _bigrams(key):
+            self._postings.setdefault(bg, set()).add(key)
+
+    def remove(self, key: str):
+        if self._order.pop(key, None) is None:
+            return
+        for bg in _bigrams(key):
+            bucket = self._postings.get(bg)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._postings[bg]
+
+    def _candidates(self, sub: str):
+        if len(sub) < 2:
+            # 單字元（或空字串）沒有 bigram 可用 → 全表掃描
+            return self._order.keys()
+        buckets = []
+        for bg in _bigrams(sub):
+            bucket = self._postings.get(bg)
+            if not bucket:
+                return ()
+            buckets.append(bucket)
+        buckets.sort(key=len)
+        if len(buckets) == 1:
+            return buckets[0]
+        return buckets[0].intersection(*buckets[1:])
+
+    def containing(self, sub: str) -> List[str]:
+        """所有包含 sub 的 key，依插入順序"""
+        hits = [k for k in self._candidates(sub) if sub in k]
+        hits.sort(key=self._order.__getitem__)
+        return hits
+
+    def any_containing(self, sub: str) -> bool:
+        return any(sub in k for k in self._candidates(sub))
+
+    def unique_containing(self, sub: str) -> Optional[str]:
+        """恰好一個 key 包含 sub 時回傳該 key，否則 None（0 個或 ≥2 個）"""
+        found = None
+        for k in self._candidates(sub):
+            if sub in k:
+                if found is not None:
+                    return None
+                found = k
+        return found
+
+    def order(self, key: str) -> int:
+        return self._order[key]
+
+    def first_overlapping(self, text: str) -> Optional[str]:
+        """插入順序第一個「包含 text 或被 text 包含」的 key（部分名稱比對）"""
+        hits = self.containing(text)
+        first = hits[0] if hits else None
+        for sub in set(substrings(text)):
+            if sub in self._order and (first is None or self._order[sub] < self._order[first]):
+                first = sub
+        return first
+
+
+class AhoCorasick:
+    """多字串同時比對自動機：一次掃過 text，找出所有出現過的 pattern。
+
+    pattern 依傳入順序編號；find(text) 回傳出現過的 pattern 編號集合。
+    """
+
+    def __init__(self, patterns: Iterable[str]):
+        self.patterns = list(patterns)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[int]] = [[]]
+        for idx, pat in enumerate(self.patterns):
+            if not pat:
+                continue
+            node = 0
+            for ch in pat:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                node = nxt
+            self._out[node].append(idx)
+        self._build_fail_links()
+
+    def _build_fail_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                target = self._goto[f].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def find(self, text: str) -> Set[int]:
+        found: Set[int] = set()
+        node = 0
+        goto, fail, out = self._goto, self._fail, self._out
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                found.update(out[node])
+        return found
@@ -0,0 +1,298 @@
+"""
+共用 JWT Token 管理（跨 thread / 跨 process）
+
+原本 upload_pdfs、match_permits、generate_permit_tracking_report 各自持有一份
+current_access_token / JWT_TOKEN，各自以 jwt_auth.get_valid_token 檢查、刷新、
+config.update_jwt_token 寫回 .env；_token_lock 只在單一 process 內有效：
+- 同一次 run 的三個步驟各刷新一次；refresh token 輪替後，其他模組手上的
+  REFRESH_TOKEN 已作廢，之後的刷新必定失敗
+- 兩個 process 同時執行（weekly 與手動 upload）會拿同一個 refresh token 各刷一次
+- token 在上傳途中過期時，worker 要先吃一個 401 再同步等刷新
+
+TokenManager 在 process 內只有一個（get_manager()），所有呼叫端共用：
+- current() 不阻塞：直接回傳記憶體中的 token；剩餘時間少於 PROACTIVE_SECONDS
+  時交給背景 thread 刷新，只有 token 已實際過期才同步等待
+- 背景 thread 在 exp − PROACTIVE_SECONDS 主動刷新
+- 刷新 single-flight：process 內以 threading.Lock，跨 process 以
+  state/token_refresh.lock（flock）；拿到鎖後先重讀 state/token_cache.json，
+  別的 process 已經換過 token 就直接沿用，不再打 refresh endpoint
+- invalidate(stale)：401 時以「舊 token」為條件只刷新一次
+  （與 api_pagination.SharedToken 同語意）
+- 刷新成功寫共用快取（atomic、0600），並在鎖內以 config.update_jwt_token 寫回 .env
+- 刷新失敗沿用舊 token（與 get_valid_token 的降級策略一致），RETRY_SECONDS 內不重試
+"""
+import fcntl
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Optional, Tuple
+
+from geobingan_sync import REPO_ROOT, jwt_auth
+
+TOKEN_CACHE_FILE = REPO_ROOT / 'state' / 'token_cache.json'
+TOKEN_LOCK_FILE = REPO_ROOT / 'state' / 'token_refresh.lock'
+CACHE_VERSION = 1
+# 剩餘有效時間少於此秒數 → 背景主動刷新（呼叫端照常拿到目前的 token）
+PROACTIVE_SECONDS = 10 * 60
+# 剩餘有效時間少於此秒數才視為不可用 → 呼叫端同步等待刷新
+EXPIRED_SECONDS = 30
+# 刷新失敗後幾秒內不再重試（避免每個 worker 各打一次 refresh endpoint）
+RETRY_SECONDS = 60
+
+# refresh_fn(refresh_token, refresh_url) → (new_access, new_refresh)；失敗回傳 (None, None)
+RefreshFn = Callable[[str, str], Tuple[Optional[str], Optional[str]]]
+
+
+def token_expiry(token: str) -> Optional[float]:
+    """JWT 的 exp（epoch 秒）；無法解碼或沒有 exp 時回傳 None"""
+    if not token:
+        return None
+    exp = jwt_auth.decode_jwt_payload(token).get('exp')
+    return float(exp) if exp else None
+
+
+class TokenManager:
+    """一組 access / refresh token 的持有者；所有方法皆 thread-safe。"""
+
+    def __init__(self, access_token: str, refresh_token: str, refresh_url: str, *,
+                 cache_file=None, lock_file=None,
+                 refresh_fn: RefreshFn = None, persist_env: bool = True,
+                 proactive_seconds: float = PROACTIVE_SECONDS, clock: Callable[[], float] = time.time):
+        self.refresh_url = refresh_url
+        self.cache_file = str(cache_file or TOKEN_CACHE_FILE)
+        self.lock_file = str(lock_file or TOKEN_LOCK_FILE)
+        self.persist_env = persist_env
+        self.proactive_seconds = proactive_seconds
+        self._refresh_fn = refresh_fn
+        self._clock = clock
+
+        self._lock = threading.Lock()          # 保護 _access / _refresh 等狀態
+        self._refresh_lock = threading.Lock()  # process 內 single-flight
+        self._access = access_token or ''
+        self._refresh = refresh_token or ''
+        self._failed_at: Optional[float] = None
+        self._background = False
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.refreshes = 0  # 本 process 實際打 refresh endpoint 的次數
+
+        self._adopt(self._read_cache())
+
+    # ── 取得 token ──
+
+    def peek(self) -> str:
+        with self._lock:
+            return self._access
+
+    def remaining(self, token: str = None) -> float:
+        """token 剩餘有效秒數；無法解碼時回傳 -inf（視為已過期）"""
+        exp = token_expiry(self.peek() if token is None else token)
+        return float('-inf') if exp is None else exp - self._clock()
+
+    def current(self) -> str:
+        """目前可用的 access token；只有已過期才會阻塞等刷新"""
+        token = self.peek()
+        remaining = self.remaining(token)
+        if remaining > self.proactive_seconds:
+            return token
+        if remaining > EXPIRED_SECONDS:
+            self._refresh_in_background(token)
+            return token
+        return self.refresh(token)
+
+    def invalidate(self, stale: str) -> str:
+        """stale 被 API 拒絕（401）→ 刷新一次；其他 thread / process 已經換過就直接回傳新 token"""
+        return self.refresh(stale, force=True)
+
+    # ── 刷新 ──
+
+    def _superseded(self, stale: str) -> Optional[str]:
+        """目前持有的 token 已不是 stale 且仍可用 → 回傳它（別人已經刷新過）"""
+        token = self.peek()
+        if token and token != stale and self.remaining(token) > EXPIRED_SECONDS:
+            return token
+        return None
+
+    def refresh(self, stale: str, force: bool = False) -> str:
+        """single-flight 刷新；回傳刷新後（或失敗時沿用）的 access token"""
+        with self._refresh_lock:
+            token = self._superseded(stale)
+            if token is not None:
+                return token
+            if not force and self._failed_at is not None and self._clock() - self._failed_at < RETRY_SECONDS:
+                return self.peek()
+            with self._file_lock():
+                # 等鎖期間別的 process 可能已經刷新並寫入共用快取
+                self._adopt(self._read_cache())
+                token = self._superseded(stale)
+                if token is not None:
+                    return token
+                with self._lock:
+                    refresh_token = self._refresh
+                if not refresh_token:
+                    print("⚠️  沒有 Refresh Token，無法刷新 JWT Token", flush=True)
+                    self._failed_at = self._clock()
+                    return self.peek()
+
+                refresh_fn = self._refresh_fn or jwt_auth.refresh_access_token
+                new_token, new_refresh = refresh_fn(refresh_token, self.refresh_url)
+                self.refreshes += 1
+                if not new_token:
+                    print("⚠️  使用舊 Token 嘗試（可能會失敗）", flush=True)
+                    self._failed_at = self._clock()
+                    return self.peek()
+
+                with self._lock:
+                    self._access = new_token
+                    if new_refresh:
+                        self._refresh = new_refresh
+                self._failed_at = None
+                self._write_cache()
+                if self.persist_env:
+                    self._persist_env(new_token, new_refresh)
+                return new_token
+
+    def _refresh_in_background(self, stale: str):
+        with self._lock:
+            if self._background:
+                return
+            self._background = True
+
+        def run():
+            try:
+                self.refresh(stale)
+            finally:
+                with self._lock:
+                    self._background = False
+
+        threading.Thread(target=run, name='token-refresh-once', daemon=True).start()
+
+    # ── 背景主動刷新 ──
+
+    def start(self):
+        """啟動背景 thread：在 exp − proactive_seconds 主動刷新（daemon，不阻擋 process 結束）"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='token-refresh', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5):
+        self._stop.set()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+        self._thread = None
+
+    def _next_delay(self) -> float:
+        return self.remaining() - self.proactive_seconds
+
+    def _run(self):
+        while not self._stop.is_set():
+            delay = self._next_delay()
+            if delay <= 0:
+                self.refresh(self.peek())
+                delay = max(self._next_delay(), RETRY_SECONDS)
+            self._stop.wait(delay)
+
+    # ── 共用快取 / 鎖 / .env ──
+
+    @contextmanager
+    def _file_lock(self):
+        os.makedirs(os.path.dirname(self.lock_file), exist_ok=True)
+        with open(self.lock_file, 'w') as fd:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+
+    def _read_cache(self) -> dict:
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+        if not isinstance(data, dict) or data.get('version') != CACHE_VERSION:
+            return {}
+        return data
+
+    def _adopt(self, cache: dict):
+        """快取中的 token 不比手上的舊（exp 相同時以快取為準）才採用；refresh token 跟著 access token 走"""
+        access = cache.get('access_token') or ''
+        refresh = cache.get('refresh_token') or ''
+        with self._lock:
+            if access and access != self._access and (token_expiry(access) or 0) >= (token_expiry(self._access) or 0):
+                self._access = access
+                if refresh:
+                    self._refresh = refresh
+            elif refresh and (token_expiry(refresh) or 0) > (token_expiry(self._refresh) or 0):
+                self._refresh = refresh
+
+    def _write_cache(self):
+        with self._lock:
+            data = {
+                'version': CACHE_VERSION,
+                'access_token': self._access,
+                'refresh_token': self._refresh,
+                'updated_at': datetime.now().isoformat(timespec='seconds'),
+            }
+        os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+        tmp = f'{self.cache_file}.tmp.{os.getpid()}'
+        try:
+            fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=2)
+            os.replace(tmp, self.cache_file)
+        except OSError as e:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            print(f"⚠️  Token 快取寫入失敗（不影響本次結果）: {e}", flush=True)
+
+    @staticmethod
+    def _persist_env(new_token: str, new_refresh: Optional[str]):
+        try:
+            from geobingan_sync.config import update_jwt_token
+            update_jwt_token(new_token, new_refresh)
+        except Exception as e:
+            print(f"⚠️  無法更新 .env Token: {e}", flush=True)
+
+
+_manager: Optional[TokenManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_manager() -> TokenManager:
+    """process 內共用的 TokenManager（第一次呼叫時由 config 建立並啟動背景刷新）"""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            from geobingan_sync import config
+            _manager = TokenManager(config.JWT_TOKEN, config.REFRESH_TOKEN, config.GEOBINGAN_REFRESH_URL)
+            _manager.start()
+        return _manager
+
+
+def get_token() -> str:
+    """目前可用的 access token（不阻塞；已過期才同步刷新）"""
+    return get_manager().current()
+
+
+def invalidate(stale: str) -> str:
+    """API 回 401 時呼叫：以被拒絕的 token 為條件刷新一次，回傳新 token"""
+    return get_manager().invalidate(stale)
+
+
+def reset():
+    """停止背景刷新並丟棄共用實例（測試用）"""
+    global _manager
+    with _manager_lock:
+        if _manager is not None:
+            _manager.stop()
+        _manager = None
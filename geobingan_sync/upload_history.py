@@ -0,0 +1,144 @@
+"""
+上傳歷史索引（state/upload_history_all.json）
+
+generate_permit_tracking_report 一次 run 會把上傳歷史讀進來、逐筆 regex 解析三次
+（檔名 → 建照對應、各建照已上傳檔案、建案名稱投票），upload_pdfs.load_state 再讀一次；
+其中檔名對應還用 `if f not in all_files` 做 list 合併（O(n²)）。
+
+load_index() 只解析一次，並以檔案 (mtime, size) 快取：同一 process 內重複呼叫
+直接回傳同一份索引，檔案被改寫（add_to_history）後下次呼叫自動重建。
+索引提供：
+- files：所有紀錄（'建照/檔名'）的 set
+- by_permit：建照 → 已上傳檔名 set
+- filename_to_permit：檔名 → 建照（含補上 .pdf 的變體）
+- name_votes / name_to_permit：從檔名萃取的建案名稱出現次數（惰性計算）
+
+索引物件在 process 內共用，呼叫端請勿修改其內容（要改請先 copy）。
+"""
+import json
+import os
+import re
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+
+from geobingan_sync import REPO_ROOT
+
+HISTORY_FILE = REPO_ROOT / 'state' / 'upload_history_all.json'
+
+_RE_PERMIT = re.compile(r'(\d{2,3}建字第\d{3,5}號)')
+_RE_PERMIT_PREFIX = re.compile(r'\d{2,3}建字第\d{3,5}號')
+
+_cache: Dict[str, Tuple[tuple, 'UploadHistoryIndex']] = {}
+_cache_lock = threading.Lock()
+
+
+def item_path(item) -> str:
+    """上傳紀錄轉成 '建照/檔名' 路徑（舊格式可能是 dict）"""
+    if isinstance(item, dict):
+        return item.get('permit', '') + '/' + item.get('pdf', {}).get('name', '')
+    return str(item)
+
+
+def add_filename_mapping(mapping: Dict[str, str], item):
+    """紀錄含建照號時，把檔名（子資料夾取最後一段）對應到建照；也補上加了 .pdf 的變體"""
+    filepath = item_path(item)
+    match = _RE_PERMIT.search(filepath)
+    if not match:
+        return
+    permit = match.group(1)
+    filename = filepath.split('/')[-1]
+    mapping[filename] = permit
+    if not filename.lower().endswith('.pdf'):
+        mapping[filename + '.pdf'] = permit
+
+
+class UploadHistoryIndex:
+    """upload_history_all.json 的一次性解析結果"""
+
+    def __init__(self, history: dict):
+        self.history = history
+        self.entries: List = list(history.get('uploaded_files', []))
+        self.files: Set[str] = {e for e in self.entries if isinstance(e, str)}
+        self.by_permit: Dict[str, Set[str]] = {}
+        self.filename_to_permit: Dict[str, str] = {}
+        for item in self.entries:
+            add_filename_mapping(self.filename_to_permit, item)
+            if isinstance(item, str) and '/' in item:
+                permit, filename = item.split('/', 1)
+                self.by_permit.setdefault(permit, set()).add(filename)
+        self._name_votes: Optional[Dict[str, Dict[str, int]]] = None
+        self._name_to_permit: Optional[Dict[str, str]] = None
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _count_names(self):
+        from geobingan_sync.permit_utils import extract_name_from_filename
+        votes: Dict[str, Dict[str, int]] = {}
+        name_to_permit: Dict[str, str] = {}
+        for item in self.entries:
+            if not (isinstance(item, str) and '/' in item):
+                continue
+            permit, filename = item.split('/', 1)
+            # 只接受合法的建照號碼格式
+            if not _RE_PERMIT_PREFIX.match(permit):
+                continue
+            name = extract_name_from_filename(filename)
+            if name and permit:
+                name_to_permit[name] = permit
+                counts = votes.setdefault(permit, {})
+                counts[name] = counts.get(name, 0) + 1
+        self._name_votes = votes
+        self._name_to_permit = name_to_permit
+
+    @property
+    def name_votes(self) -> Dict[str, Dict[str, int]]:
+        """建照 → {建案名稱: 出現次數}（名稱依第一次出現的順序）"""
+        if self._name_votes is None:
+            self._count_names()
+        return self._name_votes
+
+    @property
+    def name_to_permit(self) -> Dict[str, str]:
+        """建案名稱 → 建照（同名多建照時取最後一筆）"""
+        if self._name_to_permit is None:
+            self._count_names()
+        return self._name_to_permit
+
+    def most_common_names(self) -> Dict[str, str]:
+        """每個建照最常出現的名稱（同票取先出現者）"""
+        return {permit: max(counts.items(), key=lambda x: x[1])[0]
+                for permit, counts in self.name_votes.items() if counts}
+
+
+def _file_key(path: str) -> Optional[tuple]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def load_index(path=None) -> UploadHistoryIndex:
+    """讀取（或沿用快取的）上傳歷史索引；檔案不存在時回傳空索引。
+
+    JSON 損壞時 raise（與原本各呼叫端直接 json.load 的行為一致）。
+    """
+    path = str(path or HISTORY_FILE)
+    key = _file_key(path)
+    with _cache_lock:
+        cached = _cache.get(path)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        if key is None:
+            index = UploadHistoryIndex({})
+        else:
+            with open(path, 'r', encoding='utf-8') as f:
+                index = UploadHistoryIndex(json.load(f))
+        _cache[path] = (key, index)
+        return index
+
+
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
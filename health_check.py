@@ -24,10 +24,7 @@ import shutil
 from datetime import datetime
 from pathlib import Path
 
-# 載入設定
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-from dotenv import load_dotenv
-load_dotenv()
 
 
 def check_token():
@@ -162,6 +159,10 @@ def main():
     parser.add_argument('--notify', action='store_true', help='異常時發送通知')
     args = parser.parse_args()
 
+    # 載入設定（.env；import 本檔不做任何 I/O）
+    from geobingan_sync.config import load_env
+    load_env()
+
     checks = [
         ('JWT Token', check_token),
         ('磁碟空間', check_disk),
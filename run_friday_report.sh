@@ -18,10 +18,6 @@ echo "[$(date '+%F %T')] === run_friday_report.sh triggered (PID=$$, PPID=$PPID)
 
 LOG_FILE="$LOG_DIR/friday_report_$(date +%Y%m%d_%H%M%S).log"
 
-echo "========================================" | tee -a "$LOG_FILE"
-echo "📊 週五總結週報 - $(date)" | tee -a "$LOG_FILE"
-echo "========================================" | tee -a "$LOG_FILE"
-
 # 啟動虛擬環境
 if [ ! -f "$SCRIPT_DIR/venv/bin/activate" ]; then
     echo "❌ 找不到虛擬環境" | tee -a "$LOG_FILE"
@@ -29,14 +25,8 @@ if [ ! -f "$SCRIPT_DIR/venv/bin/activate" ]; then
 fi
 source "$SCRIPT_DIR/venv/bin/activate"
 
-# 產生總結週報並上傳
-if python3 -m geobingan_sync.steps.generate_weekly_report --type summary --upload 2>&1 | tee -a "$LOG_FILE"; then
-    echo "" | tee -a "$LOG_FILE"
-    echo "✅ 總結週報已產生並上傳到 ClickUp" | tee -a "$LOG_FILE"
-else
-    echo "" | tee -a "$LOG_FILE"
-    echo "❌ 週報產生失敗" | tee -a "$LOG_FILE"
-fi
+# 產生總結週報並上傳（見 geobingan_sync/run.py run_friday）
+python3 -m geobingan_sync.run friday 2>&1 | tee -a "$LOG_FILE"
 
 echo "========================================" | tee -a "$LOG_FILE"
 
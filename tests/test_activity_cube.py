@@ -0,0 +1,136 @@
+"""Tests for geobingan_sync.activity_cube（工地 × 月份活動立方體）。
+
+_naive_find_decline 是改用立方體之前 find_decline_candidates 每次從整份 PDF 清單
+重新分箱的原始邏輯；以隨機 inventory 比對結果，並驗證增量更新與全量重建一致。
+"""
+import os
+import random
+import sys
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from geobingan_sync import activity_cube
+from geobingan_sync.activity_cube import ActivityCube, load_cube, update_cube
+from geobingan_sync.analyze_decline import _is_real_site, _months_back, find_decline_candidates
+from geobingan_sync.filename_date_parser import parse_date_from_filename
+from geobingan_sync.pdf_inventory import annotate_pdfs
+from geobingan_sync.steps.weekly_snapshot import _bin_pdfs_by_report_month
+
+FOLDERS = ['112建字第0001號A工程', '112建字第0002號B新建工程', '松智路監測', '2026年03月', '115年1月', '']
+
+
+def _naive_find_decline(pdfs, target_year, target_month, prior_months=3, min_prior_per_month=2,
+                        max_target=0):
+    by_folder = defaultdict(lambda: defaultdict(int))
+    folder_files = defaultdict(list)
+    folder_modified_times = defaultdict(set)
+    for p in pdfs:
+        folder = p.get('folder_name', '')
+        if not folder:
+            continue
+        modified = p.get('modifiedTime', '')
+        if modified:
+            folder_modified_times[folder].add(modified[:10])
+        d = parse_date_from_filename(p.get('name', ''))
+        if d is None:
+            d = parse_date_from_filename(folder + '/' + p.get('name', ''))
+        if d is None:
+            continue
+        by_folder[folder][(d.year, d.month)] += 1
+        folder_files[folder].append((d, p.get('name', ''), modified))
+    prior_keys = [_months_back(target_year, target_month, n) for n in range(1, prior_months + 1)]
+    out = {}
+    for folder, months in by_folder.items():
+        if not _is_real_site(folder):
+            continue
+        prior_counts = [months.get(k, 0) for k in prior_keys]
+        if not all(c >= min_prior_per_month for c in prior_counts):
+            continue
+        if months.get((target_year, target_month), 0) > max_target:
+            continue
+        latest = sorted(folder_files[folder], key=lambda x: x[0], reverse=True)[0]
+        out[folder] = (sum(prior_counts), latest[0].date().isoformat(), latest[1],
+                       len(folder_modified_times[folder]))
+    return out
+
+
+def _inventory(seed, n=400):
+    rng = random.Random(seed)
+    pdfs = []
+    for i in range(n):
+        folder = rng.choice(FOLDERS)
+        y, m = rng.choice([(2025, 12), (2026, 1), (2026, 2), (2026, 3), (2026, 4)])
+        name = rng.choice([f'報告_{y - 1911}{m:02d}{rng.randint(1, 28):02d}.pdf',
+                           f'R-{y}-{m:02d}-{rng.randint(1, 28):02d}.pdf', f'{m:02d}{rng.randint(1, 28):02d}觀測.pdf',
+                           '無日期.pdf'])
+        pdfs.append({'id': f'f{seed}-{i}', 'name': name, 'folder_name': folder, 'folder_id': 'fid',
+                     'modifiedTime': f'2026-0{rng.randint(1, 4)}-{rng.randint(10, 12)}T00:00:00Z'})
+    return pdfs
+
+
+def _summary(candidates):
+    return {c['folder']: c['prior_total'] for c in candidates}
+
+
+class TestFindDeclineGolden:
+    def test_matches_naive_binning(self):
+        for seed in range(5):
+            pdfs = _inventory(seed)
+            for target, max_target in [((2026, 4), 100), ((2026, 5), 0), ((2026, 3), 0)]:
+                naive = _naive_find_decline(pdfs, *target, min_prior_per_month=1, max_target=max_target)
+                got = find_decline_candidates(pdfs, *target, min_prior_per_month=1, max_target=max_target,
+                                              top=100)
+                assert _summary(got) == {f: v[0] for f, v in naive.items()}
+                for c in got:
+                    assert (c['latest_filename_date'], c['latest_filename']) == naive[c['folder']][1:3]
+
+    def test_annotated_inventory_same_result(self):
+        pdfs = _inventory(9)
+        annotated = [dict(p) for p in pdfs]
+        annotate_pdfs(annotated)
+        assert find_decline_candidates(annotated, 2026, 4, min_prior_per_month=1, top=100) == \
+            find_decline_candidates(pdfs, 2026, 4, min_prior_per_month=1, top=100)
+
+
+class TestIncrementalUpdate:
+    def _state(self, cube):
+        sites = {}
+        for i, site in enumerate(cube.sites):
+            if cube.dated[i] or cube.modified_days[i]:
+                sites[site] = (cube.site_months(i, range(cube.base, cube.base + cube.width)),
+                               cube.latest_of(i), dict(cube.modified_days[i]))
+        months = [(m, cube.month_total(*activity_cube.month_of(m)),
+                   cube.month_total(*activity_cube.month_of(m), filename_only=True))
+                  for m in range(cube.base, cube.base + cube.width)]
+        return sites, [m for m in months if m[1] or m[2]]
+
+    def test_deltas_match_full_rebuild(self):
+        rng = random.Random(1)
+        old = _inventory(1)
+        new = [p for p in old if rng.random() > 0.2] + _inventory(2, n=120)
+        new[0] = dict(new[0], name='改名_1141115.pdf')
+        cube = ActivityCube.from_pdfs(old)
+        added, removed = cube.update(new)
+        assert added == 121 and removed == len(old) - (len(new) - 120)
+        assert self._state(cube) == self._state(ActivityCube.from_pdfs(new))
+
+    def test_month_totals_match_snapshot_binning(self):
+        pdfs = _inventory(4)
+        cube = ActivityCube.from_pdfs(pdfs)
+        for (y, m), n in _bin_pdfs_by_report_month(pdfs).items():
+            assert cube.month_total(y, m, filename_only=True) == n
+
+    def test_persisted_cube_roundtrip(self, tmp_path):
+        path = tmp_path / 'cube.json'
+        pdfs = _inventory(5)
+        first = update_cube(pdfs, path)
+        assert path.exists()
+        loaded = load_cube(path)
+        assert self._state(loaded) == self._state(first)
+        assert loaded.update(pdfs) == (0, 0)  # 沒有差異 → 不重新分箱
+
+    def test_corrupt_file_rebuilds(self, tmp_path):
+        path = tmp_path / 'cube.json'
+        path.write_text('{broken', encoding='utf-8')
+        assert len(load_cube(path).members) == 0
+        assert len(update_cube(_inventory(6, n=10), path).members) == 10
@@ -2,8 +2,14 @@
 import os
 import sys
 
+import pytest
+
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from geobingan_sync.analyze_decline import _is_real_site, _months_back, find_decline_candidates
+from geobingan_sync.activity_cube import ActivityCube, month_index
+from geobingan_sync.analyze_decline import (
+    _is_real_site, _months_back, _poisson_drop_score, find_decline_candidates, format_candidates,
+    score_stalled_sites,
+)
 
 
 class TestMonthsBack:
@@ -78,3 +84,57 @@ class TestFindDeclineCandidates:
                 pdfs.append(self._make_pdf(f'112建字第000{i}號工程site{i}', f'f_{d}.pdf', folder_id=f'fid{i}'))
         result = find_decline_candidates(pdfs, 2026, 4, top=3)
         assert len(result) == 3
+
+
+class TestScoreStalledSites:
+    def _cube(self, series_by_folder, start=(2025, 10)):
+        """series：由 start 起每月的報告數"""
+        pdfs = []
+        for folder, series in series_by_folder.items():
+            y, m = start
+            for count in series:
+                for k in range(count):
+                    pdfs.append({'id': f'{folder}-{y}-{m}-{k}', 'folder_name': folder, 'folder_id': 'fid',
+                                 'name': f'R-{y}-{m:02d}-{k % 28 + 1:02d}.pdf'})
+                y, m = (y + 1, 1) if m == 12 else (y, m + 1)
+        return ActivityCube.from_pdfs(pdfs)
+
+    def test_stalled_site_ranked_first(self):
+        cube = self._cube({
+            '112建字第0001號A工程': [8, 9, 8, 10, 9, 8, 0],   # 突然停報
+            '112建字第0002號B工程': [8, 8, 8, 8, 8, 8, 1],    # 大幅下滑
+            '112建字第0003號C工程': [5, 5, 5, 5, 5, 5, 6],    # 正常
+            '2026年03月': [9, 9, 9, 9, 9, 9, 0],              # 時間分類資料夾不計
+        })
+        result = score_stalled_sites(cube, 2026, 4, top=5)
+        assert [c['folder'] for c in result] == ['112建字第0001號A工程', '112建字第0002號B工程']
+        assert result[0]['observed'] == 0 and result[0]['score'] > result[1]['score']
+        text = format_candidates(result, '2026-04')
+        assert '異常分數' in text and '依停報異常分數排序' in text
+
+    def test_small_baseline_not_scored(self):
+        cube = self._cube({'112建字第0004號D工程': [1, 1, 0, 1, 1, 1, 0]})
+        assert score_stalled_sites(cube, 2026, 4) == []
+
+    def test_poisson_score_matches_closed_form(self):
+        import math
+        assert _poisson_drop_score(0, 5.0) == pytest.approx(5.0 / math.log(10))
+        p = math.exp(-4) * (1 + 4 + 8)
+        assert _poisson_drop_score(2, 4.0) == pytest.approx(-math.log10(p))
+
+    def test_scales_to_thousands_of_sites(self):
+        import time
+        cube = ActivityCube()
+        for i in range(3000):
+            cube._site(f'112建字第{i:04d}號工程')
+            cube.dated[i] = 1
+            cube.real_site[i] = True
+        cube._ensure_month(month_index(2020, 1))
+        cube._ensure_month(month_index(2026, 4))
+        for i, row in enumerate(cube.counts_any):
+            for col in range(cube.width):
+                row[col] = 0 if (i % 97 == 0 and col == cube.width - 1) else 6
+        t0 = time.perf_counter()
+        result = score_stalled_sites(cube, 2026, 4, top=10)
+        assert time.perf_counter() - t0 < 1.0
+        assert len(result) == 10 and all(c['observed'] == 0 for c in result)
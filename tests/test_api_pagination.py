@@ -0,0 +1,140 @@
+"""Tests for api_pagination：count 並行翻頁、頁序重組、共用 401 刷新、無 count 循序。"""
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from geobingan_sync.api_pagination import fetch_all_pages, make_json_page_fetcher
+
+
+def _pages(n_items, page_size, with_count=True):
+    items = list(range(n_items))
+    calls = []
+
+    def fetch(page):
+        calls.append(page)
+        chunk = items[(page - 1) * page_size: page * page_size]
+        data = {'results': chunk, 'next': 'x' if page * page_size < n_items else None}
+        if with_count:
+            data['count'] = n_items
+        return data
+    return fetch, calls
+
+
+def test_parallel_pages_reassembled_in_order():
+    fetch, calls = _pages(950, 100)
+    assert fetch_all_pages(fetch, max_workers=4, verbose=False) == list(range(950))
+    assert sorted(calls) == list(range(1, 11))
+
+
+def test_without_count_falls_back_to_sequential_next():
+    fetch, calls = _pages(250, 100, with_count=False)
+    assert fetch_all_pages(fetch, verbose=False) == list(range(250))
+    assert calls == [1, 2, 3]
+
+
+def test_single_page():
+    fetch, calls = _pages(30, 100)
+    assert fetch_all_pages(fetch, verbose=False) == list(range(30))
+    assert calls == [1]
+
+
+def test_failed_page_raises():
+    fetch, _ = _pages(500, 100)
+
+    def flaky(page):
+        if page == 3:
+            raise IOError('timeout')
+        return fetch(page)
+    with pytest.raises(IOError):
+        fetch_all_pages(flaky, verbose=False)
+
+
+def test_partial_skips_failed_page_and_keeps_the_rest(capsys):
+    fetch, _ = _pages(500, 100)
+
+    def flaky(page):
+        if page == 3:
+            raise IOError('timeout')
+        return fetch(page)
+    out = fetch_all_pages(flaky, verbose=False, partial=True)
+    assert out == list(range(200)) + list(range(300, 500))
+    assert '部分結果 400 / 500' in capsys.readouterr().out
+
+
+def test_partial_without_count_returns_pages_fetched_so_far():
+    fetch, _ = _pages(350, 100, with_count=False)
+
+    def flaky(page):
+        if page == 3:
+            raise IOError('timeout')
+        return fetch(page)
+    assert fetch_all_pages(flaky, verbose=False, partial=True) == list(range(200))
+
+
+def test_partial_still_raises_when_first_page_fails():
+    def down(page):
+        raise IOError('api down')
+    with pytest.raises(IOError):
+        fetch_all_pages(down, verbose=False, partial=True)
+
+
+class _Resp:
+    def __init__(self, status_code, data=None):
+        self.status_code = status_code
+        self._data = data or {}
+
+    def json(self):
+        return self._data
+
+
+class _Session:
+    """token 'old' 一律 401；'new' 正常回應。"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.seen = []
+
+    def get(self, url, params=None, headers=None, timeout=None):
+        with self.lock:
+            self.seen.append(headers['Authorization'])
+        if headers['Authorization'] == 'Bearer old':
+            return _Resp(401)
+        page = params['page']
+        return _Resp(200, {'count': 400, 'next': 'x' if page < 4 else None,
+                           'results': [page * 1000 + i for i in range(100)]})
+
+
+def test_401_refreshes_token_once_for_all_workers():
+    tokens = iter(['old', 'new', 'newer', 'newest'])
+    issued = []
+
+    def get_token():
+        issued.append(next(tokens))
+        return issued[-1]
+
+    fetch = make_json_page_fetcher(_Session(), 'https://api.test/list', {'group_id': 'g'}, get_token)
+    out = fetch_all_pages(fetch, max_workers=3, verbose=False)
+    assert len(out) == 400
+    assert out[:2] == [1000, 1001] and out[-1] == 4099
+    assert issued == ['old', 'new']     # 只刷新一次
+    assert fetch.token.refreshes == 1
+
+
+def test_persistent_401_gives_up():
+    fetch = make_json_page_fetcher(_Session(), 'https://api.test/list', {}, lambda: 'old')
+    with pytest.raises(IOError):
+        fetch(1)
+
+
+def test_401_delegates_to_invalidate():
+    invalidated = []
+
+    def invalidate(stale):
+        invalidated.append(stale)
+        return 'new'
+
+    fetch = make_json_page_fetcher(_Session(), 'https://api.test/list', {}, lambda: 'old', invalidate=invalidate)
+    assert len(fetch_all_pages(fetch, max_workers=3, verbose=False)) == 400
+    assert invalidated == ['old']
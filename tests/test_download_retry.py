@@ -9,6 +9,7 @@ import os
 import pytest
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from geobingan_sync import permit_list
 from geobingan_sync.steps import sync_permits
 from geobingan_sync.steps.sync_permits import PermitSync
 
@@ -36,6 +37,11 @@ def _make_sync():
     return PermitSync(city={'name': 'T', 'pdf_list_url': 'https://example.test/list.pdf'})
 
 
+@pytest.fixture(autouse=True)
+def _cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(permit_list, 'PERMIT_LIST_CACHE_DIR', tmp_path / 'permit_list_cache')
+
+
 def _patch(monkeypatch, fake, slept):
     monkeypatch.setattr(sync_permits, 'requests', fake)
     monkeypatch.setattr(sync_permits.time, 'sleep', lambda s: slept.append(s))
@@ -51,7 +57,7 @@ class TestDownloadRetry:
         ])
         _patch(monkeypatch, fake, slept)
         path = _make_sync().download_pdf_list(max_attempts=3)
-        assert path == '/tmp/permit_list.pdf'
+        assert path.endswith('.pdf')
         assert fake.calls == 3        # 真的重試到第 3 次才成功
         assert slept == [5, 10]       # backoff 5s, 10s（成功前各睡一次）
         with open(path, 'rb') as f:
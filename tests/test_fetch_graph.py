@@ -0,0 +1,74 @@
+"""Tests for fetch_graph.run_fetch_graph：依賴順序、並行、失敗隔離、必要來源。"""
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from geobingan_sync.fetch_graph import FetchTask, run_fetch_graph
+
+
+def test_dependencies_receive_upstream_results():
+    out = run_fetch_graph([
+        FetchTask('a', lambda: 2),
+        FetchTask('b', lambda a: a * 10, deps=('a',)),
+        FetchTask('c', lambda a, b: a + b, deps=('a', 'b')),
+    ], verbose=False)
+    assert out == {'a': 2, 'b': 20, 'c': 22}
+
+
+def test_independent_sources_run_concurrently():
+    barrier = threading.Barrier(3, timeout=5)
+
+    def wait_for_peers():
+        barrier.wait()   # 三個來源必須同時在跑才會通過
+        return True
+
+    out = run_fetch_graph([FetchTask(n, wait_for_peers) for n in 'xyz'], verbose=False)
+    assert out == {'x': True, 'y': True, 'z': True}
+
+
+def test_failed_source_uses_default_and_downstream_still_runs():
+    def boom():
+        raise RuntimeError('api down')
+
+    out = run_fetch_graph([
+        FetchTask('reports', boom, default=dict),
+        FetchTask('alerts', lambda: {'p': 1}),
+        FetchTask('merged', lambda reports, alerts: (reports, alerts), deps=('reports', 'alerts')),
+    ], verbose=False)
+    assert out['reports'] == {}
+    assert out['merged'] == ({}, {'p': 1})
+    assert out.degraded == ['reports']
+
+
+def test_no_degraded_sources_when_all_succeed():
+    out = run_fetch_graph([FetchTask('a', lambda: 1, label='來源 A')], verbose=False)
+    assert out.degraded == []
+
+
+def test_required_failure_reraises_after_running_sources_finish():
+    finished = []
+
+    def slow():
+        time.sleep(0.05)
+        finished.append('slow')
+        return 1
+
+    def fail():
+        sys.exit(1)
+
+    with pytest.raises(SystemExit):
+        run_fetch_graph([
+            FetchTask('gov', fail, required=True),
+            FetchTask('slow', slow),
+            FetchTask('after_gov', lambda gov: finished.append('after'), deps=('gov',)),
+        ], verbose=False)
+    assert finished == ['slow']   # 已啟動的來源跑完；依賴失敗來源的不再啟動
+
+
+def test_unknown_dependency_rejected():
+    with pytest.raises(ValueError):
+        run_fetch_graph([FetchTask('a', lambda b: b, deps=('b',))], verbose=False)
@@ -0,0 +1,194 @@
+"""Golden tests：match_permits 索引版名稱比對 vs 原本的全表掃描實作。
+
+_naive_* 是索引化之前 build_registry 的原始邏輯（逐字搬過來當 reference）。
+fixture 從 state/permit_registry.json 的建案名稱 / api_match 衍生：
+加上「新建工程」後綴、截頭截尾等變體，刻意製造互為子字串的 project 名稱
+與多重命中的滑動視窗，確保去重順序、第一個命中、唯一匹配的語意逐筆一致。
+"""
+import json
+import os
+import re
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from geobingan_sync.steps.match_permits import (
+    dedup_api_projects, ApiProjectMatcher, LiveAlertMatcher, extract_name_from_text,
+)
+from geobingan_sync.text_index import SubstringIndex
+
+REGISTRY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                        'state', 'permit_registry.json')
+
+
+# ==================== reference（原始全表掃描） ====================
+
+def _naive_dedup(api_projects):
+    api_project_index = {}
+    for p in api_projects:
+        name = p.get('project_name', '')
+        if not name:
+            continue
+        skip = False
+        to_remove = []
+        for existing_name in api_project_index:
+            if name in existing_name:
+                skip = True
+                break
+            if existing_name in name:
+                to_remove.append(existing_name)
+        for rm in to_remove:
+            del api_project_index[rm]
+        if skip:
+            continue
+        api_project_index[name] = {'address': p.get('location_address', '')}
+    return api_project_index
+
+
+def _naive_api_match(drive_name, api_project_index):
+    matched_api = None
+    for api_name, api_info in api_project_index.items():
+        if len(drive_name) >= 4 and drive_name in api_name:
+            matched_api = (api_name, api_info)
+            break
+        api_clean = extract_name_from_text(api_name)
+        if len(api_clean) >= 4 and api_clean in drive_name:
+            matched_api = (api_name, api_info)
+            break
+    if not matched_api:
+        drive_cjk = re.sub(r'[^\u4e00-\u9fff]', '', re.sub(r'(安全觀測|監測報表?|觀測報告|觀測數據|報告|報表|數據)', '', drive_name))
+        for flen in range(min(6, len(drive_cjk)), 2, -1):
+            found = False
+            for start in range(len(drive_cjk) - flen + 1):
+                sub = drive_cjk[start:start + flen]
+                matches = [(n, i) for n, i in api_project_index.items() if sub in n]
+                if len(matches) == 1:
+                    matched_api = matches[0]
+                    found = True
+                    break
+            if found:
+                break
+    return matched_api
+
+
+def _naive_alert_match(names_to_try, live_alerts):
+    for alert_project in live_alerts:
+        matched_alert = False
+        for try_name in names_to_try:
+            if not try_name:
+                continue
+            if (len(try_name) >= 3 and try_name in alert_project) or \
+               (len(alert_project) >= 3 and alert_project in try_name):
+                matched_alert = True
+                break
+            cjk = re.sub(r'[^\u4e00-\u9fff]', '', re.sub(r'(安全觀測|監測|觀測|報告|報表|數據|新建工程|工程)', '', try_name))
+            for flen in range(min(5, len(cjk)), 2, -1):
+                for start in range(len(cjk) - flen + 1):
+                    sub = cjk[start:start + flen]
+                    alert_matches = [ap for ap in live_alerts.keys() if sub in ap]
+                    if len(alert_matches) == 1 and sub in alert_project:
+                        matched_alert = True
+                        break
+                if matched_alert:
+                    break
+            if matched_alert:
+                break
+        if matched_alert:
+            return alert_project
+    return None
+
+
+# ==================== fixtures ====================
+
+@pytest.fixture(scope='module')
+def registry():
+    if not os.path.exists(REGISTRY):
+        pytest.skip('state/permit_registry.json 不存在')
+    with open(REGISTRY, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+@pytest.fixture(scope='module')
+def fixtures(registry):
+    names = [e['name'] for _, e in sorted(registry.items()) if e.get('name')]
+    api_names = [e['api_match'] for _, e in sorted(registry.items()) if e.get('api_match')]
+
+    projects = []
+    for i, n in enumerate(api_names + names):
+        projects.append(n)
+        if i % 3 == 0:
+            projects.append(n + '新建工程')
+        if i % 4 == 1 and len(n) >= 4:
+            projects.append(n[1:])
+        if i % 5 == 2:
+            projects.append(n[:3])
+    api_projects = [{'project_name': n, 'location_address': f'addr-{i}'} for i, n in enumerate(projects)]
+    api_projects.insert(7, {'project_name': ''})
+
+    alert_names = []
+    for i, n in enumerate(names[::3] + api_names[::2]):
+        alert_names.append(n if i % 2 else n[:max(2, len(n) - 2)])
+    live_alerts = {n: [{'tone': 'warning'}] for n in alert_names}
+
+    drive_names = []
+    for i, n in enumerate(names):
+        drive_names.append(n)
+        if i % 2 == 0:
+            drive_names.append(n + '監測報告')
+        if i % 3 == 0 and len(n) > 3:
+            drive_names.append(n[2:])
+
+    tries = [[e.get('api_match', ''), e.get('name', '')] for _, e in sorted(registry.items()) if e.get('name')][::3]
+    tries += [[n] for n in drive_names[1::6]]
+    return api_projects, live_alerts, drive_names, tries
+
+
+# ==================== golden tests ====================
+
+def test_dedup_matches_reference(fixtures):
+    api_projects = fixtures[0]
+    expected = _naive_dedup(api_projects)
+    got = dedup_api_projects(api_projects)
+    assert list(got) == list(expected)
+    assert len(got) < len(api_projects) - 1   # fixture 真的有觸發去重
+
+
+def test_api_match_matches_reference(fixtures):
+    api_projects, _, drive_names, _ = fixtures
+    index = dedup_api_projects(api_projects)
+    matcher = ApiProjectMatcher(index)
+    hits = 0
+    for drive_name in drive_names:
+        expected = _naive_api_match(drive_name, index)
+        got = matcher.match(drive_name)
+        assert (got[0] if got else None) == (expected[0] if expected else None), drive_name
+        hits += bool(got)
+    assert hits > 0
+
+
+def test_alert_match_matches_reference(fixtures):
+    _, live_alerts, _, tries = fixtures
+    matcher = LiveAlertMatcher(live_alerts)
+    hits = 0
+    for names_to_try in tries:
+        expected = _naive_alert_match(names_to_try, live_alerts)
+        assert matcher.match(names_to_try) == expected, names_to_try
+        hits += expected is not None
+    assert hits > 0
+
+
+class TestSubstringIndex:
+    def test_containing_in_insertion_order(self):
+        idx = SubstringIndex(['乙大安段', '甲大安段', '信義'])
+        assert idx.containing('大安') == ['乙大安段', '甲大安段']
+        assert idx.containing('安') == ['乙大安段', '甲大安段']
+        assert idx.containing('松山') == []
+
+    def test_unique_and_remove(self):
+        idx = SubstringIndex(['大安段一', '大安段二'])
+        assert idx.unique_containing('大安段') is None
+        assert idx.unique_containing('段一') == '大安段一'
+        idx.remove('大安段二')
+        assert idx.unique_containing('大安段') == '大安段一'
+        assert '大安段二' not in idx
@@ -13,7 +13,8 @@ from pathlib import Path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from geobingan_sync.steps import upload_pdfs
 from geobingan_sync.steps import weekly_snapshot
-from geobingan_sync import analyze_decline
+from geobingan_sync import analyze_decline, binary_inventory, pdf_inventory
+from geobingan_sync.pdf_inventory import annotate_pdfs, report_date_of
 
 PDFS = [
     {'id': 'p1', 'name': '建案A_1150301.pdf', 'folder_name': '110建字第0001號'},
@@ -36,8 +37,10 @@ def test_producer_to_consumers_chain(tmp_path, monkeypatch):
     assert data['last_scan']
     assert [p['id'] for p in data['pdfs']] == ['p1', 'p2']
 
-    assert weekly_snapshot._load_pdf_inventory() == PDFS
-    assert analyze_decline.load_pdfs() == PDFS
+    # 兩個 consumer 都優先讀 mmap 的二進位版（唯讀 Sequence）
+    assert isinstance(weekly_snapshot._load_pdf_inventory(), binary_inventory.BinaryInventory)
+    assert list(weekly_snapshot._load_pdf_inventory()) == PDFS
+    assert list(analyze_decline.load_pdfs()) == PDFS
 
 
 def test_consumers_fall_back_to_legacy_cache(tmp_path, monkeypatch):
@@ -111,3 +114,119 @@ def test_both_sources_missing(tmp_path, monkeypatch):
 
     assert weekly_snapshot._load_pdf_inventory() == []
     assert analyze_decline.load_pdfs() is None
+
+
+MIXED = [
+    {'name': '建案A_1150301.pdf', 'folder_name': '110建字第0001號A工程'},
+    {'name': '0303觀測報告.pdf', 'folder_name': '115年3月'},
+    {'name': '觀測報告.pdf', 'folder_name': '114.11'},
+    {'name': '無日期.pdf', 'folder_name': '松智路新建工程'},
+    {'name': 'B-2026-04-15.pdf', 'folder_name': ''},
+]
+
+
+def test_annotate_pdfs_columns():
+    """寫 inventory 前預先算好 report_date / date_source / is_real_site。"""
+    pdfs = [dict(p) for p in MIXED]
+    annotate_pdfs(pdfs)
+    cols = [(p['report_date'], p['date_source'], p['is_real_site']) for p in pdfs]
+    assert cols[0] == ('2026-03-01', 'filename', True)
+    assert cols[1][1] == 'folder' and cols[1][2] is False
+    assert cols[3] == (None, None, True)
+    assert cols[4] == ('2026-04-15', 'filename', False)
+
+
+def test_precomputed_columns_match_live_parsing():
+    """有欄位（新版 inventory）與無欄位（legacy cache）兩種來源，讀者結果一致。"""
+    annotated = [dict(p) for p in MIXED]
+    annotate_pdfs(annotated)
+    assert weekly_snapshot._bin_pdfs_by_report_month(annotated) == \
+        weekly_snapshot._bin_pdfs_by_report_month(MIXED)
+    for raw, ann in zip(MIXED, annotated):
+        assert report_date_of(raw) == report_date_of(ann)
+        assert report_date_of(raw, folder_fallback=False) == report_date_of(ann, folder_fallback=False)
+
+
+def test_readers_trust_precomputed_columns(monkeypatch):
+    """欄位存在時不再解析檔名。"""
+    pdfs = [dict(p) for p in MIXED]
+    annotate_pdfs(pdfs)
+
+    def _no_parse(*args):
+        raise AssertionError('不應重新解析檔名')
+    monkeypatch.setattr(pdf_inventory, 'parse_date_from_filename', _no_parse)
+    monkeypatch.setattr('geobingan_sync.filename_date_parser.parse_date_from_filename', _no_parse)
+    assert sum(weekly_snapshot._bin_pdfs_by_report_month(pdfs).values()) == 2
+    analyze_decline.find_decline_candidates(pdfs, 2026, 4)
+
+
+def test_binary_inventory_roundtrip(tmp_path):
+    """二進位格式逐列 round-trip：標註欄位、字串 size、非標準時間與額外欄位都原樣讀回。"""
+    pdfs = [dict(p, size='2048', modifiedTime='2026-03-15T08:01:02.345Z', folder_id='F1') for p in MIXED]
+    annotate_pdfs(pdfs)
+    pdfs += [
+        {'id': 'x1', 'name': '舊格式.pdf', 'size': 12, 'modifiedTime': '2026-03-15', 'owner': ['a']},
+        {'id': 'x2', 'report_date': None, 'date_source': None, 'is_real_site': False},
+    ]
+    path = tmp_path / 'pdf_inventory.bin'
+    binary_inventory.write(path, pdfs, {'last_scan': 'now'})
+    inv = binary_inventory.BinaryInventory(path)
+    assert len(inv) == len(pdfs)
+    assert list(inv) == pdfs
+    assert inv[-1] == pdfs[-1] and inv[1:3] == pdfs[1:3]
+    assert inv.to_json_dict() == {'last_scan': 'now', 'pdfs': pdfs}
+    # 資料夾 intern：重複的資料夾只存一次
+    assert len(inv.folders) == len({(p.get('folder_name', ''), p.get('folder_id', '')) for p in pdfs})
+
+
+def test_stale_binary_ignored(tmp_path, monkeypatch):
+    """二進位檔比 JSON 舊（例如二進位寫入失敗）→ 讀者改讀 JSON。"""
+    inv = tmp_path / 'pdf_inventory.json'
+    binary_inventory.write(binary_inventory.bin_path_for(inv), [{'id': 'old'}])
+    inv.write_text(json.dumps({'pdfs': PDFS}), encoding='utf-8')
+    bin_path = binary_inventory.bin_path_for(inv)
+    st = os.stat(inv)
+    os.utime(bin_path, ns=(st.st_atime_ns, st.st_mtime_ns - 10**9))
+    monkeypatch.setattr(weekly_snapshot, 'PDF_INVENTORY_FILE', str(inv))
+    monkeypatch.setattr(analyze_decline, 'PDF_INVENTORY_FILE', Path(inv))
+    assert weekly_snapshot._load_pdf_inventory() == PDFS
+    assert analyze_decline.load_pdfs() == PDFS
+
+
+def test_pdf_record_dict_interface():
+    """PdfRecord 以 slots 存放，但 dict 介面與原本的 Drive dict 一致（未設定的欄位不存在）。"""
+    item = {'id': 'p1', 'name': '建案A_1150301.pdf', 'size': '2048',
+            'modifiedTime': '2026-03-15T08:01:02.345Z', 'parents': ['F1']}
+    rec = pdf_inventory.PdfRecord.from_drive(item, 'F1', '110建字第0001號')
+    assert rec.to_dict() == {'id': 'p1', 'name': '建案A_1150301.pdf', 'size': '2048',
+                             'modifiedTime': '2026-03-15T08:01:02.345Z',
+                             'folder_id': 'F1', 'folder_name': '110建字第0001號'}
+    assert 'parents' not in rec and 'report_date' not in rec
+    assert rec.get('report_date', 'x') == 'x'
+    assert rec.unique_id == '110建字第0001號/建案A_1150301.pdf'
+    assert rec.modified.year == 2026 and rec.modified.microsecond == 345000
+    assert not hasattr(rec, '__dict__')
+
+    # 同資料夾的字串共用同一個物件
+    other = pdf_inventory.PdfRecord.from_drive({'name': 'b.pdf'}, 'F1', ''.join(['110建字', '第0001號']))
+    assert other.folder_name is rec.folder_name
+
+    annotate_pdfs([rec])
+    assert rec['report_date'] == '2026-03-01' and rec['date_source'] == 'filename'
+    assert report_date_of(rec) == report_date_of(rec.to_dict())
+    rec['name'] = '改名.pdf'
+    assert rec.unique_id == '110建字第0001號/改名.pdf'
+
+
+def test_pdf_records_written_to_inventory(tmp_path, monkeypatch):
+    """掃描結果（PdfRecord）直接寫 JSON 與二進位 inventory，讀回與 dict 版相同。"""
+    inv = tmp_path / 'pdf_inventory.json'
+    monkeypatch.setattr(upload_pdfs, 'PDF_INVENTORY_FILE', str(inv))
+    records = [pdf_inventory.PdfRecord(p) for p in MIXED]
+    annotate_pdfs(records)
+    expected = [dict(p) for p in MIXED]
+    annotate_pdfs(expected)
+
+    assert upload_pdfs.save_pdf_inventory(records) is True
+    assert json.loads(inv.read_text(encoding='utf-8'))['pdfs'] == expected
+    assert list(binary_inventory.BinaryInventory(binary_inventory.bin_path_for(inv))) == expected
@@ -0,0 +1,96 @@
+"""Tests for pdf_renderer（週報 PDF 渲染 backend 選擇與內容雜湊快取）。
+
+不依賴真的 Chrome / WeasyPrint：以假 renderer 驗證快取命中、失敗換 backend、
+快取淘汰，以及 Chrome backend 的字型注入與指令組成。
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from geobingan_sync import pdf_renderer
+from geobingan_sync.pdf_renderer import ChromeRenderer, Renderer, render_pdf
+
+HTML = '<html><head><style>body {}</style></head><body>週報</body></html>'
+
+
+class _FakeRenderer(Renderer):
+    def __init__(self, name='fake', fail=False):
+        self.name = name
+        self.fail = fail
+        self.calls = 0
+
+    def render(self, html, output_path):
+        self.calls += 1
+        if self.fail:
+            raise OSError('boom')
+        with open(output_path, 'wb') as f:
+            f.write(f'%PDF {self.name} {len(html)}'.encode())
+
+
+def test_identical_html_served_from_cache(tmp_path):
+    fake = _FakeRenderer()
+    cache = tmp_path / 'cache'
+    assert render_pdf(HTML, str(tmp_path / 'a.pdf'), renderers=[fake], cache_dir=cache) == 'fake'
+    assert render_pdf(HTML, str(tmp_path / 'b.pdf'), renderers=[fake], cache_dir=cache) == 'cache'
+    assert fake.calls == 1
+    assert (tmp_path / 'a.pdf').read_bytes() == (tmp_path / 'b.pdf').read_bytes()
+
+    # 內容不同 → 重新渲染
+    assert render_pdf(HTML + ' ', str(tmp_path / 'c.pdf'), renderers=[fake], cache_dir=cache) == 'fake'
+    assert fake.calls == 2
+
+
+def test_failed_backend_falls_through(tmp_path, capsys):
+    broken, good = _FakeRenderer('chrome', fail=True), _FakeRenderer('weasyprint')
+    out = tmp_path / 'out.pdf'
+    assert render_pdf(HTML, str(out), renderers=[broken, good], cache_dir=tmp_path / 'c') == 'weasyprint'
+    assert out.read_bytes().startswith(b'%PDF weasyprint')
+    assert 'chrome 失敗' in capsys.readouterr().out
+
+    with pytest.raises(OSError):
+        render_pdf(HTML, str(out), renderers=[_FakeRenderer(fail=True)], cache_dir=tmp_path / 'c2')
+    with pytest.raises(RuntimeError):
+        render_pdf(HTML, str(out), renderers=[], cache_dir=tmp_path / 'c3')
+
+
+def test_cache_pruned_to_limit(tmp_path):
+    fake = _FakeRenderer()
+    cache = tmp_path / 'cache'
+    for i in range(5):
+        render_pdf(HTML + str(i), str(tmp_path / 'out.pdf'), renderers=[fake], cache_dir=cache, max_entries=3)
+    assert len(list(cache.glob('*.pdf'))) == 3
+
+
+def test_chrome_injects_font_and_uses_profile(tmp_path, monkeypatch):
+    font = tmp_path / 'NotoSansCJK-Regular.ttc'
+    font.write_bytes(b'')
+    monkeypatch.setenv('GEOBINGAN_CJK_FONT', str(font))
+    pdf_renderer.find_cjk_font.cache_clear()
+    seen = {}
+
+    def _fake_run(cmd, **kwargs):
+        seen['cmd'] = cmd
+        with open(cmd[-1][len('file://'):], encoding='utf-8') as f:
+            seen['html'] = f.read()
+        out = next(a for a in cmd if a.startswith('--print-to-pdf='))[len('--print-to-pdf='):]
+        with open(out, 'wb') as f:
+            f.write(b'%PDF')
+
+    monkeypatch.setattr(pdf_renderer.subprocess, 'run', _fake_run)
+    try:
+        ChromeRenderer('/usr/bin/chromium', profile_dir=tmp_path / 'profile').render(HTML, str(tmp_path / 'o.pdf'))
+    finally:
+        pdf_renderer.find_cjk_font.cache_clear()
+    assert f'--user-data-dir={tmp_path / "profile"}' in seen['cmd']
+    assert font.as_uri() in seen['html'] and 'LocalChinese' in seen['html']
+    assert (tmp_path / 'o.pdf').read_bytes() == b'%PDF'
+
+
+def test_backend_override(monkeypatch):
+    monkeypatch.setattr(pdf_renderer, 'find_chrome', lambda: '/usr/bin/chromium')
+    monkeypatch.setenv('GEOBINGAN_PDF_BACKEND', 'chrome')
+    assert [r.name for r in pdf_renderer.available_renderers()] == ['chrome']
+    monkeypatch.setenv('GEOBINGAN_PDF_BACKEND', 'weasyprint')
+    assert all(r.name == 'weasyprint' for r in pdf_renderer.available_renderers())
@@ -0,0 +1,90 @@
+"""Tests for permit_list：條件式 GET（304 沿用快取）+ 解析結果快取。"""
+import sys
+import os
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from geobingan_sync import permit_list
+
+URL = 'https://example.test/list.pdf'
+
+
+class _Resp:
+    def __init__(self, status_code=200, content=b'', headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+
+class _Http:
+    def __init__(self, script):
+        self.script = list(script)
+        self.sent_headers = []
+
+    def get(self, url, **kwargs):
+        self.sent_headers.append(kwargs.get('headers') or {})
+        item = self.script.pop(0)
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+
+@pytest.fixture(autouse=True)
+def _cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(permit_list, 'PERMIT_LIST_CACHE_DIR', tmp_path / 'cache')
+
+
+def _fetch(http):
+    return permit_list.fetch_permit_list_pdf(URL, http=http, sleep=lambda s: None)
+
+
+class TestConditionalGet:
+    def test_second_fetch_sends_validators_and_reuses_on_304(self):
+        http = _Http([
+            _Resp(200, b'%PDF v1', {'ETag': '"abc"', 'Last-Modified': 'Mon, 01 Jan 2025 00:00:00 GMT'}),
+            _Resp(304),
+        ])
+        first = _fetch(http)
+        second = _fetch(http)
+        assert first == second
+        assert http.sent_headers[0] == {}
+        assert http.sent_headers[1]['If-None-Match'] == '"abc"'
+        assert 'If-Modified-Since' in http.sent_headers[1]
+        with open(second, 'rb') as f:
+            assert f.read() == b'%PDF v1'
+
+    def test_falls_back_to_cache_when_download_fails(self):
+        http = _Http([_Resp(200, b'%PDF v1'), OSError('dns'), OSError('dns'), OSError('dns')])
+        first = _fetch(http)
+        assert _fetch(http) == first
+
+    def test_no_cache_and_failure_returns_none(self):
+        http = _Http([_Resp(500), _Resp(500), _Resp(500)])
+        assert _fetch(http) is None
+
+
+class TestCachedParse:
+    def test_parse_reused_until_content_changes(self):
+        calls = []
+
+        def parse(path):
+            calls.append(path)
+            with open(path, 'rb') as f:
+                return {'body': f.read().decode()}
+
+        http = _Http([_Resp(200, b'%PDF v1'), _Resp(304), _Resp(200, b'%PDF v2')])
+        path = _fetch(http)
+        assert permit_list.cached_parse(URL, path, 'k/v1', parse) == {'body': '%PDF v1'}
+        path = _fetch(http)
+        assert permit_list.cached_parse(URL, path, 'k/v1', parse) == {'body': '%PDF v1'}
+        assert len(calls) == 1        # 304 → 沿用解析結果
+        path = _fetch(http)
+        assert permit_list.cached_parse(URL, path, 'k/v1', parse) == {'body': '%PDF v2'}
+        assert len(calls) == 2        # 內容變了 → 重新解析
+
+    def test_different_key_parses_separately(self):
+        http = _Http([_Resp(200, b'%PDF v1')])
+        path = _fetch(http)
+        assert permit_list.cached_parse(URL, path, 'a/v1', lambda p: 1) == 1
+        assert permit_list.cached_parse(URL, path, 'b/v1', lambda p: 2) == 2
@@ -0,0 +1,167 @@
+"""Tests for permit_list 單次掃描解析（建照 | URL alternation）與兩個 view。"""
+import sys
+import os
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from geobingan_sync import permit_list
+from geobingan_sync.permit_list import (
+    parse_permit_list_text, drive_mapping, non_google_permits, classify_url,
+    assign_links_to_permits,
+)
+
+TEXT = (
+    '1 112建字第0238號 某某建設 https://drive.google.com/drive/\n'
+    'folders/AbC_123-x?usp=sharing 大安區\n'
+    '2 113建字第012號 https://1drv.ms/f/s!abc 信義區\n'
+    '3 110建字第0456號 https://www.dropbox.com/sh/xyz?dl=0 https://gov.taipei/page\n'
+    '4 111建字第0789號 https://example.com/monitor 中山區\n'
+    '5 109建字第0001號 無連結\n'
+    '6 108建字第0002號 https://gov.taipei/only\n'
+)
+
+
+class TestParseText:
+    def test_records_in_order_with_normalized_permits(self):
+        recs = parse_permit_list_text(TEXT)
+        assert [r['permit'] for r in recs] == [
+            '112建字第0238號', '113建字第0012號', '110建字第0456號',
+            '111建字第0789號', '109建字第0001號', '108建字第0002號',
+        ]
+
+    def test_url_broken_across_lines_is_joined(self):
+        rec = parse_permit_list_text(TEXT)[0]
+        assert rec['urls']['Google Drive'] == [
+            'https://drive.google.com/drive/folders/AbC_123-x?usp=sharing']
+        assert rec['folder_id'] == 'AbC_123-x'
+
+    def test_adjacent_urls_not_merged(self):
+        recs = parse_permit_list_text('112建字第0001號https://a.example/xhttps://b.example/y')
+        assert recs[0]['urls'] == {
+            '其他: a.example': ['https://a.example/x'],
+            '其他: b.example': ['https://b.example/y'],
+        }
+
+    def test_duplicate_permit_merges_urls(self):
+        recs = parse_permit_list_text(
+            '112建字第0001號 https://1drv.ms/a 112建字第001號 https://drive.google.com/drive/folders/F1')
+        assert len(recs) == 1
+        assert set(recs[0]['urls']) == {'OneDrive', 'Google Drive'}
+        assert recs[0]['folder_id'] == 'F1'
+
+    def test_scheme_less_google_link_recognised(self):
+        recs = parse_permit_list_text('112建字第0001號 某某建設 drive.google.com/drive/folders/F1 大安區')
+        assert recs[0]['urls'] == {'Google Drive': ['drive.google.com/drive/folders/F1']}
+
+    def test_classify_url(self):
+        assert classify_url('https://docs.google.com/x') == 'Google Drive'
+        assert classify_url('https://abc.sharepoint.com/:f:/g') == 'SharePoint'
+        assert classify_url('https://reurl.cc/abc') == '短網址'
+        assert classify_url('http://Foo.Example.org/a') == '其他: foo.example.org'
+
+
+class TestViews:
+    def test_drive_mapping_only_google_drive(self):
+        assert drive_mapping(parse_permit_list_text(TEXT)) == {
+            '112建字第0238號': 'https://drive.google.com/drive/folders/AbC_123-x?usp=sharing',
+        }
+
+    def test_non_google_permits(self):
+        assert non_google_permits(parse_permit_list_text(TEXT)) == [
+            {'permit': '113建字第0012號', 'cloud': 'OneDrive', 'url': 'https://1drv.ms/f/s!abc'},
+            {'permit': '110建字第0456號', 'cloud': 'Dropbox', 'url': 'https://www.dropbox.com/sh/xyz?dl=0'},
+            {'permit': '111建字第0789號', 'cloud': '其他: example.com', 'url': 'https://example.com/monitor'},
+        ]
+
+    def test_duplicate_permit_last_drive_url_wins(self):
+        recs = parse_permit_list_text(
+            '112建字第0001號 https://drive.google.com/drive/folders/OLD '
+            '112建字第001號 https://drive.google.com/drive/folders/NEW https://drive.google.com/drive/folders/X '
+            '112建字第0001號 無連結')
+        assert drive_mapping(recs) == {'112建字第0001號': 'https://drive.google.com/drive/folders/NEW'}
+        assert recs[0]['folder_id'] == 'NEW'
+
+    def test_duplicate_permit_last_non_google_url_wins(self):
+        recs = parse_permit_list_text(
+            '112建字第0001號 https://1drv.ms/old 112建字第0001號 https://www.dropbox.com/new')
+        assert non_google_permits(recs) == [
+            {'permit': '112建字第0001號', 'cloud': 'Dropbox', 'url': 'https://www.dropbox.com/new'}]
+
+    def test_scheme_less_google_link_excluded_from_both_views(self):
+        # 沒有 scheme 的 Google 連結：算「有 Google」（不進非 Google 清單），但不當成 Drive 資料夾
+        recs = parse_permit_list_text('112建字第0001號 drive.google.com/drive/folders/F1 https://1drv.ms/x')
+        assert non_google_permits(recs) == []
+        assert drive_mapping(recs) == {}
+
+
+# ==================== 連結註解模式 ====================
+
+class TestAssignLinks:
+    def test_link_goes_to_nearest_row(self):
+        permits = [('112建字第0001號', 700.0), ('112建字第0002號', 650.0)]
+        links = [('https://a', 648.0), ('https://b', 702.0)]
+        assert assign_links_to_permits(permits, links) == [
+            ('permit', '112建字第0001號'), ('url', 'https://b'),
+            ('permit', '112建字第0002號'), ('url', 'https://a'),
+        ]
+
+    def test_tie_goes_to_upper_permit(self):
+        permits = [('112建字第0001號', 700.0), ('112建字第0002號', 680.0)]
+        tokens = assign_links_to_permits(permits, [('https://mid', 690.0)])
+        assert tokens[1] == ('url', 'https://mid')
+
+    def test_page_without_permits_passes_links_through(self):
+        assert assign_links_to_permits([], [('https://x', 10.0)]) == [('url', 'https://x')]
+
+    def test_text_urls_fill_rows_without_annotations(self):
+        permits = [('112建字第0001號', 700.0), ('112建字第0002號', 650.0)]
+        text_slots = [['https://prev'], ['https://text-a'], ['https://text-b']]
+        assert assign_links_to_permits(permits, [('https://a', 700.0)], text_slots) == [
+            ('url', 'https://prev'),
+            ('permit', '112建字第0001號'), ('url', 'https://a'),
+            ('permit', '112建字第0002號'), ('url', 'https://text-b'),
+        ]
+
+
+def _pdf_with_links(path, links):
+    pypdf = pytest.importorskip('pypdf')
+    from pypdf.annotations import Link
+    writer = pypdf.PdfWriter()
+    writer.add_blank_page(width=600, height=800)
+    for url, y in links:
+        writer.add_annotation(page_number=0, annotation=Link(rect=(100, y - 5, 300, y + 5), url=url))
+    with open(path, 'wb') as f:
+        writer.write(f)
+
+
+class TestAnnotationMode:
+    def test_links_read_from_annotations(self, tmp_path, monkeypatch):
+        pdf = str(tmp_path / 'list.pdf')
+        _pdf_with_links(pdf, [
+            ('https://drive.google.com/drive/folders/F1?usp=sharing', 700),
+            ('https://1drv.ms/f/s!long-url-that-would-wrap', 650),
+            ('mailto:someone@example.com', 650),
+        ])
+        monkeypatch.setattr(permit_list, '_page_permits', lambda page: ([
+            ('112建字第0001號', 701.0), ('113建字第0002號', 651.0)], ''))
+        recs = permit_list.parse_permit_list(pdf)
+        assert recs == [
+            {'permit': '112建字第0001號', 'folder_id': 'F1',
+             'urls': {'Google Drive': ['https://drive.google.com/drive/folders/F1?usp=sharing']},
+             'occurrences': [{'Google Drive': ['https://drive.google.com/drive/folders/F1?usp=sharing']}]},
+            {'permit': '113建字第0002號', 'folder_id': None,
+             'urls': {'OneDrive': ['https://1drv.ms/f/s!long-url-that-would-wrap']},
+             'occurrences': [{'OneDrive': ['https://1drv.ms/f/s!long-url-that-would-wrap']}]},
+        ]
+
+    def test_page_mixing_annotated_and_plain_text_urls(self, tmp_path, monkeypatch):
+        pdf = str(tmp_path / 'list.pdf')
+        _pdf_with_links(pdf, [('https://drive.google.com/drive/folders/F1?usp=sharing', 700)])
+        text = ('1112建字第0001號某某建設https://drive.google.com/drive/folders/F1?us'
+                '2113建字第0002號https://www.dropbox.com/sh/plain?dl=0大安區')
+        monkeypatch.setattr(permit_list, '_page_permits', lambda page: ([
+            ('112建字第0001號', 701.0), ('113建字第0002號', 651.0)], text))
+        recs = permit_list.parse_permit_list(pdf)
+        assert recs[0]['urls'] == {'Google Drive': ['https://drive.google.com/drive/folders/F1?usp=sharing']}
+        assert recs[1]['urls'] == {'Dropbox': ['https://www.dropbox.com/sh/plain?dl=0']}
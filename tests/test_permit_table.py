@@ -0,0 +1,172 @@
+"""Tests for geobingan_sync.permit_table（欄位式建案表）。
+
+_naive_* 是改用 PermitTable 之前 gather_stats / save_snapshot 各自以 dict 迴圈
+計算的原始邏輯；以 state/permit_registry.json 的真實 registry 加上隨機 mapping 比對。
+"""
+import json
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from geobingan_sync import permit_table
+from geobingan_sync.permit_table import PermitTable, group_sum
+from geobingan_sync.steps import generate_weekly_report, weekly_snapshot
+
+REGISTRY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                        'state', 'permit_registry.json')
+STATUSES = ['completed', 'in_progress', 'not_uploaded', 'no_reports', 'completed_project']
+
+
+def _registry():
+    with open(REGISTRY, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _mapping(registry, seed=7):
+    rng = random.Random(seed)
+    today = datetime.now()
+    mapping = {}
+    for permit in list(registry)[::2] + ['115建字第9999號', '115建字第9998號']:
+        days = rng.choice([None, 1, 3, 6, 10, 40, 120])
+        latest = (today - timedelta(days=days)).strftime('%Y-%m-%dT08:00:00') if days is not None else ''
+        mapping[permit] = {
+            'drive_count': rng.randint(0, 50),
+            'system_count': rng.choice([0, 0, 1, 5, 20]),
+            'status': rng.choice(STATUSES),
+            'latest_report': latest,
+            'days_since_update': days if days is not None else '',
+        }
+    return mapping
+
+
+def _naive_statuses(mapping):
+    statuses = {}
+    for d in mapping.values():
+        s = d.get('status', '')
+        statuses[s] = statuses.get(s, 0) + 1
+    return statuses
+
+
+def _naive_snapshot_counts(mapping, registry):
+    alerts_confirmed = 0
+    for p, info in registry.items():
+        la = info.get('live_alerts', {})
+        if la and la.get('total', 0) > 0 and mapping.get(p, {}).get('system_count', 0) > 0:
+            alerts_confirmed += 1
+    return {
+        'total_permits': len(mapping),
+        'total_pdfs': sum(d.get('drive_count', 0) for d in mapping.values()),
+        'total_ai': sum(d.get('system_count', 0) for d in mapping.values()),
+        'named_permits': sum(1 for e in registry.values() if e.get('name')),
+        'api_matched': sum(1 for e in registry.values() if e.get('api_match')),
+        'alerts_confirmed': alerts_confirmed,
+        'statuses': _naive_statuses(mapping),
+        'permits': sorted(mapping.keys()),
+    }
+
+
+def _naive_updated(mapping, registry, days):
+    cutoff_str = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
+    updated = []
+    for p, d in mapping.items():
+        latest = d.get('latest_report', '')
+        if latest and latest[:10] >= cutoff_str:
+            updated.append((p, registry.get(p, {}).get('name', '') or '-', latest[:10]))
+    return sorted(updated)
+
+
+def _naive_alerts(mapping, registry):
+    danger, warning = set(), set()
+    for p, info in registry.items():
+        la = info.get('live_alerts', {})
+        if la and la.get('total', 0) > 0 and mapping.get(p, {}).get('system_count', 0) > 0:
+            (danger if la.get('danger', 0) > 0 else warning).add(p)
+    return danger, warning
+
+
+class TestPermitTable:
+    def test_snapshot_counts_match_naive(self):
+        registry = _registry()
+        mapping = _mapping(registry)
+        table = PermitTable(mapping, registry)
+        naive = _naive_snapshot_counts(mapping, registry)
+        assert table.total == naive['total_permits']
+        assert table.total_pdfs() == naive['total_pdfs']
+        assert table.total_ai() == naive['total_ai']
+        assert table.named_count() == naive['named_permits']
+        assert table.api_matched_count() == naive['api_matched']
+        assert sum(table.alert_mask()) == naive['alerts_confirmed']
+        # 狀態分布連 key 順序都要一致（快照 JSON 逐字相同）
+        assert list(table.status_counts().items()) == list(naive['statuses'].items())
+
+    def test_gather_stats_matches_naive(self):
+        registry = _registry()
+        mapping = _mapping(registry, seed=11)
+        stats = generate_weekly_report.gather_stats(PermitTable(mapping, registry), days=7)
+        assert sorted((u['permit'], u['name'], u['latest']) for u in stats['updated']) == \
+            _naive_updated(mapping, registry, 7)
+        danger, warning = _naive_alerts(mapping, registry)
+        assert {a['permit'] for a in stats['danger_alerts']} == danger
+        assert {a['permit'] for a in stats['warning_alerts']} == warning
+        assert stats['statuses'] == _naive_statuses(mapping)
+
+    def test_report_views_match_registry(self):
+        registry = _registry()
+        table = PermitTable(_mapping(registry), registry)
+        assert table.name_map() == {p: e['name'] for p, e in registry.items() if e.get('name')}
+        assert set(table.alert_data()) == {
+            p for p, e in registry.items() if (e.get('live_alerts') or {}).get('total', 0) > 0}
+        assert table.gov_url_statuses() == {
+            p: e['gov_pdf_url_status'] for p, e in registry.items() if e.get('gov_pdf_url_status')}
+
+    def test_set_status_and_group_sum(self):
+        mapping = {
+            'A': {'status': 'not_uploaded', 'drive_count': 3},
+            'B': {'status': 'completed', 'drive_count': 5},
+            'C': {'status': 'not_uploaded', 'drive_count': 4},
+        }
+        table = PermitTable(mapping)
+        assert group_sum(table.status, table.drive_count, table.status_names) == \
+            {'not_uploaded': 7, 'completed': 5}
+        table.set_status('A', 'completed_project')
+        assert table.status_counts() == {'completed_project': 1, 'completed': 1, 'not_uploaded': 1}
+
+    def test_stale_mask_skips_no_reports(self):
+        mapping = {
+            'A': {'status': 'in_progress', 'days_since_update': 45},
+            'B': {'status': 'no_reports', 'days_since_update': 45},
+            'C': {'status': 'in_progress', 'days_since_update': '30'},
+            'D': {'status': 'in_progress', 'days_since_update': ''},
+        }
+        table = PermitTable(mapping)
+        assert [table.permits[i] for i in table.rows(table.stale_mask())] == ['A']
+
+
+class TestLoadTable:
+    def test_cached_until_file_changes(self, tmp_path):
+        permit_table.clear_cache()
+        mapping_path = tmp_path / 'mapping.json'
+        registry_path = tmp_path / 'registry.json'
+        mapping_path.write_text(json.dumps({'A': {'status': 'completed'}}), encoding='utf-8')
+        registry_path.write_text(json.dumps({'A': {'name': '甲案'}}), encoding='utf-8')
+        first = permit_table.load_table(mapping_path, registry_path)
+        assert permit_table.load_table(mapping_path, registry_path) is first
+        mapping_path.write_text(json.dumps({'A': {'status': 'completed'}, 'B': {}}), encoding='utf-8')
+        second = permit_table.load_table(mapping_path, registry_path)
+        assert second is not first and second.total == 2
+        permit_table.clear_cache()
+
+    def test_save_snapshot_reads_table(self, tmp_path, monkeypatch):
+        permit_table.clear_cache()
+        registry = _registry()
+        mapping = _mapping(registry, seed=3)
+        (tmp_path / 'permit_system_mapping.json').write_text(json.dumps(mapping), encoding='utf-8')
+        (tmp_path / 'permit_registry.json').write_text(json.dumps(registry), encoding='utf-8')
+        monkeypatch.setattr(weekly_snapshot, 'STATE_DIR', str(tmp_path))
+        monkeypatch.setattr(weekly_snapshot, 'SNAPSHOT_DIR', str(tmp_path / 'snapshots'))
+        snapshot = weekly_snapshot.save_snapshot()
+        naive = _naive_snapshot_counts(mapping, registry)
+        assert {k: snapshot[k] for k in naive} == naive
+        permit_table.clear_cache()
@@ -0,0 +1,125 @@
+"""Tests for match_permits 增量重建：per-permit 輸入指紋與內容快照。"""
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from geobingan_sync.steps import match_permits
+from geobingan_sync.steps.match_permits import input_fingerprint, _content_snapshot
+
+PERMIT = '112建字第0001號'
+OTHER = '112建字第0002號'
+API_PROJECTS = [{'project_name': '信義區松仁段新建工程', 'address': '信義路'}]
+ALERTS = {'信義區松仁段': [{'tone': 'warning', 'date': '2026-01-01', 'detail': 'x'}]}
+API_MATCH = ('信義區松仁段新建工程', {'address': '信義路'})
+
+
+def _fp(entry=None, *, gov_url='https://drive.google.com/drive/folders/A', alerts=None,
+        drive_name='信義區松仁段', api_match=API_MATCH):
+    alerts = ALERTS if alerts is None else alerts
+    return input_fingerprint(
+        PERMIT, entry or {'name': '信義區松仁段', 'name_source': 'drive_pdf'},
+        gov_data={PERMIT: {'source_url': gov_url}},
+        gov_url_statuses={PERMIT: 'alive'},
+        drive_names={PERMIT: {'name': drive_name, 'pdf_count': 3}},
+        source_names={},
+        api_match=api_match,
+        alert_match=('信義區松仁段', alerts['信義區松仁段']),
+    )
+
+
+class TestInputFingerprint:
+    def test_stable_for_same_inputs(self):
+        assert _fp() == _fp()
+
+    def test_gov_url_change(self):
+        assert _fp() != _fp(gov_url='https://drive.google.com/drive/folders/B')
+
+    def test_drive_vote_change(self):
+        assert _fp() != _fp(drive_name='信義區松仁段二期')
+
+    def test_alert_set_change(self):
+        more = {'信義區松仁段': ALERTS['信義區松仁段'] + [{'tone': 'danger', 'date': '', 'detail': 'y'}]}
+        assert _fp() != _fp(alerts=more)
+
+    def test_matched_api_project_change(self):
+        assert _fp() != _fp(api_match=('信義區松仁段新建工程', {'address': '松仁路'}))
+        assert _fp() != _fp(api_match=None)
+
+    def test_entry_content_change(self):
+        assert _fp() != _fp({'name': '信義區松仁段', 'name_source': 'manual'})
+
+    def test_bookkeeping_fields_ignored(self):
+        entry = {'name': '信義區松仁段', 'name_source': 'drive_pdf'}
+        assert _fp(entry) == _fp(dict(entry, updated_at='2026-01-01', input_fingerprint='x'))
+
+
+def test_content_snapshot_ignores_bookkeeping():
+    a = {'name': 'x', 'updated_at': '2026-01-01', 'input_fingerprint': 'aaa'}
+    b = {'name': 'x', 'updated_at': '2026-02-01', 'input_fingerprint': 'bbb'}
+    assert _content_snapshot(a) == _content_snapshot(b)
+    assert _content_snapshot(a) != _content_snapshot({'name': 'y'})
+
+
+def _patch_sources(monkeypatch, tmp_path, drive, alerts):
+    from geobingan_sync import clients, step_memo
+    monkeypatch.setattr(match_permits, 'REGISTRY_FILE', str(tmp_path / 'permit_registry.json'))
+    monkeypatch.setattr(match_permits, 'REGISTRY_CHANGES_FILE', str(tmp_path / 'registry_changes.json'))
+    monkeypatch.setattr(match_permits, '_write_url_404_csv', lambda registry: None)
+    monkeypatch.setattr(step_memo, 'MEMO_FILE', tmp_path / 'step_memo.json')
+    monkeypatch.setattr(clients, 'drive_service', lambda *a, **k: None)
+    monkeypatch.setattr(match_permits, 'fetch_gov_pdf_data', lambda city=None: {
+        PERMIT: {'source_url': 'https://drive.google.com/drive/folders/A'}})
+    monkeypatch.setattr(match_permits, 'fetch_source_folder_names', lambda gov, svc: ({}, {}))
+    monkeypatch.setattr(match_permits, 'fetch_drive_pdf_names', lambda svc: {k: dict(v) for k, v in drive.items()})
+    monkeypatch.setattr(match_permits, 'fetch_api_projects', lambda: list(API_PROJECTS))
+    monkeypatch.setattr(match_permits, 'fetch_api_report_categories', dict)
+    monkeypatch.setattr(match_permits, 'fetch_live_alerts', lambda: {k: list(v) for k, v in alerts.items()})
+
+
+def _run_twice(tmp_path, mutate):
+    match_permits.build_registry()
+    first = json.loads((tmp_path / 'permit_registry.json').read_text(encoding='utf-8'))
+    mutate()
+    match_permits.build_registry()
+    registry = json.loads((tmp_path / 'permit_registry.json').read_text(encoding='utf-8'))
+    changes = json.loads((tmp_path / 'registry_changes.json').read_text(encoding='utf-8'))
+    return first, registry, changes
+
+
+def test_unchanged_permit_skipped(tmp_path, monkeypatch):
+    """第一次 run 記錄比對後的指紋；第二次 run 只有另一個建照的輸入變了 → 不變的建照整筆沿用"""
+    drive = {PERMIT: {'name': '信義區松仁段', 'pdf_count': 3}, OTHER: {'name': '中山區新生段', 'pdf_count': 1}}
+    _patch_sources(monkeypatch, tmp_path, drive, ALERTS)
+    first, registry, changes = _run_twice(
+        tmp_path, lambda: drive.__setitem__(OTHER, {'name': '中山區新生段二期', 'pdf_count': 2}))
+    assert first[PERMIT]['api_match'] == '信義區松仁段新建工程'
+    assert registry[PERMIT] == first[PERMIT]
+    assert changes['changed'] == [OTHER] and changes['unchanged_inputs'] == 1
+
+
+def test_unrelated_alerts_do_not_rematch(tmp_path, monkeypatch):
+    """別的建案新增警示（即時警示每天都在變）→ 只有命中該建案的建照重比"""
+    drive = {PERMIT: {'name': '信義區松仁段', 'pdf_count': 3}, OTHER: {'name': '中山區新生段', 'pdf_count': 1}}
+    alerts = dict(ALERTS, 中山區新生段=[{'tone': 'warning', 'date': '2026-01-01', 'detail': 'a'}])
+    _patch_sources(monkeypatch, tmp_path, drive, alerts)
+    first, registry, changes = _run_twice(tmp_path, lambda: alerts.__setitem__(
+        '中山區新生段', alerts['中山區新生段'] + [{'tone': 'danger', 'date': '2026-01-02', 'detail': 'b'}]))
+    assert registry[PERMIT] == first[PERMIT]
+    assert registry[OTHER]['live_alerts']['danger'] == 1
+    assert changes['changed'] == [OTHER] and changes['unchanged_inputs'] == 1
+
+
+def test_failed_live_alerts_keep_existing_alerts(tmp_path, monkeypatch):
+    """即時警示抓取失敗 → 標記資料不完整，既有的 live_alerts 不被清掉"""
+    drive = {PERMIT: {'name': '信義區松仁段', 'pdf_count': 3}}
+    _patch_sources(monkeypatch, tmp_path, drive, ALERTS)
+
+    def fail():
+        raise RuntimeError('API 錯誤: 502')
+
+    first, registry, changes = _run_twice(
+        tmp_path, lambda: monkeypatch.setattr(match_permits, 'fetch_live_alerts', fail))
+    assert first[PERMIT]['live_alerts']['warning'] == 1
+    assert registry[PERMIT]['live_alerts'] == first[PERMIT]['live_alerts']
+    assert changes['degraded_sources'] == ['6 即時警示']
@@ -0,0 +1,296 @@
+"""Golden tests：ReportPermitMatcher vs 原本 fetch_api_reports 的逐一掃描實作。
+
+_naive_group 是比對器化之前 fetch_api_reports 的原始邏輯（逐字搬過來當 reference，
+只拿掉 API 抓取與 print）。語料從 state/permit_registry.json 與
+state/upload_history_all.json 衍生：真實上傳檔名、拿掉建照號的檔名、
+建案名稱 / api_match 加上日期與報告字樣、截頭截尾的名稱變體。
+"""
+import json
+import os
+import re
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from geobingan_sync.report_matcher import (
+    ReportPermitMatcher, MatchMemo, group_reports, api_core_name, registry_fingerprint,
+)
+from geobingan_sync.text_index import AhoCorasick, SubstringIndex
+
+STATE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'state')
+
+
+# ==================== reference（原始逐一掃描） ====================
+
+def _naive_group(all_reports, registry, filename_to_permit, upload_history):
+    api_name_to_permits = {}
+    for permit, info in registry.items():
+        api_match = info.get('api_match', '')
+        if api_match and len(api_match) >= 4:
+            if api_match not in api_name_to_permits:
+                api_name_to_permits[api_match] = []
+            api_name_to_permits[api_match].append(permit)
+
+    name_to_permit_fuzzy = {}
+    fragment_to_permit = {}
+    fragment_permits = {}
+    generic_patterns = re.compile(r'^(監測報告?|監測報表?|監測$|安全觀測|安全監測|觀測報告|觀測數據|工地監測|工地$|報告$|報表$|告示牌|基地觀測系統|建號\d)')
+    for permit, info in registry.items():
+        name = info.get('name', '')
+        if name and len(name) >= 4 and not generic_patterns.match(name):
+            name_to_permit_fuzzy[name] = permit
+            clean = re.sub(r'(安全觀測|監測報表?|觀測報告|觀測數據|新建工程|工程|報告|報表|數據)', '', name)
+            cjk_parts = re.findall(r'[\u4e00-\u9fff]+', clean)
+            for part in cjk_parts:
+                for flen in range(4, min(7, len(part) + 1)):
+                    for start in range(len(part) - flen + 1):
+                        frag = part[start:start + flen]
+                        if frag not in fragment_permits:
+                            fragment_permits[frag] = set()
+                        fragment_permits[frag].add(permit)
+        api_name = info.get('api_match', '')
+        if api_name:
+            name_to_permit_fuzzy[api_name] = permit
+    for frag, permits in fragment_permits.items():
+        if len(permits) == 1:
+            fragment_to_permit[frag] = next(iter(permits))
+
+    permit_reports = {}
+    matched = 0
+    unmatched = 0
+    for permit, files in upload_history.items():
+        permit_reports[permit] = [{'filename': f, 'created_at': '', 'status': 'uploaded'} for f in files]
+
+    for report in all_reports:
+        filename = report.get('file_name', '')
+        permit_match = re.search(r'(\d{2,3}建字第\d{3,5}號)', filename)
+        permit = None
+        if permit_match:
+            permit = permit_match.group(1)
+        else:
+            permit = filename_to_permit.get(filename)
+
+        if not permit and api_name_to_permits:
+            fn_clean_api = re.sub(r'\d{7,8}|\d{4}[-/.]\d{2}[-/.]\d{2}|\.pdf$|[^\u4e00-\u9fff\w\s-]', '', filename)
+            best_permits = None
+            best_api_len = 0
+            for api_name, permits_list in api_name_to_permits.items():
+                api_core = api_name
+                for _ in range(3):
+                    api_core = re.sub(r'[-\s]*(新建工程|監測案|新建統包工程|集合住宅|住宅大樓|商辦大樓|店鋪|工程|監測)$', '', api_core).strip()
+                if len(api_core) >= 3 and api_core in fn_clean_api and len(api_core) > best_api_len:
+                    best_permits = permits_list
+                    best_api_len = len(api_core)
+            if best_permits:
+                for p in best_permits:
+                    if p not in permit_reports:
+                        permit_reports[p] = []
+                    existing = {r['filename'] for r in permit_reports[p]}
+                    if filename not in existing:
+                        permit_reports[p].append({
+                            'filename': filename,
+                            'created_at': report.get('created_at', ''),
+                            'status': report.get('parse_status', '')
+                        })
+                matched += 1
+                continue
+
+        if not permit and name_to_permit_fuzzy:
+            best_match = None
+            best_len = 0
+            for name, p in name_to_permit_fuzzy.items():
+                if name in filename and len(name) > best_len:
+                    best_match = p
+                    best_len = len(name)
+            if not best_match and fragment_to_permit:
+                fn_clean = re.sub(r'\d{7,8}|\d{4}[-/.]\d{2}[-/.]\d{2}|\.pdf$|監測報告|觀測報告|報告|報表|[^\u4e00-\u9fff]', '', filename)
+                for frag, p in sorted(fragment_to_permit.items(), key=lambda x: -len(x[0])):
+                    if frag in fn_clean:
+                        best_match = p
+                        break
+            if not best_match and name_to_permit_fuzzy:
+                fn_clean = re.sub(r'\d{7,8}|\d{4}[-/.]\d{2}[-/.]\d{2}|\.pdf$|監測報告|觀測報告|觀測數據|報告|報表|新建工程|集合住宅|住宅大樓|安全觀測|安全監測|[^\u4e00-\u9fff]', '', filename)
+                cjk_text = ''.join(re.findall(r'[\u4e00-\u9fff]+', fn_clean))
+                for flen in range(min(6, len(cjk_text)), 3, -1):
+                    found = False
+                    for start in range(len(cjk_text) - flen + 1):
+                        sub = cjk_text[start:start + flen]
+                        matches = [p for name, p in name_to_permit_fuzzy.items() if sub in name]
+                        unique_permits = set(matches)
+                        if len(unique_permits) == 1:
+                            best_match = next(iter(unique_permits))
+                            found = True
+                            break
+                    if found:
+                        break
+            if best_match:
+                permit = best_match
+
+        if permit:
+            matched += 1
+            if permit not in permit_reports:
+                permit_reports[permit] = []
+            existing_files = {r['filename'] for r in permit_reports[permit]}
+            if filename not in existing_files:
+                permit_reports[permit].append({
+                    'filename': filename,
+                    'created_at': report.get('created_at', ''),
+                    'status': report.get('parse_status', '')
+                })
+        else:
+            unmatched += 1
+    return permit_reports, matched, unmatched
+
+
+# ==================== fixture ====================
+
+@pytest.fixture(scope='module')
+def corpus():
+    registry_path = os.path.join(STATE_DIR, 'permit_registry.json')
+    history_path = os.path.join(STATE_DIR, 'upload_history_all.json')
+    if not (os.path.exists(registry_path) and os.path.exists(history_path)):
+        pytest.skip('缺少 state/permit_registry.json 或 upload_history_all.json')
+    with open(registry_path, 'r', encoding='utf-8') as f:
+        registry = json.load(f)
+    with open(history_path, 'r', encoding='utf-8') as f:
+        items = [i for i in json.load(f).get('uploaded_files', []) if isinstance(i, str) and '/' in i]
+
+    # 只用一半的上傳記錄建檔名對應，另一半只能靠名稱比對
+    filename_to_permit, upload_history = {}, {}
+    for item in items[::2]:
+        permit, filename = item.split('/', 1)
+        filename_to_permit[filename] = permit
+        upload_history.setdefault(permit, set()).add(filename)
+
+    filenames = [item.split('/', 1)[1] for item in items]
+    filenames += [re.sub(r'\d{2,3}建字第\d{3,5}號', '', fn) for fn in filenames[::3]]
+    for i, (permit, info) in enumerate(sorted(registry.items())):
+        for name in (info.get('name', ''), info.get('api_match', '')):
+            if not name:
+                continue
+            filenames += [
+                f'{name}1150{i % 9 + 1}01監測報告.pdf',
+                f'2026-03-{i % 28 + 1:02d} {name[1:]}觀測數據.pdf',
+                f'{name[:-1]}安全觀測報表.pdf',
+                f'【週報】{name[2:-2]}新建工程.pdf',
+            ]
+    filenames += ['', '監測報告.pdf', '20260301.pdf', 'report-final.pdf']
+    reports = [{'file_name': fn, 'created_at': f'2026-03-{i % 28 + 1:02d}T00:00:00Z',
+                'parse_status': 'completed'} for i, fn in enumerate(filenames)]
+    return registry, filename_to_permit, upload_history, reports
+
+
+def _normalize(permit_reports):
+    return {p: sorted((r['filename'], r['created_at'], r['status']) for r in rs)
+            for p, rs in permit_reports.items()}
+
+
+# ==================== golden ====================
+
+def test_group_reports_matches_naive(corpus):
+    registry, filename_to_permit, upload_history, reports = corpus
+    expected, exp_matched, exp_unmatched = _naive_group(reports, registry, filename_to_permit, upload_history)
+    matcher = ReportPermitMatcher(registry, filename_to_permit)
+    actual, stats = group_reports(reports, matcher, upload_history)
+    assert _normalize(actual) == _normalize(expected)
+    assert (stats['matched'], stats['unmatched']) == (exp_matched, exp_unmatched)
+    assert sum(stats['by_method'].values()) == stats['matched']
+    # 語料要真的走到各條比對路徑，golden 才有意義
+    assert {'permit_no', 'history', 'api_name', 'name', 'fragment', 'reverse'} <= set(stats['by_method'])
+
+
+def test_fuzzy_counted_once_per_report():
+    """反向匹配（3c）命中只算一次名稱匹配（原本會重複累加）"""
+    registry = {'113建字第0001號': {'name': '松高工程大樓'}}
+    matcher = ReportPermitMatcher(registry, {})
+    assert matcher.match('松高工程週報.pdf') == (['113建字第0001號'], 'reverse')
+    _, stats = group_reports([{'file_name': '松高工程週報.pdf'}], matcher, {})
+    assert (stats['matched'], stats['fuzzy']) == (1, 1)
+
+
+def test_api_name_assigns_all_permits_once():
+    registry = {
+        '113建字第0001號': {'name': '甲案', 'api_match': '大安森林新建工程'},
+        '113建字第0002號': {'name': '乙案', 'api_match': '大安森林新建工程'},
+    }
+    matcher = ReportPermitMatcher(registry, {})
+    reports = [{'file_name': '大安森林1150301.pdf'}, {'file_name': '大安森林1150301.pdf'}]
+    grouped, stats = group_reports(reports, matcher, {'113建字第0001號': {'大安森林1150301.pdf'}})
+    assert [r['filename'] for r in grouped['113建字第0001號']] == ['大安森林1150301.pdf']
+    assert [r['filename'] for r in grouped['113建字第0002號']] == ['大安森林1150301.pdf']
+    assert stats['matched'] == 2
+
+
+def test_api_core_name_strips_suffixes():
+    assert api_core_name('松江路集合住宅新建工程') == '松江路'
+    assert api_core_name('敦化南路 - 監測案') == '敦化南路'
+
+
+# ==================== 跨 run memo ====================
+
+def test_memo_second_run_reuses_results(corpus, tmp_path):
+    registry, filename_to_permit, upload_history, reports = corpus
+    memo_path = tmp_path / 'memo.json'
+    version = registry_fingerprint(registry)
+    memo = MatchMemo(version, memo_path)
+    first, _ = group_reports(reports, ReportPermitMatcher(registry, filename_to_permit, memo=memo),
+                             upload_history)
+    memo.save()
+
+    memo = MatchMemo(version, memo_path)
+    matcher = ReportPermitMatcher(registry, filename_to_permit, memo=memo)
+    second, _ = group_reports(reports, matcher, upload_history)
+    assert _normalize(second) == _normalize(first)
+    assert memo.misses == 0 and memo.hits > 0
+    assert not matcher._built  # 全部命中 → 不必建自動機
+
+
+def test_memo_invalidated_when_registry_names_change(tmp_path):
+    registry = {'113建字第0001號': {'name': '松高工程大樓'}}
+    memo_path = tmp_path / 'memo.json'
+    memo = MatchMemo(registry_fingerprint(registry), memo_path)
+    ReportPermitMatcher(registry, {}, memo=memo).match('松高工程週報.pdf')
+    memo.save()
+
+    # 無關欄位變動不影響版本
+    registry['113建字第0001號']['address'] = '台北市信義區'
+    assert not MatchMemo(registry_fingerprint(registry), memo_path).invalidated
+
+    registry['113建字第0002號'] = {'name': '松高工程商場'}
+    memo = MatchMemo(registry_fingerprint(registry), memo_path)
+    assert memo.invalidated and not memo.entries
+    # 名稱變了以後反向匹配不再唯一
+    assert ReportPermitMatcher(registry, {}, memo=memo).match('松高工程週報.pdf') == ([], '')
+
+
+def test_history_mapping_bypasses_memo(tmp_path):
+    """上傳記錄對應（方法 2）每次都重新判斷，不會被舊的名稱比對結果蓋掉"""
+    registry = {'113建字第0001號': {'name': '松高工程大樓'}}
+    version = registry_fingerprint(registry)
+    memo = MatchMemo(version, tmp_path / 'memo.json')
+    assert ReportPermitMatcher(registry, {}, memo=memo).match('週報.pdf') == ([], '')
+    memo.save()
+    memo = MatchMemo(version, tmp_path / 'memo.json')
+    matcher = ReportPermitMatcher(registry, {'週報.pdf': '113建字第0009號'}, memo=memo)
+    assert matcher.match('週報.pdf') == (['113建字第0009號'], 'history')
+
+
+# ==================== text_index ====================
+
+def test_aho_corasick_matches_naive_in():
+    import random
+    rng = random.Random(7)
+    for _ in range(500):
+        pats = [''.join(rng.choice('甲乙丙丁') for _ in range(rng.randint(1, 4))) for _ in range(rng.randint(1, 8))]
+        text = ''.join(rng.choice('甲乙丙丁') for _ in range(rng.randint(0, 15)))
+        assert AhoCorasick(pats).find(text) == {i for i, p in enumerate(pats) if p in text}
+
+
+def test_first_overlapping_matches_naive_loop(corpus):
+    registry = corpus[0]
+    names = [info['name'] for _, info in sorted(registry.items()) if info.get('name')]
+    index = SubstringIndex(names)
+    for query in [''] + [n[1:] for n in names[::4]] + [f'大{n}監測' for n in names[::5]] + ['不存在的建案']:
+        naive = next((n for n in names if query in n or n in query), None)
+        assert index.first_overlapping(query) == naive, query
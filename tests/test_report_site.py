@@ -0,0 +1,74 @@
+"""Tests for report_site（線上版 shell + 資料 JSON）"""
+import json
+import os
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from geobingan_sync.report_site import (
+    COLUMNS, SHELL_HTML, build_rows, render_data_json, write_report_site,
+)
+
+NOW = datetime(2026, 4, 16, 9, 30)
+
+
+def _permit_data():
+    return {
+        '112建字第0238號': {'drive_count': 15, 'system_count': 12, 'latest_report': '2026-04-10T08:00:00Z',
+                          'days_since_update': 6, 'status': 'in_progress', 'folder_id': 'abc'},
+        '110建字第0325號': {'drive_count': 30, 'system_count': 0, 'latest_report': None,
+                          'days_since_update': '', 'status': 'not_uploaded'},
+    }
+
+
+ALERTS = {
+    '112建字第0238號': {'total': 3, 'warning_count': 2, 'danger_count': 1,
+                      'latest_alert_date': '2026-04-09T12:00:00Z', 'details': ['傾斜計 A']},
+    '110建字第0325號': {'total': 1, 'warning_count': 1, 'danger_count': 0},
+}
+
+
+def test_rows_sorted_and_alerts_gated_by_system_count():
+    rows = build_rows(_permit_data(), [], ALERTS, {'112建字第0238號': '全球人壽'}, {'110建字第0325號': '404'})
+    records = [dict(zip(COLUMNS, r)) for r in rows]
+    assert [r['permit'] for r in records] == ['110建字第0325號', '112建字第0238號']
+    # AI 辨識數 0 → 不帶警戒值（與完整報告一致）
+    assert records[0]['alert_total'] == 0 and records[0]['url_status'] == '404'
+    assert records[1]['latest'] == '2026-04-10'
+    assert records[1]['latest_alert_date'] == '2026-04-09'
+    assert records[1]['alert_details'] == ['傾斜計 A']
+
+
+def test_data_json_deterministic_one_row_per_line():
+    data = _permit_data()
+    non_google = [{'permit': '111建字第0093號', 'cloud': 'OneDrive'}]
+    text = render_data_json(build_rows(data, non_google, ALERTS), non_google, NOW)
+    reordered = dict(reversed(list(data.items())))
+    assert render_data_json(build_rows(reordered, non_google, ALERTS), non_google, NOW) == text
+
+    parsed = json.loads(text)
+    assert parsed['columns'] == COLUMNS and parsed['non_google'] == [['111建字第0093號', 'OneDrive']]
+    row_lines = [line for line in text.splitlines() if line.startswith('["1')]
+    assert len(row_lines) == 3  # 2 個建案 + 1 個非 Google
+
+    # 只改一個建案 → 只有那一行不同（加上 generated_at）
+    data['112建字第0238號']['system_count'] = 13
+    changed = render_data_json(build_rows(data, non_google, ALERTS), non_google, NOW).splitlines()
+    diff = [a for a, b in zip(text.splitlines(), changed) if a != b]
+    assert len(diff) == 1 and '112建字第0238號' in diff[0]
+
+
+def test_write_report_site(tmp_path):
+    n = write_report_site(str(tmp_path / 'site'), _permit_data(), [], ALERTS, now=NOW)
+    assert n == 2
+    shell = (tmp_path / 'site' / 'index.html').read_text(encoding='utf-8')
+    assert shell == SHELL_HTML
+    assert 'permit_data.json' in shell and '112建字第0238號' not in shell
+    assert json.loads((tmp_path / 'site' / 'permit_data.json').read_text(encoding='utf-8'))['generated_at'] == '2026-04-16 09:30'
+
+
+def test_data_json_records_degraded_sources():
+    rows = build_rows(_permit_data(), [], ALERTS)
+    assert 'degraded' not in json.loads(render_data_json(rows, [], NOW))
+    assert json.loads(render_data_json(rows, [], NOW, ['API 報告']))['degraded'] == ['API 報告']
+    assert 'data.degraded' in SHELL_HTML
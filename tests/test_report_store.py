@@ -0,0 +1,109 @@
+"""Tests for report_store：完整 / 增量同步、重疊視窗、排序檢查、失敗沿用快取。"""
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from geobingan_sync import report_store
+
+NOW = datetime(2026, 8, 1, 12, 0, 0)
+
+
+@pytest.fixture(autouse=True)
+def _store_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(report_store, 'REPORT_STORE_DIR', tmp_path / 'report_store')
+
+
+def _report(i, days_ago):
+    ts = (NOW - timedelta(days=days_ago)).isoformat()
+    return {'id': i, 'file_name': f'r{i}.pdf', 'created_at': ts, 'parse_status': 'done', 'big': 'x' * 10}
+
+
+class FakeApi:
+    """依 created_at 由新到舊分頁（每頁 page_size 筆），記錄抓了哪些頁。"""
+    def __init__(self, reports, page_size=3, honor_ordering=True):
+        self.reports = list(reports)
+        self.page_size = page_size
+        self.honor_ordering = honor_ordering
+        self.pages = []
+        self.fail = False
+
+    def __call__(self, page, ordering):
+        if self.fail:
+            raise IOError('api down')
+        self.pages.append(page)
+        rows = self.reports
+        if self.honor_ordering:
+            rows = sorted(rows, key=lambda r: r['created_at'], reverse=True)
+        chunk = rows[(page - 1) * self.page_size: page * self.page_size]
+        has_next = page * self.page_size < len(rows)
+        return {'count': len(rows), 'next': f'?page={page + 1}' if has_next else None, 'results': chunk}
+
+
+def _sync(api, **kw):
+    kw.setdefault('fresh_seconds', 0)
+    return report_store.sync_reports('g1', api, **kw)
+
+
+def test_first_sync_is_full_and_compacts_fields():
+    api = FakeApi([_report(i, days_ago=i) for i in range(10)])
+    out = _sync(api, now=NOW)
+    assert sorted(api.pages) == [1, 2, 3, 4]    # 完整同步：其餘頁並行抓
+    assert [r['id'] for r in out] == list(range(10))          # 由新到舊
+    assert set(out[0]) == {'id', 'file_name', 'created_at', 'parse_status'}
+    assert report_store.load_reports('g1') == out
+
+
+def test_incremental_stops_after_overlap_window():
+    api = FakeApi([_report(i, days_ago=10 + i) for i in range(30)])
+    _sync(api, now=NOW)
+    api.reports += [_report(100, days_ago=1), _report(101, days_ago=0)]
+    api.pages = []
+    out = _sync(api, now=NOW + timedelta(hours=1))
+    assert api.pages == [1, 2]           # 新報告 + 重疊視窗內的一頁就停
+    assert len(out) == 32
+    assert out[0]['id'] == 101
+
+
+def test_periodic_full_resync_drops_deleted_reports():
+    api = FakeApi([_report(i, days_ago=i) for i in range(5)])
+    _sync(api, now=NOW)
+    api.reports = api.reports[1:]          # 報告 0 被刪除
+    out = _sync(api, now=NOW + timedelta(days=report_store.FULL_RESYNC_DAYS))
+    assert [r['id'] for r in out] == [1, 2, 3, 4]
+
+
+def test_unordered_api_falls_back_to_full_sync():
+    api = FakeApi([_report(i, days_ago=10 + i) for i in range(9)])
+    _sync(api, now=NOW)
+    api.honor_ordering = False
+    api.reports = list(reversed(api.reports)) + [_report(50, days_ago=0)]
+    api.pages = []
+    out = _sync(api, now=NOW + timedelta(hours=1))
+    assert sorted(api.pages) == [1, 1, 2, 3, 4]    # 第 1 頁偵測到未排序 → 從頭完整翻頁
+    assert len(out) == 10
+
+
+def test_failure_returns_cached_reports():
+    api = FakeApi([_report(i, days_ago=i) for i in range(4)])
+    _sync(api, now=NOW)
+    api.fail = True
+    out = _sync(api, now=NOW + timedelta(hours=1))
+    assert [r['id'] for r in out] == [0, 1, 2, 3]
+
+
+def test_failure_without_cache_returns_empty():
+    api = FakeApi([])
+    api.fail = True
+    assert _sync(api, now=NOW) == []
+
+
+def test_recent_sync_reused_without_api_call():
+    api = FakeApi([_report(i, days_ago=i) for i in range(4)])
+    _sync(api, now=NOW)
+    api.pages = []
+    out = report_store.sync_reports('g1', api, now=NOW + timedelta(minutes=5))
+    assert api.pages == []
+    assert len(out) == 4
@@ -8,7 +8,11 @@ import os
 import tempfile
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from geobingan_sync.report_template import generate_html_report, generate_csv_report
+from datetime import datetime
+
+from geobingan_sync.report_template import (
+    generate_html_report, generate_csv_report, write_reports, write_html, summarize_permits,
+)
 
 
 def _sample_permit_data():
@@ -155,3 +159,63 @@ class TestGenerateCsvReport:
             assert os.path.exists(path)
             with open(path, encoding='utf-8-sig') as f:
                 assert f.read() == csv
+
+
+class TestStreamingRenderer:
+    def test_write_reports_matches_string_api(self, monkeypatch):
+        """串流寫檔與回傳字串的介面輸出逐字相同"""
+        import geobingan_sync.report_template as rt
+        now = datetime(2026, 4, 16, 9, 30)
+
+        class _FixedDatetime(datetime):
+            @classmethod
+            def now(cls, tz=None):
+                return now
+        monkeypatch.setattr(rt, 'datetime', _FixedDatetime)
+
+        args = (_sample_permit_data(), _sample_non_google(), _sample_alert_data(), _sample_permit_names())
+        statuses = {'112建字第0238號': '404'}
+        html = generate_html_report(*args, gov_url_statuses=statuses)
+        csv = generate_csv_report(*args, gov_url_statuses=statuses)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            html_path = os.path.join(tmpdir, 'sub', 'report.html')
+            csv_path = os.path.join(tmpdir, 'sub', 'report.csv')
+            write_reports(*args, html_path=html_path, csv_path=csv_path, gov_url_statuses=statuses, now=now)
+            with open(html_path, encoding='utf-8') as f:
+                assert f.read() == html
+            with open(csv_path, encoding='utf-8-sig') as f:
+                assert f.read() == csv
+            assert sorted(os.listdir(os.path.dirname(html_path))) == ['report.csv', 'report.html']
+        assert 'URL 失效' in html
+
+    def test_summary_single_pass(self):
+        summary = summarize_permits(_sample_permit_data(), _sample_non_google())
+        assert summary.total == 3
+        assert summary.count('in_progress') == 1 and summary.count('error') == 0
+        assert [s['permit'] for s in summary.stale_permits] == ['110建字第0325號']
+        assert summary.html_order[0] == '112建字第0238號'
+        assert summary.csv_order[-1] == '111建字第0071號'
+
+    def test_rows_written_incrementally(self):
+        """每列各自寫出，不先組成整份表格字串"""
+        writes = []
+
+        class _Recorder:
+            def write(self, chunk):
+                writes.append(chunk)
+
+        permit_data = {f'113建字第{n:04d}號': {'status': 'completed', 'drive_count': 1, 'system_count': 1}
+                       for n in range(50)}
+        write_html(_Recorder(), permit_data, summarize_permits(permit_data, []))
+        rows = [w for w in writes if w.startswith('\n<tr data-status=')]
+        assert len(rows) == 50
+
+    def test_degraded_sources_noted_in_header(self):
+        import io
+        permit_data = _sample_permit_data()
+        summary = summarize_permits(permit_data, [])
+        full, partial = io.StringIO(), io.StringIO()
+        write_html(full, permit_data, summary)
+        write_html(partial, permit_data, summary, degraded=['API 報告'])
+        assert '資料不完整' not in full.getvalue()
+        assert '資料不完整：API 報告 抓取失敗' in partial.getvalue()
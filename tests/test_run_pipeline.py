@@ -0,0 +1,133 @@
+"""Tests for run（單一 process 的同步流程 orchestrator）。
+
+以假步驟驗證 DAG 語意：依賴失敗的跳過連鎖、after 只排順序、SystemExit(0) 視為成功、
+error 步驟的錯誤記錄、獨立步驟並行；另驗證 log 計數與 Token 有效期分類。
+"""
+import base64
+import json
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from geobingan_sync import run
+from geobingan_sync.run import FAILED, OK, SKIPPED, Step, count_results, run_steps
+
+
+def _ok(log, name):
+    return lambda ctx: log.append(name)
+
+
+def _boom(ctx):
+    raise RuntimeError('boom')
+
+
+def test_failed_dependency_skips_dependents_transitively():
+    log = []
+    steps = [
+        Step('a', _boom, error=('步驟1', '同步 PDF 失敗')),
+        Step('b', _ok(log, 'b'), requires=['a']),
+        Step('c', _ok(log, 'c'), requires=['b']),
+        Step('d', _ok(log, 'd'), after=['c']),
+    ]
+    result = run_steps(steps, {})
+    assert result.status == {'a': FAILED, 'b': SKIPPED, 'c': SKIPPED, 'd': OK}
+    assert log == ['d']
+    assert result.error_message == '步驟1: 同步 PDF 失敗'
+
+
+def test_after_orders_without_requiring_success():
+    log = []
+    steps = [
+        Step('late', _ok(log, 'late'), after=['early']),
+        Step('early', lambda ctx: (log.append('early'), _boom(ctx))),
+    ]
+    result = run_steps(steps, {}, max_workers=4)
+    assert log == ['early', 'late']
+    assert result.status['late'] == OK
+    # 沒有 error 的步驟失敗不影響整體結果
+    assert not result.has_error
+
+
+def test_system_exit_zero_is_success():
+    def exits(code):
+        def fn(ctx):
+            sys.exit(code)
+        return fn
+
+    result = run_steps([Step('zero', exits(0)), Step('none', exits(None)),
+                        Step('one', exits(1), error=('步驟2', '上傳 PDF 失敗'))], {})
+    assert result.status == {'zero': OK, 'none': OK, 'one': FAILED}
+    assert result.error_message == '步驟2: 上傳 PDF 失敗'
+
+
+def test_independent_steps_run_concurrently():
+    barrier = threading.Barrier(2, timeout=5)
+    steps = [Step('x', lambda ctx: barrier.wait()), Step('y', lambda ctx: barrier.wait())]
+    result = run_steps(steps, {}, max_workers=2)
+    assert result.status == {'x': OK, 'y': OK}
+
+
+def test_invalid_dependencies_raise():
+    with pytest.raises(ValueError):
+        run_steps([Step('a', _boom, requires=['missing'])], {})
+    with pytest.raises(ValueError):
+        run_steps([Step('a', _boom, after=['b']), Step('b', _boom, after=['a'])], {})
+
+
+def test_weekly_dag_matches_shell_semantics():
+    steps = {s.name: s for s in run.weekly_steps()}
+    assert steps['upload'].requires == ('sync_permits',)
+    assert set(steps['tracking_report'].requires) == {'sync_permits', 'upload'}
+    assert steps['match_permits'].error is None
+    assert steps['snapshot'].error is None
+    assert steps['weekly_report'].error is None
+    # 快照與追蹤報告彼此獨立（可並行）
+    assert 'snapshot' not in steps['tracking_report'].requires + steps['tracking_report'].after
+    assert 'tracking_report' not in steps['snapshot'].requires + steps['snapshot'].after
+
+
+def test_upload_failure_skips_report_but_not_snapshot(monkeypatch):
+    calls = []
+    for name in ('step_sync_permits', 'step_match_permits', 'step_snapshot_table',
+                 'step_snapshot', 'step_tracking_report', 'step_publish', 'step_weekly_report'):
+        monkeypatch.setattr(run, name, lambda ctx, n=name: calls.append(n))
+    monkeypatch.setattr(run, 'step_upload', _boom)
+    result = run_steps(run.weekly_steps(), {})
+    assert result.status['tracking_report'] == SKIPPED
+    assert result.status['snapshot'] == OK
+    assert result.status['publish'] == OK
+    assert result.error_message == '步驟2: 上傳 PDF 失敗'
+
+
+def test_count_results_uses_shell_patterns():
+    log = '\n'.join([
+        '✅ 新增 3 個 PDF',
+        '✅ 新增 12 個 PDF',
+        '  ✅ 報告上傳成功: a.pdf',
+        '  ✅ 報告上傳成功: b.pdf',
+        '  ❌ 上傳失敗: c.pdf',
+    ])
+    assert count_results(log) == (12, 2, 1)
+    assert count_results('') == (0, 0, 0)
+
+
+def _jwt(exp):
+    body = base64.urlsafe_b64encode(json.dumps({'exp': exp}).encode()).rstrip(b'=').decode()
+    return f'e30.{body}.sig'
+
+
+@pytest.mark.parametrize('days, expected', [(-1, 'EXPIRED'), (1, 'WARNING'), (10, 'OK')])
+def test_check_refresh_token(days, expected):
+    now = 1_700_000_000
+    state, left = run.check_refresh_token(_jwt(now + days * 86400), now=now)
+    assert state == expected
+    assert left == pytest.approx(abs(days))
+
+
+def test_dry_run_lists_steps(capsys):
+    assert run.main(['weekly', '--dry-run']) == 0
+    out = capsys.readouterr().out
+    assert 'tracking_report（requires sync_permits, upload' in out
@@ -109,3 +109,20 @@ def test_max_uploads_zero_means_unlimited():
     pdfs = [_pdf(f'報告_11507{d:02d}.pdf', folder=f'F{d}') for d in range(10, 20)]
     picked, _ = select_pdfs_to_upload(pdfs, [], cutoff=CUTOFF, max_uploads=0)
     assert len(picked) == 10
+
+
+def test_records_and_dicts_select_same():
+    """PdfRecord（掃描結果）與 dict 輸入的選取結果一致；run 內去重用快取的 unique_id。"""
+    from geobingan_sync.pdf_inventory import PdfRecord
+    pdfs = [
+        _pdf('報告_1150715.pdf', mtime='2026-07-15T00:00:00Z'),
+        _pdf('報告_1150715.pdf', mtime='2026-07-16T00:00:00.500Z'),
+        _pdf('報告_1150716.pdf', folder='B', mtime='2026-07-16T00:00:00Z'),
+        _pdf('舊報告_1140101.pdf', mtime='2026-07-20T00:00:00Z'),
+    ]
+    records = [PdfRecord(p) for p in pdfs]
+    picked_d, counts_d = select_pdfs_to_upload(pdfs, [], cutoff=CUTOFF)
+    picked_r, counts_r = select_pdfs_to_upload(records, [], cutoff=CUTOFF)
+    assert [p.to_dict() for p in picked_d] == [p.to_dict() for p in picked_r]
+    assert counts_d == counts_r
+    assert picked_r[0] is records[1]
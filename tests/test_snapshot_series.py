@@ -0,0 +1,142 @@
+"""Tests for snapshot_series（週報快照 append-only 時間序列）。
+
+驗證：還原出的快照與原本每日完整 JSON 一致、任兩日差異只讀區間內的 delta、
+每週指標序列、中斷寫入的殘列復原，以及舊版每日快照的匯入。
+"""
+import json
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from geobingan_sync import snapshot_series
+from geobingan_sync.snapshot_series import SnapshotSeries, open_series
+from geobingan_sync.steps import weekly_snapshot
+
+
+def _snapshot(day, permits, pdfs=0):
+    return {
+        'date': day,
+        'total_permits': len(permits),
+        'total_pdfs': pdfs,
+        'total_ai': pdfs // 2,
+        'named_permits': 0,
+        'api_matched': 0,
+        'alerts_confirmed': 0,
+        'statuses': {'active': len(permits)},
+        'permits': sorted(permits),
+    }
+
+
+def _history(n=40, seed=7):
+    """n 天的快照：每天隨機增減幾個建照"""
+    rng = random.Random(seed)
+    permits = {f'P{i:03d}' for i in range(50)}
+    out = []
+    for d in range(n):
+        permits -= set(rng.sample(sorted(permits), rng.randint(0, 3)))
+        permits |= {f'P{rng.randint(0, 199):03d}' for _ in range(rng.randint(0, 4))}
+        out.append(_snapshot(f'2026-08-{1 + d:02d}' if d < 31 else f'2026-09-{d - 30:02d}', permits, pdfs=100 + d))
+    return out
+
+
+def test_roundtrip_every_snapshot(tmp_path, monkeypatch):
+    """每一筆都能還原成原本的完整快照（跨 keyframe 邊界）"""
+    monkeypatch.setattr(snapshot_series, 'KEYFRAME_EVERY', 8)
+    history = _history()
+    series = SnapshotSeries(tmp_path)
+    for snap in history:
+        series.append(snap)
+    reopened = SnapshotSeries(tmp_path)
+    assert len(reopened) == len(history)
+    assert sum(e[3] for e in reopened.entries) == 5
+    for i, snap in enumerate(history):
+        assert reopened.snapshot_at(i) == snap
+
+
+def test_changes_between_reads_only_range(tmp_path, monkeypatch):
+    """任兩日差異 = 兩份完整清單的集合差；只讀兩端點之間的紀錄"""
+    history = _history()
+    series = SnapshotSeries(tmp_path)
+    for snap in history:
+        series.append(snap)
+
+    reads = []
+    real_read = SnapshotSeries.read
+    monkeypatch.setattr(SnapshotSeries, 'read', lambda self, i: reads.append(i) or real_read(self, i))
+    before, after, added, removed = series.changes_between('2026-08-10', '2026-08-20')
+    a, b = set(history[9]['permits']), set(history[19]['permits'])
+    assert added == sorted(b - a) and removed == sorted(a - b)
+    assert before['total_pdfs'] == 109 and after['date'] == '2026-08-20'
+    assert min(reads) >= 9 and max(reads) <= 19
+
+    # 反方向
+    _, _, added_r, removed_r = series.changes_between('2026-08-20', '2026-08-10')
+    assert (added_r, removed_r) == (removed, added)
+    assert series.changes_between('2026-07-01', '2026-08-10') is None
+
+
+def test_metric_series_weekly(tmp_path):
+    series = SnapshotSeries(tmp_path)
+    for snap in _history():
+        series.append(snap)
+    points = series.metric_series('total_pdfs', 3, end='2026-09-09')
+    assert points == [('2026-08-26', 125), ('2026-09-02', 132), ('2026-09-09', 139)]
+    assert series.metric_series('status:active', 1, end='2026-09-09')[0][1] == \
+        _history()[-1]['total_permits']
+    # 沒有紀錄的週略過
+    assert series.metric_series('total_pdfs', 2, end='2026-08-03') == [('2026-08-03', 102)]
+
+
+def test_same_day_resave_and_previous(tmp_path):
+    """同一天重存以最後一筆為準；snapshot_before 跳過當天"""
+    series = SnapshotSeries(tmp_path)
+    series.append(_snapshot('2026-09-01', {'A'}))
+    series.append(_snapshot('2026-09-02', {'A', 'B'}))
+    series.append(_snapshot('2026-09-02', {'A', 'C'}))
+    assert series.snapshot_at(series.position('2026-09-02'))['permits'] == ['A', 'C']
+    assert series.snapshot_before('2026-09-02')['permits'] == ['A']
+    assert series.snapshot_before('2026-09-01') is None
+
+
+def test_torn_append_recovered(tmp_path):
+    """資料列寫到一半（或索引沒跟上）→ 開檔時補索引並截掉殘列"""
+    series = SnapshotSeries(tmp_path)
+    series.append(_snapshot('2026-09-01', {'A'}))
+    index_before = (tmp_path / 'series.idx.json').read_text()
+    series.append(_snapshot('2026-09-02', {'A', 'B'}))
+    (tmp_path / 'series.idx.json').write_text(index_before)  # 索引停在第 1 筆
+    with open(tmp_path / 'series.jsonl', 'ab') as f:
+        f.write(b'{"date":"2026-09-03","met')
+
+    reopened = SnapshotSeries(tmp_path)
+    assert reopened.dates == ['2026-09-01', '2026-09-02']
+    assert reopened.snapshot_at(1)['permits'] == ['A', 'B']
+    reopened.append(_snapshot('2026-09-03', {'B'}))
+    assert SnapshotSeries(tmp_path).snapshot_at(2)['permits'] == ['B']
+
+
+def test_legacy_daily_files_imported(tmp_path):
+    """舊版 {date}.json 匯入序列後刪除，內容可完整還原"""
+    legacy = [_snapshot('2026-08-01', {'A', 'B'}), _snapshot('2026-08-08', {'B', 'C'})]
+    for snap in legacy:
+        (tmp_path / f"{snap['date']}.json").write_text(json.dumps(snap, ensure_ascii=False))
+
+    series = open_series(tmp_path)
+    assert [series.snapshot_at(i) for i in range(len(series))] == legacy
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['series.idx.json', 'series.jsonl']
+
+
+def test_weekly_snapshot_uses_series(tmp_path, monkeypatch):
+    """get_previous_snapshot / diff_between 讀序列，結果與 compute_diff 一致"""
+    monkeypatch.setattr(weekly_snapshot, 'SNAPSHOT_DIR', str(tmp_path))
+    history = _history(10)
+    series = SnapshotSeries(tmp_path)
+    for snap in history:
+        series.append(snap)
+
+    prev = weekly_snapshot.get_previous_snapshot()
+    assert prev == history[-1]
+    expected = weekly_snapshot.compute_diff(history[-1], history[2])
+    assert weekly_snapshot.diff_between('2026-08-03', '2026-08-10') == expected
+    assert '📈' in weekly_snapshot.format_metric_series(2, end='2026-08-10')
@@ -0,0 +1,57 @@
+"""啟動時間預算：各進入點 import 時不載入重量級套件，且 import 時間在預算內。
+
+量測方式同 tools/bench_startup.py（子 process + `-X importtime`）。重量級套件的判定與負載
+無關，每次都跑；import 時間受機器負載與冷 bytecode cache 影響，只在 GEOBINGAN_BENCH=1
+時檢查（超過預算時最多重量 3 次取最小值）。
+"""
+import importlib.util
+import os
+import subprocess
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from geobingan_sync import REPO_ROOT
+
+_TOOL = REPO_ROOT / 'tools' / 'bench_startup.py'
+spec = importlib.util.spec_from_file_location('bench_startup', _TOOL)
+bench = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(bench)
+
+
+requires_bench = pytest.mark.skipif(os.environ.get('GEOBINGAN_BENCH') != '1',
+                                    reason='計時檢查依機器負載而定，設 GEOBINGAN_BENCH=1 才執行')
+
+
+@pytest.mark.parametrize('module', bench.ENTRY_POINTS)
+def test_import_is_light(module):
+    _, heavy = bench.measure(module)
+    assert heavy == [], f'{module} import 時載入了 {heavy}（請改在函式內 import）'
+
+
+@requires_bench
+@pytest.mark.parametrize('module', bench.ENTRY_POINTS)
+def test_import_within_budget(module):
+    ms, _ = bench.measure(module)
+    for _ in range(2):
+        if ms <= bench.DEFAULT_BUDGET_MS:
+            break
+        ms = min(ms, bench.measure(module)[0])
+    assert ms <= bench.DEFAULT_BUDGET_MS, f'{module} import {ms:.1f}ms 超過預算 {bench.DEFAULT_BUDGET_MS}ms'
+
+
+def _run(code: str) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, '-c', code], cwd=REPO_ROOT, capture_output=True, text=True)
+
+
+def test_config_import_does_not_read_env():
+    proc = _run("import sys, geobingan_sync.config; print('dotenv' in sys.modules)")
+    assert proc.stdout.strip() == 'False'
+
+
+def test_step_modules_do_not_print_on_import():
+    for module in ('geobingan_sync.steps.upload_pdfs', 'geobingan_sync.steps.generate_permit_tracking_report'):
+        proc = _run(f'import {module}')
+        assert proc.returncode == 0, proc.stderr
+        assert proc.stdout == ''
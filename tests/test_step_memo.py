@@ -0,0 +1,96 @@
+"""Tests for step_memo（步驟輸入指紋與記憶）。"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from geobingan_sync import step_memo
+from geobingan_sync.step_memo import Fingerprint, is_fresh, record
+
+
+@pytest.fixture(autouse=True)
+def memo_file(tmp_path, monkeypatch):
+    path = tmp_path / 'step_memo.json'
+    monkeypatch.setattr(step_memo, 'MEMO_FILE', path)
+    monkeypatch.setattr(step_memo, '_force', None)
+    monkeypatch.delenv('GEOBINGAN_FORCE', raising=False)
+    return path
+
+
+def test_fingerprint_is_stable_and_content_sensitive(tmp_path):
+    src = tmp_path / 'in.json'
+    src.write_text('{"a": 1}', encoding='utf-8')
+
+    def fp():
+        return Fingerprint('x').file(src).data({'b': {2, 1}, 'a': [1]}).code(__name__).hexdigest()
+
+    first = fp()
+    assert fp() == first
+    assert Fingerprint('x').file(src).data({'a': [1], 'b': {1, 2}}).code(__name__).hexdigest() == first
+    src.write_text('{"a": 2}', encoding='utf-8')
+    assert fp() != first
+    assert Fingerprint('y').file(src).hexdigest() != Fingerprint('x').file(src).hexdigest()
+
+
+def test_missing_file_differs_from_empty_file(tmp_path):
+    path = tmp_path / 'maybe.json'
+    missing = Fingerprint().file(path).hexdigest()
+    path.write_text('', encoding='utf-8')
+    assert Fingerprint().file(path).hexdigest() != missing
+
+
+def test_record_then_fresh_until_inputs_change(tmp_path):
+    out = tmp_path / 'out.html'
+    out.write_text('report', encoding='utf-8')
+    assert not is_fresh('step', 'fp1')
+    record('step', 'fp1', outputs=[out])
+    assert is_fresh('step', 'fp1')
+    assert not is_fresh('step', 'fp2')
+    assert not is_fresh('other', 'fp1')
+
+
+def test_changed_or_deleted_output_invalidates(tmp_path):
+    out = tmp_path / 'out.html'
+    out.write_text('report', encoding='utf-8')
+    record('step', 'fp', outputs=[out])
+    out.write_text('edited by hand', encoding='utf-8')
+    assert not is_fresh('step', 'fp')
+    record('step', 'fp', outputs=[out])
+    out.unlink()
+    assert not is_fresh('step', 'fp')
+
+
+def test_force_by_prefix_and_env(monkeypatch):
+    record('match_permits.taipei', 'fp')
+    record('tracking_report.render.taipei', 'fp')
+    step_memo.set_force(['match_permits'])
+    assert not is_fresh('match_permits.taipei', 'fp')
+    assert is_fresh('tracking_report.render.taipei', 'fp')
+    step_memo.set_force(None)
+    assert not is_fresh('tracking_report.render.taipei', 'fp')
+
+    monkeypatch.setattr(step_memo, '_force', None)
+    monkeypatch.setenv('GEOBINGAN_FORCE', 'tracking_report')
+    assert not is_fresh('tracking_report.render.taipei', 'fp')
+    assert is_fresh('match_permits.taipei', 'fp')
+
+
+def test_corrupt_memo_means_rerun(memo_file):
+    record('step', 'fp')
+    memo_file.write_text('{not json', encoding='utf-8')
+    assert not is_fresh('step', 'fp')
+    record('step', 'fp')
+    assert is_fresh('step', 'fp')
+    step_memo.forget('step')
+    assert not is_fresh('step', 'fp')
+
+
+def test_code_fingerprint_does_not_need_the_module_in_sys_modules(monkeypatch):
+    # `python -m geobingan_sync.steps.match_permits` 時模組以 __main__ 載入，sys.modules 沒有正式名稱
+    name = 'geobingan_sync.text_index'
+    __import__(name)
+    imported = Fingerprint('x').code(name).hexdigest()
+    monkeypatch.delitem(sys.modules, name)
+    assert Fingerprint('x').code(name).hexdigest() == imported
+    assert Fingerprint('x').code('geobingan_sync.no_such_module').hexdigest() != imported
@@ -0,0 +1,179 @@
+"""Tests for token_manager：不阻塞取 token、背景主動刷新、thread / process 間 single-flight、共用快取。"""
+import base64
+import json
+import os
+import stat
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from geobingan_sync import token_manager
+from geobingan_sync.token_manager import TokenManager
+
+
+def _make_jwt(exp: float, tag: str = '') -> str:
+    header = base64.urlsafe_b64encode(json.dumps({"alg": "HS256"}).encode()).rstrip(b'=').decode()
+    body = base64.urlsafe_b64encode(json.dumps({"exp": int(exp), "jti": tag}).encode()).rstrip(b'=').decode()
+    return f"{header}.{body}.sig"
+
+
+class _Refresher:
+    """假的 refresh endpoint：每次回傳新的 access / refresh token"""
+
+    def __init__(self, delay=0.0, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def __call__(self, refresh_token, refresh_url):
+        time.sleep(self.delay)
+        with self._lock:
+            self.calls.append(refresh_token)
+            n = len(self.calls)
+        if self.fail:
+            return None, None
+        return _make_jwt(time.time() + 3600, f'access{n}'), _make_jwt(time.time() + 7 * 86400, f'refresh{n}')
+
+
+@pytest.fixture
+def make_manager(tmp_path):
+    managers = []
+
+    def make(access, refresh='r0', refresher=None, **kwargs):
+        m = TokenManager(access, refresh, 'https://example.com/refresh',
+                         cache_file=tmp_path / 'token_cache.json', lock_file=tmp_path / 'token_refresh.lock',
+                         refresh_fn=refresher or _Refresher(), persist_env=False, **kwargs)
+        managers.append(m)
+        return m
+    yield make
+    for m in managers:
+        m.stop()
+
+
+def _wait_for(cond, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if cond():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_fresh_token_returned_without_refresh(make_manager):
+    token = _make_jwt(time.time() + 3600)
+    refresher = _Refresher()
+    m = make_manager(token, refresher=refresher)
+    assert m.current() == token
+    assert refresher.calls == []
+
+
+def test_expiring_token_returned_immediately_and_refreshed_in_background(make_manager):
+    token = _make_jwt(time.time() + 120)
+    refresher = _Refresher(delay=0.2)
+    m = make_manager(token, refresher=refresher)
+
+    start = time.time()
+    assert m.current() == token
+    assert time.time() - start < 0.1
+    assert _wait_for(lambda: m.peek() != token)
+    assert refresher.calls == ['r0']
+
+
+def test_expired_token_blocks_until_refreshed_and_writes_cache(make_manager, tmp_path):
+    refresher = _Refresher()
+    m = make_manager(_make_jwt(time.time() - 10), refresher=refresher)
+    new = m.current()
+    assert new != '' and m.remaining(new) > 3000
+    assert refresher.calls == ['r0']
+
+    cache_path = tmp_path / 'token_cache.json'
+    cache = json.loads(cache_path.read_text(encoding='utf-8'))
+    assert cache['access_token'] == new
+    assert stat.S_IMODE(os.stat(cache_path).st_mode) == 0o600
+    # refresh token 輪替後，下一次刷新用新的 refresh token
+    m.invalidate(new)
+    assert refresher.calls[1] == cache['refresh_token']
+
+
+def test_concurrent_401s_refresh_once(make_manager):
+    stale = _make_jwt(time.time() + 1800, 'stale')
+    refresher = _Refresher(delay=0.1)
+    m = make_manager(stale, refresher=refresher)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(m.invalidate(stale))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(refresher.calls) == 1
+    assert len(set(results)) == 1 and results[0] != stale
+
+
+def test_processes_share_refresh_through_cache_and_lock(make_manager):
+    # 兩個 manager 各自持有同一個舊 token，共用快取與 flock（等同兩個 process）
+    stale = _make_jwt(time.time() + 1800, 'stale')
+    ra, rb = _Refresher(delay=0.1), _Refresher(delay=0.1)
+    a = make_manager(stale, refresher=ra)
+    b = make_manager(stale, refresher=rb)
+
+    results = {}
+    threads = [threading.Thread(target=lambda m=m, k=k: results.__setitem__(k, m.invalidate(stale)))
+               for k, m in (('a', a), ('b', b))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(ra.calls) + len(rb.calls) == 1
+    assert results['a'] == results['b'] != stale
+
+
+def test_new_manager_adopts_newer_cached_token(make_manager):
+    refresher = _Refresher()
+    first = make_manager(_make_jwt(time.time() - 10), refresher=refresher)
+    fresh = first.current()
+
+    # 新 process 由 .env 讀到舊 token，但共用快取裡有較新的
+    second = make_manager(_make_jwt(time.time() - 10), refresh='stale-refresh', refresher=refresher)
+    assert second.current() == fresh
+    assert len(refresher.calls) == 1
+
+
+def test_failed_refresh_keeps_old_token_and_backs_off(make_manager, capsys):
+    old = _make_jwt(time.time() - 10)
+    refresher = _Refresher(fail=True)
+    m = make_manager(old, refresher=refresher)
+    assert m.current() == old
+    assert m.current() == old
+    assert len(refresher.calls) == 1
+    assert '使用舊 Token' in capsys.readouterr().out
+
+
+def test_background_thread_refreshes_before_expiry(make_manager):
+    token = _make_jwt(time.time() + 120)
+    refresher = _Refresher()
+    m = make_manager(token, refresher=refresher)
+    m.start()
+    assert _wait_for(lambda: m.peek() != token)
+    assert refresher.calls == ['r0']
+    m.stop()
+    assert m._thread is None
+
+
+def test_module_singleton_built_from_config(monkeypatch, tmp_path):
+    from geobingan_sync import config
+    token = _make_jwt(time.time() + 3600)
+    monkeypatch.setattr(config, 'JWT_TOKEN', token, raising=False)
+    monkeypatch.setattr(config, 'REFRESH_TOKEN', 'r0', raising=False)
+    monkeypatch.setattr(token_manager, 'TOKEN_CACHE_FILE', tmp_path / 'token_cache.json')
+    monkeypatch.setattr(token_manager, 'TOKEN_LOCK_FILE', tmp_path / 'token_refresh.lock')
+    token_manager.reset()
+    try:
+        assert token_manager.get_token() == token
+        assert token_manager.get_manager() is token_manager.get_manager()
+    finally:
+        token_manager.reset()
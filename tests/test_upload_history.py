@@ -0,0 +1,145 @@
+"""Tests for geobingan_sync.upload_history（共用上傳歷史索引）。
+
+_naive_* 是索引化之前 generate_permit_tracking_report 三個 loader 各自解析
+upload_history_all.json 的原始邏輯；以 state/ 的真實歷史檔逐筆比對結果一致。
+"""
+import json
+import os
+import re
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from geobingan_sync import upload_history
+from geobingan_sync.permit_utils import extract_name_from_filename
+from geobingan_sync.steps import upload_pdfs
+
+HISTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                       'state', 'upload_history_all.json')
+
+
+def _naive_filename_to_permit(all_files):
+    mapping = {}
+    for item in all_files:
+        if isinstance(item, dict):
+            filepath = item.get('permit', '') + '/' + item.get('pdf', {}).get('name', '')
+        else:
+            filepath = str(item)
+        match = re.search(r'(\d{2,3}建字第\d{3,5}號)', filepath)
+        if match:
+            permit = match.group(1)
+            filename = filepath.split('/')[-1] if '/' in filepath else filepath
+            mapping[filename] = permit
+            if not filename.lower().endswith('.pdf'):
+                mapping[filename + '.pdf'] = permit
+    return mapping
+
+
+def _naive_names(items):
+    name_to_permit, permit_to_name, counts = {}, {}, {}
+    for item in items:
+        if isinstance(item, str) and '/' in item:
+            permit, filename = item.split('/', 1)
+            if not re.match(r'\d{2,3}建字第\d{3,5}號', permit):
+                continue
+            name = extract_name_from_filename(filename)
+            if name and permit:
+                name_to_permit[name] = permit
+                counts.setdefault(permit, {})
+                counts[permit][name] = counts[permit].get(name, 0) + 1
+    for permit, name_counts in counts.items():
+        if name_counts:
+            permit_to_name[permit] = max(name_counts.items(), key=lambda x: x[1])[0]
+    return name_to_permit, permit_to_name
+
+
+@pytest.fixture(autouse=True)
+def _fresh_cache():
+    upload_history.clear_cache()
+    yield
+    upload_history.clear_cache()
+
+
+def test_index_matches_naive_loaders():
+    if not os.path.exists(HISTORY):
+        pytest.skip('缺少 state/upload_history_all.json')
+    with open(HISTORY, 'r', encoding='utf-8') as f:
+        items = json.load(f)['uploaded_files']
+    index = upload_history.load_index(HISTORY)
+
+    assert index.filename_to_permit == _naive_filename_to_permit(items)
+    by_permit = {}
+    for item in items:
+        if isinstance(item, str) and '/' in item:
+            permit, filename = item.split('/', 1)
+            by_permit.setdefault(permit, set()).add(filename)
+    assert index.by_permit == by_permit
+    name_to_permit, permit_to_name = _naive_names(items)
+    assert list(index.name_to_permit.items()) == list(name_to_permit.items())
+    assert index.most_common_names() == permit_to_name
+
+
+def test_index_memoized_until_file_changes(tmp_path):
+    path = tmp_path / 'history.json'
+    path.write_text(json.dumps({'uploaded_files': ['113建字第0001號/甲案1150301.pdf']}), encoding='utf-8')
+    first = upload_history.load_index(path)
+    assert upload_history.load_index(path) is first
+
+    path.write_text(json.dumps({'uploaded_files': ['113建字第0001號/甲案1150301.pdf',
+                                                   '113建字第0002號/乙案1150302.pdf']}), encoding='utf-8')
+    second = upload_history.load_index(path)
+    assert second is not first
+    assert set(second.by_permit) == {'113建字第0001號', '113建字第0002號'}
+
+
+def test_missing_file_gives_empty_index(tmp_path):
+    index = upload_history.load_index(tmp_path / 'none.json')
+    assert len(index) == 0 and index.files == set() and index.name_votes == {}
+
+
+def test_legacy_dict_entries_mapped():
+    index = upload_history.UploadHistoryIndex({'uploaded_files': [
+        {'permit': '112建字第0100號', 'pdf': {'name': '丙案觀測報告'}},
+        '子資料夾/113建字第0200號/丁案.pdf',
+    ]})
+    assert index.filename_to_permit == {
+        '丙案觀測報告': '112建字第0100號',
+        '丙案觀測報告.pdf': '112建字第0100號',
+        '丁案.pdf': '113建字第0200號',
+    }
+    assert index.files == {'子資料夾/113建字第0200號/丁案.pdf'}
+
+
+def test_load_state_merges_history_index(tmp_path, monkeypatch):
+    state_file = tmp_path / 'state.json'
+    state_file.write_text(json.dumps({'uploaded_files': ['a/1.pdf'], 'errors': []}), encoding='utf-8')
+    history_file = tmp_path / 'history.json'
+    history_file.write_text(json.dumps({'uploaded_files': ['a/1.pdf', 'b/2.pdf']}), encoding='utf-8')
+    monkeypatch.setattr(upload_pdfs, 'STATE_FILE', str(state_file))
+    monkeypatch.setattr(upload_pdfs, 'HISTORY_FILE', str(history_file))
+    monkeypatch.setattr(upload_pdfs, 'PDF_INVENTORY_FILE', str(tmp_path / 'inv.json'))
+
+    state = upload_pdfs.load_state()
+    assert sorted(state['uploaded_files']) == ['a/1.pdf', 'b/2.pdf']
+    # 共用索引的 set 不可被 load_state 改到
+    assert upload_history.load_index(history_file).files == {'a/1.pdf', 'b/2.pdf'}
+
+
+def test_tracking_report_merges_7day_state_without_duplicates(tmp_path, monkeypatch, capsys):
+    from geobingan_sync.steps import generate_permit_tracking_report as report
+    legacy = {'permit': '112建字第0100號', 'pdf': {'name': '丙案觀測報告'}}
+    monkeypatch.setattr(upload_history, 'load_index', lambda: upload_history.UploadHistoryIndex(
+        {'uploaded_files': ['113建字第0200號/丁案.pdf', legacy]}))
+    (tmp_path / 'state').mkdir()
+    (tmp_path / 'state' / 'uploaded_to_geobingan_7days.json').write_text(json.dumps({'uploaded_files': [
+        '113建字第0200號/丁案.pdf',
+        {'pdf': {'name': '丙案觀測報告'}, 'permit': '112建字第0100號'},  # 與歷史相同（key 順序不同）
+        {'permit': '114建字第0300號', 'pdf': {'name': '戊案'}},
+        {'permit': '114建字第0300號', 'pdf': {'name': '戊案'}},
+    ]}, ensure_ascii=False), encoding='utf-8')
+    monkeypatch.chdir(tmp_path)
+
+    mapping = report.load_filename_to_permit_mapping()
+    assert mapping['戊案.pdf'] == '114建字第0300號'
+    assert '載入 3 個上傳記錄' in capsys.readouterr().out
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""match_permits 名稱比對 benchmark：索引版 vs 全表掃描，建照數 1× ~ 10×。
+
+以 state/permit_registry.json 的建案名稱 / api_match 為種子，放大 N 倍時每份複本
+在名稱後加上不同的 CJK 後綴（讓名稱彼此不同，但子字串關係與真實資料相近）。
+全表掃描版只跑到 --naive-max 倍（再大就要等很久，這正是要解決的問題）。
+
+用法：
+    python3 tools/bench_name_matching.py                 # 1, 2, 5, 10 倍
+    python3 tools/bench_name_matching.py --scales 1 20   # 自訂倍數
+"""
+import os
+import sys
+# REPO_ROOT bootstrap：允許 python3 tools/bench_name_matching.py 直接執行
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import argparse
+import json
+import re
+import time
+
+from geobingan_sync import REPO_ROOT
+from geobingan_sync.steps.match_permits import (
+    dedup_api_projects, ApiProjectMatcher, LiveAlertMatcher,
+)
+
+REGISTRY_FILE = REPO_ROOT / 'state' / 'permit_registry.json'
+_SUFFIX_CHARS = '甲乙丙丁戊己庚辛壬癸子丑寅卯辰巳午未申酉'
+_ALERT_NOISE = re.compile(r'(安全觀測|監測|觀測|報告|報表|數據|新建工程|工程)')
+_NON_CJK = re.compile(r'[^\u4e00-\u9fff]')
+
+
+def _suffix(k: int) -> str:
+    if k == 0:
+        return ''
+    out = ''
+    while k:
+        k, r = divmod(k, len(_SUFFIX_CHARS))
+        out += _SUFFIX_CHARS[r]
+    return out + '區'
+
+
+def build_fixtures(registry: dict, scale: int):
+    names = [e['name'] for _, e in sorted(registry.items()) if e.get('name')]
+    api_names = [e['api_match'] for _, e in sorted(registry.items()) if e.get('api_match')]
+    projects, alerts, drive_names = [], {}, []
+    for k in range(scale):
+        sfx = _suffix(k)
+        projects += [{'project_name': n + sfx} for n in api_names + names[::2]]
+        for n in names[::3]:
+            alerts[n + sfx] = [{'tone': 'warning'}]
+        drive_names += [n + sfx for n in names]
+    return projects, alerts, drive_names
+
+
+def run_indexed(projects, alerts, drive_names):
+    index = dedup_api_projects(projects)
+    api_matcher = ApiProjectMatcher(index)
+    alert_matcher = LiveAlertMatcher(alerts)
+    for n in drive_names:
+        api_matcher.match(n)
+        alert_matcher.match([n])
+
+
+def run_naive(projects, alerts, drive_names):
+    """原 build_registry 的全表掃描（去重 + 方法 2 視窗 + 警示視窗，只保留成本結構）"""
+    index = {}
+    for p in projects:
+        name = p['project_name']
+        if any(name in e for e in index):
+            continue
+        for e in [e for e in index if e in name]:
+            del index[e]
+        index[name] = p
+    for n in drive_names:
+        cjk = _NON_CJK.sub('', n)
+        for flen in range(min(6, len(cjk)), 2, -1):
+            for start in range(len(cjk) - flen + 1):
+                [k for k in index if cjk[start:start + flen] in k]
+        cjk = _NON_CJK.sub('', _ALERT_NOISE.sub('', n))
+        for ap in alerts:
+            for flen in range(min(5, len(cjk)), 2, -1):
+                for start in range(len(cjk) - flen + 1):
+                    [a for a in alerts if cjk[start:start + flen] in a]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 2, 5, 10])
+    parser.add_argument('--naive-max', type=int, default=1, help='全表掃描版只跑到這個倍數')
+    args = parser.parse_args()
+
+    with open(REGISTRY_FILE, 'r', encoding='utf-8') as f:
+        registry = json.load(f)
+
+    print(f"{'倍數':>4} {'建照':>6} {'project':>8} {'警示':>6} {'索引版':>10} {'全表掃描':>10}")
+    for scale in args.scales:
+        projects, alerts, drive_names = build_fixtures(registry, scale)
+        t0 = time.perf_counter()
+        run_indexed(projects, alerts, drive_names)
+        indexed = time.perf_counter() - t0
+        naive = '-'
+        if scale <= args.naive_max:
+            t0 = time.perf_counter()
+            run_naive(projects, alerts, drive_names)
+            naive = f'{time.perf_counter() - t0:.2f}s'
+        print(f"{scale:>4} {len(drive_names):>6} {len(projects):>8} {len(alerts):>6} "
+              f"{indexed:>9.2f}s {naive:>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""PDF inventory 載入 benchmark：JSON（json.load 成 list of dict）vs 二進位（mmap）。
+
+以合成的 Drive PDF 清單（資料夾名稱重複、標準 modifiedTime、已標註報告日期）
+比較寫出大小、載入耗時與載入後常駐記憶體（tracemalloc peak）。
+
+用法：
+    python3 tools/bench_pdf_inventory.py                    # 10 萬、20 萬筆
+    python3 tools/bench_pdf_inventory.py --sizes 50000      # 自訂筆數
+"""
+import os
+import sys
+# REPO_ROOT bootstrap：允許 python3 tools/bench_pdf_inventory.py 直接執行
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import argparse
+import json
+import random
+import tempfile
+import time
+import tracemalloc
+
+from geobingan_sync import binary_inventory
+from geobingan_sync.pdf_inventory import annotate_pdfs
+
+
+def build_pdfs(n: int, folders: int = 1200):
+    rng = random.Random(0)
+    names = [f'{110 + i % 6}建字第{i:04d}號某某新建工程監測' for i in range(folders)]
+    pdfs = []
+    for i in range(n):
+        f = rng.randrange(folders)
+        y, m, d = 114 + rng.randrange(2), rng.randint(1, 12), rng.randint(1, 28)
+        pdfs.append({
+            'id': f'1{i:032x}',
+            'name': f'觀測報告_{y}{m:02d}{d:02d}.pdf',
+            'size': str(rng.randint(10_000, 9_000_000)),
+            'modifiedTime': f'2026-0{rng.randint(1, 9)}-{rng.randint(10, 28)}T0{rng.randint(0, 9)}:00:00.000Z',
+            'folder_id': f'F{f:08d}',
+            'folder_name': names[f],
+        })
+    annotate_pdfs(pdfs)
+    return pdfs
+
+
+def measure(fn):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100_000, 200_000])
+    args = parser.parse_args()
+
+    print(f"{'筆數':>8} {'格式':>6} {'檔案':>8} {'載入':>8} {'記憶體':>9} {'逐列走訪':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.sizes:
+            pdfs = build_pdfs(n)
+            json_path = os.path.join(tmp, 'pdf_inventory.json')
+            with open(json_path, 'w', encoding='utf-8') as f:
+                json.dump({'last_scan': 'bench', 'pdfs': pdfs}, f, ensure_ascii=False)
+            bin_path = binary_inventory.bin_path_for(json_path)
+            binary_inventory.write(bin_path, pdfs, {'last_scan': 'bench'})
+            del pdfs
+
+            def load_json():
+                with open(json_path, 'r', encoding='utf-8') as f:
+                    return json.load(f)['pdfs']
+
+            for label, path, loader in (('JSON', json_path, load_json),
+                                        ('binary', bin_path, lambda: binary_inventory.BinaryInventory(bin_path))):
+                inv, elapsed, peak = measure(loader)
+                t0 = time.perf_counter()
+                folders = sum(1 for p in inv if p.get('is_real_site'))
+                walk = time.perf_counter() - t0
+                print(f"{n:>8} {label:>6} {os.path.getsize(path) / 1e6:>6.1f}MB {elapsed:>7.3f}s "
+                      f"{peak / 1e6:>7.1f}MB {walk:>7.2f}s")
+                del inv, folders
+
+
+if __name__ == '__main__':
+    main()
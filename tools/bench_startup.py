@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""啟動時間 benchmark：以 `python -X importtime` 量測各進入點的 import 成本。
+
+每個進入點在獨立的子 process 量測（冷啟動；模組快取不互相污染），取該模組那一行的
+cumulative 時間——只算 `import <module>` 本身，不含 interpreter 啟動與 site。
+另外列出 import 時就被載入的重量級套件（googleapiclient / pypdf / requests…）：
+這些應該延遲到真正用到的函式內才 import（見 geobingan_sync/lazy_import.py）。
+
+超過預算或載入了重量級套件 → exit 1（tests/test_startup_budget.py 以同一套量測把關）。
+
+用法：
+    python3 tools/bench_startup.py                   # 全部進入點，預算 100ms
+    python3 tools/bench_startup.py --budget-ms 50    # 自訂預算
+    python3 tools/bench_startup.py --repeat 5        # 每個進入點量 5 次取中位數
+"""
+import os
+import sys
+# REPO_ROOT bootstrap：允許 python3 tools/bench_startup.py 直接執行
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import argparse
+import re
+import statistics
+import subprocess
+from typing import Dict, List, Tuple
+
+from geobingan_sync import REPO_ROOT
+
+# 輕量指令（token 檢查、記錄結果、健康檢查）與各步驟模組
+ENTRY_POINTS = [
+    'geobingan_sync.config',
+    'geobingan_sync.jwt_auth',
+    'geobingan_sync.run',
+    'geobingan_sync.steps.record_sync_result',
+    'health_check',
+    'geobingan_sync.steps.sync_permits',
+    'geobingan_sync.steps.upload_pdfs',
+    'geobingan_sync.steps.match_permits',
+    'geobingan_sync.steps.generate_permit_tracking_report',
+    'geobingan_sync.steps.weekly_snapshot',
+    'geobingan_sync.steps.generate_weekly_report',
+]
+# import 時不該出現的重量級套件（頂層套件名）
+HEAVY_PACKAGES = ('googleapiclient', 'google.oauth2', 'google.auth', 'pypdf', 'requests', 'urllib3')
+DEFAULT_BUDGET_MS = 100
+
+_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$')
+
+
+def measure(module: str) -> Tuple[float, List[str]]:
+    """(module 的 cumulative import 毫秒, import 時載入的重量級套件)"""
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=REPO_ROOT, capture_output=True, text=True,
+        env=dict(os.environ, PYTHONDONTWRITEBYTECODE='1'),
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f'import {module} 失敗:\n{proc.stderr[-2000:]}')
+    cumulative = None
+    heavy = set()
+    for line in proc.stderr.splitlines():
+        m = _LINE.match(line)
+        if not m:
+            continue
+        name = m.group(4)
+        if name == module and len(m.group(3)) == 1:
+            cumulative = int(m.group(2)) / 1000
+        for pkg in HEAVY_PACKAGES:
+            if name == pkg or name.startswith(pkg + '.'):
+                heavy.add(pkg)
+    if cumulative is None:
+        raise RuntimeError(f'importtime 輸出中找不到 {module}')
+    return cumulative, sorted(heavy)
+
+
+def run(modules: List[str], repeat: int = 1) -> Dict[str, Tuple[float, List[str]]]:
+    results = {}
+    for module in modules:
+        samples = [measure(module) for _ in range(max(1, repeat))]
+        results[module] = (statistics.median(s[0] for s in samples), samples[-1][1])
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='各進入點的 import 時間')
+    parser.add_argument('modules', nargs='*', default=ENTRY_POINTS)
+    parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    failed = False
+    width = max(map(len, args.modules))
+    for module, (ms, heavy) in run(args.modules, args.repeat).items():
+        over = ms > args.budget_ms
+        failed = failed or over or bool(heavy)
+        flag = '❌' if over or heavy else '✅'
+        extra = f"  重量級: {', '.join(heavy)}" if heavy else ''
+        print(f"{flag} {module:<{width}}  {ms:7.1f} ms{extra}")
+    print(f"\n預算 {args.budget_ms:.0f} ms / 進入點")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())